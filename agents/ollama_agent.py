@@ -1,6 +1,7 @@
 # ArtAgent/agents/ollama_agent.py
 
 import json
+import threading
 import requests
 from PIL import Image # Keep if image processing happens here
 import io             # Keep if image processing happens here
@@ -9,6 +10,58 @@ import numpy as np    # Keep if image processing happens here (less likely now)
 
 # Removed internal load_settings/load_roles - Assume these are passed in
 # from core.utils import load_json # Not needed if settings/roles passed
+from agents.roles_config import compiled_role
+
+class EncodedImage:
+    """
+    An image already encoded for the Ollama payload (base64 JPEG/PNG string).
+    Lets callers prepare images ahead of time (see core/image_prefetch.py) and
+    avoids re-encoding the same image for every step of a team workflow.
+    """
+    __slots__ = ("data", "source", "size")
+
+    def __init__(self, data: str, source: str = "", size: tuple = None):
+        self.data = data
+        self.source = source
+        self.size = size
+
+    def close(self):
+        """No-op, so callers can treat it like a PIL Image in cleanup code."""
+
+
+_token_usage = threading.local() # Per-thread sums of Ollama's token counters (sweep runs use one thread each)
+
+def reset_token_usage():
+    """Starts a fresh token count for LLM requests made by the current thread."""
+    _token_usage.totals = {"requests": 0, "prompt_tokens": 0, "eval_tokens": 0, "eval_seconds": 0.0}
+
+
+def get_token_usage() -> dict:
+    """Token counts of the current thread's requests since reset_token_usage()."""
+    if not hasattr(_token_usage, "totals"): reset_token_usage()
+    return dict(_token_usage.totals)
+
+
+def _record_token_usage(final_chunk: dict):
+    """Adds the counters Ollama sends with the done=true chunk."""
+    if not hasattr(_token_usage, "totals"): reset_token_usage()
+    totals = _token_usage.totals
+    totals["requests"] += 1
+    totals["prompt_tokens"] += final_chunk.get("prompt_eval_count") or 0
+    totals["eval_tokens"] += final_chunk.get("eval_count") or 0
+    totals["eval_seconds"] += (final_chunk.get("eval_duration") or 0) / 1e9 # Reported in nanoseconds
+
+
+def encode_image(img_object: Image.Image) -> str:
+    """Encodes a PIL Image to the base64 string Ollama expects."""
+    buffered = io.BytesIO()
+    # Choose format (JPEG is often smaller, PNG supports transparency)
+    save_format = "JPEG" if img_object.mode != "RGBA" else "PNG"
+    if save_format == "JPEG" and img_object.mode not in ("RGB", "L"):
+        img_object = img_object.convert("RGB") # JPEG can't store P/LA/CMYK etc. directly
+    img_object.save(buffered, format=save_format)
+    return base64.b64encode(buffered.getvalue()).decode('utf-8')
+
 
 def get_llm_response(
     role: str,
@@ -16,7 +69,7 @@ def get_llm_response(
     model: str,
     settings: dict,         # Pass settings dict
     roles_data: dict,       # Pass loaded roles dict
-    images: list = None,    # List of PIL Image objects
+    images: list = None,    # List of PIL Image or EncodedImage objects
     max_tokens: int = 1500, # Still useful as fallback for num_predict
     # Optional args removed for clarity, add back if needed by specific logic:
     # file_path=None, user_input=None, model_with_vision=None, num_predict=None,
@@ -32,7 +85,7 @@ def get_llm_response(
         model (str): The name of the Ollama model to use.
         settings (dict): The application's settings dictionary.
         roles_data (dict): The loaded dictionary of all available agent roles.
-        images (list, optional): A list of PIL Image objects. Defaults to None.
+        images (list, optional): A list of PIL Image or pre-encoded EncodedImage objects. Defaults to None.
         max_tokens (int, optional): Fallback for num_predict if not specified elsewhere. Defaults to 1500.
         ollama_api_options (dict, optional): Options to directly override/merge settings. Defaults to None.
 
@@ -48,16 +101,12 @@ def get_llm_response(
     # role_description = roles_data.get(role, {}).get("description", "Unknown Role")
 
     # --- Merge Ollama API Options ---
-    # Priority: Direct call > Role-specific > Global Settings
-    effective_options = settings.get("ollama_api_options", {}).copy() # Start with global
-    role_settings = roles_data.get(role, {}).get("ollama_api_options", {})
-    effective_options.update(role_settings) # Apply role settings
-    if ollama_api_options: # Apply direct overrides
-        effective_options.update(ollama_api_options)
-
-    # Ensure num_predict is set (using max_tokens as fallback)
-    if "num_predict" not in effective_options:
-        effective_options["num_predict"] = max_tokens
+    # Priority: Direct call > Role-specific > Global Settings (the last two are merged once per role, see compiled_role)
+    effective_options = compiled_role(role, settings, roles_data).options
+    if ollama_api_options or "num_predict" not in effective_options:
+        effective_options = {**effective_options, **(ollama_api_options or {})} # Copy; the compiled options are shared
+        # Ensure num_predict is set (using max_tokens as fallback)
+        effective_options.setdefault("num_predict", max_tokens)
 
     # --- Log details if enabled ---
     if ollama_api_prompt_to_console:
@@ -91,20 +140,18 @@ def get_llm_response(
         try:
             print(f"Processing {len(images)} image(s) for payload...")
             for i, img_object in enumerate(images):
-                if isinstance(img_object, Image.Image): # Check if it's a PIL Image
-                    buffered = io.BytesIO()
-                    # Choose format (JPEG is often smaller, PNG supports transparency)
-                    save_format = "JPEG" if img_object.mode != "RGBA" else "PNG"
-                    img_object.save(buffered, format=save_format)
-                    img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
+                if isinstance(img_object, EncodedImage): # Prepared ahead of time, send as-is
+                    image_data.append(img_object.data)
+                elif isinstance(img_object, Image.Image): # Check if it's a PIL Image
+                    img_str = encode_image(img_object)
                     image_data.append(img_str)
-                    # print(f"  Processed image {i+1} ({save_format}, size: {len(img_str)} bytes)") # Reduce verbosity
+                    # print(f"  Processed image {i+1} (size: {len(img_str)} bytes)") # Reduce verbosity
                 else:
                     print(f"Warning: Item {i+1} in images list is not a PIL Image object, skipping.")
             if image_data:
                 payload["images"] = image_data
             else:
-                 print("Warning: Image list provided but no valid PIL Images found/processed.")
+                 print("Warning: Image list provided but no valid images found/processed.")
         except Exception as img_e:
             print(f"Error processing image for Ollama payload: {img_e}")
             # Return error immediately if image processing fails critically
@@ -133,6 +180,7 @@ def get_llm_response(
                     complete_response += chunk_data.get('response', "")
                     if chunk_data.get("done"):
                         print(f"Stream finished (done=true received after {chunk_count} chunks).")
+                        _record_token_usage(chunk_data)
                         # Optional: log context length, eval duration etc. if present
                         # final_context = chunk_data.get('context')
                         # if final_context: print(f"  Final context length: {len(final_context)}")
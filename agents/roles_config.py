@@ -1,13 +1,20 @@
 # ArtAgent/agents/roles_config.py
 import os
+import threading
+from collections import OrderedDict
 from core.utils import load_json # Use utility function
+from core.config_registry import load_config # Cached by file mtime
 
 DEFAULT_ROLES_FILE = 'agents/agent_roles.json'
 CUSTOM_ROLES_FILE = 'agents/custom_agent_roles.json'
+ROLE_TABLE_SIZE = 512 # Compiled (global options, role definition) entries kept; older ones are rebuilt on use
+FILE_AGENT_PREFIX = "[File] "
 
 def load_all_roles(settings, file_agents: dict = None):
     """
     Loads default, custom, and optionally file-loaded roles based on settings flags.
+    Role files are parsed once and re-read only when they change (core/config_registry.py),
+    so the role definitions in the result are shared: do not modify them in place.
 
     Args:
         settings (dict): The application settings dictionary.
@@ -22,7 +29,7 @@ def load_all_roles(settings, file_agents: dict = None):
 
     # 1. Load default roles first if enabled
     if use_default:
-        default_roles = load_json(DEFAULT_ROLES_FILE, is_relative=True)
+        default_roles = load_config(DEFAULT_ROLES_FILE, loader=load_json)
         if isinstance(default_roles, dict):
              roles.update(default_roles)
         else:
@@ -30,7 +37,7 @@ def load_all_roles(settings, file_agents: dict = None):
 
     # 2. Load custom roles if enabled, potentially overriding defaults
     if use_custom:
-        custom_roles = load_json(CUSTOM_ROLES_FILE, is_relative=True)
+        custom_roles = load_config(CUSTOM_ROLES_FILE, loader=load_json)
         if isinstance(custom_roles, dict):
              roles.update(custom_roles) # Custom roles override defaults
         else:
@@ -57,12 +64,57 @@ def load_all_roles(settings, file_agents: dict = None):
 def get_role_display_name(role_name: str, file_agent_keys: list = None) -> str:
     """Adds a prefix to role names loaded from file for display purposes."""
     if file_agent_keys and role_name in file_agent_keys:
-        return f"[File] {role_name}"
+        return f"{FILE_AGENT_PREFIX}{role_name}"
     return role_name
 
 def get_actual_role_name(display_name: str) -> str:
     """Removes the prefix from a display name to get the actual key."""
-    prefix = "[File] "
-    if display_name.startswith(prefix):
-        return display_name[len(prefix):]
-    return display_name
\ No newline at end of file
+    if display_name.startswith(FILE_AGENT_PREFIX):
+        return display_name[len(FILE_AGENT_PREFIX):]
+    return display_name
+
+
+class CompiledRole:
+    """A role's effective Ollama options (global settings overridden by the role's own), description and display name."""
+    __slots__ = ("name", "description", "display_name", "options")
+
+    def __init__(self, name: str, description, display_name: str, options: dict):
+        self.name = name
+        self.description = description # None if the role defines none (callers pick their own fallback)
+        self.display_name = display_name
+        self.options = options # Shared between requests: copy before changing
+
+
+_role_table = OrderedDict() # (id(global options), id(role definition), name, from file) -> (global options, definition, CompiledRole)
+_role_table_lock = threading.Lock()
+_NO_ROLE = {} # Stands in for roles missing from roles_data (never modified)
+_NO_OPTIONS = {}
+
+def compiled_role(role_name: str, settings: dict, roles_data: dict, file_agent_keys=None) -> CompiledRole:
+    """
+    The compiled entry of one role. Entries are keyed by the identity of the
+    settings' 'ollama_api_options' dict and of the role definition, so they are
+    rebuilt only when settings are saved or a role file changes (both produce new
+    dicts, see core/config_registry.py); otherwise this is one dict lookup.
+    Neither dict may be modified in place while in use.
+    """
+    global_options = settings.get("ollama_api_options") or _NO_OPTIONS
+    definition = roles_data.get(role_name) or _NO_ROLE
+    from_file = bool(file_agent_keys) and role_name in file_agent_keys
+    key = (id(global_options), id(definition), role_name, from_file)
+    with _role_table_lock:
+        entry = _role_table.get(key)
+        if entry is not None and entry[0] is global_options and entry[1] is definition: # Ids are only unique while the dicts live
+            _role_table.move_to_end(key)
+            return entry[2]
+    compiled = CompiledRole(role_name, definition.get("description"), get_role_display_name(role_name, [role_name] if from_file else None),
+                            {**global_options, **(definition.get("ollama_api_options") or {})})
+    with _role_table_lock:
+        _role_table[key] = (global_options, definition, compiled) # Holding both dicts keeps their ids from being reused
+        if len(_role_table) > ROLE_TABLE_SIZE: _role_table.popitem(last=False)
+    return compiled
+
+
+def compile_role_table(settings: dict, roles_data: dict, file_agent_keys=None) -> dict:
+    """CompiledRole of every role in roles_data, by role name (see compiled_role)."""
+    return {name: compiled_role(name, settings, roles_data, file_agent_keys) for name in roles_data}
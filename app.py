@@ -10,9 +10,12 @@ import atexit
 # Import from project structure
 # --- Updated Imports ---
 from core.utils import load_json, get_theme_object, get_absolute_path
+from core.config_registry import load_config
 from core.ollama_checker import OllamaStatusChecker
 from core import history_manager as history # Use alias for clarity
-from core.sweep_manager import run_sweep # Import sweep logic
+from core.sweep_manager import run_sweep_with_progress # Sweep logic (streams progress to the Sweep tab)
+from core.sweep_estimator import dry_run_sweep # Sweep cost estimate from past run timings
+from core.sweep_analytics import analyze_sweep_folder # Diversity/duplication report of a sweep's outputs
 # Import logic functions that will be used as callbacks
 from core.app_logic import (
     execute_chat_or_team, # Router function used for submit
@@ -34,7 +37,7 @@ from core.refinement_logic import comment_logic # <-- IMPORT from new module
 # Import the logic function for releasing models
 from core.ollama_manager import release_all_models_logic
 # Import functions needed for initial UI setup from roles_config
-from agents.roles_config import load_all_roles, get_role_display_name
+from agents.roles_config import load_all_roles, get_role_display_name, compile_role_table
 # Import UI creation functions
 from ui.chat_tab import create_chat_tab
 from ui.app_settings_tab import create_app_settings_tab
@@ -48,13 +51,16 @@ from ui.common_ui_elements import create_footer
 # Import captioning logic
 from core.captioning_logic import (
     load_images_and_captions,
+    refresh_images_and_captions,
     # update_caption_display, # Replaced by update_caption_display_from_gallery
     update_caption_display_from_gallery, # NEW function for Gallery
+    get_selected_image_path, # Full-resolution preview (gallery holds thumbnails)
     save_caption,
-    batch_edit_captions, # Needs redesign for Gallery multi-select
+    batch_edit_captions, # Pattern-selected bulk edits
     generate_captions_for_selected, # Uses single selected item state
     generate_captions_for_all
 )
+from core.dataset_export import export_dataset, import_dataset
 # --- End Updated Imports ---
 
 # --- Constants ---
@@ -65,12 +71,14 @@ PROFILES_FILE = 'ollama_profiles.json'
 AGENT_TEAMS_FILE = 'agent_teams.json'
 DEFAULT_ROLES_FILE = 'agents/agent_roles.json' # Needed for Info tab data
 CUSTOM_ROLES_FILE = 'agents/custom_agent_roles.json' # Needed for Info tab data
+QUEUE_CONCURRENCY = 8 # Queued events handled at once (a running sweep must not block the other tabs)
 
 # --- Utility Functions (App Specific or Loading) ---
 def load_settings(settings_file=SETTINGS_FILE): return load_json(settings_file, is_relative=True)
-def load_models(model_file=MODELS_FILE): models_list = load_json(model_file, is_relative=True); return models_list if isinstance(models_list, list) else []
-def load_limiters(limiter_file=LIMITERS_FILE): limiter_dict = load_json(limiter_file, is_relative=True); return limiter_dict if isinstance(limiter_dict, dict) else {}
-def load_profiles(profile_file=PROFILES_FILE): profile_dict = load_json(profile_file, is_relative=True); return profile_dict if isinstance(profile_dict, dict) else {}
+def load_settings_copy(settings_file=SETTINGS_FILE): return dict(load_config(settings_file)) # Cached snapshot, copied so callers can set keys
+def load_models(model_file=MODELS_FILE): models_list = load_config(model_file); return models_list if isinstance(models_list, list) else []
+def load_limiters(limiter_file=LIMITERS_FILE): limiter_dict = load_config(limiter_file); return limiter_dict if isinstance(limiter_dict, dict) else {}
+def load_profiles(profile_file=PROFILES_FILE): profile_dict = load_config(profile_file); return profile_dict if isinstance(profile_dict, dict) else {}
 def load_agent_teams(team_file=AGENT_TEAMS_FILE): team_dict = load_json(team_file, is_relative=True); return team_dict if isinstance(team_dict, dict) else {}
 # --- Load Raw Role Data for Info Tab ---
 default_roles_data_for_info = load_json(DEFAULT_ROLES_FILE, is_relative=True)
@@ -139,9 +147,9 @@ with gr.Blocks(title="ArtAgents", theme=theme_object) as demo:
     # --- Create UI Tabs using functions from ui/ ---
     # --- Updated Tab Creation Order/Calls ---
     chat_comps = create_chat_tab(initial_agent_team_choices, model_names_with_vision, limiters_names, settings)
-    caption_comps = create_captions_tab(initial_agent_team_choices, vision_model_names)
+    caption_comps = create_captions_tab(initial_agent_team_choices, vision_model_names, settings.get("caption_parallel_workers", 1))
     editor_comps = create_team_editor_tab(initial_team_names=sorted(team_names), initial_available_agent_names=all_available_agent_display_names_initial)
-    sweep_comps = create_sweep_tab(initial_team_names=sorted(team_names), initial_model_names=all_initial_worker_model_choices)
+    sweep_comps = create_sweep_tab(initial_team_names=sorted(team_names), initial_model_names=all_initial_worker_model_choices, initial_sweep_concurrency=settings.get("sweep_concurrency", 1), initial_result_sink=settings.get("sweep_result_sink", "json"))
     history_comps = create_history_tab(history_list)
     # roles_comps = create_roles_tabs(...) # <-- Removed
     info_comps = create_info_tab(default_roles_data_for_info, custom_roles_data_for_info) # <-- Added
@@ -154,11 +162,11 @@ with gr.Blocks(title="ArtAgents", theme=theme_object) as demo:
     # Refreshes Chat & Captions Agent/Team dropdowns
     def refresh_agent_team_dropdowns_wrapper(use_default, use_custom, file_agents_dict, teams_dict):
          print("Refreshing Chat & Captions tab agent/team dropdowns...")
-         current_settings = load_settings()
+         current_settings = load_settings_copy()
          current_settings["using_default_agents"] = use_default; current_settings["using_custom_agents"] = use_custom
          combined_roles = load_all_roles(current_settings, file_agents=file_agents_dict)
          file_agent_keys = list(file_agents_dict.keys()) if file_agents_dict else []
-         role_display_choices = sorted([get_role_display_name(name, file_agent_keys) for name in combined_roles.keys()])
+         role_display_choices = sorted(role.display_name for role in compile_role_table(current_settings, combined_roles, file_agent_keys).values())
          team_display_choices = sorted([f"[Team] {name}" for name in teams_dict.keys()])
          all_choices = ["(Direct Agent Call)"] + team_display_choices + role_display_choices
          new_value = all_choices[0] if all_choices else None
@@ -170,12 +178,12 @@ with gr.Blocks(title="ArtAgents", theme=theme_object) as demo:
     # Refreshes Team Editor Agent dropdown
     def refresh_available_agents_for_editor_wrapper(use_default, use_custom, file_agents_dict):
         print("Refreshing available agent list for team editor...")
-        current_settings = load_settings()
+        current_settings = load_settings_copy()
         current_settings["using_default_agents"] = use_default
         current_settings["using_custom_agents"] = use_custom
         combined_roles = load_all_roles(current_settings, file_agents=file_agents_dict)
         file_agent_keys = list(file_agents_dict.keys()) if file_agents_dict else []
-        display_choices = sorted([get_role_display_name(name, file_agent_keys) for name in combined_roles.keys()])
+        display_choices = sorted(role.display_name for role in compile_role_table(current_settings, combined_roles, file_agent_keys).values())
         print(f" Available agents for editor updated: {len(display_choices)} total")
         return gr.Dropdown.update(choices=display_choices), display_choices
 
@@ -368,17 +376,32 @@ with gr.Blocks(title="ArtAgents", theme=theme_object) as demo:
 
     # -- Experiment Sweep Tab Wiring --
     sweep_comps['sweep_start_button'].click(
-        fn=run_sweep,
-        inputs=[ sweep_comps['sweep_prompts_input'], sweep_comps['sweep_teams_select'], sweep_comps['sweep_models_select'], sweep_comps['sweep_output_folder_input'], sweep_comps['sweep_log_intermediate_checkbox'], settings_state, teams_data_state, ],
+        fn=run_sweep_with_progress,
+        inputs=[ sweep_comps['sweep_prompts_input'], sweep_comps['sweep_teams_select'], sweep_comps['sweep_models_select'], sweep_comps['sweep_output_folder_input'], sweep_comps['sweep_log_intermediate_checkbox'], settings_state, teams_data_state, sweep_comps['sweep_concurrency_slider'], sweep_comps['sweep_resume_folder_input'], sweep_comps['sweep_result_sink_dropdown'], sweep_comps['sweep_use_workers_checkbox'], sweep_comps['sweep_option_space_input'], sweep_comps['sweep_option_mode_dropdown'], sweep_comps['sweep_option_samples_number'], ],
         outputs=[sweep_comps['sweep_status_display']]
         # Add progress=gr.Progress() to inputs if using progress updates
     )
+    sweep_comps['sweep_analyze_button'].click(
+        fn=analyze_sweep_folder,
+        inputs=[sweep_comps['sweep_analyze_folder_input']],
+        outputs=[sweep_comps['sweep_status_display']]
+    )
+    sweep_comps['sweep_estimate_button'].click(
+        fn=dry_run_sweep,
+        inputs=[ sweep_comps['sweep_prompts_input'], sweep_comps['sweep_teams_select'], sweep_comps['sweep_models_select'], settings_state, teams_data_state, sweep_comps['sweep_concurrency_slider'], sweep_comps['sweep_resume_folder_input'], sweep_comps['sweep_option_space_input'], sweep_comps['sweep_option_mode_dropdown'], sweep_comps['sweep_option_samples_number'], ],
+        outputs=[sweep_comps['sweep_status_display']]
+    )
 
 
     # -- Captions Tab Wiring --
     caption_comps['captions_load_button'].click(
         fn=load_images_and_captions,
-        inputs=[caption_comps['captions_folder_path']],
+        inputs=[caption_comps['captions_folder_path'], caption_comps['captions_include_subfolders'], settings_state],
+        outputs=[ caption_comps['captions_image_gallery'], caption_image_paths_state, caption_data_state, caption_comps['captions_status_display'], caption_selected_item_state, caption_comps['captions_caption_display'], caption_comps['caption_selected_filename_display'], ]
+    )
+    caption_comps['captions_refresh_button'].click(
+        fn=refresh_images_and_captions,
+        inputs=[caption_comps['captions_folder_path'], caption_comps['captions_include_subfolders'], settings_state, caption_image_paths_state, caption_data_state, caption_selected_item_state, caption_comps['captions_caption_display']],
         outputs=[ caption_comps['captions_image_gallery'], caption_image_paths_state, caption_data_state, caption_comps['captions_status_display'], caption_selected_item_state, caption_comps['captions_caption_display'], caption_comps['caption_selected_filename_display'], ]
     )
     caption_comps['captions_image_gallery'].select(
@@ -386,19 +409,32 @@ with gr.Blocks(title="ArtAgents", theme=theme_object) as demo:
         inputs=[caption_data_state, caption_image_paths_state],
         outputs=[ caption_comps['captions_caption_display'], caption_selected_item_state, caption_comps['caption_selected_filename_display'], ]
     )
+    caption_comps['captions_image_gallery'].select(
+        fn=get_selected_image_path,
+        inputs=[caption_image_paths_state],
+        outputs=[ caption_comps['caption_image_preview'] ]
+    )
     caption_comps['captions_save_button'].click(
         fn=save_caption,
         inputs=[ caption_selected_item_state, caption_comps['captions_caption_display'], caption_image_paths_state, caption_data_state ],
         outputs=[ caption_comps['captions_status_display'], caption_data_state ]
     )
-    # Batch Append/Prepend (Needs update for multi-select)
-    caption_comps['captions_append_button'].click(
-        fn=lambda *args: batch_edit_captions(*args, mode="Append"),
-        inputs=[ caption_selected_item_state, caption_comps['captions_batch_text'], caption_image_paths_state, caption_data_state ], outputs=[ caption_comps['captions_status_display'], caption_data_state ]
+    # Batch Edit (pattern selection; Append/Prepend/Replace/Dedupe)
+    caption_comps['captions_batch_apply_button'].click(
+        fn=batch_edit_captions,
+        inputs=[ caption_comps['captions_batch_selection'], caption_comps['captions_batch_text'], caption_comps['captions_batch_mode'], caption_image_paths_state, caption_data_state, caption_comps['captions_batch_replace'] ],
+        outputs=[ caption_comps['captions_status_display'], caption_data_state ]
+    )
+    # Dataset Export / Import
+    caption_comps['dataset_export_button'].click(
+        fn=lambda paths, captions, folder, fmt, size: export_dataset(paths, captions, folder, export_format=fmt, shard_size_mb=size),
+        inputs=[ caption_image_paths_state, caption_data_state, caption_comps['dataset_export_folder'], caption_comps['dataset_export_format'], caption_comps['dataset_shard_size'] ],
+        outputs=[ caption_comps['captions_status_display'] ]
     )
-    caption_comps['captions_prepend_button'].click(
-        fn=lambda *args: batch_edit_captions(*args, mode="Prepend"),
-        inputs=[ caption_selected_item_state, caption_comps['captions_batch_text'], caption_image_paths_state, caption_data_state ], outputs=[ caption_comps['captions_status_display'], caption_data_state ]
+    caption_comps['dataset_import_button'].click(
+        fn=import_dataset,
+        inputs=[ caption_comps['dataset_import_source'], caption_comps['dataset_import_dest'] ],
+        outputs=[ caption_comps['captions_status_display'] ]
     )
     # Generate Caption for Selected
     caption_comps['caption_generate_selected_button'].click(
@@ -409,7 +445,7 @@ with gr.Blocks(title="ArtAgents", theme=theme_object) as demo:
     # Generate for All
     caption_comps['caption_generate_all_button'].click(
         fn=generate_captions_for_all,
-        inputs=[ caption_image_paths_state, caption_data_state, caption_comps['caption_agent_selector'], caption_comps['caption_model_selector'], caption_comps['caption_generate_mode'], settings_state, models_data_state, limiters_data_state, teams_data_state, chat_comps['loaded_file_agents_state'], history_list_state, session_history_state, ],
+        inputs=[ caption_image_paths_state, caption_data_state, caption_comps['caption_agent_selector'], caption_comps['caption_model_selector'], caption_comps['caption_generate_mode'], settings_state, models_data_state, limiters_data_state, teams_data_state, chat_comps['loaded_file_agents_state'], history_list_state, session_history_state, caption_comps['caption_parallel_workers'], caption_comps['caption_resume_job'], caption_comps['caption_skip_duplicates'], caption_comps['caption_duplicate_distance'], caption_comps['caption_worker_processes'], caption_comps['caption_shard_by'], ],
         outputs=[ caption_comps['captions_status_display'], caption_data_state, caption_comps['captions_caption_display'], session_history_state ]
     )
 
@@ -425,6 +461,8 @@ atexit.register(on_exit)
 # --- Launch the Application ---
 if __name__ == "__main__":
     print("Initializing ArtAgents...")
+    # Queue is required for generator handlers (live sweep progress)
+    demo.queue(concurrency_count=QUEUE_CONCURRENCY)
     # Set launch parameters
     demo.launch(
         # share=True # For public link
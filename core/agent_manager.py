@@ -1,4 +1,5 @@
 # ArtAgent/core/agent_manager.py
+import json
 import time
 from .utils import load_json # Utility for loading team definitions if needed elsewhere
 # IMPORT get_llm_response from ollama_agent
@@ -25,7 +26,9 @@ def run_team_workflow(
     worker_model_name: str,
     # Pass single_image_input if workflows need to handle images
     single_image_input = None, # Add image input parameter (default to None)
-    return_intermediate_steps: bool = False # Argument to control return value
+    return_intermediate_steps: bool = False, # Argument to control return value
+    step_cache = None, # Optional StepOutputCache (core/sweep_prefix.py) shared by runs with common step prefixes
+    option_overrides: dict | None = None # Ollama options applied on top of settings/role options (sweep option grids)
     ) -> tuple[str, list, dict | None]: # Updated return signature
     """
     Executes a defined agent team workflow.
@@ -40,6 +43,10 @@ def run_team_workflow(
         worker_model_name (str): The model selected in the UI for worker agents.
         single_image_input (PIL.Image, optional): A single PIL image object if provided. Defaults to None.
         return_intermediate_steps (bool): If True, return dict of step outputs. Defaults to False.
+        step_cache (StepOutputCache, optional): Reuses the output of a text-only step whose exact
+            prompt (and model, role, token limit, options) another run already sent. Defaults to None.
+        option_overrides (dict, optional): Ollama API options for every LLM call of this run,
+            taking priority over global and role options. Defaults to None.
 
     Returns:
         tuple[str, list, dict | None]: A tuple containing:
@@ -116,15 +123,24 @@ def run_team_workflow(
              print(f"  Not passing image to agent '{step_role}' (model '{worker_model_name}' does not support vision).")
 
 
-        step_output_text = get_llm_response(
-            role=step_role, # Use the actual role name from step definition
-            prompt=step_prompt,
-            model=worker_model_name,
-            settings=initial_settings,
-            roles_data=all_roles_data, # Pass full roles data for option merging
-            images=images_for_step, # Pass image list if applicable for this step
-            max_tokens=step_max_tokens,
-        )
+        def call_step_llm():
+            return get_llm_response(
+                role=step_role, # Use the actual role name from step definition
+                prompt=step_prompt,
+                model=worker_model_name,
+                settings=initial_settings,
+                roles_data=all_roles_data, # Pass full roles data for option merging
+                images=images_for_step, # Pass image list if applicable for this step
+                max_tokens=step_max_tokens,
+                ollama_api_options=option_overrides,
+            )
+
+        if step_cache is not None and not images_for_step:
+            # The prompt embeds the whole prefix (request, team description, earlier outputs)
+            step_output_text, reused = step_cache.get_or_compute((worker_model_name, step_role, step_max_tokens, json.dumps(option_overrides or {}, sort_keys=True), step_prompt), call_step_llm)
+            if reused: print(f"  Reused output of an identical step prefix from another run.")
+        else:
+            step_output_text = call_step_llm()
 
         # Check if agent returned an error message (starts with warning emoji)
         if step_output_text.strip().startswith("⚠️ Error:"):
@@ -229,6 +245,7 @@ def run_team_workflow(
                   roles_data=all_roles_data,
                   images=None, # Summary step unlikely to need image again
                   max_tokens=summary_max_tokens,
+                  ollama_api_options=option_overrides,
              )
 
              # Log this extra step to history
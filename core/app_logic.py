@@ -10,12 +10,17 @@ import time
 
 # Import necessary functions/classes from sibling modules or agents
 from .utils import load_json, get_absolute_path, clean_agent_artifacts # Import cleaner
+from .file_lock import FileLock, atomic_write_json
+from .config_registry import load_config
 from . import history_manager as history
-from agents.roles_config import load_all_roles, get_role_display_name, get_actual_role_name
-from agents.ollama_agent import get_llm_response
+from agents.roles_config import load_all_roles, get_role_display_name, get_actual_role_name, compiled_role
+from agents.ollama_agent import get_llm_response, EncodedImage
 # Import ollama_manager to call release_model and agent_manager for workflows
 from . import ollama_manager
 from . import agent_manager # Import the agent manager
+from .image_prefetch import ImagePrefetcher, resolve_image_max_side
+from .caption_store import open_caption_store, resolve_caption_store_backend
+from .caption_index import remember_caption
 
 # --- Constants used by logic functions ---
 SETTINGS_FILE = 'settings.json'
@@ -27,12 +32,28 @@ DEFAULT_ROLES_FILE = 'agents/agent_roles.json' # Define here if needed by logic
 CUSTOM_ROLES_FILE = 'agents/custom_agent_roles.json' # Define here if needed by logic
 
 # --- Helper to save teams ---
-def save_teams_to_file(teams_data):
-    """Saves the teams dictionary to the JSON file."""
+def save_teams_to_file(teams_data, merge_keys=None):
+    """
+    Saves the teams dictionary to the JSON file under the teams file lock.
+
+    Args:
+        teams_data (dict): Teams dictionary (typically the UI state copy).
+        merge_keys (list, optional): If given, only these team names are written:
+            each is set from teams_data, or removed from the file if absent there.
+            Other teams on disk (e.g. saved by another app process) are preserved.
+    """
     full_path = get_absolute_path(AGENT_TEAMS_FILE)
     try:
-        with open(full_path, 'w', encoding='utf-8') as file:
-            json.dump(teams_data, file, indent=4, sort_keys=True) # Sort keys for consistency
+        with FileLock(full_path):
+            if merge_keys is None:
+                data_to_save = teams_data
+            else:
+                data_to_save = load_json(full_path, is_relative=False)
+                if not isinstance(data_to_save, dict): data_to_save = {}
+                for key in merge_keys:
+                    if key in teams_data: data_to_save[key] = teams_data[key]
+                    else: data_to_save.pop(key, None)
+            atomic_write_json(full_path, data_to_save, indent=4, sort_keys=True) # Sort keys for consistency
         print(f"Agent teams saved successfully to {full_path}")
         return True
     except Exception as e:
@@ -231,7 +252,7 @@ def chat_logic(
     limiter_prompt_format = limiter_settings.get("limiter_prompt_format", "")
     limiter_token_slider = limiter_settings.get("limiter_token_slider")
     effective_max_tokens = min(max_tokens_ui, limiter_token_slider) if limiter_handling_option != "Off" and limiter_token_slider is not None else max_tokens_ui
-    role_description = roles_data_current.get(actual_role_name, {}).get("description", "Unknown Role")
+    role_description = compiled_role(actual_role_name, current_settings, roles_data_current).description or "Unknown Role"
     # Construct prompt - ensure limiter format comes before user input if applicable
     prompt_parts = [f"Role: {actual_role_name} - {role_description}"]
     if limiter_prompt_format: prompt_parts.append(limiter_prompt_format)
@@ -253,6 +274,12 @@ def chat_logic(
             pil_images_list = [single_image_input]
             is_single_image_mode = True
             image_source_info = "[Single PIL Image]"
+        # Already decoded/encoded (prefetched by captioning logic)
+        elif isinstance(single_image_input, EncodedImage):
+            print("  Processing pre-encoded image input.")
+            pil_images_list = [single_image_input]
+            is_single_image_mode = True
+            image_source_info = "[Single Pre-encoded Image]"
         # Check if input is a numpy array (coming from Gradio Image component)
         elif isinstance(single_image_input, np.ndarray):
             print("  Processing Numpy Image input.")
@@ -322,70 +349,78 @@ def chat_logic(
                  ])
              except Exception as list_e: return f"Error listing folder: {list_e}", "\n---\n".join(current_session_history), model_name, current_session_history
 
-             for file_name in files_in_folder:
-                 file_path = os.path.join(folder_path, file_name)
-                 loop_img = None # Initialize loop_img
-                 try:
-                      print(f"  Processing file: {file_name}")
-                      loop_img = Image.open(file_path)
-                      image_prompt = f"{base_prompt}\nImage Context: Analyzing '{file_name}'\n"
-                      img_response = get_llm_response(
-                           role=actual_role_name, prompt=image_prompt, model=model_name, settings=current_settings,
-                           roles_data=roles_data_current, images=[loop_img], max_tokens=effective_max_tokens,
-                           ollama_api_options=agent_ollama_options
-                      )
-
-                      # --- File Handling Logic ---
-                      base_name = os.path.splitext(file_name)[0]
-                      output_file = os.path.join(folder_path, f"{base_name}.txt")
-                      action_taken = "Skipped"
-                      file_exists = os.path.exists(output_file)
-                      original_content = ""
-
-                      if file_exists and file_handling_option != "Overwrite" and file_handling_option != "Skip":
-                          try:
-                              with open(output_file, 'r', encoding='utf-8') as f:
-                                  original_content = f.read().strip()
-                          except Exception as read_e:
-                              print(f"  Warning: Could not read existing file {output_file}: {read_e}")
-
-                      # Decide action based on mode and existence
-                      if file_handling_option == "Overwrite" or not file_exists:
-                          if img_response and not img_response.startswith("⚠️ Error:"):
-                              with open(output_file, 'w', encoding='utf-8') as f: f.write(img_response)
-                              action_taken = "Written" if not file_exists else "Overwritten"
-                          else: action_taken = "Skipped (Empty/Error Response)"
-                      elif file_handling_option == "Append":
-                          if img_response and not img_response.startswith("⚠️ Error:"):
-                              separator = "\n\n---\n\n" if original_content else ""
-                              with open(output_file, 'w', encoding='utf-8') as f: f.write(original_content + separator + img_response)
-                              action_taken = "Appended"
-                          else: action_taken = "Skipped (Empty/Error Response)"
-                      elif file_handling_option == "Prepend":
-                          if img_response and not img_response.startswith("⚠️ Error:"):
-                              separator = "\n\n---\n\n" if original_content else ""
-                              with open(output_file, 'w', encoding='utf-8') as f: f.write(img_response + separator + original_content)
-                              action_taken = "Prepended"
-                          else: action_taken = "Skipped (Empty/Error Response)"
-                      # Skip case is handled by default action_taken="Skipped"
-
-                      # --- End File Handling ---
-
-                      confirmation_messages.append(f"  - {file_name}: {action_taken} -> {base_name}.txt")
-                      # History Update per Image
-                      entry = f"{entry_prefix}\nImage: {file_name} [Data Sent]\nResponse:\n{img_response}\n---\n" # Placeholder for image data
-                      history_list = history.add_to_history(history_list, entry); current_session_history.append(entry); processed_files += 1
-
-                 except Exception as e:
-                      error_msg = f"Error processing file '{file_name}': {e}"
-                      print(f"  {error_msg}")
-                      confirmation_messages.append(f"  - {file_name}: Error - {e}")
-                      error_entry = f"Timestamp: {timestamp}\nRole: {actual_role_name}\nModel: {model_name}\nInput: {user_input}\nImage: {file_name}\nERROR: {e}\n---\n"
-                      history_list = history.add_to_history(history_list, error_entry); current_session_history.append(error_entry)
-                 finally:
-                      if loop_img:
-                          try: loop_img.close()
-                          except Exception as e_close: print(f"  Warning: Error closing loop image {file_name}: {e_close}")
+             caption_store = open_caption_store(folder_path, resolve_caption_store_backend(current_settings))
+             # Prepare the next images in the background while the current one is generated
+             prefetcher = ImagePrefetcher([os.path.join(folder_path, f) for f in files_in_folder],
+                                          max_side=resolve_image_max_side(current_settings))
+             try:
+                 for file_name in files_in_folder:
+                     file_path = os.path.join(folder_path, file_name)
+                     loop_img = None # Initialize loop_img
+                     try:
+                          print(f"  Processing file: {file_name}")
+                          loop_img = prefetcher.get(file_path)
+                          image_prompt = f"{base_prompt}\nImage Context: Analyzing '{file_name}'\n"
+                          img_response = get_llm_response(
+                               role=actual_role_name, prompt=image_prompt, model=model_name, settings=current_settings,
+                               roles_data=roles_data_current, images=[loop_img], max_tokens=effective_max_tokens,
+                               ollama_api_options=agent_ollama_options
+                          )
+
+                          # --- File Handling Logic (through the folder's caption store) ---
+                          action_taken = "Skipped"
+                          written_caption = None
+                          file_exists = caption_store.has(file_name)
+                          original_content = ""
+
+                          if file_exists and file_handling_option != "Overwrite" and file_handling_option != "Skip":
+                              try:
+                                  original_content = (caption_store.read(file_name) or "").strip()
+                              except Exception as read_e:
+                                  print(f"  Warning: Could not read existing caption {caption_store.location(file_name)}: {read_e}")
+
+                          # Decide action based on mode and existence
+                          if file_handling_option == "Overwrite" or not file_exists:
+                              if img_response and not img_response.startswith("⚠️ Error:"):
+                                  written_caption = img_response
+                                  action_taken = "Written" if not file_exists else "Overwritten"
+                              else: action_taken = "Skipped (Empty/Error Response)"
+                          elif file_handling_option == "Append":
+                              if img_response and not img_response.startswith("⚠️ Error:"):
+                                  separator = "\n\n---\n\n" if original_content else ""
+                                  written_caption = original_content + separator + img_response
+                                  action_taken = "Appended"
+                              else: action_taken = "Skipped (Empty/Error Response)"
+                          elif file_handling_option == "Prepend":
+                              if img_response and not img_response.startswith("⚠️ Error:"):
+                                  separator = "\n\n---\n\n" if original_content else ""
+                                  written_caption = img_response + separator + original_content
+                                  action_taken = "Prepended"
+                              else: action_taken = "Skipped (Empty/Error Response)"
+                          # Skip case is handled by default action_taken="Skipped"
+                          if written_caption is not None:
+                              caption_store.write(file_name, written_caption)
+                              remember_caption(file_path, file_name, written_caption)
+
+                          # --- End File Handling ---
+
+                          confirmation_messages.append(f"  - {file_name}: {action_taken} -> {caption_store.location(file_name)}")
+                          # History Update per Image
+                          entry = f"{entry_prefix}\nImage: {file_name} [Data Sent]\nResponse:\n{img_response}\n---\n" # Placeholder for image data
+                          history_list = history.add_to_history(history_list, entry); current_session_history.append(entry); processed_files += 1
+
+                     except Exception as e:
+                          error_msg = f"Error processing file '{file_name}': {e}"
+                          print(f"  {error_msg}")
+                          confirmation_messages.append(f"  - {file_name}: Error - {e}")
+                          error_entry = f"Timestamp: {timestamp}\nRole: {actual_role_name}\nModel: {model_name}\nInput: {user_input}\nImage: {file_name}\nERROR: {e}\n---\n"
+                          history_list = history.add_to_history(history_list, error_entry); current_session_history.append(error_entry)
+                     finally:
+                          if loop_img:
+                              try: loop_img.close()
+                              except Exception as e_close: print(f"  Warning: Error closing loop image {file_name}: {e_close}")
+             finally:
+                 prefetcher.close() # Also when an agent call raises or the handler is abandoned
 
              if processed_files == 0: final_response = "No valid image files found or processed in the directory."
              else: final_response = f"Folder processing complete ({processed_files} files):\n" + "\n".join(confirmation_messages)
@@ -446,7 +481,7 @@ def trigger_copy_js(text_to_copy):
 
 def update_max_tokens_on_limiter_change(limiter_choice, current_max_tokens_value):
     """Updates the max token slider value based on limiter selection."""
-    current_limiters_data = load_json(LIMITERS_FILE, is_relative=True)
+    current_limiters_data = load_config(LIMITERS_FILE, loader=load_json)
     if limiter_choice == "Off": return gr.update()
 
     limiter_settings = current_limiters_data.get(limiter_choice, {})
@@ -542,51 +577,65 @@ def save_settings_callback(
     print("Saving application settings...")
     try:
         settings_path = get_absolute_path(SETTINGS_FILE)
-        current_settings = load_json(settings_path, is_relative=False)
-        if not isinstance(current_settings, dict): current_settings = {}
-
-        previous_theme = current_settings.get("gradio_theme", "Default")
-        # Update general values
-        current_settings.update({
-            "ollama_url": ollama_url_in, "max_tokens_slider": max_tokens_slider_range_in,
-            "ollama_api_prompt_to_console": api_to_console_in, "using_default_agents": use_default_in,
-            "using_custom_agents": use_custom_in, "use_ollama_api_options": use_ollama_opts_default_in,
-            "release_model_on_change": release_model_default_in, "gradio_theme": theme_select_in
-        })
-        # Update ollama_api_options
-        current_settings["ollama_api_options"] = current_settings.get("ollama_api_options", {})
-        ordered_keys = ordered_option_keys_state
-        num_expected = len(ordered_keys); num_received = len(api_option_values)
-        initial_options_for_types = load_json(settings_path, is_relative=False).get("ollama_api_options", {})
-
-        if ordered_keys and num_expected == num_received:
-            api_options_updates = current_settings["ollama_api_options"].copy()
-            for key, value in zip(ordered_keys, api_option_values):
-                original_value = initial_options_for_types.get(key)
-                try:
-                    if isinstance(original_value, bool): api_options_updates[key] = bool(value)
-                    elif isinstance(original_value, int): api_options_updates[key] = int(value)
-                    elif isinstance(original_value, float): api_options_updates[key] = float(value)
-                    else: api_options_updates[key] = value
-                except (ValueError, TypeError) as e:
-                    print(f"Warning: Could not convert saved value '{value}' for option '{key}' based on original type {type(original_value)}. Saving as received. Error: {e}")
-                    api_options_updates[key] = value
-            current_settings["ollama_api_options"] = api_options_updates
-            # print(f" Ollama API options updated ({num_expected} values).") # Reduce verbosity
-        elif not ordered_keys and num_received == 0:
-             print("No API options defined or received, skipping update.")
-        else: print(f"Warning: API Options count mismatch ({num_expected} vs {num_received}). Options NOT saved.")
-
-        with open(settings_path, 'w', encoding='utf-8') as file: json.dump(current_settings, file, indent=4)
-        print(f"Settings saved successfully to {settings_path}")
-
-        save_msg = "Settings saved successfully."
-        if theme_select_in != previous_theme: save_msg += " Restart application to apply theme change."
+        with FileLock(settings_path): # Read-modify-write must not interleave with other processes
+            save_msg = _save_settings_locked(
+                settings_path, ollama_url_in, max_tokens_slider_range_in, api_to_console_in,
+                use_default_in, use_custom_in, use_ollama_opts_default_in,
+                release_model_default_in, theme_select_in, ordered_option_keys_state, api_option_values
+            )
         return save_msg
     except Exception as e:
         error_msg = f"Error saving settings: {e}"; print(error_msg); return error_msg
 
 
+def _save_settings_locked(
+    settings_path, ollama_url_in, max_tokens_slider_range_in, api_to_console_in,
+    use_default_in, use_custom_in, use_ollama_opts_default_in,
+    release_model_default_in, theme_select_in, ordered_option_keys_state, api_option_values):
+    """Merges UI values into settings.json. Caller must hold the settings file lock."""
+    current_settings = load_json(settings_path, is_relative=False)
+    if not isinstance(current_settings, dict): current_settings = {}
+
+    previous_theme = current_settings.get("gradio_theme", "Default")
+    # Update general values
+    current_settings.update({
+        "ollama_url": ollama_url_in, "max_tokens_slider": max_tokens_slider_range_in,
+        "ollama_api_prompt_to_console": api_to_console_in, "using_default_agents": use_default_in,
+        "using_custom_agents": use_custom_in, "use_ollama_api_options": use_ollama_opts_default_in,
+        "release_model_on_change": release_model_default_in, "gradio_theme": theme_select_in
+    })
+    # Update ollama_api_options
+    current_settings["ollama_api_options"] = current_settings.get("ollama_api_options", {})
+    ordered_keys = ordered_option_keys_state
+    num_expected = len(ordered_keys); num_received = len(api_option_values)
+    initial_options_for_types = load_json(settings_path, is_relative=False).get("ollama_api_options", {})
+
+    if ordered_keys and num_expected == num_received:
+        api_options_updates = current_settings["ollama_api_options"].copy()
+        for key, value in zip(ordered_keys, api_option_values):
+            original_value = initial_options_for_types.get(key)
+            try:
+                if isinstance(original_value, bool): api_options_updates[key] = bool(value)
+                elif isinstance(original_value, int): api_options_updates[key] = int(value)
+                elif isinstance(original_value, float): api_options_updates[key] = float(value)
+                else: api_options_updates[key] = value
+            except (ValueError, TypeError) as e:
+                print(f"Warning: Could not convert saved value '{value}' for option '{key}' based on original type {type(original_value)}. Saving as received. Error: {e}")
+                api_options_updates[key] = value
+        current_settings["ollama_api_options"] = api_options_updates
+        # print(f" Ollama API options updated ({num_expected} values).") # Reduce verbosity
+    elif not ordered_keys and num_received == 0:
+         print("No API options defined or received, skipping update.")
+    else: print(f"Warning: API Options count mismatch ({num_expected} vs {num_received}). Options NOT saved.")
+
+    atomic_write_json(settings_path, current_settings, indent=4)
+    print(f"Settings saved successfully to {settings_path}")
+
+    save_msg = "Settings saved successfully."
+    if theme_select_in != previous_theme: save_msg += " Restart application to apply theme change."
+    return save_msg
+
+
 # --- Team Editor Callbacks ---
 
 def load_team_for_editing(team_name_to_load, all_teams_data_state):
@@ -677,7 +726,7 @@ def save_team_from_editor(
     team_data = {"description": description_in.strip(), "steps": steps, "assembly_strategy": assembly_strategy_in}
     all_teams_data[team_name] = team_data
 
-    if save_teams_to_file(all_teams_data):
+    if save_teams_to_file(all_teams_data, merge_keys=[team_name]):
         msg = f"Team '{team_name}' saved successfully."
         print(msg)
         # Reload roles/teams for dropdown updates
@@ -721,7 +770,7 @@ def delete_team_logic(
 
     del all_teams_data[team_name_to_delete]
 
-    if save_teams_to_file(all_teams_data):
+    if save_teams_to_file(all_teams_data, merge_keys=[team_name_to_delete]):
         msg = f"Team '{team_name_to_delete}' deleted successfully."
         print(msg)
         # Reload roles/teams for dropdown updates
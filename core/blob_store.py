@@ -0,0 +1,125 @@
+# ArtAgent/core/blob_store.py
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from .utils import get_absolute_path
+
+BLOB_STORE_DIR = 'core/blobs' # Path relative to project root
+BLOB_SUFFIX = '.z'
+BLOB_PRUNE_MIN_AGE = 3600 # Seconds; younger unreferenced blobs may belong to an in-flight write
+BLOB_CACHE_ENTRIES = 256 # Decoded blobs kept in memory (content-addressed, so never stale)
+
+class BlobStore:
+    """
+    Content-addressed, zlib-compressed storage for large text bodies.
+
+    Each text is stored once under its SHA-256 digest, so identical bodies
+    (e.g. a workflow's last step output and its final output) share one file.
+    Layout: <root>/<digest[:2]>/<digest[2:]>.z
+    """
+    def __init__(self, root_dir: str, compress_level: int = 6, cache_entries: int = BLOB_CACHE_ENTRIES):
+        self.root_dir = root_dir
+        self.compress_level = compress_level
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def digest_for(text: str) -> str:
+        """Returns the content address (hex SHA-256) for a text."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root_dir, digest[:2], digest[2:] + BLOB_SUFFIX)
+
+    def has(self, digest: str) -> bool:
+        return os.path.isfile(self._blob_path(digest))
+
+    def put(self, text: str) -> str:
+        """Stores text (if not already present) and returns its digest."""
+        digest = self.digest_for(text)
+        blob_path = self._blob_path(digest)
+        if os.path.isfile(blob_path):
+            # Already stored; refresh mtime so a concurrent prune's grace period covers this reuse
+            try: os.utime(blob_path)
+            except OSError: pass
+            return digest
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        # A private temp file per call: threads of one process may store the same body at once
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(zlib.compress(text.encode('utf-8'), self.compress_level))
+            os.replace(tmp_path, blob_path) # Atomic, concurrent writers produce identical bytes
+        except BaseException:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            raise
+        return digest
+
+    def get(self, digest: str) -> str | None:
+        """Returns the stored text for a digest, or None if missing/corrupt."""
+        with self._cache_lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return self._cache[digest]
+        try:
+            with open(self._blob_path(digest), 'rb') as f:
+                text = zlib.decompress(f.read()).decode('utf-8')
+        except FileNotFoundError:
+            return None
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            print(f"Warning: Could not read blob {digest[:12]}: {e}")
+            return None
+        with self._cache_lock:
+            self._cache[digest] = text
+            if len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return text
+
+    def prune(self, live_digests, min_age_seconds: float = BLOB_PRUNE_MIN_AGE) -> int:
+        """
+        Deletes blobs not in live_digests that are older than min_age_seconds.
+
+        Returns:
+            int: Number of blobs removed.
+        """
+        if not os.path.isdir(self.root_dir):
+            return 0
+        live = set(live_digests)
+        cutoff = time.time() - min_age_seconds
+        removed = 0
+        with os.scandir(self.root_dir) as shard_dirs:
+            for shard in shard_dirs:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as blobs:
+                    for blob in blobs:
+                        if not blob.name.endswith(BLOB_SUFFIX):
+                            continue
+                        digest = shard.name + blob.name[:-len(BLOB_SUFFIX)]
+                        if digest in live:
+                            continue
+                        try:
+                            if blob.stat().st_mtime < cutoff:
+                                os.remove(blob.path)
+                                with self._cache_lock: self._cache.pop(digest, None)
+                                removed += 1
+                        except OSError as e:
+                            print(f"Warning: Could not prune blob {digest[:12]}: {e}")
+        return removed
+
+
+_default_store = None
+
+def get_default_store() -> BlobStore:
+    """Returns the shared project blob store (created lazily)."""
+    global _default_store
+    if _default_store is None:
+        _default_store = BlobStore(get_absolute_path(BLOB_STORE_DIR))
+    return _default_store
@@ -0,0 +1,336 @@
+# ArtAgent/core/caption_index.py
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from .caption_store import CAPTION_EXTENSION, SidecarCaptionStore, open_caption_store, store_for_image
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp')
+BACKGROUND_BATCH_SIZE = 256 # Captions read per lock acquisition by the background loader
+SCAN_PROCESSES = max(1, min(4, os.cpu_count() or 1)) # Worker processes for recursive scans
+
+class ImageEntry(NamedTuple):
+    """One image in a caption folder, with stat data captured during the scan."""
+    filename: str # Relative to the indexed folder ('/'-separated for subfolders)
+    image_path: str
+    size: int
+    mtime_ns: int
+    caption_path: str | None # None when no sidecar .txt exists
+    caption_stat: tuple | None = None # (size, mtime_ns) of the sidecar at scan time, for change tracking
+
+
+def _scan_directory(dir_path: str, rel_prefix: str) -> tuple[list, list]:
+    """
+    Lists one directory with a single os.scandir pass.
+
+    Returns:
+        tuple: (ImageEntry list with filenames prefixed by rel_prefix, subdirectory paths)
+    """
+    images = []
+    subdirs = []
+    caption_files = {} # stem -> caption DirEntry
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            name, ext = os.path.splitext(entry.name)
+            if ext.lower() in IMAGE_EXTENSIONS:
+                images.append(entry)
+            elif ext == CAPTION_EXTENSION: # Exact match: captions are always written as '.txt'
+                caption_files[name] = entry
+            elif not entry.name.startswith('.'): # Hidden folders (e.g. .git) are never datasets
+                try:
+                    if entry.is_dir(follow_symlinks=False): subdirs.append(entry.path)
+                except OSError:
+                    pass
+
+    entries = []
+    for entry in images:
+        try:
+            if not entry.is_file(): continue # d_type from scandir, no extra syscall
+            st = entry.stat() # Cached by DirEntry (free on Windows)
+        except OSError:
+            continue
+        caption = caption_files.get(os.path.splitext(entry.name)[0])
+        caption_stat = None
+        if caption is not None:
+            try:
+                cst = caption.stat()
+                caption_stat = (cst.st_size, cst.st_mtime_ns)
+            except OSError:
+                caption = None
+        entries.append(ImageEntry(rel_prefix + entry.name, entry.path, st.st_size, st.st_mtime_ns,
+                                  caption.path if caption is not None else None, caption_stat))
+    return entries, subdirs
+
+
+def _scan_subtree(args) -> list:
+    """Walks a directory tree iteratively (runs in a worker process for sharded scans)."""
+    root, dir_path = args
+    entries = []
+    stack = [dir_path]
+    while stack:
+        current = stack.pop()
+        rel = os.path.relpath(current, root)
+        prefix = "" if rel == "." else rel.replace(os.sep, "/") + "/"
+        try:
+            found, subdirs = _scan_directory(current, prefix)
+        except OSError as e:
+            print(f"Warning: Could not scan folder {current}: {e}")
+            continue
+        entries.extend(found)
+        stack.extend(subdirs)
+    return entries
+
+
+def scan_tree(root: str, processes: int = 1) -> list:
+    """
+    Recursively scans a dataset folder. Each top-level subfolder is one shard;
+    with processes > 1 the shards are scanned by a process pool and merged.
+    """
+    entries, subdirs = _scan_directory(root, "") # Root files; raises if root is unreadable
+    if processes > 1 and len(subdirs) > 1:
+        with ProcessPoolExecutor(max_workers=min(processes, len(subdirs))) as pool:
+            for shard_entries in pool.map(_scan_subtree, [(root, d) for d in subdirs]):
+                entries.extend(shard_entries)
+    else:
+        for d in subdirs:
+            entries.extend(_scan_subtree((root, d)))
+    return entries
+
+
+class CaptionIndex:
+    """
+    Index of a caption folder built with a single os.scandir pass.
+
+    The scan collects images and sidecar .txt names together, so no per-file
+    isfile/exists calls are needed. Caption text is read lazily (on first
+    access) or in the background via start_background_load(), and cached.
+    Captions come from the folder's caption store (sidecar files by default;
+    a SQLite store serves many captions per query).
+    """
+    def __init__(self, folder_path: str, store=None):
+        self.folder_path = folder_path
+        self.store = store or SidecarCaptionStore(folder_path)
+        self.entries: dict[str, ImageEntry] = {} # filename -> ImageEntry
+        self.filenames: list[str] = [] # Sorted image filenames
+        self._captions: dict[str, str] = {} # filename -> caption text (loaded so far)
+        self._lock = threading.Lock()
+        self._loader = None
+        self.recursive = False
+        self.snapshot_time = 0.0 # When the entries were last scanned (for store-side change queries)
+
+    def _scan(self, processes: int = 1) -> dict:
+        if self.recursive:
+            entries = scan_tree(self.folder_path, processes=processes)
+        else:
+            entries, _ = _scan_directory(self.folder_path, "")
+        return {entry.filename: entry for entry in entries}
+
+    def build(self, recursive: bool = False, processes: int = 1):
+        """
+        Scans the folder once (and, with recursive, every subfolder). Raises OSError
+        if the folder can't be listed. Recursive scans can shard top-level
+        subfolders across `processes` worker processes; results merge into this index.
+        Filenames of images in subfolders are relative paths ('class_a/img.png').
+        """
+        self.recursive = recursive
+        self.snapshot_time = time.time()
+        entries = self._scan(processes)
+
+        with self._lock:
+            self.entries = entries
+            self.filenames = sorted(entries)
+            self._captions = {}
+        return self
+
+    def refresh(self, processes: int = 1) -> dict:
+        """
+        Rescans the folder and diffs the result against the previous scan by
+        size and mtime, so only what changed has to be re-read. Cached captions
+        of changed/removed images are dropped. Stores that track their own
+        changes (SQLite) also report captions written by other processes.
+
+        Returns:
+            dict: {"added", "removed", "changed" (image files), "captions_changed"} filename lists.
+        """
+        started = time.time()
+        new_entries = self._scan(processes)
+        with self._lock:
+            old_entries = self.entries
+        added = sorted(set(new_entries) - set(old_entries))
+        removed = sorted(set(old_entries) - set(new_entries))
+        changed, captions_changed = [], set()
+        for name in set(new_entries) & set(old_entries):
+            old, new = old_entries[name], new_entries[name]
+            if (old.size, old.mtime_ns) != (new.size, new.mtime_ns):
+                changed.append(name)
+            if not self.store.bulk_reads and old.caption_stat != new.caption_stat:
+                captions_changed.add(name)
+        if self.store.bulk_reads and hasattr(self.store, "changed_since"):
+            try:
+                captions_changed.update(n for n in self.store.changed_since(self.snapshot_time) if n in new_entries and n not in added)
+            except Exception as e:
+                print(f"Warning: Could not query caption store changes: {e}")
+
+        with self._lock:
+            self.entries = new_entries
+            self.filenames = sorted(new_entries)
+            for name in removed + sorted(captions_changed):
+                self._captions.pop(name, None)
+            self.snapshot_time = started
+        return {"added": added, "removed": removed, "changed": sorted(changed), "captions_changed": sorted(captions_changed)}
+
+    @property
+    def image_paths(self) -> dict:
+        return {name: self.entries[name].image_path for name in self.filenames}
+
+    def _read_caption(self, entry: ImageEntry) -> str:
+        if not entry.caption_path:
+            return ""
+        try:
+            with open(entry.caption_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except Exception as e:
+            print(f"Warning: Could not read caption file {os.path.basename(entry.caption_path)}: {e}")
+            return ""
+
+    def _read_captions(self, names) -> dict:
+        """Reads captions for known filenames from the store ("" for uncaptioned images)."""
+        names = [n for n in names if n in self.entries]
+        if self.store.bulk_reads:
+            try:
+                texts = self.store.read_many(names)
+            except Exception as e:
+                print(f"Warning: Could not read captions from {self.store.backend} store: {e}")
+                texts = {}
+            return {n: texts.get(n, "") for n in names}
+        return {n: self._read_caption(self.entries[n]) for n in names} # Scan already knows which sidecars exist
+
+    def is_loaded(self, filename: str) -> bool:
+        with self._lock:
+            return filename in self._captions
+
+    def get_caption(self, filename: str) -> str | None:
+        """Returns the caption for an image (reading it on first access), or None if unknown."""
+        with self._lock:
+            if filename in self._captions:
+                return self._captions[filename]
+            entry = self.entries.get(filename)
+        if entry is None:
+            return None
+        text = self._read_captions([filename])[filename]
+        with self._lock:
+            return self._captions.setdefault(filename, text)
+
+    def set_caption(self, filename: str, text: str):
+        """Records a caption written by the app so later lookups don't re-read or go stale."""
+        with self._lock:
+            self._captions[filename] = text
+            entry = self.entries.get(filename)
+            if entry is not None and not self.store.bulk_reads:
+                caption_path = entry.caption_path or os.path.splitext(entry.image_path)[0] + CAPTION_EXTENSION
+                try: # Our own write is not an outside change
+                    st = os.stat(caption_path)
+                    caption_stat = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    caption_stat = None
+                self.entries[filename] = entry._replace(caption_path=caption_path, caption_stat=caption_stat)
+
+    def load_captions(self, filenames=None) -> dict:
+        """Reads (or returns cached) captions for the given filenames (default: all)."""
+        names = [n for n in (self.filenames if filenames is None else filenames) if n in self.entries]
+        missing = [n for n in names if not self.is_loaded(n)]
+        if missing:
+            texts = self._read_captions(missing) # One query for bulk-read stores
+            with self._lock:
+                for n, text in texts.items():
+                    self._captions.setdefault(n, text)
+        with self._lock:
+            return {n: self._captions[n] for n in names}
+
+    def loaded_captions(self) -> dict:
+        """Returns a copy of the captions read so far."""
+        with self._lock:
+            return dict(self._captions)
+
+    def start_background_load(self, batch_size: int = BACKGROUND_BATCH_SIZE):
+        """Reads all remaining captions in a daemon thread. No-op if already running."""
+        if self._loader is not None and self._loader.is_alive():
+            return self._loader
+
+        def _load_all():
+            names = list(self.filenames)
+            for start in range(0, len(names), batch_size):
+                pending = [n for n in names[start:start + batch_size] if not self.is_loaded(n)]
+                texts = self._read_captions(pending)
+                with self._lock:
+                    for n, text in texts.items():
+                        self._captions.setdefault(n, text) # Never clobber app-written captions
+            print(f"Background caption load finished for {self.folder_path} ({len(names)} image(s)).")
+
+        self._loader = threading.Thread(target=_load_all, name="caption-index-loader", daemon=True)
+        self._loader.start()
+        return self._loader
+
+
+# --- Registry of indexes for folders opened in this process ---
+_indexes: dict[str, CaptionIndex] = {}
+_indexes_lock = threading.Lock()
+
+def build_caption_index(folder_path: str, recursive: bool = False, processes: int = 1, backend: str | None = None) -> CaptionIndex:
+    """
+    Scans a folder and registers the fresh index (replacing any previous one).
+    `backend` selects the caption store ('sidecar'/'sqlite', see caption_store);
+    a new SQLite store starts with a copy of the folder's existing sidecar captions.
+    """
+    store = open_caption_store(folder_path, backend)
+    index = CaptionIndex(folder_path, store=store).build(recursive=recursive, processes=processes)
+    if store.bulk_reads and store.count() == 0:
+        sidecar_keys = [name for name, entry in index.entries.items() if entry.caption_path]
+        if sidecar_keys:
+            store.import_sidecars(sidecar_keys)
+            index.snapshot_time = time.time() # The import is not an outside change
+    with _indexes_lock:
+        _indexes[os.path.abspath(folder_path)] = index
+    return index
+
+def get_caption_index(folder_path: str) -> CaptionIndex | None:
+    """Returns the registered index for a folder, if it has been loaded."""
+    with _indexes_lock:
+        return _indexes.get(os.path.abspath(folder_path))
+
+def _index_for(image_path: str, filename: str) -> CaptionIndex | None:
+    """Finds the index an image was loaded through (its root is above subfolder filenames)."""
+    root = os.path.dirname(image_path)
+    for _ in range(filename.count("/")):
+        root = os.path.dirname(root)
+    return get_caption_index(root)
+
+def lookup_caption(filename: str, image_path: str | None, captions: dict | None) -> str:
+    """
+    Returns an image's caption from the captions state dict, falling back to the
+    folder index (lazy read) and finally to reading the sidecar file directly.
+    """
+    if isinstance(captions, dict) and filename in captions:
+        return captions[filename]
+    if image_path:
+        index = _index_for(image_path, filename)
+        if index is not None:
+            text = index.get_caption(filename)
+            if text is not None:
+                return text
+        store = store_for_image(image_path, filename)
+        try:
+            text = store.read(filename)
+            if text is not None:
+                return text
+        except Exception as e:
+            print(f"Warning: Could not read caption {store.location(filename)}: {e}")
+    return ""
+
+def remember_caption(image_path: str, filename: str, text: str):
+    """Updates the folder index cache after the app writes a caption file."""
+    index = _index_for(image_path, filename) if image_path else None
+    if index is not None:
+        index.set_caption(filename, text)
@@ -0,0 +1,211 @@
+# ArtAgent/core/caption_jobs.py
+import contextlib
+import json
+import os
+import threading
+import time
+from .file_lock import FileLock, atomic_write_json
+
+MANIFEST_FILENAME = '.artagent_caption_job.json' # Written inside the captioned image folder
+MANIFEST_VERSION = 1
+MANIFEST_FLUSH_INTERVAL = 2.0 # Seconds between manifest writes while a job runs (at most this much work is re-done after a crash)
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_SKIPPED = "skipped"
+STATUS_ERROR = "error"
+FINISHED_STATUSES = (STATUS_DONE, STATUS_SKIPPED) # Not repeated on resume; errors are retried
+UNREPEATABLE_MODES = ("Append", "Prepend") # Captioning an image twice doubles its text: flush after every finished image
+
+def manifest_filename(job_id: str = "") -> str:
+    return MANIFEST_FILENAME if not job_id else MANIFEST_FILENAME.replace(".json", f"-{job_id}.json")
+
+
+def job_params(agent_or_team: str, model: str, mode: str) -> dict:
+    """Parameters identifying a caption job: a manifest is resumed only by a run with the same ones."""
+    return {"agent_or_team": agent_or_team, "model": model, "mode": mode}
+
+
+class CaptionJob:
+    """
+    A "Generate ALL" captioning run with a persisted per-folder manifest.
+
+    The manifest records each image's status (pending/running/done/skipped/error)
+    and timings. It is written atomically, at most every MANIFEST_FLUSH_INTERVAL
+    seconds while the job runs (after every finished image in UNREPEATABLE_MODES)
+    and once at the end. Re-running the same job
+    (same agent/team, model and mode) on the same folder resumes it: finished
+    images are not captioned again.
+
+    A shared job covers part of a folder whose other images are captioned by
+    other processes (hash shards): opening and every write happen under the
+    manifest's FileLock and merge with the items the others recorded, so the
+    folder keeps one manifest however its images are sharded.
+    """
+    def __init__(self, folder_path: str, params: dict, items: dict | None = None, created: float | None = None, job_id: str = "",
+                 shared: bool = False):
+        self.folder_path = folder_path
+        self.manifest_path = os.path.join(folder_path, manifest_filename(job_id))
+        self.params = dict(params)
+        self.items = items if items is not None else {} # filename -> {"status", "duration", "error", ...}
+        self.created = created or time.time()
+        self.state = "running"
+        self.resumed_count = 0
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    @classmethod
+    def open(cls, folder_path: str, filenames, params: dict, resume: bool = True, job_id: str = "", shared: bool = False) -> "CaptionJob":
+        """
+        Returns a job for the folder, resuming an unfinished manifest with matching params.
+        New images are added as pending and vanished ones dropped (from a shared
+        job's own images only). Jobs sharing a folder either use distinct job_ids
+        or are all opened with shared=True.
+        """
+        filenames = sorted(filenames)
+        manifest_path = os.path.join(folder_path, manifest_filename(job_id))
+        with FileLock(manifest_path) if shared else contextlib.nullcontext():
+            manifest = cls._load_manifest(manifest_path) if resume else None
+            if manifest and manifest.get("params") == dict(params) and manifest.get("state") != "complete":
+                old_items = manifest.get("items", {})
+                job = cls(folder_path, params, created=manifest.get("created"), job_id=job_id, shared=shared)
+                for name in filenames:
+                    item = old_items.get(name)
+                    if isinstance(item, dict) and item.get("status") in FINISHED_STATUSES:
+                        job.items[name] = item
+                        job.resumed_count += 1
+                    else:
+                        job.items[name] = {"status": STATUS_PENDING}
+                print(f"Resuming caption job in {folder_path}: {job.resumed_count}/{len(filenames)} image(s) already finished.")
+            else:
+                job = cls(folder_path, params, items={name: {"status": STATUS_PENDING} for name in filenames}, job_id=job_id, shared=shared)
+            job.flush(force=True)
+        return job
+
+    @staticmethod
+    def _load_manifest(manifest_path: str) -> dict | None:
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable caption job manifest {manifest_path}: {e}")
+            return None
+        return manifest if isinstance(manifest, dict) and manifest.get("version") == MANIFEST_VERSION else None
+
+    def pending_filenames(self) -> list:
+        """Filenames still to caption, in order (the first one is where the job resumes)."""
+        with self._lock:
+            return [name for name in sorted(self.items) if self.items[name]["status"] not in FINISHED_STATUSES]
+
+    def mark_started(self, filename: str):
+        with self._lock:
+            self.items[filename] = {"status": STATUS_RUNNING, "started": time.time()}
+        self.flush()
+
+    def mark_finished(self, filename: str, status: str, duration: float, error: str | None = None, **extra):
+        with self._lock:
+            item = self.items.setdefault(filename, {})
+            item.update({"status": status, "duration": round(duration, 3), "finished": time.time()}, **extra)
+            if error: item["error"] = error[:500]
+            else: item.pop("error", None)
+        self.flush(force=status == STATUS_DONE and self.params.get("mode") in UNREPEATABLE_MODES)
+
+    def counts(self) -> dict:
+        with self._lock:
+            counts = {}
+            for item in self.items.values():
+                counts[item["status"]] = counts.get(item["status"], 0) + 1
+            return counts
+
+    def finish(self):
+        """Marks the job complete if nothing is left to do, and writes the manifest."""
+        with self._lock:
+            unfinished = any(item["status"] not in FINISHED_STATUSES for item in self.items.values())
+            self.state = "incomplete" if unfinished else "complete"
+        self.flush(force=True)
+
+    def flush(self, force: bool = False):
+        """Writes the manifest if forced or the flush interval has passed."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_flush < MANIFEST_FLUSH_INTERVAL:
+                return
+            self._last_flush = now
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "state": self.state,
+                "params": self.params,
+                "created": self.created,
+                "updated": time.time(),
+                "items": {name: dict(item) for name, item in self.items.items()},
+            }
+            try:
+                if not self.shared:
+                    atomic_write_json(self.manifest_path, manifest, indent=1)
+                    return
+                with FileLock(self.manifest_path):
+                    on_disk = self._load_manifest(self.manifest_path)
+                    if on_disk and on_disk.get("params") == self.params and on_disk.get("created") == self.created:
+                        manifest["items"] = {**on_disk.get("items", {}), **manifest["items"]} # Other processes' images
+                    if self.state != "running": # Complete only when every process's images are finished
+                        unfinished = any(item.get("status") not in FINISHED_STATUSES for item in manifest["items"].values())
+                        manifest["state"] = "incomplete" if unfinished else "complete"
+                    atomic_write_json(self.manifest_path, manifest, indent=1)
+            except Exception as e:
+                print(f"Warning: Could not write caption job manifest {self.manifest_path}: {e}")
+
+
+class CaptionJobSet:
+    """
+    One CaptionJob per image folder, for runs spanning several folders
+    (recursive datasets). Images are addressed by their key in image_paths;
+    each folder's manifest records them by basename.
+    """
+    def __init__(self, image_paths: dict, jobs: dict):
+        self.image_paths = image_paths
+        self.jobs = jobs # folder -> CaptionJob
+
+    @classmethod
+    def open(cls, image_paths: dict, filenames, params: dict, resume: bool = True, job_id: str = "", shared: bool = False) -> "CaptionJobSet":
+        by_folder = {}
+        for name in filenames:
+            path = image_paths.get(name)
+            if path: by_folder.setdefault(os.path.dirname(path), []).append(os.path.basename(path))
+        jobs = {folder: CaptionJob.open(folder, names, params, resume=resume, job_id=job_id, shared=shared)
+                for folder, names in sorted(by_folder.items()) if os.path.isdir(folder)}
+        return cls(image_paths, jobs)
+
+    def _job_for(self, name: str):
+        path = self.image_paths.get(name) or ""
+        return self.jobs.get(os.path.dirname(path)), os.path.basename(path)
+
+    @property
+    def resumed_count(self) -> int:
+        return sum(job.resumed_count for job in self.jobs.values())
+
+    def pending_filenames(self, filenames) -> list:
+        """Filters filenames down to those not already finished (untracked images stay pending)."""
+        pending = {folder: set(job.pending_filenames()) for folder, job in self.jobs.items()}
+        result = []
+        for name in filenames:
+            path = self.image_paths.get(name) or ""
+            folder = os.path.dirname(path)
+            if folder not in pending or os.path.basename(path) in pending[folder]:
+                result.append(name)
+        return result
+
+    def mark_started(self, name: str):
+        job, key = self._job_for(name)
+        if job: job.mark_started(key)
+
+    def mark_finished(self, name: str, status: str, duration: float, error: str | None = None, **extra):
+        job, key = self._job_for(name)
+        if job: job.mark_finished(key, status, duration, error=error, **extra)
+
+    def finish(self):
+        for job in self.jobs.values():
+            job.finish()
@@ -0,0 +1,136 @@
+# ArtAgent/core/caption_shards.py
+import multiprocessing
+import re
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from .caption_index import remember_caption
+from .caption_jobs import CaptionJobSet, job_params
+from .ollama_manager import resolve_ollama_endpoints
+
+SHARD_MODES = ("Subdirectory", "Hash")
+MAX_CAPTION_PROCESSES = 8
+_OVERALL_RE = re.compile(r"Overall: Processed=(\d+), Errors=(\d+), Skipped=(\d+)\.")
+
+def plan_shards(filenames, num_shards: int, shard_by: str = "Subdirectory") -> list:
+    """
+    Splits image filenames (relative paths from a recursive load) into shards.
+
+    Subdirectory: images are grouped by their top-level folder (root images form
+    one group) and groups are bin-packed largest first, so a folder is never
+    split across processes and its job manifest has a single writer.
+    Hash: filenames are spread by a stable crc32 hash for even shard sizes.
+
+    Returns:
+        list[list[str]]: Non-empty shards of sorted filenames.
+    """
+    num_shards = max(1, int(num_shards))
+    shards = [[] for _ in range(num_shards)]
+    if shard_by == "Hash":
+        for name in filenames:
+            shards[zlib.crc32(name.encode('utf-8')) % num_shards].append(name)
+    else:
+        groups = {}
+        for name in filenames:
+            groups.setdefault(name.split("/", 1)[0] if "/" in name else "", []).append(name)
+        for _, names in sorted(groups.items(), key=lambda item: (-len(item[1]), item[0])):
+            min(shards, key=len).extend(names)
+    return [sorted(shard) for shard in shards if shard]
+
+
+def _spawn_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Shard processes start as fresh interpreters: forking the multithreaded Gradio process would copy its locks and connections."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _run_shard(args) -> tuple:
+    """Captions one shard in a worker process with its own thread pool."""
+    from .captioning_logic import generate_captions_for_all # Imported here: runs in the child process
+    shard_index, image_paths, shard_settings, gen_args, gen_kwargs = args
+    status, captions, last_caption, history = generate_captions_for_all(
+        image_paths, {}, gen_args[0], gen_args[1], gen_args[2], shard_settings, *gen_args[3:], [],
+        num_processes=1, **gen_kwargs)
+    return shard_index, status, captions, last_caption, history
+
+
+def generate_captions_sharded(
+    image_paths: dict,
+    current_captions: dict,
+    agent_or_team_display_name: str,
+    selected_model_display_name: str,
+    generate_mode: str,
+    settings: dict,
+    models_data: list,
+    limiters_data: dict,
+    teams_data: dict,
+    file_agents: dict,
+    history_list: list,
+    session_history: list,
+    num_processes: int = 2,
+    shard_by: str = "Subdirectory",
+    workers_per_process: int | None = None,
+    resume_job: bool = True,
+    skip_duplicates: bool = False,
+    duplicate_max_distance: int | None = None,
+    executor_factory=_spawn_pool
+    ) -> tuple[str, dict, str, list]:
+    """
+    Runs generate_captions_for_all over shards of the loaded images in separate
+    processes, each with its own `workers_per_process` Ollama concurrency budget
+    (and its own Ollama URL when settings["ollama_endpoints"] lists several).
+    Shard results are merged into one captions dict, session history and status.
+    Hash shards share each folder's job manifest (CaptionJob with shared=True).
+    It is opened here for all images first, so a run resumes however the
+    images were sharded before.
+    """
+    start_time = time.time()
+    shards = plan_shards(sorted(image_paths), min(max(1, int(num_processes)), MAX_CAPTION_PROCESSES), shard_by)
+    endpoints = resolve_ollama_endpoints(settings)
+    gen_args = (agent_or_team_display_name, selected_model_display_name, generate_mode,
+                models_data, limiters_data, teams_data, file_agents, history_list)
+    shared_job = shard_by == "Hash" and len(shards) > 1
+    if shared_job:
+        # Decide resume or fresh start once for the whole folder; the shards then join that job
+        CaptionJobSet.open(image_paths, sorted(image_paths), job_params(agent_or_team_display_name, selected_model_display_name, generate_mode),
+                           resume=resume_job, shared=True)
+    tasks = []
+    for i, shard in enumerate(shards):
+        shard_settings = dict(settings or {})
+        if endpoints[i % len(endpoints)]: shard_settings["ollama_url"] = endpoints[i % len(endpoints)]
+        gen_kwargs = {"num_workers": workers_per_process, "resume_job": resume_job or shared_job, "skip_duplicates": skip_duplicates,
+                      "duplicate_max_distance": duplicate_max_distance, "shared_job": shared_job}
+        tasks.append((i, {name: image_paths[name] for name in shard}, shard_settings, gen_args, gen_kwargs))
+    print(f"Sharded captioning: {len(image_paths)} image(s) in {len(shards)} shard(s) by {shard_by.lower()}.")
+
+    results = {}
+    try:
+        with executor_factory(max_workers=max(1, len(tasks))) as pool:
+            for shard_index, status, captions, last_caption, history in pool.map(_run_shard, tasks):
+                results[shard_index] = (status, captions, last_caption, history)
+    except Exception as e:
+        status = f"Error: Sharded captioning failed: {e}"
+        print(status)
+        return status, current_captions, "", session_history
+
+    merged_captions = dict(current_captions) if isinstance(current_captions, dict) else {}
+    merged_history = list(session_history)
+    totals = [0, 0, 0]
+    last_caption = ""
+    shard_reports = []
+    for i in sorted(results):
+        status, captions, shard_last, history = results[i]
+        for filename, text in captions.items():
+            merged_captions[filename] = text
+            if filename in image_paths: remember_caption(image_paths[filename], filename, text) # Workers updated their own copies of the index
+        merged_history.extend(history)
+        if shard_last: last_caption = shard_last
+        match = _OVERALL_RE.search(status)
+        if match:
+            for k in range(3): totals[k] += int(match.group(k + 1))
+        shard_reports.append(f"=== Shard {i + 1}/{len(results)} ({len(tasks[i][1])} image(s)) ===\n{status}")
+
+    final_status = (f"Sharded caption generation finished in {time.time() - start_time:.2f}s ({len(results)} process(es)).\n"
+                    f"Overall: Processed={totals[0]}, Errors={totals[1]}, Skipped={totals[2]}.\n\n"
+                    + "\n\n".join(shard_reports))
+    print(final_status)
+    return final_status, merged_captions, last_caption, merged_history
@@ -0,0 +1,211 @@
+# ArtAgent/core/caption_store.py
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .file_lock import atomic_write_text
+
+CAPTION_EXTENSION = '.txt'
+CAPTION_STORE_BACKENDS = ("sidecar", "sqlite")
+DEFAULT_CAPTION_STORE_BACKEND = "sidecar"
+SQLITE_STORE_FILENAME = '.artagent_captions.sqlite' # Written inside the dataset root folder
+SQLITE_BATCH_SIZE = 900 # Keys per IN (...) query; below SQLite's default 999 variable limit
+SIDECAR_IO_WORKERS = 8 # Threads for bulk sidecar reads/writes (I/O bound)
+
+def resolve_caption_store_backend(settings: dict) -> str:
+    """Returns settings["caption_store_backend"] ('sidecar' or 'sqlite')."""
+    backend = str((settings or {}).get("caption_store_backend", DEFAULT_CAPTION_STORE_BACKEND)).strip().lower()
+    return backend if backend in CAPTION_STORE_BACKENDS else DEFAULT_CAPTION_STORE_BACKEND
+
+
+class SidecarCaptionStore:
+    """
+    Captions as '<image stem>.txt' files next to each image (the classic layout
+    most training tools expect). Keys are image filenames relative to the root
+    folder ('img.png' or 'class_a/img.png').
+    """
+    backend = "sidecar"
+    bulk_reads = False # Every caption is its own file
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def caption_path(self, key: str) -> str:
+        return os.path.join(self.root_dir, os.path.splitext(key)[0].replace("/", os.sep) + CAPTION_EXTENSION)
+
+    def location(self, key: str) -> str:
+        """Short description of where a caption lives, for status messages."""
+        return os.path.basename(self.caption_path(key))
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self.caption_path(key))
+
+    def read(self, key: str) -> str | None:
+        """Returns the caption text, or None if the image has no caption."""
+        try:
+            with open(self.caption_path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def read_many(self, keys) -> dict:
+        """Returns key -> caption for the keys that have one (read by a thread pool)."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        def _read(key):
+            try:
+                return key, self.read(key)
+            except Exception as e:
+                print(f"Warning: Could not read caption file {self.location(key)}: {e}")
+                return key, None
+        with ThreadPoolExecutor(max_workers=max(1, min(SIDECAR_IO_WORKERS, len(keys))), thread_name_prefix="caption-read") as executor:
+            return {key: text for key, text in executor.map(_read, keys) if text is not None}
+
+    def write(self, key: str, text: str):
+        atomic_write_text(self.caption_path(key), text)
+
+    def write_many(self, captions: dict) -> dict:
+        """
+        Writes key -> caption pairs (each file atomically, by a thread pool).
+
+        Returns:
+            dict[str, str]: key -> error message for captions that could not be written.
+        """
+        if not captions:
+            return {}
+        def _write(item):
+            key, text = item
+            try:
+                self.write(key, text)
+                return key, None
+            except Exception as e:
+                return key, str(e)
+        with ThreadPoolExecutor(max_workers=max(1, min(SIDECAR_IO_WORKERS, len(captions))), thread_name_prefix="caption-write") as executor:
+            return {key: error for key, error in executor.map(_write, captions.items()) if error}
+
+    def close(self):
+        pass
+
+
+class SQLiteCaptionStore:
+    """
+    All captions of a dataset in one SQLite file in the root folder
+    (SQLITE_STORE_FILENAME). A whole folder loads with one query instead of one
+    open() per image, and batch writes are a single transaction.
+    """
+    backend = "sqlite"
+    bulk_reads = True
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self.db_path = os.path.join(root_dir, SQLITE_STORE_FILENAME)
+        self._lock = threading.Lock() # One connection shared by the UI and worker threads
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL") # Readers in other processes don't block on writes
+            self._conn.execute("CREATE TABLE IF NOT EXISTS captions (key TEXT PRIMARY KEY, text TEXT NOT NULL, updated REAL NOT NULL)")
+
+    def location(self, key: str) -> str:
+        return f"{key} in {SQLITE_STORE_FILENAME}"
+
+    def has(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM captions WHERE key = ?", (key,)).fetchone() is not None
+
+    def read(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM captions WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def read_many(self, keys=None) -> dict:
+        """Returns key -> caption for the given keys (all captions if keys is None)."""
+        with self._lock:
+            if keys is None:
+                return dict(self._conn.execute("SELECT key, text FROM captions"))
+            keys = list(keys)
+            result = {}
+            for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+                chunk = keys[start:start + SQLITE_BATCH_SIZE]
+                query = f"SELECT key, text FROM captions WHERE key IN ({','.join('?' * len(chunk))})"
+                result.update(self._conn.execute(query, chunk))
+            return result
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+
+    def changed_since(self, timestamp: float) -> list:
+        """Keys whose caption was written at or after timestamp (by any process)."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM captions WHERE updated >= ?", (timestamp,))]
+
+    def write(self, key: str, text: str):
+        self.write_many({key: text})
+
+    def write_many(self, captions: dict) -> dict:
+        """Writes key -> caption pairs in one transaction (all or nothing). Returns {} or raises."""
+        if not captions:
+            return {}
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO captions (key, text, updated) VALUES (?, ?, ?)",
+                                   [(key, text, now) for key, text in captions.items()])
+        return {}
+
+    def import_sidecars(self, keys) -> int:
+        """Copies existing sidecar .txt captions for the given keys into the store. Returns the count."""
+        captions = SidecarCaptionStore(self.root_dir).read_many(keys)
+        self.write_many(captions)
+        print(f"Caption store: imported {len(captions)} sidecar caption(s) into {self.db_path}.")
+        return len(captions)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Registry of stores for dataset folders opened in this process ---
+_stores: dict = {}
+_stores_lock = threading.Lock()
+_parent_stores: list = [] # Stores inherited through fork: kept referenced (never used or closed) so the child never touches the parent's SQLite connections
+
+def _forget_parent_stores():
+    """Runs in a forked child (e.g. caption_shards' process pool): it opens its own stores and connections."""
+    global _stores_lock
+    _parent_stores.extend(_stores.values())
+    _stores.clear()
+    _stores_lock = threading.Lock() # The parent's lock may have been held by another thread at fork time
+
+if hasattr(os, "register_at_fork"): # POSIX; spawned processes start with an empty registry anyway
+    os.register_at_fork(after_in_child=_forget_parent_stores)
+
+def open_caption_store(root_dir: str, backend: str | None = None):
+    """
+    Returns the caption store for a dataset folder, creating it if needed.
+
+    A folder that already has a SQLite store always uses it (so captions are
+    never split across backends). Otherwise `backend` decides; None means the
+    store registered for the folder, else sidecar files.
+    """
+    key = os.path.abspath(root_dir)
+    has_db = os.path.exists(os.path.join(root_dir, SQLITE_STORE_FILENAME))
+    wanted = "sqlite" if has_db else (backend or None)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is not None and (wanted is None or store.backend == wanted):
+            return store
+        if store is not None:
+            store.close()
+        store = SQLiteCaptionStore(root_dir) if wanted == "sqlite" else SidecarCaptionStore(root_dir)
+        _stores[key] = store
+        return store
+
+
+def store_for_image(image_path: str, filename: str):
+    """Returns the store an image's caption belongs to (its root is above subfolder filenames)."""
+    root = os.path.dirname(image_path)
+    for _ in range(filename.count("/")):
+        root = os.path.dirname(root)
+    return open_caption_store(root)
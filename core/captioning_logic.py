@@ -1,28 +1,45 @@
 # ArtAgent/core/captioning_logic.py
 import os
+import re
+import fnmatch
 import gradio as gr # Keep for gr.SelectData type hint if desired
 from PIL import Image
 import time
+import threading
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Import utilities and core components
 from .utils import get_absolute_path, load_json
 from .app_logic import execute_chat_or_team
 from . import history_manager as history
-
-IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp')
+from .caption_index import IMAGE_EXTENSIONS, SCAN_PROCESSES, build_caption_index, get_caption_index, lookup_caption, remember_caption
+from .caption_store import resolve_caption_store_backend, store_for_image
+from .thumbnail_cache import get_default_cache as get_thumbnail_cache
+from .caption_jobs import CaptionJobSet, job_params, STATUS_DONE, STATUS_SKIPPED, STATUS_ERROR
+from .image_prefetch import ImagePrefetcher, prepare_image, resolve_image_max_side, DEFAULT_PREFETCH_DEPTH
+from .image_dedup import find_duplicate_groups, DEFAULT_MAX_DISTANCE as DEFAULT_DUPLICATE_DISTANCE
+
+EAGER_CAPTION_LIMIT = 2000 # Folders up to this size read all captions up front; larger ones load lazily
+DEFAULT_CAPTION_WORKERS = 1 # Match Ollama's OLLAMA_NUM_PARALLEL slots via settings/UI
+MAX_CAPTION_WORKERS = 16
+CAPTION_WRITE_WORKERS = 8 # Threads for bulk caption reads/writes (I/O bound)
 
 # --- Function to load images and prepare data for Gallery ---
-def load_images_and_captions(folder_path: str):
+def load_images_and_captions(folder_path: str, recursive: bool = False, settings: dict | None = None):
     """
     Loads images and captions, returning data formatted for gr.Gallery.
 
     Args:
         folder_path (str): The path to the folder.
+        recursive (bool): Also load images from subfolders (keyed by relative path,
+                          e.g. 'class_a/img.png'); top-level subfolders are scanned in parallel.
+        settings (dict | None): App settings; "caption_store_backend" picks sidecar .txt
+                          files or one SQLite store per folder (see caption_store).
 
     Returns:
         tuple: Contains:
-            - list[tuple[str, str]]: List of (image_path, filename) tuples for Gallery.
+            - list[tuple[str, str]]: List of (thumbnail_path, filename) tuples for Gallery.
             - dict[str, str]: Mapping of image filename to its absolute path.
             - dict[str, str]: Mapping of image filename to its caption text.
             - str: Status message.
@@ -30,10 +47,6 @@ def load_images_and_captions(folder_path: str):
             - str | None: Caption of the first image.
             - str | None: Filename of the first image again (for filename display).
     """
-    captions = {}
-    image_paths = {}
-    gallery_data = [] # List for Gallery component [(path, filename), ...]
-    image_filenames_sorted = []
     status = ""
     empty_return = [], {}, {}, "Error: No folder specified.", None, None, None
 
@@ -44,30 +57,25 @@ def load_images_and_captions(folder_path: str):
         return [], {}, {}, status, None, None, None # 7 items
 
     print(f"Loading captions from folder: {folder_path}")
-    found_count = 0
     try:
-        listdir_sorted = sorted(os.listdir(folder_path))
-        for filename in listdir_sorted:
-            name, ext = os.path.splitext(filename)
-            if ext.lower() in IMAGE_EXTENSIONS:
-                image_abs_path = os.path.join(folder_path, filename)
-                if os.path.isfile(image_abs_path):
-                    image_filenames_sorted.append(filename)
-                    image_paths[filename] = image_abs_path
-                    # Gallery expects list of (image_path, label) tuples
-                    gallery_data.append((image_abs_path, filename)) # Use filename as label
-
-                    text_filename = name + ".txt"
-                    text_path = os.path.join(folder_path, text_filename)
-                    caption_text = ""
-                    if os.path.exists(text_path):
-                        try:
-                            with open(text_path, 'r', encoding='utf-8') as f: caption_text = f.read()
-                        except Exception as e: print(f"Warning: Could not read caption file {text_filename}: {e}")
-                    captions[filename] = caption_text
-                    found_count += 1
-
-        status = f"Loaded {found_count} image(s)." if found_count > 0 else "No supported image files found."
+        # One scandir pass finds images and their sidecar .txt files together
+        backend = resolve_caption_store_backend(settings) if settings is not None else None
+        index = build_caption_index(folder_path, recursive=recursive, processes=SCAN_PROCESSES if recursive else 1, backend=backend)
+        image_filenames_sorted = index.filenames
+        image_paths = index.image_paths
+        # Gallery gets cached thumbnails (full images load on selection); list of (image_path, label) tuples
+        thumbnails = get_thumbnail_cache().get_thumbnails(index.entries[name] for name in image_filenames_sorted)
+        gallery_data = [(thumbnails.get(name, image_paths[name]), name) for name in image_filenames_sorted] # Use filename as label
+        found_count = len(image_filenames_sorted)
+
+        if found_count <= EAGER_CAPTION_LIMIT or index.store.bulk_reads: # A SQLite store loads everything in one query
+            captions = index.load_captions()
+            status = f"Loaded {found_count} image(s)." if found_count > 0 else "No supported image files found."
+        else:
+            # Large folder: show the gallery now, read captions on selection / in the background
+            captions = index.load_captions(image_filenames_sorted[:1])
+            index.start_background_load()
+            status = f"Loaded {found_count} image(s). Captions are loading in the background."
         print(status)
 
     except Exception as e:
@@ -91,6 +99,62 @@ def load_images_and_captions(folder_path: str):
     )
 
 
+# --- Function to pick up outside changes without a full reload ---
+def refresh_images_and_captions(
+    folder_path: str,
+    recursive: bool,
+    settings: dict | None,
+    image_paths_dict: dict,
+    caption_data_dict: dict,
+    selected_filename: str | None,
+    current_caption_text: str
+    ):
+    """
+    Re-syncs a loaded folder with the filesystem: the folder is rescanned and
+    diffed against the previous scan (size/mtime), and only added images and
+    changed captions are read. Falls back to a full load if the folder isn't loaded.
+
+    Returns:
+        tuple: The same 7 values as load_images_and_captions. The selected image
+               stays selected; its caption text is only replaced if it changed on disk.
+    """
+    index = get_caption_index(folder_path) if folder_path else None
+    if index is None or index.recursive != bool(recursive) or not isinstance(image_paths_dict, dict) or not image_paths_dict:
+        return load_images_and_captions(folder_path, recursive, settings)
+
+    start_time = time.time()
+    try:
+        diff = index.refresh(processes=SCAN_PROCESSES if recursive else 1)
+        image_filenames_sorted = index.filenames
+        image_paths = index.image_paths
+        # Thumbnail keys include size/mtime: only new or changed images are rendered
+        thumbnails = get_thumbnail_cache().get_thumbnails(index.entries[name] for name in image_filenames_sorted)
+    except Exception as e:
+        status = f"Error refreshing folder contents: {e}"
+        print(status)
+        return gr.update(), image_paths_dict, caption_data_dict, status, selected_filename, current_caption_text, selected_filename
+    gallery_data = [(thumbnails.get(name, image_paths[name]), name) for name in image_filenames_sorted]
+
+    captions = {name: text for name, text in (caption_data_dict or {}).items() if name in image_paths}
+    to_read = [name for name in diff["added"] + diff["captions_changed"]
+               if name in captions or len(image_filenames_sorted) <= EAGER_CAPTION_LIMIT or index.store.bulk_reads]
+    captions.update(index.load_captions(to_read))
+    for name in diff["captions_changed"]:
+        if name not in to_read: captions.pop(name, None) # Lazy mode: re-read on selection
+
+    if selected_filename in image_paths:
+        caption_text = lookup_caption(selected_filename, image_paths[selected_filename], captions) if selected_filename in diff["captions_changed"] else current_caption_text
+    else:
+        selected_filename = image_filenames_sorted[0] if image_filenames_sorted else None
+        caption_text = lookup_caption(selected_filename, image_paths[selected_filename], captions) if selected_filename else ""
+
+    status = (f"Refreshed in {time.time() - start_time:.2f}s: {len(diff['added'])} added, {len(diff['removed'])} removed, "
+              f"{len(diff['changed'])} image(s) changed, {len(diff['captions_changed'])} caption(s) changed. "
+              f"{len(image_filenames_sorted)} image(s) loaded.")
+    print(status)
+    return gallery_data, image_paths, captions, status, selected_filename, caption_text, selected_filename
+
+
 # --- Function to handle Gallery selection event ---
 # CORRECTED Signature: Takes 3 arguments now
 def update_caption_display_from_gallery(
@@ -121,11 +185,15 @@ def update_caption_display_from_gallery(
         print(f"Gallery selected: Filename='{selected_filename}', Index={evt.index}")
 
         if selected_filename and isinstance(caption_data_dict, dict):
-            caption_text = caption_data_dict.get(selected_filename, f"Caption data not found for '{selected_filename}'.")
-            filename_display = selected_filename
-
             # Optional: Verify path exists using the passed dict
             image_path = image_paths_dict.get(selected_filename) if isinstance(image_paths_dict, dict) else None
+            if selected_filename in caption_data_dict or image_path:
+                # Lazily loaded folders may not have this caption in state yet
+                caption_text = lookup_caption(selected_filename, image_path, caption_data_dict)
+            else:
+                caption_text = f"Caption data not found for '{selected_filename}'."
+            filename_display = selected_filename
+
             if not image_path or not os.path.isfile(image_path):
                  print(f"Warning: Path issue for gallery selected file: {selected_filename}")
                  filename_display = f"{selected_filename} (Path Issue)" # Indicate issue
@@ -145,6 +213,18 @@ def update_caption_display_from_gallery(
     return caption_text, selected_filename, filename_display
 
 
+# --- Function to load the full-resolution image for the selected gallery item ---
+def get_selected_image_path(evt: gr.SelectData, image_paths_dict: dict) -> str | None:
+    """
+    Handles the Gallery select event for the preview image.
+    The gallery only holds thumbnails, so the original is loaded here, on selection.
+    """
+    if not evt or not isinstance(image_paths_dict, dict):
+        return None
+    image_path = image_paths_dict.get(evt.value)
+    return image_path if image_path and os.path.isfile(image_path) else None
+
+
 # --- Function to save manually edited caption ---
 def save_caption(
     selected_filename: str | None, # Filename from state
@@ -153,7 +233,7 @@ def save_caption(
     caption_data_dict: dict # Map filename -> caption (to update state)
     ) -> tuple[str, dict]: # Return status string and updated captions dict
     """
-    Saves the edited caption text to the corresponding .txt file.
+    Saves the edited caption text to the image's caption store (its .txt file by default).
     """
     if not selected_filename:
         return "Error: No image selected to save caption for.", caption_data_dict
@@ -164,40 +244,163 @@ def save_caption(
         return f"Error: Could not find original path for '{selected_filename}'.", caption_data_dict
 
     updated_captions = caption_data_dict.copy() if isinstance(caption_data_dict, dict) else {}
+    store = store_for_image(image_path, selected_filename)
     try:
-        folder_path = os.path.dirname(image_path)
-        base_name = os.path.splitext(selected_filename)[0]
-        text_path = os.path.join(folder_path, base_name + ".txt")
-        with open(text_path, 'w', encoding='utf-8') as f:
-            f.write(caption_text)
-        status = f"Caption saved successfully to {base_name}.txt"
+        store.write(selected_filename, caption_text)
+        status = f"Caption saved successfully to {store.location(selected_filename)}"
         print(status)
         updated_captions[selected_filename] = caption_text
+        remember_caption(image_path, selected_filename, caption_text)
         return status, updated_captions
     except Exception as e:
-        status = f"Error saving caption to '{text_path}': {e}"
+        status = f"Error saving caption to '{store.location(selected_filename)}': {e}"
         print(status)
         return status, (caption_data_dict if isinstance(caption_data_dict, dict) else {})
 
 
 # --- Function for manual batch editing ---
-# Needs Redesign for Gallery multi-select - Currently Non-functional
+BATCH_EDIT_MODES = ("Append", "Prepend", "Replace (Regex)", "Dedupe Tags")
+
+def select_images_by_pattern(patterns: str, image_filenames) -> list:
+    """
+    Returns the filenames matching any of the comma-separated glob patterns
+    (case-insensitive), e.g. "*.png, char_*". "*" selects the whole folder.
+    """
+    globs = [p.strip().lower() for p in (patterns or "").split(",") if p.strip()]
+    return sorted(name for name in image_filenames if any(fnmatch.fnmatchcase(name.lower(), g) for g in globs))
+
+
+def dedupe_tags(caption: str) -> str:
+    """Removes repeated comma-separated tags (case-insensitive), keeping the first occurrence."""
+    seen = set()
+    tags = []
+    for tag in caption.split(","):
+        tag = tag.strip()
+        if tag and tag.lower() not in seen:
+            seen.add(tag.lower())
+            tags.append(tag)
+    return ", ".join(tags)
+
+
 def batch_edit_captions(
-    selected_items_from_gallery: list | None, # Placeholder input
+    selection, # list of filenames, or comma-separated glob patterns ("*" = all loaded images)
     text_to_add: str,
     mode: str,
     image_paths_dict: dict,
-    caption_data_dict: dict
+    caption_data_dict: dict,
+    replace_with: str = "",
+    num_workers: int = CAPTION_WRITE_WORKERS
     ) -> tuple[str, dict]:
     """
-    Appends or prepends text to the captions of selected images.
-    *** CURRENTLY INCOMPATIBLE WITH GALLERY - Needs redesign for multi-select ***
+    Applies one edit to the captions of many images.
+
+    Modes:
+        Append / Prepend: adds `text_to_add` after/before the caption (as-is, include your own separator).
+        Replace (Regex): re.sub(text_to_add, replace_with, caption).
+        Dedupe Tags: drops repeated comma-separated tags.
+
+    Captions are read and edited by a thread pool, then written through the
+    folder's caption store in one batch (atomic sidecar replacements, or a single
+    SQLite transaction). Captions whose content would not change are not rewritten.
+
+    Returns:
+        tuple: (status_message, updated_caption_data_dict)
     """
-    print("Warning: Batch edit caption logic needs redesign for Gallery component.")
-    return ("Batch edit feature needs update for Gallery UI.", caption_data_dict)
+    original_captions = caption_data_dict if isinstance(caption_data_dict, dict) else {}
+    image_paths_dict = image_paths_dict if isinstance(image_paths_dict, dict) else {}
+    if isinstance(selection, str):
+        selected = select_images_by_pattern(selection, image_paths_dict.keys())
+    else:
+        selected = list(selection or [])
+    if not selected:
+        return "No images selected (or no loaded images match the pattern).", original_captions
+    if mode not in BATCH_EDIT_MODES:
+        return f"Invalid batch mode: {mode}", original_captions
+
+    if mode == "Replace (Regex)":
+        if not text_to_add: return "Error: Enter a regex pattern to replace.", original_captions
+        try: pattern = re.compile(text_to_add)
+        except re.error as e: return f"Error: Invalid regex '{text_to_add}': {e}", original_captions
+        edit = lambda caption: pattern.sub(replace_with or "", caption)
+    elif mode == "Dedupe Tags":
+        edit = dedupe_tags
+    else:
+        if not text_to_add: return f"Error: Enter text to {mode.lower()}.", original_captions
+        edit = (lambda caption: caption + text_to_add) if mode == "Append" else (lambda caption: text_to_add + caption)
+
+    start_time = time.time()
+    print(f"Batch {mode}: {len(selected)} image(s) selected.")
+
+    def edit_one(filename):
+        image_path = image_paths_dict.get(filename)
+        if not image_path:
+            return filename, "skipped", None, f"- {filename}: Skipped (image path not found)."
+        current = lookup_caption(filename, image_path, original_captions)
+        new_caption = edit(current)
+        if new_caption == current:
+            return filename, "unchanged", None, None
+        return filename, "changed", new_caption, None
+
+    updated_captions = original_captions.copy()
+    counts = {"changed": 0, "unchanged": 0, "skipped": 0, "error": 0}
+    details = []
+    changes = {} # store -> {filename: new caption}
+    with ThreadPoolExecutor(max_workers=max(1, min(num_workers, len(selected))), thread_name_prefix="caption-edit") as executor:
+        futures = {executor.submit(edit_one, name): name for name in selected}
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                _, outcome, new_caption, detail = future.result()
+            except Exception as e:
+                outcome, new_caption, detail = "error", None, f"- {filename}: Error - {e}"
+            if outcome == "changed":
+                changes.setdefault(store_for_image(image_paths_dict[filename], filename), {})[filename] = new_caption
+                continue
+            counts[outcome] += 1
+            if detail: details.append(detail)
+
+    # One batched write per store (a single transaction for SQLite)
+    for store, captions in changes.items():
+        try:
+            errors = store.write_many(captions)
+        except Exception as e:
+            errors = {filename: str(e) for filename in captions}
+        for filename, new_caption in captions.items():
+            if filename in errors:
+                counts["error"] += 1
+                details.append(f"- {filename}: Error - {errors[filename]}")
+                continue
+            counts["changed"] += 1
+            updated_captions[filename] = new_caption
+            remember_caption(image_paths_dict[filename], filename, new_caption)
+
+    duration = time.time() - start_time
+    status = (f"Batch {mode} complete in {duration:.2f}s. Processed: {counts['changed']}, "
+              f"Unchanged: {counts['unchanged']}, Errors: {counts['error']}, Skipped: {counts['skipped']}.")
+    if details:
+        status += "\n" + "\n".join(sorted(details))
+    print(status)
+    return status, updated_captions
 
 
 # --- Functions for Agent Caption Generation ---
+def compose_caption(generated_caption: str, original_caption: str, caption_exists: bool, generate_mode: str) -> tuple[str, str]:
+    """Returns (caption_to_write, action_taken) for a generated caption under the file handling mode."""
+    final_caption_to_write = generated_caption
+    action_taken = ""
+    if generate_mode == "Append":
+        final_caption_to_write = f"{original_caption}\n\n---\n\n{generated_caption}" if original_caption else generated_caption
+        action_taken = "Appended" if caption_exists else "Written"
+    elif generate_mode == "Prepend":
+        final_caption_to_write = f"{generated_caption}\n\n---\n\n{original_caption}" if original_caption else generated_caption
+        action_taken = "Prepended" if caption_exists else "Written"
+    elif caption_exists and generate_mode == "Overwrite":
+        action_taken = "Overwritten"
+    elif not caption_exists: # Handles Overwrite mode when file doesn't exist
+        action_taken = "Written"
+    return final_caption_to_write, action_taken
+
+
 
 # MODIFIED: Accepts single selected_filename from state
 def generate_captions_for_selected(
@@ -213,10 +416,14 @@ def generate_captions_for_selected(
     teams_data: dict,
     file_agents: dict,
     history_list: list,
-    session_history: list
+    session_history: list,
+    image_loader=None
     ) -> tuple[str, dict, str, list]:
     """
     Generates caption for the currently selected image using an agent/team and model.
+
+    `image_loader(image_path)` supplies the prepared image (e.g. ImagePrefetcher.get
+    during batch runs); by default the image is prepared here via prepare_image.
     """
     print("\n--- Running: Generate Caption for Selected Image ---")
     start_time = time.time()
@@ -254,11 +461,10 @@ def generate_captions_for_selected(
 
     # --- File handling check ---
     print(f"  Processing selected: {selected_filename}")
-    base_name = os.path.splitext(selected_filename)[0]
-    text_filename = base_name + ".txt"
-    text_path = os.path.join(os.path.dirname(image_path), text_filename)
-    caption_exists = os.path.exists(text_path)
-    original_caption = updated_captions.get(selected_filename, "")
+    store = store_for_image(image_path, selected_filename)
+    text_filename = store.location(selected_filename)
+    caption_exists = store.has(selected_filename)
+    original_caption = lookup_caption(selected_filename, image_path, updated_captions) if caption_exists else ""
 
     if caption_exists and generate_mode == "Skip":
         msg = f"- Skipped {selected_filename}: Caption file '{text_filename}' already exists and mode is Skip."
@@ -273,10 +479,11 @@ def generate_captions_for_selected(
     # --- Image loading and Agent call ---
     img = None
     try:
-        img = Image.open(image_path)
+        # Decoded, resized and base64-encoded once, even if a team sends it to several steps
+        img = image_loader(image_path) if image_loader else prepare_image(image_path, resolve_image_max_side(settings))
         print(f"    Calling agent/team '{agent_or_team_display_name}' with model '{selected_model_display_name}'...")
 
-        # Call the router, passing PIL image via 'single_image_input' keyword
+        # Call the router, passing the prepared image via 'single_image_input' keyword
         response_text, _, _, updated_session_history_list = execute_chat_or_team(
             folder_path=None,
             user_input=fixed_prompt,
@@ -288,6 +495,7 @@ def generate_captions_for_selected(
             use_ollama_api_options=True,
             release_model_on_change=False,
             selected_role_or_team=agent_or_team_display_name,
+            clean_artifacts_flag=True, # Captions should never contain agent output headers
             current_settings=settings,
             models_data_state=models_data,
             limiters_data_state=limiters_data,
@@ -316,28 +524,16 @@ def generate_captions_for_selected(
         print(f"    Generated Caption (Stripped): {generated_caption[:100]}...")
 
         # Determine final content and action message based on generate_mode
-        action_taken = ""
-        final_caption_to_write = generated_caption
-
-        if generate_mode == "Append":
-            final_caption_to_write = f"{original_caption}\n\n---\n\n{generated_caption}" if original_caption else generated_caption
-            action_taken = "Appended" if caption_exists else "Written"
-        elif generate_mode == "Prepend":
-            final_caption_to_write = f"{generated_caption}\n\n---\n\n{original_caption}" if original_caption else generated_caption
-            action_taken = "Prepended" if caption_exists else "Written"
-        elif caption_exists and generate_mode == "Overwrite":
-            action_taken = "Overwritten"
-        elif not caption_exists: # Handles Overwrite mode when file doesn't exist
-             action_taken = "Written"
+        final_caption_to_write, action_taken = compose_caption(generated_caption, original_caption, caption_exists, generate_mode)
         # Skip case was handled earlier
 
         # Save the caption
         try:
-            print(f"DEBUG CAPTIONING: Preparing to write to {text_path}")
+            print(f"DEBUG CAPTIONING: Preparing to write to {text_filename}")
             print(f"DEBUG CAPTIONING: Content to Write: >>>{final_caption_to_write}<<<")
-            with open(text_path, 'w', encoding='utf-8') as f:
-                f.write(final_caption_to_write)
+            store.write(selected_filename, final_caption_to_write)
             updated_captions[selected_filename] = final_caption_to_write # Update the dict state
+            remember_caption(image_path, selected_filename, final_caption_to_write)
             msg = f"- Success {selected_filename}: Caption generated and file {action_taken}."
             print(f"    {msg}")
             status_messages.append(msg)
@@ -374,7 +570,49 @@ def generate_captions_for_selected(
     return final_status, updated_captions, last_caption_generated, current_session_history
 
 
-# MODIFIED: Loops and calls the MODIFIED generate_captions_for_selected
+def resolve_caption_workers(settings: dict, requested=None) -> int:
+    """Returns the captioning worker count (UI value, else settings, else default), clamped."""
+    value = requested if requested not in (None, "") else (settings or {}).get("caption_parallel_workers", DEFAULT_CAPTION_WORKERS)
+    try: value = int(value)
+    except (ValueError, TypeError): value = DEFAULT_CAPTION_WORKERS
+    return max(1, min(MAX_CAPTION_WORKERS, value))
+
+
+def resolve_prefetch_depth(settings: dict) -> int:
+    """Returns how many images 'Generate ALL' prepares ahead (settings["caption_prefetch_depth"])."""
+    try: return max(1, int((settings or {}).get("caption_prefetch_depth", DEFAULT_PREFETCH_DEPTH)))
+    except (ValueError, TypeError): return DEFAULT_PREFETCH_DEPTH
+
+
+def resolve_duplicate_distance(settings: dict, requested=None) -> int:
+    """Returns the near-duplicate Hamming threshold (UI value, else settings["caption_duplicate_max_distance"])."""
+    value = requested if requested not in (None, "") else (settings or {}).get("caption_duplicate_max_distance", DEFAULT_DUPLICATE_DISTANCE)
+    try: return max(0, min(64, int(value)))
+    except (ValueError, TypeError): return DEFAULT_DUPLICATE_DISTANCE
+
+
+def _copy_caption_to_duplicate(filename: str, rep_filename: str, generated_caption: str, image_path: str,
+                               generate_mode: str, captions: dict) -> tuple[str, str | None]:
+    """
+    Writes a representative's generated caption for a near-duplicate image,
+    honouring the file handling mode. Returns (status, written_caption_or_None).
+    """
+    if not generated_caption:
+        return (f"Caption for '{filename}' not copied. Status: Error.\n"
+                f"- Error {filename}: Representative '{rep_filename}' produced no caption to copy.", None)
+    store = store_for_image(image_path, filename)
+    caption_exists = store.has(filename)
+    if caption_exists and generate_mode == "Skip":
+        return f"Caption for '{filename}' skipped. Status: Skipped.\n- Skipped {filename}: Caption file already exists and mode is Skip.", None
+    original_caption = lookup_caption(filename, image_path, captions) if caption_exists else ""
+    final_caption, action_taken = compose_caption(generated_caption, original_caption, caption_exists, generate_mode)
+    store.write(filename, final_caption)
+    remember_caption(image_path, filename, final_caption)
+    return (f"Caption for '{filename}' copied. Status: Success.\n"
+            f"- Success {filename}: Caption copied from near-duplicate '{rep_filename}' and file {action_taken}.", final_caption)
+
+
+# Runs generate_captions_for_selected for many images through a bounded thread pool
 def generate_captions_for_all(
     image_paths: dict,
     current_captions: dict,
@@ -387,11 +625,36 @@ def generate_captions_for_all(
     teams_data: dict,
     file_agents: dict,
     history_list: list,
-    session_history: list
+    session_history: list,
+    num_workers: int | None = None,
+    resume_job: bool = True,
+    skip_duplicates: bool = False,
+    duplicate_max_distance: int | None = None,
+    num_processes: int = 1,
+    shard_by: str = "Subdirectory",
+    shared_job: bool = False
     ) -> tuple[str, dict, str, list]:
     """
-    Generates captions for ALL loaded images using an agent/team by calling
-    the single-image generation logic repeatedly.
+    Generates captions for ALL loaded images using an agent/team.
+
+    Images are dispatched to a pool of `num_workers` threads (ideally Ollama's
+    parallel slot count; falls back to settings["caption_parallel_workers"]).
+    Each image is isolated: a failure only marks that image as an error.
+    Results are merged into the captions dict under a lock as they finish, and
+    status lines / session history entries are reported in filename order.
+
+    Progress is recorded in a CaptionJob manifest inside the image folder. With
+    `resume_job`, an interrupted run with the same agent/team, model and mode
+    continues from its first unfinished image instead of starting over.
+    `shared_job` is set by hash shards, whose processes share each folder's
+    manifest (see CaptionJob).
+
+    With `skip_duplicates`, near-duplicate images (perceptual hash within
+    `duplicate_max_distance` bits) are grouped and only one representative per
+    group is sent to the model; its generated caption is copied to the others.
+
+    With `num_processes` > 1 the images are split into shards (by top-level
+    subfolder or by hash, see caption_shards) captioned by separate processes.
     """
     print("\n--- Running: Generate Captions for ALL ---")
     start_time = time.time()
@@ -401,60 +664,139 @@ def generate_captions_for_all(
     if not selected_model_display_name: return "Please select a Vision Model.", current_captions, "", session_history
     if not agent_or_team_display_name or agent_or_team_display_name == "(Direct Agent Call)": return "Please select Agent/Team.", current_captions, "", session_history
 
+    if num_processes and int(num_processes) > 1:
+        from .caption_shards import generate_captions_sharded
+        return generate_captions_sharded(image_paths, current_captions, agent_or_team_display_name, selected_model_display_name,
+                                         generate_mode, settings, models_data, limiters_data, teams_data, file_agents,
+                                         history_list, session_history, num_processes=int(num_processes), shard_by=shard_by,
+                                         workers_per_process=num_workers, resume_job=resume_job,
+                                         skip_duplicates=skip_duplicates, duplicate_max_distance=duplicate_max_distance)
+
     all_filenames = sorted(list(image_paths.keys()))
-    batch_status_messages = []
-    # Start with copies of the state dicts/lists that will be modified
+    # One resumable job manifest per image folder
+    params = job_params(agent_or_team_display_name, selected_model_display_name, generate_mode)
+    jobs = CaptionJobSet.open(image_paths, all_filenames, params, resume=resume_job, shared=shared_job)
+    all_filenames = jobs.pending_filenames(all_filenames)
+    if not all_filenames:
+        jobs.finish()
+        return f"Caption job already finished for all {jobs.resumed_count} image(s). Nothing to do.", current_captions, "", session_history
+
+    duplicate_of = {} # duplicate filename -> representative filename
+    if skip_duplicates and len(all_filenames) > 1:
+        # Only images that will actually be generated can represent a group (Skip mode keeps existing captions)
+        needs_caption = {name: image_paths[name] for name in all_filenames
+                         if not (generate_mode == "Skip" and store_for_image(image_paths[name], name).has(name))}
+        groups = find_duplicate_groups(needs_caption, resolve_duplicate_distance(settings, duplicate_max_distance))
+        duplicate_of = {member: rep for rep, members in groups.items() for member in members}
+    caption_filenames = [name for name in all_filenames if name not in duplicate_of]
+
+    workers = min(resolve_caption_workers(settings, num_workers), len(caption_filenames))
+    print(f"  Captioning {len(caption_filenames)} image(s) with {workers} worker(s)"
+          + (f"; {len(duplicate_of)} near-duplicate(s) will reuse a representative's caption." if duplicate_of else "."))
+
+    # Background threads prepare upcoming images while the current ones are being generated
+    prefetch_paths = [image_paths[name] for name in caption_filenames
+                      if not (generate_mode == "Skip" and store_for_image(image_paths[name], name).has(name))]
+    prefetch_depth = max(resolve_prefetch_depth(settings), workers) # >= workers so every worker's image is in the window
+    prefetcher = ImagePrefetcher(prefetch_paths, depth=prefetch_depth, max_side=resolve_image_max_side(settings))
+
     batch_updated_captions = current_captions.copy()
-    batch_session_history = list(session_history)
-    # Persistent history is passed but assumed updated within the called function via history_manager
+    merge_lock = threading.Lock()
+    # Persistent history is updated (under its file lock) inside the single-image path
     batch_history_list = list(history_list)
+    results = {} # filename -> (status, caption, session_entries); reported in filename order
+
+    def caption_one(filename):
+        jobs.mark_started(filename)
+        item_start = time.time()
+        # Each worker only sees its own caption, so the shared dict is never copied per image
+        with merge_lock:
+            # Omit captions not loaded yet (lazy folders); the single-image path reads them on demand
+            own_caption = {filename: batch_updated_captions[filename]} if filename in batch_updated_captions else {}
+        single_status, single_captions, single_caption, single_session = generate_captions_for_selected(
+            selected_filename=filename,
+            agent_or_team_display_name=agent_or_team_display_name,
+            selected_model_display_name=selected_model_display_name,
+            generate_mode=generate_mode,
+            image_paths=image_paths,
+            current_captions=own_caption,
+            settings=settings,
+            models_data=models_data,
+            limiters_data=limiters_data,
+            teams_data=teams_data,
+            file_agents=file_agents,
+            history_list=batch_history_list,
+            session_history=[], # Collect only this image's entries
+            image_loader=prefetcher.get
+        )
+        prefetcher.discard(image_paths[filename]) # Frees the slot if the image wasn't needed (e.g. skipped)
+        if filename in single_captions and single_captions[filename] != own_caption.get(filename):
+            with merge_lock:
+                batch_updated_captions[filename] = single_captions[filename]
+        if "Status: Success." in single_status: jobs.mark_finished(filename, STATUS_DONE, time.time() - item_start)
+        elif "Status: Skipped." in single_status: jobs.mark_finished(filename, STATUS_SKIPPED, time.time() - item_start)
+        else: jobs.mark_finished(filename, STATUS_ERROR, time.time() - item_start, error=single_status)
+        return single_status, single_caption, single_session
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="caption") as executor:
+        futures = {executor.submit(caption_one, filename): filename for filename in caption_filenames}
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                results[filename] = future.result()
+            except Exception as e: # Isolate unexpected failures to their image
+                msg = f"- Error processing {filename}: {e}"
+                print(f"    {msg}")
+                jobs.mark_finished(filename, STATUS_ERROR, 0.0, error=msg)
+                results[filename] = (f"Caption generation for '{filename}' failed. Status: Error.\n{msg}", "", [])
+                prefetcher.discard(image_paths[filename])
+    prefetcher.close()
+
+    # Near-duplicates reuse their representative's freshly generated caption
+    for filename in sorted(duplicate_of):
+        rep = duplicate_of[filename]
+        rep_status, rep_caption, _ = results[rep]
+        try:
+            copy_status, copied_caption = _copy_caption_to_duplicate(
+                filename, rep, rep_caption if "Status: Success." in rep_status else "", image_paths[filename], generate_mode, batch_updated_captions)
+        except Exception as e:
+            copy_status, copied_caption = f"Caption for '{filename}' not copied. Status: Error.\n- Error copying caption from '{rep}' to {filename}: {e}", None
+        if copied_caption is not None:
+            batch_updated_captions[filename] = copied_caption
+        results[filename] = (copy_status, "", [])
+        outcome = STATUS_DONE if "Status: Success." in copy_status else STATUS_SKIPPED if "Status: Skipped." in copy_status else STATUS_ERROR
+        jobs.mark_finished(filename, outcome, 0.0, error=copy_status if outcome == STATUS_ERROR else None, copied_from=rep)
 
     overall_processed = 0
     overall_errors = 0
     overall_skipped = 0
-    last_caption = "" # Store the very last generated caption from the batch
-
-    # Loop through all filenames and call the *single-image* generation logic
+    last_caption = "" # The caption of the last file (in order) that produced one
+    batch_status_messages = []
+    batch_session_history = list(session_history)
     for filename in all_filenames:
-         # Call the single-image function, passing the *current* state of captions/history
-         single_status, single_updated_captions, single_last_caption, single_updated_session = generate_captions_for_selected(
-             selected_filename=filename, # Pass the single filename
-             agent_or_team_display_name=agent_or_team_display_name,
-             selected_model_display_name=selected_model_display_name,
-             generate_mode=generate_mode,
-             image_paths=image_paths, # Pass the original full dict
-             current_captions=batch_updated_captions, # Pass the running updated dict
-             settings=settings,
-             models_data=models_data,
-             limiters_data=limiters_data,
-             teams_data=teams_data,
-             file_agents=file_agents,
-             history_list=batch_history_list, # Pass the persistent list copy
-             session_history=batch_session_history # Pass the running session list
-         )
-
-         # Update running state for the next iteration based on the *return* values
-         batch_updated_captions = single_updated_captions
-         batch_session_history = single_updated_session
-         if single_last_caption: last_caption = single_last_caption # Keep the latest non-empty caption
-
-         # Parse status for counts (more robustly)
-         if "Status: Success." in single_status: overall_processed += 1
-         elif "Status: Error." in single_status: overall_errors += 1
-         elif "Status: Skipped." in single_status: overall_skipped += 1
-         # Add formatted status for this file to the batch list
-         # Extract detail lines after the first summary line
-         detail_lines = single_status.split('\n', 1)[1] if '\n' in single_status else "(No details)"
-         batch_status_messages.append(f"--- {filename} ---\n{detail_lines}")
+        single_status, single_caption, single_session = results[filename]
+        batch_session_history.extend(single_session)
+        if single_caption: last_caption = single_caption
+        if "Status: Success." in single_status: overall_processed += 1
+        elif "Status: Error." in single_status: overall_errors += 1
+        elif "Status: Skipped." in single_status: overall_skipped += 1
+        # Extract detail lines after the first summary line
+        detail_lines = single_status.split('\n', 1)[1] if '\n' in single_status else "(No details)"
+        batch_status_messages.append(f"--- {filename} ---\n{detail_lines}")
+
+    if duplicate_of: job_line = f"Duplicates: {len(duplicate_of)} image(s) reused the caption of a near-duplicate instead of calling the model.\n"
+    else: job_line = ""
+    jobs.finish()
+    if jobs.resumed_count: job_line += f"Resumed job: {jobs.resumed_count} image(s) were already finished and not redone.\n"
 
     # Compile final batch status
     end_time = time.time()
     duration = end_time - start_time
-    final_status = (f"Batch Caption generation finished in {duration:.2f}s.\n"
-                    f"Overall: Processed={overall_processed}, Errors={overall_errors}, Skipped={overall_skipped}.\n\n"
+    final_status = (f"Batch Caption generation finished in {duration:.2f}s ({workers} worker(s)).\n"
+                    f"Overall: Processed={overall_processed}, Errors={overall_errors}, Skipped={overall_skipped}.\n"
+                    + job_line + "\n"
                     + "--- Details ---\n"
                     + "\n".join(batch_status_messages))
     print(final_status)
 
-    # Return final state after the loop
-    return final_status, batch_updated_captions, last_caption, batch_session_history
\ No newline at end of file
+    return final_status, batch_updated_captions, last_caption, batch_session_history
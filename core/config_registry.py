@@ -0,0 +1,51 @@
+# ArtAgent/core/config_registry.py
+import os
+import threading
+from .utils import load_json, get_absolute_path
+
+_snapshots = {} # (full path, loader) -> (file signature, parsed data)
+_snapshots_lock = threading.Lock()
+
+def file_signature(full_path: str) -> tuple | None:
+    """(mtime_ns, size, inode) of a file, or None if it cannot be stat'ed. An atomic replace changes the inode."""
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def load_config(file_path: str, is_relative: bool = True, loader=load_json):
+    """
+    Parsed JSON config file (roles, teams, models, limiters...) served from
+    memory. The file is read and parsed again only when its mtime, size or inode
+    changed since the last call; otherwise the cost is one os.stat.
+
+    The returned snapshot is the same object for every caller until the file
+    changes: treat it as read-only and copy it before modifying. Missing files
+    are not cached (the loader's empty result is returned each time).
+
+    Args:
+        file_path (str): Path of the JSON file.
+        is_relative (bool): If True, file_path is relative to the project root.
+        loader (callable): Parses the file, called as loader(full_path, is_relative=False).
+    """
+    full_path = get_absolute_path(file_path) if is_relative else file_path
+    signature = file_signature(full_path)
+    if signature is None:
+        return loader(full_path, is_relative=False)
+    key = (full_path, loader)
+    with _snapshots_lock:
+        cached = _snapshots.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    data = loader(full_path, is_relative=False) # Parsed outside the lock; a concurrent reload just parses twice
+    with _snapshots_lock:
+        _snapshots[key] = (signature, data)
+    return data
+
+
+def clear_config_cache():
+    """Drops all snapshots (the next load_config of each file reads it again)."""
+    with _snapshots_lock:
+        _snapshots.clear()
@@ -0,0 +1,319 @@
+# ArtAgent/core/dataset_export.py
+import base64
+import glob
+import io
+import json
+import os
+import tarfile
+import time
+from .caption_index import IMAGE_EXTENSIONS, lookup_caption
+from .file_lock import atomic_write_json
+
+EXPORT_FORMATS = ("Tar Shards", "JSONL")
+DEFAULT_SHARD_SIZE_MB = 512
+TAR_SHARD_PATTERN = "{prefix}-{index:06d}.tar" # WebDataset-style shard names
+MANIFEST_SUFFIX = ".manifest.json"
+JSONL_INDEX_SUFFIX = ".idx.json"
+COPY_CHUNK_BYTES = 1024 * 1024 # Streaming buffer; export/import memory stays bounded by this
+
+def _unique_keys(filenames) -> dict:
+    """
+    Maps filenames to flat tar sample keys (no dots or slashes, unique), e.g.
+    'img.v2.png' -> 'img_v2' and 'a/img.png' -> 'a__img'. The subpath itself
+    travels in the sample's .json and is restored on import.
+    """
+    keys, used = {}, set()
+    for name in filenames:
+        base = os.path.splitext(name)[0].replace(".", "_").replace("\\", "/").replace("/", "__")
+        key, n = base, 1
+        while key in used:
+            key, n = f"{base}_{n}", n + 1
+        used.add(key)
+        keys[name] = key
+    return keys
+
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes, mtime: float):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _tar_entry_size(size: int) -> int:
+    """Bytes a member occupies in a tar: 512-byte header + data padded to 512."""
+    return 512 + (size + 511) // 512 * 512
+
+
+def _export_tar(items, output_dir: str, prefix: str, shard_size_bytes: int) -> list:
+    shards = []
+    keys = _unique_keys([filename for filename, _, _ in items])
+    tar, tmp_path, shard_path, shard_bytes, shard_samples = None, None, None, 0, 0
+
+    def close_shard():
+        if tar is None:
+            return
+        tar.close()
+        os.replace(tmp_path, shard_path)
+        shards.append({"file": os.path.basename(shard_path), "samples": shard_samples, "bytes": os.path.getsize(shard_path)})
+
+    for filename, image_path, caption in items:
+        st = os.stat(image_path)
+        caption_bytes = caption.encode('utf-8')
+        meta_bytes = json.dumps({"filename": filename}).encode('utf-8')
+        sample_bytes = _tar_entry_size(st.st_size) + _tar_entry_size(len(caption_bytes)) + _tar_entry_size(len(meta_bytes))
+        if tar is None or (shard_samples and shard_bytes + sample_bytes > shard_size_bytes):
+            close_shard()
+            shard_path = os.path.join(output_dir, TAR_SHARD_PATTERN.format(prefix=prefix, index=len(shards)))
+            tmp_path = shard_path + ".tmp"
+            tar = tarfile.open(tmp_path, mode="w", format=tarfile.PAX_FORMAT)
+            shard_bytes, shard_samples = 0, 0
+
+        key = keys[filename]
+        ext = os.path.splitext(filename)[1].lower()
+        info = tar.gettarinfo(image_path, arcname=key + ext)
+        with open(image_path, 'rb') as f:
+            tar.addfile(info, f) # Streams the file in chunks
+        _add_bytes(tar, key + ".txt", caption_bytes, st.st_mtime)
+        _add_bytes(tar, key + ".json", meta_bytes, st.st_mtime)
+        shard_bytes += sample_bytes
+        shard_samples += 1
+    close_shard()
+    return shards
+
+
+def _export_jsonl(items, output_dir: str, prefix: str) -> list:
+    jsonl_path = os.path.join(output_dir, f"{prefix}.jsonl")
+    tmp_path = jsonl_path + ".tmp"
+    index = [] # [filename, byte_offset, byte_length] per record
+    offset = 0
+    with open(tmp_path, 'wb') as out:
+        for filename, image_path, caption in items:
+            with open(image_path, 'rb') as f:
+                image_b64 = base64.b64encode(f.read()).decode('ascii')
+            line = (json.dumps({"filename": filename, "caption": caption, "image": image_b64}, ensure_ascii=False) + "\n").encode('utf-8')
+            out.write(line)
+            index.append([filename, offset, len(line)])
+            offset += len(line)
+    os.replace(tmp_path, jsonl_path)
+    atomic_write_json(jsonl_path[:-len(".jsonl")] + JSONL_INDEX_SUFFIX, index)
+    return [{"file": os.path.basename(jsonl_path), "samples": len(index), "bytes": offset,
+             "index": os.path.basename(jsonl_path)[:-len(".jsonl")] + JSONL_INDEX_SUFFIX}]
+
+
+def export_dataset(
+    image_paths: dict,
+    caption_data: dict,
+    output_dir: str,
+    export_format: str = "Tar Shards",
+    shard_size_mb: float = DEFAULT_SHARD_SIZE_MB,
+    prefix: str = "dataset",
+    include_uncaptioned: bool = True
+    ) -> str:
+    """
+    Streams loaded (image, caption) pairs into packed files.
+
+    Tar Shards: WebDataset-style '<prefix>-000000.tar' files of about shard_size_mb,
+    each sample stored as '<key>.<ext>' + '<key>.txt' + '<key>.json' (original filename).
+    JSONL: one '<prefix>.jsonl' record per image (base64 image + caption) plus a
+    '<prefix>.idx.json' of byte offsets for random access (see read_jsonl_record).
+
+    Images are streamed one at a time, so memory use doesn't grow with the dataset.
+    A '<prefix>.manifest.json' lists the written files.
+
+    Returns:
+        str: Status message.
+    """
+    if not isinstance(image_paths, dict) or not image_paths:
+        return "Error: No images loaded to export."
+    if not output_dir:
+        return "Error: No output folder specified."
+    if export_format not in EXPORT_FORMATS:
+        return f"Error: Unknown export format '{export_format}'."
+    try:
+        shard_size_bytes = max(1, int(float(shard_size_mb) * 1024 * 1024))
+    except (ValueError, TypeError):
+        return f"Error: Invalid shard size '{shard_size_mb}'."
+
+    start_time = time.time()
+    captions = caption_data if isinstance(caption_data, dict) else {}
+    items = []
+    for filename in sorted(image_paths):
+        image_path = image_paths[filename]
+        if not image_path or not os.path.isfile(image_path):
+            continue
+        caption = lookup_caption(filename, image_path, captions)
+        if caption or include_uncaptioned:
+            items.append((filename, image_path, caption))
+    if not items:
+        return "Error: No exportable images found."
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        if export_format == "Tar Shards":
+            files = _export_tar(items, output_dir, prefix, shard_size_bytes)
+        else:
+            files = _export_jsonl(items, output_dir, prefix)
+        manifest = {"format": export_format, "prefix": prefix, "samples": len(items), "created": time.time(), "files": files}
+        atomic_write_json(os.path.join(output_dir, prefix + MANIFEST_SUFFIX), manifest, indent=2)
+    except Exception as e:
+        status = f"Error exporting dataset: {e}"
+        print(status)
+        return status
+
+    total_mb = sum(f["bytes"] for f in files) / (1024 * 1024)
+    status = (f"Exported {len(items)} image(s) to {len(files)} {export_format} file(s) "
+              f"({total_mb:.1f} MB) in {time.time() - start_time:.2f}s: {output_dir}")
+    print(status)
+    return status
+
+
+def read_jsonl_record(jsonl_path: str, offset: int, length: int) -> dict:
+    """Reads one exported JSONL record by byte offset (from the .idx.json index)."""
+    with open(jsonl_path, 'rb') as f:
+        f.seek(offset)
+        return json.loads(f.read(length).decode('utf-8'))
+
+
+def _safe_relative_path(filename: str) -> str | None:
+    """
+    Normalized relative path of an imported sample (keeps subfolders of recursive
+    datasets), or None if it is absolute or climbs out of the destination ('..').
+    """
+    if not filename:
+        return None
+    path = os.path.normpath(filename.replace("\\", "/"))
+    if os.path.isabs(path) or os.path.splitdrive(path)[0] or path.startswith(("/", "\\")):
+        return None
+    if path in (".", "") or ".." in path.replace("\\", "/").split("/"):
+        return None
+    return path
+
+
+def _image_destination(dest_folder: str, filename: str) -> str | None:
+    relative = _safe_relative_path(filename)
+    if relative is None:
+        print(f"Warning: Skipping imported sample with unsafe path '{filename}'.")
+        return None
+    image_path = os.path.join(dest_folder, relative)
+    os.makedirs(os.path.dirname(image_path), exist_ok=True)
+    return image_path
+
+
+def _write_sample(dest_folder: str, filename: str, image_fileobj, caption: str, overwrite: bool) -> bool | None:
+    """Writes one imported image + caption pair. Returns False if skipped (exists, no overwrite), None if its path is unsafe."""
+    image_path = _image_destination(dest_folder, filename)
+    if image_path is None:
+        return None
+    if not overwrite and os.path.exists(image_path):
+        return False
+    tmp_path = image_path + ".tmp"
+    with open(tmp_path, 'wb') as out:
+        while True:
+            chunk = image_fileobj.read(COPY_CHUNK_BYTES)
+            if not chunk: break
+            out.write(chunk)
+    os.replace(tmp_path, image_path)
+    with open(os.path.splitext(image_path)[0] + ".txt", 'w', encoding='utf-8') as f:
+        f.write(caption)
+    return True
+
+
+def _count(counts: dict, result: bool | None):
+    counts["imported" if result else "skipped" if result is False else "rejected"] += 1
+
+
+def _import_tar(shard_path: str, dest_folder: str, overwrite: bool, counts: dict):
+    """Imports a tar shard in a single sequential pass (stream mode, no seeking)."""
+    pending = {} # key -> partial sample; members of one sample are adjacent in our shards
+    with tarfile.open(shard_path, mode="r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            directory, name = os.path.split(member.name) # Shards from other tools may nest samples in directories
+            key, ext = name.split(".", 1) if "." in name else (name, "")
+            key = f"{directory}/{key}" if directory else key
+            sample = pending.setdefault(key, {})
+            fileobj = tar.extractfile(member)
+            if ext == "txt":
+                sample["caption"] = fileobj.read().decode('utf-8')
+            elif ext == "json":
+                sample["filename"] = json.loads(fileobj.read().decode('utf-8')).get("filename")
+            elif "." + ext.lower() in IMAGE_EXTENSIONS:
+                # Stream mode: must consume the image now; stage it next to its final place
+                sample["image_name"] = key + "." + ext
+                staging = os.path.join(dest_folder, f".import-{key.replace('/', '__')}.{ext}.part")
+                with open(staging, 'wb') as out:
+                    while True:
+                        chunk = fileobj.read(COPY_CHUNK_BYTES)
+                        if not chunk: break
+                        out.write(chunk)
+                sample["staging"] = staging
+            if "staging" in sample and "caption" in sample and "filename" in sample:
+                _count(counts, _finish_staged_sample(dest_folder, pending.pop(key), overwrite))
+    for sample in pending.values(): # Samples missing a .json (e.g. third-party shards)
+        if "staging" in sample:
+            _count(counts, _finish_staged_sample(dest_folder, sample, overwrite))
+
+
+def _finish_staged_sample(dest_folder: str, sample: dict, overwrite: bool) -> bool | None:
+    image_path = _image_destination(dest_folder, sample.get("filename") or sample["image_name"])
+    if image_path is None or (not overwrite and os.path.exists(image_path)):
+        os.remove(sample["staging"])
+        return None if image_path is None else False
+    os.replace(sample["staging"], image_path)
+    with open(os.path.splitext(image_path)[0] + ".txt", 'w', encoding='utf-8') as f:
+        f.write(sample.get("caption", ""))
+    return True
+
+
+def _import_jsonl(jsonl_path: str, dest_folder: str, overwrite: bool, counts: dict):
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f: # One record in memory at a time
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            _count(counts, _write_sample(dest_folder, record["filename"], io.BytesIO(base64.b64decode(record["image"])),
+                                         record.get("caption", ""), overwrite))
+
+
+def import_dataset(source_path: str, dest_folder: str, overwrite: bool = False) -> str:
+    """
+    Unpacks an exported dataset (a .tar shard, a .jsonl file, or a folder of them)
+    into dest_folder as images with .txt caption sidecars. Subfolders of a
+    recursively loaded dataset are recreated; absolute paths and '..' are rejected.
+
+    Returns:
+        str: Status message.
+    """
+    if not source_path or not os.path.exists(source_path):
+        return f"Error: Import source not found: '{source_path}'."
+    if not dest_folder:
+        return "Error: No destination folder specified."
+
+    if os.path.isdir(source_path):
+        sources = sorted(glob.glob(os.path.join(source_path, "*.tar")) + glob.glob(os.path.join(source_path, "*.jsonl")))
+    else:
+        sources = [source_path]
+    if not sources:
+        return f"Error: No .tar or .jsonl files found in '{source_path}'."
+
+    start_time = time.time()
+    counts = {"imported": 0, "skipped": 0, "rejected": 0}
+    try:
+        os.makedirs(dest_folder, exist_ok=True)
+        for path in sources:
+            if path.endswith(".jsonl"):
+                _import_jsonl(path, dest_folder, overwrite, counts)
+            else:
+                _import_tar(path, dest_folder, overwrite, counts)
+    except Exception as e:
+        status = f"Error importing dataset from '{source_path}': {e}"
+        print(status)
+        return status
+
+    status = (f"Imported {counts['imported']} image(s) from {len(sources)} file(s) in {time.time() - start_time:.2f}s"
+              + (f" ({counts['skipped']} skipped: already exist)" if counts["skipped"] else "")
+              + (f" ({counts['rejected']} rejected: unsafe path)" if counts["rejected"] else "") + f": {dest_folder}")
+    print(status)
+    return status
@@ -0,0 +1,148 @@
+# ArtAgent/core/file_lock.py
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl # POSIX
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt # Windows
+except ImportError:
+    msvcrt = None
+
+LOCK_SUFFIX = '.lock'
+DEFAULT_LOCK_TIMEOUT = 15.0 # Seconds to keep retrying before giving up
+INITIAL_RETRY_DELAY = 0.005
+MAX_RETRY_DELAY = 0.25
+
+class LockTimeoutError(TimeoutError):
+    """Raised when a file lock could not be acquired within the timeout."""
+
+
+# Per-thread hold counts so nested acquisitions of the same lock (e.g. a locked
+# read-modify-write calling a helper that locks too) don't deadlock against our own open lock descriptor.
+_held = threading.local()
+
+def _held_counts() -> dict:
+    if not hasattr(_held, "counts"):
+        _held.counts = {}
+    return _held.counts
+
+
+class FileLock:
+    """
+    Advisory, inter-process lock guarding a data file via a '<file>.lock' sidecar.
+
+    Uses fcntl.flock on POSIX and msvcrt.locking on Windows. Acquisition retries
+    with exponential backoff plus jitter until `timeout` elapses. The lock is
+    re-entrant within a thread. Usage:
+
+        with FileLock(settings_path):
+            ... read, modify, atomic_write_json(...) ...
+    """
+    def __init__(self, target_path: str, timeout: float = DEFAULT_LOCK_TIMEOUT):
+        self.lock_path = os.path.abspath(target_path) + LOCK_SUFFIX
+        self.timeout = timeout
+        self._fd = None
+
+    def _try_lock(self, fd) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            elif msvcrt is not None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True # No locking primitive available: degrade to unlocked behaviour
+        except (BlockingIOError, PermissionError, OSError):
+            return False
+
+    def _unlock(self, fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def acquire(self):
+        counts = _held_counts()
+        if counts.get(self.lock_path, 0) > 0:
+            counts[self.lock_path] += 1
+            return self
+
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        delay = INITIAL_RETRY_DELAY
+        while not self._try_lock(fd):
+            if time.monotonic() >= deadline:
+                os.close(fd)
+                raise LockTimeoutError(f"Timed out after {self.timeout}s waiting for lock {self.lock_path}")
+            time.sleep(delay * (0.5 + random.random())) # Jitter avoids lock-step retries
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+
+        self._fd = fd
+        counts[self.lock_path] = 1
+        return self
+
+    def release(self):
+        counts = _held_counts()
+        count = counts.get(self.lock_path, 0)
+        if count > 1:
+            counts[self.lock_path] = count - 1
+            return
+        counts.pop(self.lock_path, None)
+        if self._fd is not None:
+            try:
+                self._unlock(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def _atomic_write(full_path: str, write_fn, fsync: bool = True):
+    """Runs write_fn(f) on a temp file in the target directory, then renames it over the target."""
+    directory = os.path.dirname(full_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(full_path) + ".", suffix=".tmp", dir=directory)
+    try:
+        # mkstemp creates 0600 files; keep the target's permissions (or the usual 0644)
+        try: os.chmod(tmp_path, os.stat(full_path).st_mode & 0o777)
+        except FileNotFoundError: os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            write_fn(f)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, full_path)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+
+def atomic_write_json(full_path: str, data, **dump_kwargs):
+    """
+    Writes JSON to a temp file in the target directory, then renames it over
+    the target so readers never observe a partially written file.
+    """
+    _atomic_write(full_path, lambda f: json.dump(data, f, **dump_kwargs))
+
+
+def atomic_write_text(full_path: str, text: str, fsync: bool = False):
+    """
+    Atomically replaces a text file (temp file + rename). fsync is off by default:
+    bulk caption edits only need readers to never see a half-written file.
+    """
+    _atomic_write(full_path, lambda f: f.write(text), fsync=fsync)
@@ -67,6 +67,34 @@ TOOLTIPS = {
     "opt_use_mlock": "Force model to stay in RAM (requires permissions). Prevents swapping but uses more RAM.",
     "opt_num_thread": "Number of CPU threads for prompt processing/generation. Adjust based on CPU cores. Affects CPU usage/speed.",
 
+    # === Captions Tab ===
+    "caption_parallel_workers": "Images captioned concurrently by 'Generate ALL'. Match Ollama's parallel slots (OLLAMA_NUM_PARALLEL); higher values only queue on the server.",
+    "captions_batch_selection": "Comma-separated filename patterns (case-insensitive) choosing which loaded images to edit, e.g. '*.png, char_*'. '*' selects the whole folder.",
+    "captions_batch_mode": "Append/Prepend add the text as-is (include your own separator, e.g. ', tag'). Replace (Regex) substitutes the pattern. Dedupe Tags removes repeated comma-separated tags.",
+    "captions_batch_text": "Text to append/prepend, or the regular expression to find in Replace mode.",
+    "captions_batch_replace": "Replacement for Replace (Regex) mode. Supports group references like \\1.",
+    "captions_batch_apply_button": "Apply the operation to all selected images' caption files. Unchanged files are not rewritten.",
+    "caption_skip_duplicates": "Detect near-duplicate images (frames, crops, re-exports) with a perceptual hash and send only one image per group to the model; the others get a copy of its caption.",
+    "caption_duplicate_distance": "How many of the 64 perceptual-hash bits may differ for images to count as near-duplicates. 0 = visually identical only; 6 suits adjacent video frames; higher values group more aggressively.",
+    "captions_include_subfolders": "Also load images from all subfolders (hidden folders excluded). Images are listed by relative path, e.g. 'class_a/img.png'; large trees are scanned by several processes.",
+    "caption_worker_processes": "Number of processes 'Generate ALL' splits the images across. Each process runs its own Parallel Workers, so the total load on Ollama is processes x workers. Lists of URLs in the 'ollama_endpoints' setting are spread over the processes.",
+    "caption_shard_by": "Subdirectory: each top-level subfolder stays in one process (keeps resume manifests simple). Hash: images are spread evenly regardless of folder.",
+    "dataset_export_format": "Tar Shards: WebDataset-style .tar files (image + .txt + .json per sample), ideal for copying and training loaders. JSONL: one line per image (base64 image + caption) with a byte-offset index.",
+    "dataset_shard_size": "Approximate size of each tar shard in MB. A new shard starts once this size would be exceeded.",
+    "dataset_export_folder": "Folder where the shards/JSONL and a manifest are written. Exports the images currently loaded above.",
+    "dataset_import_source": "A .tar shard or .jsonl file produced by the exporter, or a folder containing them.",
+    "dataset_import_dest": "Folder to unpack images and their .txt captions into. Existing images are not overwritten.",
+    "caption_resume_job": "Continue an interrupted 'Generate ALL' run (same Agent/Team, model and mode) from its manifest in the image folder, skipping images already finished.",
+
+    # === Experiment Sweep Tab ===
+    "sweep_resume_folder": "Name of an existing sweep_runs/<run> folder. Runs whose protocol there recorded success are skipped; only missing or failed combinations run, appending to the same prompt files.",
+    "sweep_concurrency": "Prompt x team runs executed at the same time for the current model (models still run one after another). Match Ollama's OLLAMA_NUM_PARALLEL; higher values only queue on the server.",
+    "sweep_result_sink": "How run protocols are stored. 'JSON file per run' writes one pretty-printed file each; 'Single JSONL file' or 'Single SQLite file' append every run to one sweep_results file with indexed prompt hash, team, model, status and timing columns (query with core.sweep_store.query_sweep_results). A resumed folder keeps its original storage.",
+    "sweep_use_workers": "Put the runs on a durable queue in the sweep folder (sweep_queue.sqlite) and start background worker processes, one per Ollama endpoint in settings['ollama_endpoints'] (else ollama_url). Workers keep going if the app closes; more can be started on other hosts sharing the folder with: python -m core.sweep_queue worker <folder> --endpoint <url>.",
+    "sweep_option_space": "Ollama options to vary across runs, as JSON: a list of values per option, or a range {\"min\": a, \"max\": b} (add \"steps\": n to use a range in the full grid). Each option set applies to every LLM call of a run, on top of the global and role options. Leave empty to use the settings as they are.",
+    "sweep_option_mode": "'Full grid' runs every combination. 'Random samples' and 'Latin hypercube' draw the given number of option sets; Latin hypercube spreads them evenly over each option's range. Option sets sharing num_ctx (and other runner options) run together per model, so Ollama reloads the model once per num_ctx, not per run.",
+    "sweep_analyze_folder": "A sweep_runs/<run> folder to report on: per team and model, how many outputs are distinct (near-duplicates grouped), how similar outputs are to each other (mean TF-IDF cosine, lower is more diverse) and their length. The report is also saved as sweep_report.txt/.json in the folder.",
+
     # === History Tab ===
     "clear_history_button": "Permanently delete all entries from the persistent history file (core/history.json).",
 
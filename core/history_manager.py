@@ -1,45 +1,133 @@
 # ArtAgent/core/history_manager.py
 import json
 import os
+import re
+import time
 from .utils import load_json, get_absolute_path # Import from sibling module
+from .blob_store import get_default_store
+from .file_lock import FileLock, atomic_write_json
 
 HISTORY_FILE = 'core/history.json' # Path relative to project root
 MAX_HISTORY_ENTRIES = 150
+BLOB_MIN_BODY_CHARS = 1024 # Bodies at least this long are stored in the blob store
+HISTORY_PRUNE_INTERVAL = 3600 # Seconds between blob prunes triggered by history trimming
+
+# Body starts after the first "Output:"/"Final Output:"/"Response:" line; the entry's
+# trailing "---" separator stays inline so records keep their readable framing.
+_BODY_START_RE = re.compile(r"^(?:Final Output|Output|Response):\n", re.MULTILINE)
+_BODY_TAIL = "\n---\n"
+
+def _externalize_entry(entry, store):
+    """Converts a large history entry into a blob reference record for disk."""
+    if not isinstance(entry, str) or len(entry) < BLOB_MIN_BODY_CHARS:
+        return entry
+    match = _BODY_START_RE.search(entry)
+    head = entry[:match.end()] if match else ""
+    body = entry[len(head):]
+    tail = _BODY_TAIL if body.endswith(_BODY_TAIL) else ""
+    if tail: body = body[:-len(tail)]
+    if len(body) < BLOB_MIN_BODY_CHARS:
+        return entry
+    return {"head": head, "blob": store.put(body), "tail": tail}
+
+def _internalize_entry(record, store):
+    """Resolves a blob reference record back into the full entry string."""
+    if not isinstance(record, dict) or "blob" not in record:
+        return record
+    body = store.get(record["blob"])
+    if body is None:
+        body = f"[History body missing from blob store: {record['blob'][:12]}]"
+    return f"{record.get('head', '')}{body}{record.get('tail', '')}"
+
 
 def load_history():
     """Loads history from the JSON file."""
     # load_json from utils now handles path resolution and errors
     history_data = load_json(HISTORY_FILE, is_relative=True)
     if isinstance(history_data, list):
-        return history_data
+        store = get_default_store()
+        return [_internalize_entry(record, store) for record in history_data]
     else:
         # Handle case where file exists but isn't a list (or load_json returned dict)
         print(f"Warning: History file '{HISTORY_FILE}' did not contain a valid list. Initializing empty history.")
         return []
 
 
+def _load_history_records():
+    """Returns the raw on-disk history records, or None if no history file exists yet."""
+    if not os.path.exists(get_absolute_path(HISTORY_FILE)):
+        return None
+    records = load_json(HISTORY_FILE, is_relative=True)
+    return records if isinstance(records, list) else []
+
+
+def _live_digests(records):
+    return [record["blob"] for record in records if isinstance(record, dict) and "blob" in record]
+
+
+def _write_history_records(full_path, records):
+    """Writes already externalized records (caller holds the history file lock)."""
+    atomic_write_json(full_path, records, indent=4)
+
+
 def save_history(history):
-    """Saves the history list to the JSON file."""
+    """
+    Saves the history list to the JSON file, moving large bodies to the blob store,
+    and prunes blobs no longer referenced. Used for full rewrites such as clearing
+    the history; add_to_history appends without rewriting or pruning every entry.
+    """
     full_path = get_absolute_path(HISTORY_FILE)
     try:
-        with open(full_path, 'w', encoding='utf-8') as file:
-            json.dump(history, file, indent=4)
+        store = get_default_store()
+        records = [_externalize_entry(entry, store) for entry in history]
+        with FileLock(full_path):
+            atomic_write_json(full_path, records, indent=4)
+        # Drop blobs no longer referenced by any retained entry
+        store.prune(_live_digests(records))
     except Exception as e:
         print(f"Error saving history to {full_path}: {e}")
 
 
+_last_prune = time.time() # Last trim-triggered prune in this process (first one an interval after start)
+
 def add_to_history(history, entry):
-    """Adds an entry to history, manages size, and saves."""
+    """
+    Adds an entry to history, manages size, and saves.
+
+    The read-append-write cycle runs under the history file lock and starts from
+    the on-disk records (when they exist), so concurrent app processes don't drop
+    each other's entries. The passed list is only used when no file exists yet.
+    Only the new entry is externalized (before taking the lock); stored records
+    are appended to as they are, so the lock is held for load, append and write.
+    Blobs of trimmed entries are pruned at most every HISTORY_PRUNE_INTERVAL seconds.
+    """
+    global _last_prune
     if not isinstance(history, list):
         print("Warning: History is not a list. Cannot add entry.")
         history = [] # Reset if corrupted
 
-    if entry not in history: # Avoid exact duplicates if desired
-        history.append(entry)
+    full_path = get_absolute_path(HISTORY_FILE)
+    try:
+        store = get_default_store()
+        new_record = _externalize_entry(entry, store)
+        with FileLock(full_path):
+            records = _load_history_records()
+            if records is None: # First write: start from the caller's list
+                records = [_externalize_entry(item, store) for item in history]
 
-    if len(history) > MAX_HISTORY_ENTRIES:
-        # Keep the most recent entries
-        history = history[-MAX_HISTORY_ENTRIES:]
+            if new_record not in records: # Avoid exact duplicates (equal entries give equal records)
+                records.append(new_record)
 
-    save_history(history)
-    return history
\ No newline at end of file
+            trimmed = len(records) > MAX_HISTORY_ENTRIES
+            if trimmed:
+                # Keep the most recent entries
+                records = records[-MAX_HISTORY_ENTRIES:]
+
+            _write_history_records(full_path, records)
+        if trimmed and time.time() - _last_prune >= HISTORY_PRUNE_INTERVAL:
+            _last_prune = time.time()
+            store.prune(_live_digests(records))
+        history = [_internalize_entry(record, store) for record in records] # Outside the lock; blob reads are cached
+    except Exception as e:
+        print(f"Error updating history: {e}")
+    return history
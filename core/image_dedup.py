@@ -0,0 +1,113 @@
+# ArtAgent/core/image_dedup.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8 # dHash grid: 8x8 = 64-bit hashes
+DEFAULT_MAX_DISTANCE = 6 # Hamming bits; <=6 of 64 catches re-exports, resizes and adjacent video frames
+HASH_WORKERS = 8 # PIL releases the GIL while decoding
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+# (abs path, size, mtime_ns) -> hash, so re-running on the same folder doesn't re-decode
+_hash_cache: dict = {}
+_hash_cache_lock = threading.Lock()
+
+def _bits_to_uint64(bits: np.ndarray) -> np.ndarray:
+    """Packs rows of 64 booleans into uint64 values (row-wise, MSB first)."""
+    packed = np.packbits(bits.astype(np.uint8), axis=-1) # (n, 8) bytes
+    return packed.view('>u8').astype(np.uint64).reshape(-1)
+
+
+def dhash_pixels(gray: np.ndarray) -> int:
+    """dHash of a (HASH_SIZE, HASH_SIZE + 1) grayscale array: one bit per horizontal gradient sign."""
+    bits = gray[:, 1:] > gray[:, :-1]
+    return int(_bits_to_uint64(bits.reshape(1, -1))[0])
+
+
+def compute_dhash(image_path: str) -> int:
+    """Computes the 64-bit difference hash of an image file."""
+    with Image.open(image_path) as img:
+        img.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8)) # JPEG: decode at reduced scale
+        small = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+        return dhash_pixels(np.asarray(small, dtype=np.int16))
+
+
+def hash_images(image_paths: dict, workers: int = HASH_WORKERS) -> dict:
+    """
+    Returns filename -> dHash for the given images (unreadable images are left out).
+    Hashes are cached in memory by path, size and mtime.
+    """
+    def _hash_one(item):
+        filename, path = item
+        try:
+            st = os.stat(path)
+            key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+            with _hash_cache_lock:
+                if key in _hash_cache:
+                    return filename, _hash_cache[key]
+            value = compute_dhash(path)
+            with _hash_cache_lock:
+                _hash_cache[key] = value
+            return filename, value
+        except Exception as e:
+            print(f"Warning: Could not hash image {filename}: {e}")
+            return filename, None
+
+    items = sorted(image_paths.items())
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items) or 1)), thread_name_prefix="dhash") as executor:
+        results = list(executor.map(_hash_one, items))
+    return {name: value for name, value in results if value is not None}
+
+
+def hamming_distances(hash_value: int, hashes: np.ndarray) -> np.ndarray:
+    """Vectorized Hamming distance between one 64-bit hash and an array of uint64 hashes."""
+    xor = np.bitwise_xor(hashes, np.uint64(hash_value))
+    return _POPCOUNT16[xor.view(np.uint16)].reshape(-1, 4).sum(axis=1, dtype=np.uint8)
+
+
+def cluster_hashes(hashes: dict, max_distance: int = DEFAULT_MAX_DISTANCE) -> dict:
+    """
+    Groups near-duplicate images by leader clustering, in filename order.
+
+    Each image joins the nearest existing representative within max_distance,
+    otherwise it becomes a new representative. Unlike single-linkage chaining,
+    every member is guaranteed to be within max_distance of its representative,
+    which is what makes copying the representative's caption safe.
+
+    Returns:
+        dict[str, list[str]]: representative filename -> duplicate filenames (excluding itself).
+    """
+    names = sorted(hashes)
+    if not names:
+        return {}
+    leaders = np.empty(len(names), dtype=np.uint64) # Preallocated; first n_leaders entries are in use
+    leader_names = []
+    clusters = {}
+    for name in names:
+        value = hashes[name]
+        if leader_names:
+            distances = hamming_distances(value, leaders[:len(leader_names)])
+            nearest = int(np.argmin(distances))
+            if distances[nearest] <= max_distance:
+                clusters[leader_names[nearest]].append(name)
+                continue
+        leaders[len(leader_names)] = np.uint64(value)
+        leader_names.append(name)
+        clusters[name] = []
+    return clusters
+
+
+def find_duplicate_groups(image_paths: dict, max_distance: int = DEFAULT_MAX_DISTANCE) -> dict:
+    """
+    Hashes images and returns only the groups with duplicates.
+
+    Returns:
+        dict[str, list[str]]: representative filename -> its duplicates (non-empty lists only).
+    """
+    clusters = cluster_hashes(hash_images(image_paths), max_distance)
+    groups = {rep: members for rep, members in clusters.items() if members}
+    duplicate_count = sum(len(members) for members in groups.values())
+    print(f"Duplicate detection: {len(image_paths)} image(s), {len(groups)} group(s), {duplicate_count} duplicate(s) (max distance {max_distance}).")
+    return groups
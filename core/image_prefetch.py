@@ -0,0 +1,109 @@
+# ArtAgent/core/image_prefetch.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from agents.ollama_agent import EncodedImage, encode_image
+
+DEFAULT_IMAGE_MAX_SIDE = 2048 # Longest edge sent to vision models (they downscale further anyway); 0 = original size
+DEFAULT_PREFETCH_DEPTH = 4 # Images prepared ahead of the one being generated
+DEFAULT_PREFETCH_WORKERS = 2 # Threads decoding/encoding (PIL releases the GIL while coding)
+
+def resolve_image_max_side(settings: dict) -> int:
+    """Returns settings["caption_image_max_side"] as a non-negative int (0 disables resizing)."""
+    try: return max(0, int((settings or {}).get("caption_image_max_side", DEFAULT_IMAGE_MAX_SIDE)))
+    except (ValueError, TypeError): return DEFAULT_IMAGE_MAX_SIDE
+
+
+def prepare_image(image_path: str, max_side: int = DEFAULT_IMAGE_MAX_SIDE) -> EncodedImage:
+    """Decodes, downsizes (if larger than max_side) and base64-encodes an image file."""
+    with Image.open(image_path) as img:
+        if max_side and max(img.size) > max_side:
+            img.draft('RGB', (max_side, max_side)) # JPEG: decode at reduced scale
+            img.thumbnail((max_side, max_side))
+        else:
+            img.load()
+        return EncodedImage(encode_image(img), source=image_path, size=img.size)
+
+
+class ImagePrefetcher:
+    """
+    Prepares images (prepare_image) in background threads ahead of their use.
+
+    Images are prepared in the given order, keeping at most `depth` prepared
+    but unclaimed images in memory (back-pressure). Consumers call get(path) for
+    the image they need now and discard(path) for images they ended up not
+    needing (e.g. skipped), which frees their slot. Requesting an image outside
+    the window submits it immediately, so the prefetcher never blocks consumers.
+
+    Usage:
+        with ImagePrefetcher(paths, max_side=1024) as prefetcher:
+            for path in paths:
+                image = prefetcher.get(path)
+    """
+    def __init__(self, image_paths, depth: int = DEFAULT_PREFETCH_DEPTH, workers: int = DEFAULT_PREFETCH_WORKERS,
+                 max_side: int = DEFAULT_IMAGE_MAX_SIDE):
+        self._order = list(image_paths)
+        self._positions = {path: i for i, path in enumerate(self._order)}
+        self._next = 0 # Index of the next path to submit
+        self._depth = max(1, depth)
+        self._max_side = max_side
+        self._futures = {} # path -> Future, submitted and not yet claimed
+        self._skip = set() # Paths discarded before they were submitted
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="image-prefetch")
+        with self._lock:
+            self._top_up()
+
+    def _top_up(self, until_path=None):
+        """Submits upcoming paths while under the depth limit, or up to until_path (lock held)."""
+        while self._next < len(self._order) and not self._closed:
+            if until_path is None and len(self._futures) >= self._depth:
+                break
+            path = self._order[self._next]
+            self._next += 1
+            if path not in self._skip and path not in self._futures:
+                self._futures[path] = self._executor.submit(prepare_image, path, self._max_side)
+            if path == until_path:
+                until_path = None
+
+    def _pending(self, image_path: str) -> bool:
+        return self._positions.get(image_path, -1) >= self._next
+
+    def get(self, image_path: str) -> EncodedImage:
+        """Returns the prepared image for a path (waiting for it if still in progress)."""
+        with self._lock:
+            if image_path not in self._futures and self._pending(image_path) and not self._closed:
+                self._top_up(until_path=image_path) # Consumer ran ahead of the window
+            future = self._futures.pop(image_path, None)
+            if not self._closed:
+                self._top_up()
+        if future is None:
+            return prepare_image(image_path, self._max_side) # Unknown or already-claimed path
+        return future.result() # Re-raises decode errors in the consumer
+
+    def discard(self, image_path: str):
+        """Releases a path that won't be claimed (no-op if already claimed)."""
+        with self._lock:
+            future = self._futures.pop(image_path, None)
+            if future is not None:
+                future.cancel()
+            elif self._pending(image_path):
+                self._skip.add(image_path) # Never prepare it
+            if not self._closed:
+                self._top_up()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -1,8 +1,72 @@
 # ArtAgent/core/ollama_manager.py
 import requests
+from urllib.parse import urlparse
 from .utils import load_json # Use utils for loading
 
 MODELS_FILE = 'models.json' # Relative path from root
+PRELOAD_TIMEOUT = 600 # Seconds; loading a large model from disk can take minutes
+
+def ollama_base_url(ollama_api_url: str) -> str:
+    """Returns scheme://host:port of a configured API URL (e.g. .../api/generate), or '' if unparsable."""
+    parsed = urlparse(ollama_api_url or "")
+    return f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme and parsed.netloc else ""
+
+def resolve_ollama_endpoints(settings: dict) -> list:
+    """Ollama URLs to spread work over: settings["ollama_endpoints"], else the single ollama_url."""
+    endpoints = [url for url in (settings or {}).get("ollama_endpoints", []) or [] if isinstance(url, str) and url.strip()]
+    return endpoints or [(settings or {}).get("ollama_url", "")]
+
+def list_running_models(ollama_api_url: str, timeout: int = 5) -> list | None:
+    """
+    Asks Ollama which models are loaded in memory (GET /api/ps).
+
+    Returns:
+        list[dict] | None: Entries with 'name', 'size', 'size_vram', 'expires_at',
+                           or None if Ollama could not be queried.
+    """
+    base_url = ollama_base_url(ollama_api_url)
+    if not base_url:
+        return None
+    try:
+        response = requests.get(f"{base_url}/api/ps", timeout=timeout)
+        response.raise_for_status()
+        models = response.json().get("models") or []
+        return [m for m in models if isinstance(m, dict) and m.get("name")]
+    except Exception as e:
+        print(f"Could not query running models at {base_url}/api/ps: {e}")
+        return None
+
+def list_local_model_sizes(ollama_api_url: str, timeout: int = 5) -> dict:
+    """Returns {model name: size in bytes} of locally available models (GET /api/tags), {} on error."""
+    base_url = ollama_base_url(ollama_api_url)
+    if not base_url:
+        return {}
+    try:
+        response = requests.get(f"{base_url}/api/tags", timeout=timeout)
+        response.raise_for_status()
+        return {m["name"]: m.get("size", 0) for m in response.json().get("models") or [] if isinstance(m, dict) and m.get("name")}
+    except Exception as e:
+        print(f"Could not query local models at {base_url}/api/tags: {e}")
+        return {}
+
+def preload_model(model_name: str, ollama_api_url: str, keep_alive="10m") -> str:
+    """Asks Ollama to load a model into memory and keep it for `keep_alive` (a generate request without a prompt)."""
+    if not model_name or not ollama_api_url:
+        return f"Skipping preload: Missing model name ('{model_name}') or URL ('{ollama_api_url}')."
+
+    payload = {"model": model_name, "keep_alive": keep_alive}
+    try:
+        print(f"Sending preload request for model: {model_name} to {ollama_api_url}")
+        response = requests.post(ollama_api_url, json=payload, timeout=PRELOAD_TIMEOUT) # Returns once the model is loaded
+        response.raise_for_status()
+        msg = f"Model '{model_name}' preloaded (keep_alive={keep_alive})."
+        print(msg)
+        return msg
+    except requests.exceptions.Timeout:
+        msg = f"Error preloading model '{model_name}': Request timed out."
+        print(msg); return msg
+    except requests.exceptions.RequestException as e:
+        msg = f"Error preloading model '{model_name}': {e}"; print(msg); return msg
 
 def release_model(model_name: str, ollama_api_url: str):
     """Sends request to Ollama to release (unload) a model."""
@@ -0,0 +1,360 @@
+# ArtAgent/core/sweep_analytics.py
+import argparse
+import json
+import os
+import sys
+import numpy as np
+from .sweep_manager import resolve_resume_dir
+from .sweep_store import query_sweep_results
+
+SIMHASH_BITS = 64
+SIMHASH_FEATURES = 512 # Terms are hashed into this many signed buckets before the random projection
+SIMHASH_DOC_CHUNK = 8192 # Documents projected at a time (bounds the dense buffer)
+DEFAULT_DUPLICATE_SIMILARITY = 0.95 # TF-IDF cosine at which two outputs count as near-duplicates
+CANDIDATE_BITS = 10 # SimHash Hamming bits of candidate pairs checked with the exact cosine
+SIMHASH_BANDS = (11, 11, 11, 11, 10, 10) # 6 bands: two signatures within 5 bits share at least one band exactly
+PAIR_BLOCK = 256 # Rows per block when comparing the signatures inside one LSH bucket
+MAX_WORD_BYTES = 32 # Longer tokens (URLs, hashes) are hashed by their first 32 bytes and their length
+_HASH_MULTIPLIER = np.uint64(0x100000001B3) # FNV prime; word hashes wrap around mod 2^64
+REPORT_TEXT_FILENAME = "sweep_report.txt" # Written inside the sweep run folder
+REPORT_JSON_FILENAME = "sweep_report.json"
+REPORT_TOP_CLUSTERS = 10
+_WORD_BYTES = np.zeros(256, dtype=bool) # Bytes of lower-cased words: [a-z0-9_] and any UTF-8 multi-byte character
+_WORD_BYTES[list(b"abcdefghijklmnopqrstuvwxyz0123456789_")] = True
+_WORD_BYTES[128:] = True
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+_FAILED_OUTPUT_PREFIXES = ("Error:", "⚠️ Error:", "Workflow stopped", "ERROR during execution")
+
+def load_sweep_outputs(output_dir: str) -> list:
+    """
+    Final outputs of a sweep folder's successful runs (any result sink).
+
+    Returns:
+        list[dict]: {"run_id", "team", "model", "text", "eval_tokens"} per run with a usable output.
+    """
+    outputs = []
+    for record in query_sweep_results(output_dir, include_protocol=True, status="Success"):
+        protocol = record.get("protocol") or {}
+        text = (protocol.get("final_output") or "").strip()
+        if not text or text.startswith(_FAILED_OUTPUT_PREFIXES): continue
+        outputs.append({"run_id": record["run_id"], "team": record["team"], "model": record["model"], "text": text,
+                        "eval_tokens": (protocol.get("sweep_metadata") or {}).get("eval_tokens")})
+    return outputs
+
+
+def tokenize_hashed(texts: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lower-cased word tokens of all texts as 64-bit hashes, computed on the
+    UTF-8 bytes with array operations instead of one Python string per token.
+
+    Returns:
+        tuple: (doc index per token, token hash per token), both in text order.
+    """
+    encoded = [text.lower().encode('utf-8') for text in texts]
+    data = np.frombuffer(b"\x00".join(encoded) + bytes(8), dtype=np.uint8) # NUL separators are never word bytes
+    edges = np.diff(_WORD_BYTES[data].view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1)
+    lengths = np.flatnonzero(edges == -1) - starts
+    # Big-endian 8-byte words starting at every byte offset (a strided view, no copy)
+    words8 = np.ndarray((len(data) - 7,), dtype='>u8', buffer=data, strides=(1,))
+    hashes = lengths.astype(np.uint64)
+    alive = np.arange(len(starts))
+    for offset in range(0, MAX_WORD_BYTES, 8): # Most words fit the first 8 bytes; finished words drop out
+        alive = alive[lengths[alive] > offset]
+        if not len(alive): break
+        chunk = words8[starts[alive] + offset].astype(np.uint64)
+        chunk >>= np.clip(8 - (lengths[alive] - offset), 0, 7).astype(np.uint64) * np.uint64(8) # Drop bytes past the word's end
+        hashes[alive] = hashes[alive] * _HASH_MULTIPLIER + chunk
+    doc_offsets = np.cumsum([0] + [len(e) + 1 for e in encoded])
+    return np.searchsorted(doc_offsets, starts, side='right') - 1, hashes
+
+
+class TfidfMatrix:
+    """
+    Sparse, L2-normalized TF-IDF rows (sublinear tf, smoothed idf) over lower-cased
+    word tokens, stored as COO arrays sorted by document: docs[i], terms[i], weights[i].
+    """
+    def __init__(self, texts: list):
+        token_docs, token_hashes = tokenize_hashed(texts)
+        _, term_ids = np.unique(token_hashes, return_inverse=True)
+        self.n_docs, self.n_terms = len(texts), int(term_ids.max()) + 1 if len(term_ids) else 0
+        self.token_counts = np.bincount(token_docs, minlength=self.n_docs)
+        keys, counts = np.unique(token_docs * max(1, self.n_terms) + term_ids.reshape(-1), return_counts=True)
+        self.docs, self.terms = keys // max(1, self.n_terms), keys % max(1, self.n_terms) # Sorted by doc, then term
+        document_frequency = np.bincount(self.terms, minlength=self.n_terms)
+        idf = np.log((1 + self.n_docs) / (1 + document_frequency)) + 1.0
+        weights = (1.0 + np.log(counts)) * idf[self.terms]
+        norms = np.sqrt(np.bincount(self.docs, weights=weights ** 2, minlength=self.n_docs))
+        self.weights = weights / np.where(norms > 0, norms, 1.0)[self.docs]
+        self.doc_starts = np.searchsorted(self.docs, np.arange(self.n_docs + 1))
+
+    def group_sums(self, doc_groups: np.ndarray, n_groups: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Sum of the unit rows of each group's documents, and each group's number
+        of non-empty rows, in one pass over the entries.
+
+        Returns:
+            tuple: (sums of shape (n_groups, n_terms), non-empty row counts per group)
+        """
+        entry_groups = doc_groups[self.docs]
+        sums = np.bincount(entry_groups * self.n_terms + self.terms, weights=self.weights,
+                           minlength=n_groups * self.n_terms).reshape(n_groups, self.n_terms)
+        nonempty = np.bincount(doc_groups[np.diff(self.doc_starts) > 0], minlength=n_groups)
+        return sums, nonempty
+
+
+    def simhash(self, seed: int = 0) -> np.ndarray:
+        """
+        64-bit SimHash per document: signs of 64 random projections of its
+        TF-IDF row. Rows are first folded into SIMHASH_FEATURES signed hash
+        buckets (the hashing trick keeps cosines close), so the projection is
+        one dense matrix product instead of 64 passes over the sparse entries.
+        """
+        rng = np.random.default_rng(seed)
+        buckets = rng.integers(0, SIMHASH_FEATURES, self.n_terms)
+        signed_weights = self.weights * rng.choice([-1.0, 1.0], self.n_terms)[self.terms]
+        hyperplanes = rng.standard_normal((SIMHASH_FEATURES, SIMHASH_BITS)).astype(np.float32)
+        bits = np.empty((self.n_docs, SIMHASH_BITS), dtype=bool)
+        for first in range(0, self.n_docs, SIMHASH_DOC_CHUNK):
+            last = min(first + SIMHASH_DOC_CHUNK, self.n_docs)
+            lo, hi = self.doc_starts[first], self.doc_starts[last]
+            dense = np.bincount((self.docs[lo:hi] - first) * SIMHASH_FEATURES + buckets[self.terms[lo:hi]],
+                                weights=signed_weights[lo:hi], minlength=(last - first) * SIMHASH_FEATURES)
+            bits[first:last] = dense.reshape(-1, SIMHASH_FEATURES).astype(np.float32) @ hyperplanes > 0
+        return np.packbits(bits, axis=1).view('>u8').astype(np.uint64).reshape(-1) # MSB first
+
+    def _entries(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Entry indices of the given rows (concatenated) and the position in `rows` each belongs to."""
+        lengths = self.doc_starts[rows + 1] - self.doc_starts[rows]
+        owners = np.repeat(np.arange(len(rows)), lengths)
+        return self.doc_starts[rows][owners] + np.arange(len(owners)) - np.repeat(np.cumsum(lengths) - lengths, lengths), owners
+
+    def pair_cosines(self, pairs: np.ndarray) -> np.ndarray:
+        """Exact cosine of each (i, j) row pair: shared terms are adjacent after one sort of both rows' entries."""
+        if not len(pairs): return np.empty(0)
+        left, left_pairs = self._entries(pairs[:, 0])
+        right, right_pairs = self._entries(pairs[:, 1])
+        keys = np.concatenate([left_pairs * self.n_terms + self.terms[left], right_pairs * self.n_terms + self.terms[right]])
+        weights = np.concatenate([self.weights[left], self.weights[right]])
+        order = np.argsort(keys, kind='stable')
+        keys, weights = keys[order], weights[order]
+        shared = np.flatnonzero(keys[1:] == keys[:-1]) # A term occurs once per row, so matches come in pairs
+        return np.bincount(keys[shared] // self.n_terms, weights=weights[shared] * weights[shared + 1], minlength=len(pairs))
+
+
+def mean_pairwise_similarity(summed: np.ndarray, nonempty: int, n: int) -> float | None:
+    """
+    Mean cosine similarity over all pairs of n documents from the sum of their
+    unit rows: |sum|^2 = (non-empty rows) + 2 * (sum of pair cosines).
+    Linear in the documents' entries, no pairwise matrix.
+    """
+    if n < 2: return None
+    return float((summed @ summed - nonempty) / (n * (n - 1)))
+
+
+def _popcount64(values: np.ndarray) -> np.ndarray:
+    return _POPCOUNT16[values.view(np.uint16)].reshape(*values.shape, 4).sum(axis=-1, dtype=np.uint8)
+
+
+def _close_pairs(signatures: np.ndarray, max_bits: int) -> np.ndarray:
+    """
+    (i, j) index pairs (i < j) of signatures within max_bits Hamming bits that
+    match exactly on one of the SIMHASH_BANDS; only signatures sharing a band
+    bucket are compared. Every pair within len(SIMHASH_BANDS) - 1 bits is
+    found, pairs further apart only when their differing bits leave a band intact.
+    """
+    pairs = []
+    shift = SIMHASH_BITS
+    for band_bits in SIMHASH_BANDS:
+        shift -= band_bits
+        bands = (signatures >> np.uint64(shift)) & np.uint64((1 << band_bits) - 1)
+        order = np.argsort(bands, kind='stable')
+        boundaries = np.flatnonzero(np.diff(bands[order])) + 1
+        for bucket in np.split(order, boundaries):
+            if len(bucket) < 2: continue
+            bucket = np.sort(bucket)
+            for start in range(0, len(bucket) - 1, PAIR_BLOCK):
+                rows, columns = bucket[start:start + PAIR_BLOCK], bucket[start:]
+                distances = _popcount64(signatures[rows, None] ^ signatures[None, columns])
+                r, c = np.nonzero((distances <= max_bits) & (rows[:, None] < columns[None, :]))
+                if len(r): pairs.append(np.stack([rows[r], columns[c]], axis=1))
+    return np.unique(np.concatenate(pairs), axis=0) if pairs else np.empty((0, 2), dtype=np.int64)
+
+
+def _connected_components(n: int, pairs: np.ndarray) -> np.ndarray:
+    """Component label (smallest member index) per node."""
+    labels = np.arange(n)
+    if not len(pairs): return labels
+    while True:
+        low = np.minimum(labels[pairs[:, 0]], labels[pairs[:, 1]])
+        previous = labels.copy()
+        np.minimum.at(labels, pairs[:, 0], low)
+        np.minimum.at(labels, pairs[:, 1], low)
+        labels = labels[labels] # Pointer jumping
+        if np.array_equal(labels, previous): return labels
+
+
+def near_duplicate_labels(matrix: TfidfMatrix, min_similarity: float = DEFAULT_DUPLICATE_SIMILARITY) -> np.ndarray:
+    """
+    Near-duplicate cluster label per document: single linkage over pairs with
+    TF-IDF cosine >= min_similarity. SimHash band matches within CANDIDATE_BITS
+    propose the pairs (64-bit SimHash alone is too noisy to decide, a one-word
+    edit can move it 6 bits) and the exact cosine decides. Documents with
+    identical signatures are collapsed first, so repeated outputs cost nothing
+    extra; each is checked against its group's first document by exact cosine
+    too and stays on its own if it fails. Documents without word tokens (all
+    signature 0) are near-duplicates of nothing.
+    """
+    labels = np.arange(matrix.n_docs)
+    rows = np.flatnonzero(np.diff(matrix.doc_starts) > 0)
+    if not len(rows): return labels
+    unique, first, inverse = np.unique(matrix.simhash()[rows], return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    collapsed = np.flatnonzero(first[inverse] != np.arange(len(rows)))
+    verified = np.ones(len(rows), dtype=bool)
+    if len(collapsed):
+        verified[collapsed] = matrix.pair_cosines(np.stack([rows[collapsed], rows[first[inverse[collapsed]]]], axis=1)) >= min_similarity
+    candidates = _close_pairs(unique, CANDIDATE_BITS)
+    pairs = candidates[matrix.pair_cosines(rows[first[candidates]]) >= min_similarity] if len(candidates) else candidates
+    components = _connected_components(len(unique), pairs)
+    labels[rows[verified]] = rows[first[components[inverse[verified]]]] # A representative document's index
+    return labels
+
+
+def _distribution(values: np.ndarray) -> dict:
+    if not len(values): return {"mean": None, "median": None, "p90": None}
+    return {"mean": round(float(values.mean()), 1), "median": float(np.median(values)), "p90": float(np.percentile(values, 90))}
+
+
+def analyze_outputs(outputs: list, min_similarity: float = DEFAULT_DUPLICATE_SIMILARITY) -> dict:
+    """
+    Diversity, duplication and length statistics of sweep outputs, overall,
+    per team, per model and per (team, model).
+    'unique_ratio' is distinct near-duplicate clusters / outputs within a group,
+    'mean_similarity' the mean pairwise TF-IDF cosine (lower = more diverse).
+
+    Returns:
+        dict: {"outputs", "duplicate_similarity", "overall", "by_team", "by_model", "by_team_model", "clusters"}
+    """
+    texts = [o["text"] for o in outputs]
+    matrix = TfidfMatrix(texts)
+    labels = near_duplicate_labels(matrix, min_similarity)
+    chars = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    eval_tokens = np.array([o.get("eval_tokens") if o.get("eval_tokens") is not None else np.nan for o in outputs], dtype=float)
+
+    # Pair sums once; team, model and overall sums are sums of pair sums
+    pairs = sorted({(o["team"], o["model"]) for o in outputs})
+    pair_index = {pair: i for i, pair in enumerate(pairs)}
+    doc_pairs = np.array([pair_index[(o["team"], o["model"])] for o in outputs], dtype=np.int64)
+    pair_sums, pair_nonempty = matrix.group_sums(doc_pairs, len(pairs))
+
+    def stats(pair_ids: list) -> dict:
+        indices = np.flatnonzero(np.isin(doc_pairs, pair_ids))
+        tokens = eval_tokens[indices]; tokens = tokens[~np.isnan(tokens)]
+        similarity = mean_pairwise_similarity(pair_sums[pair_ids].sum(axis=0), int(pair_nonempty[pair_ids].sum()), len(indices))
+        return {
+            "outputs": int(len(indices)),
+            "unique_ratio": round(len(np.unique(labels[indices])) / len(indices), 3) if len(indices) else None,
+            "mean_similarity": round(similarity, 3) if similarity is not None else None,
+            "chars": _distribution(chars[indices]),
+            "words": _distribution(matrix.token_counts[indices]),
+            "eval_tokens": _distribution(tokens),
+        }
+
+    def grouped(key) -> dict:
+        groups = {}
+        for i, pair in enumerate(pairs):
+            groups.setdefault(key(*pair), []).append(i)
+        return {name: stats(pair_ids) for name, pair_ids in sorted(groups.items())}
+
+    clusters = []
+    if len(labels):
+        cluster_ids, sizes = np.unique(labels, return_counts=True)
+        for cluster_id in cluster_ids[np.argsort(-sizes, kind='stable')]:
+            members = np.flatnonzero(labels == cluster_id)
+            if len(members) < 2 or len(clusters) >= REPORT_TOP_CLUSTERS: break
+            sources = {}
+            for i in members:
+                source = f"{outputs[i]['team']} / {outputs[i]['model']}"
+                sources[source] = sources.get(source, 0) + 1
+            clusters.append({"size": int(len(members)), "sources": sources, "example": texts[members[0]][:200],
+                             "run_ids": [outputs[i]["run_id"] for i in members]})
+    return {
+        "outputs": len(outputs),
+        "duplicate_similarity": min_similarity,
+        "overall": stats(list(range(len(pairs)))),
+        "by_team": grouped(lambda team, model: team),
+        "by_model": grouped(lambda team, model: model),
+        "by_team_model": grouped(lambda team, model: f"{team} / {model}"),
+        "clusters": clusters,
+    }
+
+
+def format_sweep_report(report: dict) -> str:
+    def row(name, s):
+        similarity = f"{s['mean_similarity']:.3f}" if s["mean_similarity"] is not None else "  -  "
+        unique = f"{100 * s['unique_ratio']:.0f}%" if s["unique_ratio"] is not None else "-"
+        tokens = f" | tokens ~{s['eval_tokens']['mean']:.0f}" if s["eval_tokens"]["mean"] is not None else ""
+        return (f"  {name}: {s['outputs']} output(s) | unique {unique} | similarity {similarity} | "
+                f"words {s['words']['median']:.0f} (p90 {s['words']['p90']:.0f}) | chars {s['chars']['median']:.0f}{tokens}")
+
+    lines = [f"--- Sweep Output Analytics ({report['outputs']} output(s)) ---",
+             "unique = distinct near-duplicate clusters per output; similarity = mean pairwise TF-IDF cosine (lower = more diverse)"]
+    if not report["outputs"]:
+        return "\n".join(lines + ["No successful outputs to analyze."])
+    lines.append(row("All", report["overall"]))
+    for title, key in (("By Team", "by_team"), ("By Model", "by_model"), ("By Team / Model", "by_team_model")):
+        lines.append(f"\n{title}:")
+        lines.extend(row(name, stats) for name, stats in report[key].items())
+    if report["clusters"]:
+        lines.append(f"\nLargest Near-Duplicate Clusters (TF-IDF cosine >= {report['duplicate_similarity']}):")
+        for cluster in report["clusters"]:
+            sources = ", ".join(f"{source} x{count}" for source, count in cluster["sources"].items())
+            lines.append(f"  {cluster['size']} outputs ({sources}): {cluster['example'][:100]}")
+    return "\n".join(lines)
+
+
+def analyze_sweep(output_dir: str, min_similarity: float = DEFAULT_DUPLICATE_SIMILARITY) -> tuple[str, dict | None]:
+    """
+    Analyzes a sweep folder and writes REPORT_TEXT_FILENAME and REPORT_JSON_FILENAME into it.
+
+    Returns:
+        tuple: (report text or "Error: ..." message, report dict or None)
+    """
+    if not output_dir or not os.path.isdir(output_dir):
+        return f"Error: Sweep folder not found: '{output_dir}'.", None
+    try:
+        report = analyze_outputs(load_sweep_outputs(output_dir), min_similarity)
+    except Exception as e:
+        return f"Error analyzing sweep outputs in '{output_dir}': {e}", None
+    text = format_sweep_report(report)
+    try:
+        with open(os.path.join(output_dir, REPORT_TEXT_FILENAME), 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        with open(os.path.join(output_dir, REPORT_JSON_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print(f"Warning: Could not write sweep report files in {output_dir}: {e}")
+    return text, report
+
+
+def analyze_sweep_folder(folder: str) -> str:
+    """Sweep tab handler: analyzes a sweep_runs/<run> folder (name or path) and returns the report text."""
+    if not folder or not folder.strip():
+        return "Error: Enter the sweep folder to analyze."
+    return analyze_sweep(resolve_resume_dir(folder))[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.sweep_analytics", description="Diversity and duplication report of a sweep's outputs.")
+    parser.add_argument("folder", help="Sweep folder (sweep_runs/<run> name or path).")
+    parser.add_argument("--min-similarity", type=float, default=DEFAULT_DUPLICATE_SIMILARITY,
+                        help=f"TF-IDF cosine at which outputs count as near-duplicates (default {DEFAULT_DUPLICATE_SIMILARITY}).")
+    args = parser.parse_args(argv)
+    text, report = analyze_sweep(resolve_resume_dir(args.folder), args.min_similarity)
+    print(text)
+    return 0 if report is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# ArtAgent/core/sweep_estimator.py
+import os
+from agents.roles_config import load_all_roles
+from .utils import get_absolute_path
+from .sweep_manager import (SWEEP_OUTPUT_BASE_DIR, make_run_id, load_completed_run_ids, resolve_resume_dir,
+                            resolve_sweep_concurrency, _format_duration)
+from .sweep_prefix import build_prefix_trie
+from .sweep_store import query_sweep_results
+from .sweep_options import resolve_option_sets
+
+DEFAULT_SECONDS_PER_STEP = 20.0 # Assumed step duration when no past run is comparable
+SWEEP_HISTORY_FOLDERS = 50 # Most recent sweep folders read for telemetry
+
+def _team_calls(team_definition: dict) -> int:
+    """LLM calls one run of a team makes (steps with a role, plus the summarizer of summarize_all)."""
+    steps = sum(1 for step in (team_definition or {}).get("steps", []) if step.get("role"))
+    return steps + (1 if (team_definition or {}).get("assembly_strategy") == "summarize_all" else 0)
+
+
+def load_run_telemetry(base_dir: str | None = None, max_folders: int = SWEEP_HISTORY_FOLDERS) -> list:
+    """
+    Successful past runs with recorded timings from the newest sweep folders.
+
+    Returns:
+        list[dict]: Records with model, team, duration_seconds (and eval_tokens,
+                    llm_calls and concurrency if recorded).
+    """
+    base_dir = base_dir or get_absolute_path(SWEEP_OUTPUT_BASE_DIR)
+    try:
+        with os.scandir(base_dir) as it:
+            folders = sorted((e.path for e in it if e.is_dir()), reverse=True)[:max_folders] # Named <timestamp>_<name>
+    except FileNotFoundError:
+        return []
+    records = []
+    for folder in folders:
+        try:
+            rows = query_sweep_results(folder, include_protocol=True, status="Success")
+        except Exception as e:
+            print(f"Warning: Skipping sweep telemetry in {folder}: {e}")
+            continue
+        for row in rows:
+            if row.get("duration_seconds") is None: continue # Protocols from before timings were recorded
+            metadata = (row.pop("protocol", None) or {}).get("sweep_metadata") or {}
+            for key in ("eval_tokens", "llm_calls", "concurrency"): row[key] = metadata.get(key)
+            records.append(row)
+    return records
+
+
+class DurationModel:
+    """
+    Predicts the serial duration of a (model, team) run from past runs. A past
+    run is normalized to seconds per LLM call it actually made (its duration
+    already reflects the steps it reused from other runs); runs recorded
+    before calls were counted use the team's calls. The cost per call is the
+    mean of that exact pair, else the model's mean, else the mean over all
+    models, else DEFAULT_SECONDS_PER_STEP. Concurrency is applied by the
+    caller, the same way for every source.
+    """
+    def __init__(self, records: list, all_teams_data: dict):
+        self.pairs, self.model_steps, self.all_steps = {}, {}, []
+        self.pair_tokens = {}
+        for r in records:
+            calls = r.get("llm_calls")
+            if calls is None: calls = _team_calls(all_teams_data.get(r["team"]))
+            if not calls: continue # Every step reused from another run: nothing to learn a call's cost from
+            per_call = r["duration_seconds"] / calls
+            self.pairs.setdefault((r["model"], r["team"]), []).append(per_call)
+            self.model_steps.setdefault(r["model"], []).append(per_call)
+            self.all_steps.append(per_call)
+            if r.get("eval_tokens") is not None: self.pair_tokens.setdefault((r["model"], r["team"]), []).append(r["eval_tokens"] / calls)
+
+    def predict(self, model: str, team: str, calls: float) -> tuple[float, str]:
+        """Returns (seconds, source) for a run making `calls` LLM calls; source says which history the estimate came from."""
+        if (model, team) in self.pairs:
+            per_call = self.pairs[(model, team)]
+            return calls * sum(per_call) / len(per_call), f"{len(per_call)} past run(s)"
+        if model in self.model_steps:
+            per_call = self.model_steps[model]
+            return calls * sum(per_call) / len(per_call), "model average"
+        if self.all_steps:
+            return calls * sum(self.all_steps) / len(self.all_steps), "all-model average"
+        return calls * DEFAULT_SECONDS_PER_STEP, "default"
+
+    def predict_tokens(self, model: str, team: str) -> float | None:
+        """Mean generated tokens per LLM call of the pair's past runs."""
+        tokens = self.pair_tokens.get((model, team))
+        return sum(tokens) / len(tokens) if tokens else None
+
+
+def estimate_sweep(
+    base_prompts_text: str,
+    selected_teams: list,
+    selected_models: list,
+    settings: dict,
+    all_teams_data: dict,
+    all_roles_data: dict | None = None,
+    concurrency: int | None = None,
+    resume_from: str = "",
+    telemetry: list | None = None,
+    option_sets: list | None = None
+    ) -> dict:
+    """
+    Builds a sweep's run plan without running anything and estimates it.
+    Runs already completed in a resumed folder are left out. A model's LLM
+    calls account for the steps its remaining runs of each prompt share (see
+    sweep_prefix), and its runs' calls are scaled by that share. A model
+    group's time is its runs' serial times (see DurationModel) divided by the
+    concurrent runs per model, at most the number of runs it has. Each option
+    set of an option sweep (see sweep_options) multiplies the runs; durations
+    are not modelled per option set.
+
+    Returns:
+        dict: {"runs", "llm_calls", "seconds", "tokens", "concurrency",
+               "models": {model: {"runs", "llm_calls", "seconds", "teams": {team: {"runs", "seconds_per_run", "source"}}}},
+               "error"} ('error' is set instead when the inputs are invalid).
+    """
+    prompts = [p.strip() for p in (base_prompts_text or "").strip().splitlines() if p.strip()]
+    if not prompts: return {"error": "Error: No base prompts provided."}
+    if not selected_teams: return {"error": "Error: No Agent Teams selected."}
+    if not selected_models: return {"error": "Error: No Worker Models selected."}
+    completed = set()
+    if resume_from and resume_from.strip():
+        resume_dir = resolve_resume_dir(resume_from)
+        if not os.path.isdir(resume_dir): return {"error": f"Error: Sweep folder to resume not found: '{resume_dir}'."}
+        completed = load_completed_run_ids(resume_dir)
+
+    workers = resolve_sweep_concurrency(settings, concurrency)
+    durations = DurationModel(load_run_telemetry() if telemetry is None else telemetry, all_teams_data)
+    share_prefixes = settings.get("sweep_share_prefixes", True)
+    unique_calls = {} # Teams run together for one prompt -> their LLM calls with shared steps run once
+    def calls_of(teams: tuple) -> int:
+        if teams not in unique_calls:
+            trie = build_prefix_trie(list(teams), all_teams_data, all_roles_data or {})
+            summaries = sum(_team_calls(all_teams_data[team]) for team in teams) - trie.naive_calls
+            unique_calls[teams] = (trie.unique_calls if share_prefixes else trie.naive_calls) + summaries
+        return unique_calls[teams]
+
+    estimate = {"runs": 0, "llm_calls": 0, "seconds": 0.0, "tokens": 0.0, "concurrency": workers, "models": {}}
+    for model in dict.fromkeys(selected_models):
+        group = {"runs": 0, "llm_calls": 0, "seconds": 0.0, "teams": {}}
+        team_runs, naive_calls = {}, 0
+        for prompt in prompts:
+            for options in (option_sets or [{}]):
+                # run_sweep skips teams without a definition too
+                teams = tuple(team for team in selected_teams if all_teams_data.get(team)
+                              and make_run_id(prompt, team, model, options) not in completed)
+                for team in teams: team_runs[team] = team_runs.get(team, 0) + 1
+                naive_calls += sum(_team_calls(all_teams_data[team]) for team in teams)
+                group["llm_calls"] += calls_of(teams) if teams else 0
+        share = group["llm_calls"] / naive_calls if naive_calls else 1.0 # This model's remaining runs, not the whole sweep
+        for team, runs in team_runs.items():
+            calls = _team_calls(all_teams_data[team]) * share
+            seconds, source = durations.predict(model, team, calls)
+            group["teams"][team] = {"runs": runs, "seconds_per_run": seconds, "source": source}
+            group["runs"] += runs
+            group["seconds"] += runs * seconds
+            estimate["tokens"] += runs * calls * (durations.predict_tokens(model, team) or 0)
+        if group["runs"]: group["seconds"] /= min(workers, group["runs"]) # No more runs in flight than there are runs
+        estimate["models"][model] = group
+        for key in ("runs", "llm_calls", "seconds"): estimate[key] += group[key]
+    return estimate
+
+
+def format_sweep_estimate(estimate: dict) -> str:
+    if estimate.get("error"):
+        return estimate["error"]
+    lines = [f"--- Sweep Estimate (dry run, nothing executed) ---",
+             f"Runs: {estimate['runs']} | LLM calls: {estimate['llm_calls']} | "
+             f"Predicted time: ~{_format_duration(estimate['seconds'])} ({estimate['concurrency']} concurrent run(s) per model, model loads not included)"]
+    if estimate["tokens"]: lines.append(f"Predicted generated tokens: ~{estimate['tokens']:.0f}")
+    for model, group in estimate["models"].items():
+        lines.append(f"\nModel '{model}': {group['runs']} run(s), {group['llm_calls']} call(s), ~{_format_duration(group['seconds'])}")
+        for team, info in group["teams"].items():
+            lines.append(f"  Team '{team}': {info['runs']} x ~{info['seconds_per_run']:.1f}s ({info['source']})")
+    return "\n".join(lines)
+
+
+def dry_run_sweep(base_prompts_text, selected_teams, selected_models, settings, all_teams_data, concurrency=None, resume_from="",
+                  option_space=None, option_mode=None, option_samples=None) -> str:
+    """Sweep tab handler for the 'Estimate' button: the formatted estimate (or an error message)."""
+    option_sets, error = resolve_option_sets(settings, option_space, option_mode, option_samples)
+    if error: return error
+    try:
+        all_roles_data = load_all_roles(settings, file_agents={})
+    except Exception as e:
+        print(f"Warning: Estimating without roles (shared steps not counted precisely): {e}")
+        all_roles_data = {}
+    return format_sweep_estimate(estimate_sweep(base_prompts_text, selected_teams, selected_models, settings, all_teams_data,
+                                                all_roles_data, concurrency, resume_from, option_sets=option_sets))
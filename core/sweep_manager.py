@@ -6,6 +6,9 @@ import json
 import hashlib # For hashing prompts in filenames if needed
 import traceback # For logging detailed errors during workflow
 import re # For sanitizing filenames
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Import necessary functions/classes from sibling modules or agents
 from .utils import get_absolute_path # Utility for path handling
@@ -31,8 +34,17 @@ from . import agent_manager # Import the agent manager module
 from .agent_manager import run_team_workflow
 # Import function to load all roles (needed if run_team_workflow doesn't handle it internally based on settings)
 from agents.roles_config import load_all_roles
+from agents.ollama_agent import reset_token_usage, get_token_usage
+from .sweep_planner import plan_sweep_models, ModelPreloader, DEFAULT_SWEEP_KEEP_ALIVE
+from .sweep_prefix import build_prefix_trie, StepOutputCache
+from .sweep_store import prompt_hash, resolve_sweep_sink, detect_sweep_sink, open_sweep_sink, query_sweep_results
+from .sweep_options import resolve_option_sets, group_option_sets, option_set_id, describe_option_set
 
 SWEEP_OUTPUT_BASE_DIR = "sweep_runs" # Folder relative to project root
+DEFAULT_SWEEP_CONCURRENCY = 1 # Runs in flight per model; match Ollama's OLLAMA_NUM_PARALLEL
+MAX_SWEEP_CONCURRENCY = 16
+SWEEP_RATE_WINDOW = 20 # Recent runs that throughput and ETA are computed from
+SWEEP_LOG_LINES = 10 # Run statuses shown under the live progress line
 
 def sanitize_filename(name):
     """Removes or replaces characters unsafe for filenames."""
@@ -50,7 +62,369 @@ def sanitize_filename(name):
     return name
 
 
-def run_sweep(
+def make_run_id(base_prompt: str, team_name: str, model_name: str, options: dict | None = None) -> str:
+    """Stable id of one prompt x team x model (x option set) configuration (also its protocol filename)."""
+    # Use sanitized names in run_id for consistency
+    run_id = f"{prompt_hash(base_prompt)}_{sanitize_filename(team_name)}_{sanitize_filename(model_name)}"
+    return f"{run_id}_o{option_set_id(options)}" if options else run_id
+
+
+def protocol_completed(protocol: dict) -> bool:
+    """True if a saved protocol records a successful run (older protocols lack 'status')."""
+    if not isinstance(protocol, dict):
+        return False
+    if "status" in protocol:
+        return protocol["status"] == "Success"
+    final_output = protocol.get("final_output")
+    return isinstance(final_output, str) and final_output != "Execution did not complete." and not final_output.startswith("ERROR during execution")
+
+
+def load_completed_run_ids(output_dir: str) -> set:
+    """Returns the run_ids whose protocol (JSON file or result sink record) in output_dir records a successful run."""
+    completed = set()
+    if detect_sweep_sink(output_dir):
+        completed.update(r["run_id"] for r in query_sweep_results(output_dir, status="Success"))
+    with os.scandir(output_dir) as it:
+        for entry in it:
+            if not entry.name.endswith(".json") or not entry.is_file():
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    protocol = json.load(f)
+            except Exception as e:
+                print(f"Warning: Ignoring unreadable protocol {entry.name}: {e}")
+                continue
+            if protocol_completed(protocol):
+                completed.add(protocol.get("sweep_metadata", {}).get("run_id") or entry.name[:-len(".json")])
+    return completed
+
+
+def resolve_resume_dir(resume_from: str) -> str:
+    """Maps a sweep run folder name (under SWEEP_OUTPUT_BASE_DIR) or absolute path to a directory."""
+    resume_from = resume_from.strip().rstrip("/\\")
+    if os.path.isabs(resume_from):
+        return resume_from
+    folder_name = os.path.basename(resume_from.replace("\\", "/")) # Accept 'sweep_runs/<run>' too
+    return get_absolute_path(os.path.join(SWEEP_OUTPUT_BASE_DIR, folder_name))
+
+
+def resolve_sweep_concurrency(settings: dict, requested=None) -> int:
+    """Returns the concurrent runs per model group (UI value, else settings["sweep_concurrency"]), clamped."""
+    value = requested if requested not in (None, "") else (settings or {}).get("sweep_concurrency", DEFAULT_SWEEP_CONCURRENCY)
+    try: value = int(value)
+    except (ValueError, TypeError): value = DEFAULT_SWEEP_CONCURRENCY
+    return max(1, min(MAX_SWEEP_CONCURRENCY, value))
+
+
+def prepare_sweep(base_prompts_text: str, selected_teams: list, selected_models: list, output_folder_name: str,
+                  resume_from: str = "") -> tuple[list, str, set, str]:
+    """
+    Validates sweep inputs and creates the sweep_runs/<timestamp>_<name> folder,
+    or picks up the folder being resumed with the run_ids it already completed.
+
+    Returns:
+        tuple: (prompts, output_dir, completed_run_ids, error_message or "")
+    """
+    # 1. Validate Inputs
+    if not base_prompts_text or not base_prompts_text.strip():
+        return [], "", set(), "Error: No base prompts provided."
+    if not selected_teams:
+        return [], "", set(), "Error: No Agent Teams selected."
+    if not selected_models:
+        return [], "", set(), "Error: No Worker Models selected."
+
+    # Sanitize folder name slightly
+    safe_folder_name = "".join(c for c in output_folder_name.strip() if c.isalnum() or c in ('-', '_'))
+    if not safe_folder_name: safe_folder_name = "sweep_results"
+
+    prompts = [p.strip() for p in base_prompts_text.strip().splitlines() if p.strip()]
+    if not prompts: return [], "", set(), "Error: No valid prompts found after stripping."
+
+    # 2. Prepare Output Directory (or pick up the one being resumed)
+    completed_run_ids = set()
+    if resume_from and resume_from.strip():
+        output_dir = resolve_resume_dir(resume_from)
+        if not os.path.isdir(output_dir):
+            return prompts, output_dir, set(), f"Error: Sweep folder to resume not found: '{output_dir}'."
+        try:
+            completed_run_ids = load_completed_run_ids(output_dir)
+        except Exception as e:
+            return prompts, output_dir, set(), f"Error reading protocols in '{output_dir}': {e}"
+        print(f"Resuming sweep in {output_dir}: {len(completed_run_ids)} completed run(s) found.")
+    else:
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        run_folder_name = f"{timestamp}_{safe_folder_name}"
+        output_dir = get_absolute_path(os.path.join(SWEEP_OUTPUT_BASE_DIR, run_folder_name))
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            print(f"Output directory created: {output_dir}")
+        except Exception as e:
+            return prompts, output_dir, set(), f"Error creating output directory '{output_dir}': {e}"
+    return prompts, output_dir, completed_run_ids, ""
+
+
+class SweepOutputWriter:
+    """
+    Serializes a sweep's file writes so concurrent runs can share it: one
+    append handle per model prompt file, and protocols saved under the
+    same lock (repeated prompts produce the same run_id and protocol path).
+    With a result sink (see sweep_store), protocols are appended to its one
+    file instead of being written as one JSON file per run.
+    """
+    def __init__(self, output_dir: str, sink=None):
+        self.output_dir = output_dir
+        self.sink = sink
+        self._prompt_file_handles = {} # {sanitized_model_name: file_handle}, opened once per model
+        self._lock = threading.Lock()
+
+    def write_prompt(self, sanitized_model_name: str, cleaned_prompt: str):
+        prompt_filename = f"prompts_{sanitized_model_name}.txt"
+        with self._lock:
+            if sanitized_model_name not in self._prompt_file_handles:
+                # Open file in append mode ('a+') only once per model
+                self._prompt_file_handles[sanitized_model_name] = open(os.path.join(self.output_dir, prompt_filename), 'a+', encoding='utf-8')
+                print(f"  Opened prompt file: {prompt_filename}")
+            handle = self._prompt_file_handles[sanitized_model_name]
+            handle.write(cleaned_prompt + '\n')
+            handle.flush() # Keep the file complete if the sweep dies later
+
+    def save_protocol(self, protocol_filepath: str, protocol: dict) -> bool:
+        with self._lock:
+            if self.sink is not None:
+                return self.sink.append(protocol)
+            return save_json(protocol_filepath, protocol, is_relative=False)
+
+    def close(self):
+        """Closes all prompt output files."""
+        closed_count = 0
+        print("Closing prompt output files...")
+        with self._lock:
+            for model_key, handle in self._prompt_file_handles.items():
+                try:
+                    if handle and not handle.closed:
+                        handle.close()
+                        closed_count += 1
+                except Exception as e_close:
+                    print(f"Warning: Error closing prompt file for model '{model_key}': {e_close}")
+        if closed_count > 0: print(f"Closed {closed_count} prompt file(s).")
+        if self.sink is not None:
+            try: self.sink.close()
+            except Exception as e_close: print(f"Warning: Error closing sweep result file: {e_close}")
+
+
+def _execute_sweep_run(
+    base_prompt: str,
+    prompt_label: str,
+    team_name: str,
+    team_definition: dict,
+    model_name: str,
+    log_intermediate: bool,
+    settings: dict,
+    all_roles_data: dict,
+    writer: SweepOutputWriter,
+    step_cache: StepOutputCache | None = None,
+    options: dict | None = None,
+    concurrency: int = 1
+    ) -> tuple[str, str, dict]:
+    """
+    Runs one prompt x team x model configuration (with an option set of an
+    option sweep applied to every LLM call) and saves its outputs. Prompts of
+    an option set go to their own prompts_<model>_o<option set id>.txt file.
+
+    concurrency is the number of runs of this model in flight alongside this
+    one; it is recorded with the run's timings for the sweep estimator.
+
+    Returns:
+        tuple: (run_label, run_status, run_stats) where run_stats holds the
+               run's 'duration_seconds', 'llm_calls' (requests actually sent,
+               shared steps reused from another run excluded), 'concurrency'
+               and the 'eval_tokens'/'eval_seconds' Ollama reported.
+    """
+    model_label = f"Model '{model_name}'"
+    team_label = f"Team '{team_name}'"
+    sanitized_model_name = sanitize_filename(model_name)
+    if options: sanitized_model_name += f"_o{option_set_id(options)}"
+
+    # --- Run Configuration ---
+    run_label = f"{prompt_label}, {team_label}, {model_label}" + (f", Options '{describe_option_set(options)}'" if options else "")
+    run_id = make_run_id(base_prompt, team_name, model_name, options)
+    print(f"\nRunning Configuration: {run_label}")
+
+    # Prepare data for this specific run's protocol
+    run_config = {
+        "agent_team_name": team_name,
+        "worker_model": model_name,
+        "log_intermediate_steps": log_intermediate,
+        # Optionally add effective ollama options used if needed
+    }
+    if options: run_config["ollama_api_options"] = options # Option set of an option sweep
+    protocol = {
+        "sweep_metadata": {
+            "base_user_prompt": base_prompt,
+            "timestamp_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "run_id": run_id
+        },
+        "configuration": run_config,
+        "execution_log": [] if log_intermediate else None, # Initialize only if needed
+        "final_output": "Execution did not complete." # Default
+    }
+
+    # Execute the workflow
+    run_status = "Unknown Error" # Default status
+    final_output = None # Initialize final_output
+    intermediate_steps = None # Initialize intermediate_steps
+    run_start = time.perf_counter()
+    reset_token_usage() # This thread's LLM requests now count towards this run
+
+    try:
+        # Pass empty list for history_list - sweep manager shouldn't modify persistent history directly during runs
+        # Expecting return: (final_output, updated_persistent_history, step_outputs_dict | None)
+        final_output, _, intermediate_steps = agent_manager.run_team_workflow(
+            team_name=team_name,
+            team_definition=team_definition,
+            user_input=base_prompt,
+            initial_settings=settings,
+            all_roles_data=all_roles_data, # Pass loaded roles
+            history_list=[], # Pass empty list for sweep mode
+            worker_model_name=model_name, # Current model in outer loop
+            # Pass single_image_input=None as sweep currently doesn't handle image inputs
+            single_image_input=None,
+            return_intermediate_steps=log_intermediate, # Request intermediate steps if needed
+            step_cache=step_cache, # Shared with the other runs of this model group
+            option_overrides=options
+        )
+        protocol["final_output"] = final_output
+        run_status = "Success" # Mark success if no exception
+
+        # Log intermediate steps if requested and returned
+        if log_intermediate and intermediate_steps and isinstance(intermediate_steps, dict):
+            for step_idx, step_data in intermediate_steps.items():
+                 protocol["execution_log"].append({
+                     "step": step_idx,
+                     "agent_role": step_data.get("role", "N/A"),
+                     "goal": step_data.get("goal", "N/A"),
+                     "output": step_data.get("output"), # Can be None if error occurred
+                     "error": step_data.get("error") # Will be None if no error
+                 })
+        elif log_intermediate:
+             protocol["execution_log"] = "Intermediate steps requested but not returned/invalid."
+
+        # --- Write CLEANED prompt to model-specific file ---
+        # Check if run was successful and output is not an error message
+        if final_output and run_status == "Success" and not final_output.strip().startswith("Error:") and not final_output.strip().startswith("⚠️ Error:"):
+             # Clean the output: replace internal newlines with spaces
+             cleaned_prompt = final_output.strip().replace('\n', ' ').replace('\r', '') # Replace CR too
+
+             if cleaned_prompt: # Only write if not empty after cleaning
+                 try:
+                     writer.write_prompt(sanitized_model_name, cleaned_prompt)
+                 except Exception as e_prompt_write:
+                     write_error = f"Prompt Write Error: {e_prompt_write}"
+                     print(f"  ERROR writing to prompt file prompts_{sanitized_model_name}.txt: {e_prompt_write}")
+                     # Update status but don't overwrite original execution error if one occurred
+                     if run_status == "Success": run_status = write_error
+                     else: run_status += f" | {write_error}"
+             else:
+                 print(f"  Skipping write to prompt file: Output was empty after cleaning.")
+        elif run_status == "Success":
+             # Handle cases where execution succeeded but output was empty or an error message
+             print(f"  Skipping write to prompt file: Final output indicates error or is empty.")
+
+    except Exception as e: # Workflow execution error handling
+        print(f"ERROR during workflow execution for {run_label}: {e}")
+        traceback.print_exc() # Print full traceback for debugging
+        error_str = f"ERROR during execution: {e}"
+        protocol["final_output"] = error_str
+        if protocol["execution_log"] is not None: # Add error to log if intermediate logging is on
+            protocol["execution_log"].append({"step": "FATAL_ERROR", "error": str(e)})
+        run_status = f"Error: {e}"
+
+    # Save the protocol file (JSON); 'status' tells a resumed sweep whether to redo this run
+    protocol["status"] = run_status
+    usage = get_token_usage()
+    run_stats = {"duration_seconds": round(time.perf_counter() - run_start, 3), "llm_calls": usage["requests"], "concurrency": concurrency,
+                 "eval_tokens": usage["eval_tokens"], "eval_seconds": round(usage["eval_seconds"], 3)}
+    protocol["sweep_metadata"].update(run_stats)
+    protocol_filename = f"{run_id}.json"
+    protocol_filepath = os.path.join(writer.output_dir, protocol_filename)
+    try:
+        if not writer.save_protocol(protocol_filepath, protocol):
+             raise IOError("save_json utility returned False")
+    except Exception as e_save:
+        save_error = f"Protocol Save Error: {e_save}"
+        print(f"  ERROR saving protocol file {protocol_filename}: {e_save}")
+        # Update run status without overwriting original execution status if it was success
+        if run_status == "Success": run_status = save_error
+        else: run_status += f" | {save_error}"
+
+    return run_label, run_status, run_stats
+
+
+class SweepProgress:
+    """
+    Completed/total, throughput and ETA of a running sweep. Rates come from the
+    last SWEEP_RATE_WINDOW executed runs (resumed and skipped runs count as
+    completed but not towards the rates), so the ETA follows the current model.
+    """
+    def __init__(self, total: int):
+        self.total = total
+        self.completed = 0
+        self._start = time.perf_counter()
+        self._marks = deque([(self._start, 0)], maxlen=SWEEP_RATE_WINDOW + 1) # (finish time, eval tokens); first is the window anchor
+
+    def run_finished(self, run_stats: dict | None):
+        self.completed += 1
+        self._marks.append((time.perf_counter(), (run_stats or {}).get("eval_tokens", 0)))
+
+    def run_skipped(self):
+        self.completed += 1
+
+    def event(self, last_status: str = "", done: bool = False, summary: str = "") -> dict:
+        """A progress event as yielded by run_sweep_iter."""
+        marks = list(self._marks)
+        span = marks[-1][0] - marks[0][0]
+        runs = len(marks) - 1
+        rate = runs / span if runs and span > 0 else None # Runs per second
+        remaining = max(0, self.total - self.completed)
+        return {
+            "completed": self.completed,
+            "total": self.total,
+            "elapsed_seconds": time.perf_counter() - self._start,
+            "runs_per_minute": rate * 60 if rate else None,
+            "tokens_per_second": sum(tokens for _, tokens in marks[1:]) / span if rate else None,
+            "eta_seconds": remaining / rate if rate else (0.0 if not remaining else None),
+            "last_status": last_status,
+            "done": done,
+            "summary": summary,
+        }
+
+
+def _final_event(summary: str) -> dict:
+    """Progress event for a sweep that ends before any run (validation/setup errors)."""
+    return {"completed": 0, "total": 0, "elapsed_seconds": 0.0, "runs_per_minute": None, "tokens_per_second": None,
+            "eta_seconds": None, "last_status": "", "done": True, "summary": summary}
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}h {rest // 60:02d}m" if hours else f"{rest // 60}m {rest % 60:02d}s"
+
+
+def format_sweep_progress(event: dict) -> str:
+    """One-line progress report for a run_sweep_iter event (the summary once the sweep is done)."""
+    if event["done"]:
+        return event["summary"]
+    total = event["total"] or 1
+    parts = [f"Progress: {event['completed']}/{event['total']} runs ({100 * event['completed'] / total:.0f}%)",
+             f"elapsed {_format_duration(event['elapsed_seconds'])}"]
+    if event["runs_per_minute"] is not None: parts.append(f"{event['runs_per_minute']:.1f} runs/min")
+    if event["tokens_per_second"]: parts.append(f"{event['tokens_per_second']:.1f} tokens/s")
+    parts.append(f"ETA {_format_duration(event['eta_seconds'])}" if event["eta_seconds"] is not None else "ETA unknown")
+    return " | ".join(parts)
+
+
+def run_sweep_iter(
     base_prompts_text: str,
     selected_teams: list[str],
     selected_models: list[str],
@@ -59,13 +433,49 @@ def run_sweep(
     # Need data passed from state via app.py
     settings: dict,
     all_teams_data: dict,
-    # Gradio progress object needs to be the *last* argument if used with type hints
-    # progress=gr.Progress(track_tqdm=True) # Uncomment if using progress
-    ) -> str: # Returns final status message
+    concurrency: int | None = None,
+    resume_from: str = "",
+    result_sink: str | None = None,
+    option_space=None,
+    option_mode: str | None = None,
+    option_samples: int | None = None,
+    ):
     """
     Runs the experiment sweep based on selected prompts, teams, and models.
     Optimizes model switching and saves cleaned, one-prompt-per-line TXT files per model.
 
+    A generator of progress events (see SweepProgress.event): one when the
+    runs are dispatched, one per finished run, and a final one with
+    done=True and the summary (or an "Error: ..." message) in 'summary'.
+
+    Models are still processed one after another (so each is loaded once), but
+    the prompt x team runs for the current model are dispatched to a pool of
+    `concurrency` threads (falls back to settings["sweep_concurrency"], default 1).
+    Ollama serves them in parallel up to its OLLAMA_NUM_PARALLEL slots. Run
+    statuses are reported in prompt/team order regardless of completion order.
+
+    Model order comes from the sweep planner: models Ollama already has in
+    memory (/api/ps) first, then the rest by estimated load cost. Once the
+    current group has no queued runs left, the next model is preloaded in the
+    background (settings["sweep_preload_next_model"], default on, kept for
+    settings["sweep_keep_alive"]) so its load overlaps the last runs.
+
+    With `resume_from` (an existing sweep_runs/<run> folder), no new folder is
+    created: runs whose protocol there records success are skipped, and only
+    missing or failed combinations are executed. Prompt files are appended to.
+
+    `result_sink` ('json', 'jsonl' or 'sqlite', or its UI label; falls back to
+    settings["sweep_result_sink"]) picks how protocols are stored: one JSON file
+    per run, or records appended to one sweep_results file (see sweep_store).
+    A resumed folder keeps the sink it was started with.
+
+    `option_space` (JSON text or dict, see sweep_options.parse_option_space;
+    falls back to settings["sweep_option_space"]) adds Ollama option sets as a
+    fourth sweep dimension: the full grid, or `option_samples` random or Latin
+    hypercube draws (`option_mode`). Within a model, option sets that share
+    runner options (num_ctx etc.) run as one batch, and batches run one after
+    another, so Ollama reloads the runner once per batch rather than per run.
+
     Args:
         base_prompts_text (str): Multiline string of base prompts.
         selected_teams (list[str]): List of team names to run.
@@ -74,38 +484,29 @@ def run_sweep(
         log_intermediate (bool): Whether to include intermediate step outputs in protocols.
         settings (dict): The current application settings dictionary.
         all_teams_data (dict): Dictionary containing definitions for all loaded teams.
-        # progress (gradio.Progress): Gradio progress tracker object.
-
-    Returns:
-        str: A summary message indicating completion status and output location.
+        concurrency (int | None): Concurrent runs per model group.
+        resume_from (str): Name or path of a sweep run folder to resume.
+        result_sink (str | None): Protocol storage ('json', 'jsonl', 'sqlite').
+        option_space (str | dict | None): Ollama options to sweep.
+        option_mode (str | None): 'grid', 'random' or 'lhs' (or its UI label).
+        option_samples (int | None): Option sets drawn in 'random'/'lhs' mode.
+
+    Yields:
+        dict: Progress events with completed, total, runs_per_minute,
+              tokens_per_second, eta_seconds, last_status, done and summary.
     """
     start_time = time.time()
     print("\n--- Starting Experiment Sweep (Optimized Model Switching) ---")
 
-    # 1. Validate Inputs
-    if not base_prompts_text or not base_prompts_text.strip():
-        return "Error: No base prompts provided."
-    if not selected_teams:
-        return "Error: No Agent Teams selected."
-    if not selected_models:
-        return "Error: No Worker Models selected."
-
-    # Sanitize folder name slightly
-    safe_folder_name = "".join(c for c in output_folder_name.strip() if c.isalnum() or c in ('-', '_'))
-    if not safe_folder_name: safe_folder_name = "sweep_results"
-
-    prompts = [p.strip() for p in base_prompts_text.strip().splitlines() if p.strip()]
-    if not prompts: return "Error: No valid prompts found after stripping."
-
-    # 2. Prepare Output Directory
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
-    run_folder_name = f"{timestamp}_{safe_folder_name}"
-    output_dir = get_absolute_path(os.path.join(SWEEP_OUTPUT_BASE_DIR, run_folder_name))
-    try:
-        os.makedirs(output_dir, exist_ok=True)
-        print(f"Output directory created: {output_dir}")
-    except Exception as e:
-        return f"Error creating output directory '{output_dir}': {e}"
+    # 1-2. Validate Inputs, Prepare Output Directory (or pick up the one being resumed)
+    option_sets, error = resolve_option_sets(settings, option_space, option_mode, option_samples)
+    if error:
+        yield _final_event(error); return
+    option_groups = group_option_sets(option_sets) # [[{}]] without an option sweep
+    prompts, output_dir, completed_run_ids, error = prepare_sweep(base_prompts_text, selected_teams, selected_models,
+                                                                  output_folder_name, resume_from)
+    if error:
+        yield _final_event(error); return
 
     # 3. Load necessary data (roles)
     try:
@@ -115,199 +516,173 @@ def run_sweep(
         if not all_roles_data:
              print("Warning: No agent roles loaded based on current settings. Workflows might fail.")
     except Exception as e:
-        return f"Error loading agent roles during sweep setup: {e}"
-
-    # 4. Execute Sweep Loops --- >>> REORDERED LOOPS <<< ---
-    total_runs = len(prompts) * len(selected_teams) * len(selected_models)
-    completed_runs = 0
+        yield _final_event(f"Error loading agent roles during sweep setup: {e}"); return
+
+    # 4. Execute Sweep: models outer (one load each, resident ones first), prompt x team runs concurrent within a model
+    model_plan = plan_sweep_models(selected_models, settings)
+    model_order = model_plan.order
+    preloader = None
+    if settings.get("sweep_preload_next_model", True) and settings.get("ollama_url") and len(model_order) > 1:
+        preloader = ModelPreloader(settings["ollama_url"], settings.get("sweep_keep_alive", DEFAULT_SWEEP_KEEP_ALIVE), model_plan.resident)
+    total_runs = len(prompts) * len(selected_teams) * len(model_order) * len(option_sets)
+    workers = resolve_sweep_concurrency(settings, concurrency)
+    progress = SweepProgress(total_runs)
+    resumed_runs = 0 # Already completed in the resumed folder
     status_updates = [] # Store short status lines for final summary
-    prompt_file_handles = {} # Dictionary to keep prompt file handles open per model {sanitized_model_name: file_handle}
+    # Teams whose first steps build identical prompts share those steps' outputs per (prompt, model)
+    prefix_trie = build_prefix_trie(selected_teams, all_teams_data, all_roles_data)
+    share_prefixes = settings.get("sweep_share_prefixes", True) and prefix_trie.shared_calls > 0
+    if share_prefixes: print(f"Shared step prefixes: {prefix_trie.unique_calls} of {prefix_trie.naive_calls} step calls per (prompt, model) are unique.")
+    reused_steps = 0
+    sink_name = (detect_sweep_sink(output_dir) if resume_from and resume_from.strip() else None) or resolve_sweep_sink(settings, result_sink)
+    try:
+        writer = SweepOutputWriter(output_dir, open_sweep_sink(output_dir, sink_name))
+    except Exception as e:
+        yield _final_event(f"Error opening sweep result file in '{output_dir}': {e}"); return
 
-    print(f"Total configurations to run: {total_runs}")
-    # Initialize progress bar if used
-    # progress(0, desc=f"Starting Sweep ({total_runs} runs)...")
+    print(f"Total configurations to run: {total_runs} ({workers} concurrent run(s) per model)")
 
     try: # Use try...finally to ensure prompt files are closed
-        # --- Outer loop: Models ---
-        for m_idx, model_name in enumerate(selected_models):
-            model_label = f"Model '{model_name}'"
-            sanitized_model_name = sanitize_filename(model_name)
-            print(f"\n===== Processing all tasks for {model_label} =====")
-
-            # --- Middle loop: Prompts ---
-            for p_idx, base_prompt in enumerate(prompts):
-                prompt_label = f"Prompt {p_idx+1}/{len(prompts)}"
-                prompt_hash = hashlib.md5(base_prompt.encode()).hexdigest()[:8]
-
-                # --- Inner loop: Teams ---
-                for t_idx, team_name in enumerate(selected_teams):
-                    team_label = f"Team '{team_name}'"
-                    sanitized_team_name = sanitize_filename(team_name) # Sanitize team name too
-                    team_definition = all_teams_data.get(team_name)
-
-                    if not team_definition:
-                        # Note: This skip counts towards total, adjust if needed
-                        msg = f"Skipping: Team definition '{team_name}' not found (for {model_label}, {prompt_label})."
-                        print(msg); status_updates.append(msg)
-                        completed_runs += 1 # Increment even on skip for progress tracking
-                        # progress(completed_runs / total_runs) # Update progress on skip if desired
-                        continue # Skip to the next team for this prompt/model
-
-                    # --- Run Configuration ---
-                    run_label = f"{prompt_label}, {team_label}, {model_label}"
-                    # Use sanitized names in run_id for consistency
-                    run_id = f"{prompt_hash}_{sanitized_team_name}_{sanitized_model_name}"
-                    print(f"\nRunning Configuration {completed_runs + 1}/{total_runs}: {run_label}")
-                    # Update progress if used
-                    # progress((completed_runs) / total_runs, desc=f"Running ({completed_runs+1}/{total_runs}): {team_label}...")
-
-                    # Prepare data for this specific run's protocol
-                    run_config = {
-                        "agent_team_name": team_name,
-                        "worker_model": model_name,
-                        "log_intermediate_steps": log_intermediate,
-                        # Optionally add effective ollama options used if needed
-                    }
-                    protocol = {
-                        "sweep_metadata": {
-                            "base_user_prompt": base_prompt,
-                            "timestamp_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-                            "run_id": run_id
-                        },
-                        "configuration": run_config,
-                        "execution_log": [] if log_intermediate else None, # Initialize only if needed
-                        "final_output": "Execution did not complete." # Default
-                    }
-
-                    # Execute the workflow
-                    run_status = "Unknown Error" # Default status
-                    final_output = None # Initialize final_output
-                    intermediate_steps = None # Initialize intermediate_steps
-
-                    try:
-                        # Pass empty list for history_list - sweep manager shouldn't modify persistent history directly during runs
-                        # Expecting return: (final_output, updated_persistent_history, step_outputs_dict | None)
-                        final_output, _, intermediate_steps = agent_manager.run_team_workflow(
-                            team_name=team_name,
-                            team_definition=team_definition,
-                            user_input=base_prompt,
-                            initial_settings=settings,
-                            all_roles_data=all_roles_data, # Pass loaded roles
-                            history_list=[], # Pass empty list for sweep mode
-                            worker_model_name=model_name, # Current model in outer loop
-                            # Pass single_image_input=None as sweep currently doesn't handle image inputs
-                            single_image_input=None,
-                            return_intermediate_steps=log_intermediate # Request intermediate steps if needed
-                        )
-                        protocol["final_output"] = final_output
-                        run_status = "Success" # Mark success if no exception
-
-                        # Log intermediate steps if requested and returned
-                        if log_intermediate and intermediate_steps and isinstance(intermediate_steps, dict):
-                            for step_idx, step_data in intermediate_steps.items():
-                                 protocol["execution_log"].append({
-                                     "step": step_idx,
-                                     "agent_role": step_data.get("role", "N/A"),
-                                     "goal": step_data.get("goal", "N/A"),
-                                     "output": step_data.get("output"), # Can be None if error occurred
-                                     "error": step_data.get("error") # Will be None if no error
-                                 })
-                        elif log_intermediate:
-                             protocol["execution_log"] = "Intermediate steps requested but not returned/invalid."
-
-
-                        # --- >>> MODIFIED: Write CLEANED prompt to model-specific file <<< ---
-                        # Check if run was successful and output is not an error message
-                        if final_output and run_status == "Success" and not final_output.strip().startswith("Error:") and not final_output.strip().startswith("⚠️ Error:"):
-                             # Clean the output: replace internal newlines with spaces
-                             cleaned_prompt = final_output.strip().replace('\n', ' ').replace('\r', '') # Replace CR too
-
-                             if cleaned_prompt: # Only write if not empty after cleaning
-                                 prompt_filename = f"prompts_{sanitized_model_name}.txt"
-                                 prompt_filepath = os.path.join(output_dir, prompt_filename)
-                                 try:
-                                     # Open file handle if not already open for this model
-                                     if sanitized_model_name not in prompt_file_handles:
-                                         # Open file in append mode ('a+') only once per model
-                                         prompt_file_handles[sanitized_model_name] = open(prompt_filepath, 'a+', encoding='utf-8')
-                                         print(f"  Opened prompt file: {prompt_filename}")
-
-                                     # Write the cleaned, single-line prompt
-                                     prompt_file_handles[sanitized_model_name].write(cleaned_prompt + '\n')
-
-                                 except Exception as e_prompt_write:
-                                     write_error = f"Prompt Write Error: {e_prompt_write}"
-                                     print(f"  ERROR writing to prompt file {prompt_filename}: {e_prompt_write}")
-                                     # Update status but don't overwrite original execution error if one occurred
-                                     if run_status == "Success": run_status = write_error
-                                     else: run_status += f" | {write_error}"
-                             else:
-                                 print(f"  Skipping write to prompt file: Output was empty after cleaning.")
-                        elif run_status == "Success":
-                             # Handle cases where execution succeeded but output was empty or an error message
-                             print(f"  Skipping write to prompt file: Final output indicates error or is empty.")
-
-                        # --- <<< End MODIFIED Prompt Writing Code >>> ---
-
-
-                    except Exception as e: # Workflow execution error handling
-                        print(f"ERROR during workflow execution for {run_label}: {e}")
-                        traceback.print_exc() # Print full traceback for debugging
-                        error_str = f"ERROR during execution: {e}"
-                        protocol["final_output"] = error_str
-                        if protocol["execution_log"] is not None: # Add error to log if intermediate logging is on
-                            protocol["execution_log"].append({"step": "FATAL_ERROR", "error": str(e)})
-                        run_status = f"Error: {e}"
-
-                    # Save the protocol file (JSON)
-                    protocol_filename = f"{run_id}.json"
-                    protocol_filepath = os.path.join(output_dir, protocol_filename)
-                    try:
-                        # Use save_json utility if available and handles absolute paths
-                        if not save_json(protocol_filepath, protocol, is_relative=False):
-                             raise IOError("save_json utility returned False")
-                        # print(f"  Protocol saved: {protocol_filename}") # Reduce console noise slightly
-                    except Exception as e_save:
-                        save_error = f"Protocol Save Error: {e_save}"
-                        print(f"  ERROR saving protocol file {protocol_filename}: {e_save}")
-                        # Update run status without overwriting original execution status if it was success
-                        if run_status == "Success": run_status = save_error
-                        else: run_status += f" | {save_error}"
-
-                    # Append concise status update for final summary
-                    status_updates.append(f"Run {completed_runs + 1}: {run_label} -> {run_status[:100]}{'...' if len(run_status)>100 else ''}")
-                    completed_runs += 1
-                    # Update progress if used
-                    # progress(completed_runs / total_runs)
-
-            # Optional: Add a print statement indicating completion for the current model
-            print(f"\n===== Finished all tasks for {model_label} =====")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sweep-run") as executor:
+            # --- Outer loop: Models ---
+            for m_idx, model_name in enumerate(model_order):
+                model_label = f"Model '{model_name}'"
+                print(f"\n===== Processing all tasks for {model_label} =====")
+                step_cache = StepOutputCache() if share_prefixes else None # One per model: keys never match across models
+                next_model = model_order[m_idx + 1] if m_idx + 1 < len(model_order) else None
+
+                # --- One batch per runner configuration (option sets sharing num_ctx etc.) ---
+                for g_idx, option_group in enumerate(option_groups):
+                    last_batch = g_idx == len(option_groups) - 1
+                    # Prompt x Team (x option set) runs of this batch, in prompt-major order
+                    group = [] # (future or None, skip message)
+                    for p_idx, base_prompt in enumerate(prompts):
+                        prompt_label = f"Prompt {p_idx+1}/{len(prompts)}"
+                        for t_idx, team_name in enumerate(selected_teams):
+                            team_definition = all_teams_data.get(team_name)
+                            for options in option_group:
+                                if not team_definition:
+                                    # Note: This skip counts towards total, adjust if needed
+                                    group.append((None, f"Skipping: Team definition '{team_name}' not found (for {model_label}, {prompt_label})."))
+                                    continue
+                                if make_run_id(base_prompt, team_name, model_name, options) in completed_run_ids:
+                                    resumed_runs += 1
+                                    progress.run_skipped()
+                                    continue
+                                future = executor.submit(_execute_sweep_run, base_prompt, prompt_label, team_name, team_definition,
+                                                         model_name, log_intermediate, settings, all_roles_data, writer, step_cache,
+                                                         options or None, workers)
+                                group.append((future, None))
+
+                    batch_label = f" (options {g_idx + 1}/{len(option_groups)})" if len(option_groups) > 1 else ""
+                    yield progress.event(f"Dispatched {len(group)} run(s) for {model_label}{batch_label}.")
+
+                    # The whole batch finishes before the next one starts (no model or runner thrashing)
+                    group_futures = [future for future, _ in group if future is not None]
+                    for future, skip_msg in group:
+                        # Nothing queued behind the model's last runs in flight: warm up the next model meanwhile
+                        if preloader and next_model and last_batch and sum(not f.done() for f in group_futures) <= workers:
+                            preloader.preload(next_model)
+                        if future is None:
+                            print(skip_msg); status_updates.append(skip_msg)
+                            progress.run_skipped() # Increment even on skip for progress tracking
+                            yield progress.event(skip_msg)
+                            continue
+                        try:
+                            run_label, run_status, run_stats = future.result()
+                        except Exception as e: # _execute_sweep_run handles its own errors; this is a safety net
+                            run_label, run_status, run_stats = f"{model_label}", f"Error: {e}", None
+                        # Append concise status update for final summary
+                        status_updates.append(f"Run {progress.completed + 1}: {run_label} -> {run_status[:100]}{'...' if len(run_status)>100 else ''}")
+                        progress.run_finished(run_stats)
+                        yield progress.event(status_updates[-1])
+
+                if preloader and next_model: preloader.preload(next_model) # Group was empty (e.g. all resumed)
+                if step_cache is not None: reused_steps += step_cache.hits
+                # Optional: Add a print statement indicating completion for the current model
+                print(f"\n===== Finished all tasks for {model_label} =====")
 
     finally:
         # --- Ensure all prompt files are closed ---
-        closed_count = 0
-        print("Closing prompt output files...")
-        for model_key, handle in prompt_file_handles.items():
-            try:
-                if handle and not handle.closed:
-                    handle.close()
-                    closed_count += 1
-            except Exception as e_close:
-                print(f"Warning: Error closing prompt file for model '{model_key}': {e_close}")
-        if closed_count > 0: print(f"Closed {closed_count} prompt file(s).")
+        writer.close()
 
 
     # 5. Final Summary
     end_time = time.time()
     duration = end_time - start_time
+    resume_line = f"Already Completed (skipped on resume): {resumed_runs}\n" if resume_from and resume_from.strip() else ""
+    option_line = (f"Option Sets: {len(option_sets)} in {len(option_groups)} runner configuration(s) per model\n"
+                   if option_sets != [{}] else "")
+    prefix_line = (f"Shared Step Prefixes: {reused_steps} step call(s) reused "
+                   f"({prefix_trie.shared_calls} of {prefix_trie.naive_calls} per prompt and model)\n") if share_prefixes else ""
     final_summary = (
         f"--- Sweep Complete ---\n"
-        f"Total Runs Attempted: {completed_runs}/{total_runs}\n"
+        f"Total Runs Attempted: {progress.completed}/{total_runs}\n"
+        f"{resume_line}"
+        f"Model Order: {model_plan.describe()}\n"
+        f"{option_line}"
+        f"{prefix_line}"
         f"Total Duration: {duration:.2f} seconds\n"
-        f"Protocols and Prompt Files saved to: {output_dir}\n\n"
+        f"Protocols and Prompt Files saved to: {output_dir}"
+        f"{f' (protocols in {writer.sink.path})' if writer.sink else ''}\n\n"
         f"Last {len(status_updates)} Run Statuses:\n" + "\n".join(status_updates[-20:]) # Show last 20 statuses
     )
     print(final_summary)
-    # Final progress update if used
-    # progress(1.0, desc="Sweep Complete!")
-    return final_summary
\ No newline at end of file
+    yield progress.event(status_updates[-1] if status_updates else "", done=True, summary=final_summary)
+
+
+def run_sweep(*args, **kwargs) -> str:
+    """
+    Runs a whole sweep (same arguments as run_sweep_iter) and returns the
+    final summary message, or an "Error: ..." message.
+    """
+    event = None
+    for event in run_sweep_iter(*args, **kwargs):
+        pass
+    return event["summary"]
+
+
+def run_sweep_with_progress(
+    base_prompts_text: str,
+    selected_teams: list[str],
+    selected_models: list[str],
+    output_folder_name: str,
+    log_intermediate: bool,
+    settings: dict,
+    all_teams_data: dict,
+    concurrency: int | None = None,
+    resume_from: str = "",
+    result_sink: str | None = None,
+    use_workers: bool = False,
+    option_space=None,
+    option_mode: str | None = None,
+    option_samples: int | None = None
+    ):
+    """
+    Sweep tab handler: runs run_sweep_iter (or, with use_workers, the queued
+    multi-process sweep of core/sweep_queue.py) and yields the status log text
+    (live progress line plus the latest run statuses, then the summary).
+    """
+    if use_workers:
+        option_sets, error = resolve_option_sets(settings, option_space, option_mode, option_samples)
+        if error:
+            yield error; return
+        if option_sets != [{}]:
+            yield "Error: Option sweeps run in this process only; turn off worker processes to sweep Ollama options."
+            return
+    if use_workers:
+        from .sweep_queue import run_sweep_distributed_iter # Imported here: sweep_queue builds on this module
+        events = run_sweep_distributed_iter(base_prompts_text, selected_teams, selected_models, output_folder_name, log_intermediate,
+                                            settings, all_teams_data, resume_from, result_sink,
+                                            workers_per_endpoint=settings.get("sweep_workers_per_endpoint", 1))
+    else:
+        events = run_sweep_iter(base_prompts_text, selected_teams, selected_models, output_folder_name, log_intermediate,
+                                settings, all_teams_data, concurrency, resume_from, result_sink,
+                                option_space, option_mode, option_samples)
+    recent = deque(maxlen=SWEEP_LOG_LINES)
+    for event in events:
+        if event["done"]:
+            yield event["summary"]
+            return
+        if event["last_status"]: recent.append(event["last_status"])
+        yield format_sweep_progress(event) + "\n\n" + "\n".join(recent)
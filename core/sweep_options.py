@@ -0,0 +1,165 @@
+# ArtAgent/core/sweep_options.py
+import hashlib
+import itertools
+import json
+import math
+import random
+
+SWEEP_OPTION_MODES = ("grid", "random", "lhs")
+SWEEP_OPTION_MODE_CHOICES = { # UI label -> mode
+    "Full grid": "grid",
+    "Random samples": "random",
+    "Latin hypercube": "lhs",
+}
+DEFAULT_OPTION_SAMPLES = 8 # Option sets drawn in 'random'/'lhs' mode
+MAX_OPTION_SETS = 256 # Guard against grids that multiply into an unintended job size
+LOAD_OPTIONS = ("num_ctx", "num_gpu", "main_gpu", "num_batch", "num_thread", "use_mmap") # Changing these makes Ollama reload the model runner
+
+def parse_option_space(spec) -> tuple[dict, str]:
+    """
+    Parses an option space: a JSON object (text or dict) mapping Ollama option
+    names to a list of values, or to a range {"min": a, "max": b} (sampled
+    in 'random'/'lhs' mode; add "steps": n to use it in a grid). Integer
+    bounds give integer samples, e.g.
+    {"temperature": {"min": 0.2, "max": 1.0, "steps": 3}, "num_ctx": [2048, 8192]}.
+
+    Returns:
+        tuple: (space, error_message or "")
+    """
+    if isinstance(spec, str):
+        if not spec.strip(): return {}, ""
+        try: spec = json.loads(spec)
+        except json.JSONDecodeError as e: return {}, f"Error: Option grid is not valid JSON: {e}"
+    if not spec: return {}, ""
+    if not isinstance(spec, dict): return {}, "Error: Option grid must be a JSON object of option -> values."
+    for name, values in spec.items():
+        if isinstance(values, list):
+            if not values: return {}, f"Error: Option '{name}' has an empty value list."
+        elif isinstance(values, dict):
+            low, high = values.get("min"), values.get("max")
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (low, high)) or low > high:
+                return {}, f"Error: Option '{name}' range needs numeric 'min' <= 'max'."
+            if "steps" in values and (not isinstance(values["steps"], int) or values["steps"] < 1):
+                return {}, f"Error: Option '{name}' range 'steps' must be a positive integer."
+        else:
+            return {}, f"Error: Option '{name}' must be a list of values or a {{'min', 'max'}} range."
+    return spec, ""
+
+
+def _is_int_range(values: dict) -> bool:
+    return isinstance(values["min"], int) and isinstance(values["max"], int)
+
+
+def _range_value(values: dict, fraction: float):
+    """Value at `fraction` (0..1) of a range, rounded for integer ranges."""
+    value = values["min"] + fraction * (values["max"] - values["min"])
+    return int(round(value)) if _is_int_range(values) else round(value, 4)
+
+
+def _grid_values(name: str, values) -> list:
+    if isinstance(values, list): return values
+    steps = values.get("steps")
+    if not steps:
+        raise ValueError(f"Option '{name}' is a range without 'steps'; give 'steps' or use random/Latin hypercube sampling.")
+    if _is_int_range(values) and steps > values["max"] - values["min"]: return list(range(values["min"], values["max"] + 1)) # Rounding hits every integer
+    return list(dict.fromkeys(_range_value(values, i / (steps - 1) if steps > 1 else 0.0) for i in range(steps)))
+
+
+def _grid_size(name: str, values) -> int:
+    """Values of one option in a grid, counted without building a long range."""
+    if isinstance(values, list): return len(values)
+    steps = values.get("steps")
+    if not steps: return len(_grid_values(name, values)) # Raises the 'needs steps' error
+    if _is_int_range(values): return min(steps, values["max"] - values["min"] + 1) # Steps at least 1 apart stay distinct; denser ones hit every integer
+    return len(_grid_values(name, values)) if steps <= MAX_OPTION_SETS else steps
+
+
+def count_option_sets(space: dict, mode: str = "grid", samples: int = DEFAULT_OPTION_SAMPLES) -> int:
+    """Option sets expand_option_sets would return (before duplicates are removed), computed without expanding."""
+    if not space: return 1
+    if mode == "grid": return math.prod(_grid_size(name, values) for name, values in space.items())
+    return max(1, int(samples))
+
+
+def expand_option_sets(space: dict, mode: str = "grid", samples: int = DEFAULT_OPTION_SAMPLES, seed=None) -> list:
+    """
+    Turns an option space into the list of option dicts a sweep runs.
+    'grid' is the full cross product. 'random' draws `samples` independent
+    sets. 'lhs' (Latin hypercube) splits every option's range into `samples`
+    equal strata and uses each stratum exactly once per option, so few
+    samples still cover every option's whole range. An empty space gives [{}]
+    (the settings' options unchanged).
+    """
+    if not space: return [{}]
+    names = list(space)
+    if mode == "grid":
+        return [dict(zip(names, combo)) for combo in itertools.product(*(_grid_values(n, space[n]) for n in names))]
+    rng = random.Random(seed)
+    samples = max(1, int(samples))
+    if mode == "random":
+        fractions = {name: [rng.random() for _ in range(samples)] for name in names}
+    elif mode == "lhs":
+        # One random permutation of the strata per option, one point inside each stratum
+        fractions = {name: [(stratum + rng.random()) / samples for stratum in rng.sample(range(samples), samples)] for name in names}
+    else:
+        raise ValueError(f"Unknown option sweep mode '{mode}' (expected one of {', '.join(SWEEP_OPTION_MODES)}).")
+
+    def value_at(values, fraction):
+        return values[min(int(fraction * len(values)), len(values) - 1)] if isinstance(values, list) else _range_value(values, fraction)
+    return [{name: value_at(space[name], fractions[name][i]) for name in names} for i in range(samples)]
+
+
+def load_options_key(options: dict) -> tuple:
+    """The part of an option set that decides whether Ollama has to reload the model runner."""
+    return tuple((name, json.dumps(options[name])) for name in LOAD_OPTIONS if name in options)
+
+
+def group_option_sets(option_sets: list) -> list:
+    """
+    Groups option sets by load_options_key (first-seen order), so a sweep runs
+    all sets sharing a runner configuration (e.g. num_ctx) back to back and
+    Ollama reloads the model at most once per group.
+    """
+    groups = {}
+    for options in option_sets:
+        groups.setdefault(load_options_key(options), []).append(options)
+    return list(groups.values())
+
+
+def option_set_id(options: dict | None) -> str:
+    """Short stable hash of an option set ('' for none), part of the run_id of option sweeps."""
+    if not options: return ""
+    return hashlib.md5(json.dumps(options, sort_keys=True).encode()).hexdigest()[:6]
+
+
+def describe_option_set(options: dict | None) -> str:
+    return ", ".join(f"{name}={value}" for name, value in (options or {}).items())
+
+
+def resolve_option_sets(settings: dict, option_space=None, mode=None, samples=None) -> tuple[list, str]:
+    """
+    Option sets of a sweep from the UI values, else settings["sweep_option_space"],
+    settings["sweep_option_mode"] (default 'grid') and settings["sweep_option_samples"];
+    settings["sweep_option_seed"] makes random/LHS draws repeatable.
+
+    Returns:
+        tuple: (option_sets, error_message or "") with [{}] when no space is given.
+    """
+    settings = settings or {}
+    space, error = parse_option_space(option_space if option_space not in (None, "") else settings.get("sweep_option_space", {}))
+    if error: return [], error
+    mode = mode if mode not in (None, "") else settings.get("sweep_option_mode", "grid")
+    mode = SWEEP_OPTION_MODE_CHOICES.get(mode, str(mode).strip().lower())
+    try:
+        samples = int(samples if samples not in (None, "") else settings.get("sweep_option_samples", DEFAULT_OPTION_SAMPLES))
+        count = count_option_sets(space, mode, samples) if mode in SWEEP_OPTION_MODES else 0 # Unknown modes fail in expand_option_sets
+        if count > MAX_OPTION_SETS: # Checked before expanding: a large grid would take long just to build
+            hint = "use random or Latin hypercube sampling" if mode == "grid" else "draw fewer samples"
+            return [], f"Error: Option grid expands to {count} option sets (limit {MAX_OPTION_SETS}); {hint}."
+        option_sets = expand_option_sets(space, mode, samples, settings.get("sweep_option_seed"))
+    except (ValueError, TypeError) as e:
+        return [], f"Error: {e}"
+    unique = list({option_set_id(o): o for o in option_sets}.values()) # Repeated draws would be the same runs
+    if len(unique) > MAX_OPTION_SETS:
+        return [], f"Error: Option grid expands to {len(unique)} option sets (limit {MAX_OPTION_SETS}); use random or Latin hypercube sampling."
+    return unique, ""
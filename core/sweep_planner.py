@@ -0,0 +1,114 @@
+# ArtAgent/core/sweep_planner.py
+import threading
+import time
+from . import ollama_manager
+
+DEFAULT_LOAD_SECONDS = 10.0 # Assumed load time of a model whose size is unknown
+LOAD_BYTES_PER_SECOND = 1.0e9 # Rough disk -> (V)RAM throughput for size-based load estimates
+DEFAULT_SWEEP_KEEP_ALIVE = "10m" # How long a preloaded model stays resident before its first request
+
+_observed_load_seconds = {} # model -> measured preload duration (seconds) in this process
+_observed_lock = threading.Lock()
+
+def normalize_model_name(model_name: str) -> str:
+    """Ollama reports untagged models as '<name>:latest'."""
+    model_name = (model_name or "").strip()
+    return model_name if not model_name or ":" in model_name else f"{model_name}:latest"
+
+
+def record_load_seconds(model_name: str, seconds: float):
+    with _observed_lock:
+        _observed_load_seconds[normalize_model_name(model_name)] = seconds
+
+
+def estimate_load_seconds(model_name: str, model_sizes: dict) -> float:
+    """Measured load time if this process has loaded the model before, else estimated from its size on disk."""
+    name = normalize_model_name(model_name)
+    with _observed_lock:
+        if name in _observed_load_seconds:
+            return _observed_load_seconds[name]
+    size = model_sizes.get(name) or model_sizes.get(model_name)
+    return size / LOAD_BYTES_PER_SECOND if size else DEFAULT_LOAD_SECONDS
+
+
+def plan_model_order(models: list, resident: set, load_seconds: dict) -> list:
+    """
+    Orders model groups to keep loads off the critical path: models already in
+    memory run first (no load, and they are not evicted before use), then the
+    rest cheapest first, so the only un-overlapped load is the shortest one and
+    each later load is hidden behind the previous group by preloading.
+    Ties keep the selection order.
+    """
+    unique = list(dict.fromkeys(models))
+    warm = [m for m in unique if normalize_model_name(m) in resident]
+    cold = sorted((m for m in unique if normalize_model_name(m) not in resident),
+                  key=lambda m: (load_seconds.get(m, DEFAULT_LOAD_SECONDS), unique.index(m)))
+    return warm + cold
+
+
+class SweepModelPlan:
+    """Model execution order of a sweep plus what the planner knew when choosing it."""
+    def __init__(self, order: list, resident: set | None = None, load_seconds: dict | None = None):
+        self.order = order
+        self.resident = resident or set()
+        self.load_seconds = load_seconds or {}
+
+    def describe(self) -> str:
+        parts = []
+        for model in self.order:
+            if normalize_model_name(model) in self.resident: parts.append(f"{model} (resident)")
+            elif model in self.load_seconds: parts.append(f"{model} (~{self.load_seconds[model]:.0f}s load)")
+            else: parts.append(model)
+        return " -> ".join(parts)
+
+
+def plan_sweep_models(selected_models: list, settings: dict) -> SweepModelPlan:
+    """
+    Asks Ollama what is resident (/api/ps) and how big the other models are
+    (/api/tags), and orders the models with plan_model_order. Without a
+    reachable Ollama the selection order is kept.
+    """
+    ollama_url = (settings or {}).get("ollama_url", "")
+    running = ollama_manager.list_running_models(ollama_url) if ollama_url else None
+    if running is None:
+        return SweepModelPlan(list(dict.fromkeys(selected_models)))
+    resident = {normalize_model_name(m["name"]) for m in running}
+    sizes = {normalize_model_name(name): size for name, size in ollama_manager.list_local_model_sizes(ollama_url).items()}
+    load_seconds = {m: estimate_load_seconds(m, sizes) for m in selected_models if normalize_model_name(m) not in resident}
+    plan = SweepModelPlan(plan_model_order(selected_models, resident, load_seconds), resident, load_seconds)
+    print(f"Sweep model plan: {plan.describe()}")
+    return plan
+
+
+class ModelPreloader:
+    """
+    Loads the next model of a sweep in a background thread (once per model)
+    while the current group's last runs finish. Measured load times feed
+    later estimates. Needs Ollama to be able to hold both models at once
+    (OLLAMA_MAX_LOADED_MODELS >= 2 and enough memory); otherwise Ollama
+    queues the load until the current model is idle.
+    """
+    def __init__(self, ollama_url: str, keep_alive=DEFAULT_SWEEP_KEEP_ALIVE, resident: set | None = None):
+        self.ollama_url = ollama_url
+        self.keep_alive = keep_alive
+        self.resident = set(resident or ())
+        self._threads = {}
+
+    def preload(self, model_name: str) -> bool:
+        """Starts preloading model_name unless it is resident or already being preloaded. Returns True if started."""
+        if not model_name or model_name in self._threads or normalize_model_name(model_name) in self.resident:
+            return False
+        thread = threading.Thread(target=self._load, args=(model_name,), name=f"sweep-preload-{model_name}", daemon=True)
+        self._threads[model_name] = thread
+        thread.start()
+        return True
+
+    def _load(self, model_name: str):
+        start = time.perf_counter()
+        msg = ollama_manager.preload_model(model_name, self.ollama_url, self.keep_alive)
+        if not msg.startswith("Error") and not msg.startswith("Skipping"):
+            record_load_seconds(model_name, time.perf_counter() - start)
+
+    def wait(self, timeout: float | None = None):
+        for thread in list(self._threads.values()):
+            thread.join(timeout)
@@ -0,0 +1,89 @@
+# ArtAgent/core/sweep_prefix.py
+import threading
+
+class PrefixTrie:
+    """
+    Trie of the step prefixes of a set of teams. A node is one workflow step;
+    two teams share a node when everything that goes into that step's prompt
+    is identical: the team description (part of every step's context) and the
+    role/goal of this and all earlier steps. Counts are per (prompt, model).
+    """
+    def __init__(self):
+        self.root = {}
+        self.naive_calls = 0 # Step LLM calls if every team ran on its own
+
+    def add_team(self, team_definition: dict, all_roles_data: dict):
+        node = self.root.setdefault(("description", team_definition.get("description", "Generate detailed output.")), {})
+        for i, step in enumerate(team_definition.get("steps", [])):
+            role = step.get("role")
+            if not role: continue # Skipped by run_team_workflow, no call and no context change
+            role_desc = (all_roles_data.get(role) or {}).get("description", "Perform your function.")
+            node = node.setdefault((i + 1, role, role_desc, step.get("goal", f"Execute step {i + 1}")), {})
+            self.naive_calls += 1
+
+    @property
+    def unique_calls(self) -> int:
+        """Step LLM calls when each unique prefix runs once."""
+        def count(node):
+            return sum(1 + count(child) for child in node.values())
+        return sum(count(child) for child in self.root.values())
+
+    @property
+    def shared_calls(self) -> int:
+        return self.naive_calls - self.unique_calls
+
+
+def build_prefix_trie(team_names: list, all_teams_data: dict, all_roles_data: dict) -> PrefixTrie:
+    trie = PrefixTrie()
+    for name in team_names:
+        if isinstance(all_teams_data.get(name), dict):
+            trie.add_team(all_teams_data[name], all_roles_data)
+    return trie
+
+
+class StepOutputCache:
+    """
+    Thread-safe memo of workflow step outputs for run_team_workflow(step_cache=...).
+    Keys include the full step prompt, which embeds the whole prefix (request,
+    team description and earlier step outputs), so a hit is exactly a shared
+    trie node. Concurrent runs asking for a step that is being computed wait
+    for it instead of calling the LLM again. Error outputs are not kept: runs
+    waiting on a step that failed compute it themselves.
+    """
+    def __init__(self):
+        self._results = {}
+        self._pending = {} # key -> threading.Event set when the first caller finishes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute) -> tuple[str, bool]:
+        """Returns (output, reused)."""
+        while True:
+            with self._lock:
+                if key in self._results:
+                    self.hits += 1
+                    return self._results[key], True
+                event = self._pending.get(key)
+                if event is None:
+                    event = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+            event.wait()
+            with self._lock:
+                if key in self._results:
+                    self.hits += 1
+                    return self._results[key], True
+                # The first caller failed; loop around and compute it ourselves
+        try:
+            output = compute()
+        except BaseException:
+            with self._lock: self._pending.pop(key, None)
+            event.set()
+            raise
+        with self._lock:
+            if not output.strip().startswith("⚠️ Error:"):
+                self._results[key] = output
+            self._pending.pop(key, None)
+        event.set()
+        return output, False
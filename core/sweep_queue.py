@@ -0,0 +1,373 @@
+# ArtAgent/core/sweep_queue.py
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from .utils import PROJECT_ROOT
+from .ollama_manager import resolve_ollama_endpoints
+from . import sweep_manager
+from .sweep_manager import (make_run_id, prepare_sweep, resolve_resume_dir, SweepOutputWriter, SweepProgress,
+                            _execute_sweep_run, _final_event)
+from .sweep_store import resolve_sweep_sink, detect_sweep_sink, open_sweep_sink
+
+QUEUE_FILENAME = "sweep_queue.sqlite" # Written inside the sweep run folder
+DEFAULT_LEASE_SECONDS = 300 # A task whose worker stops renewing its lease this long is handed to another worker
+MAX_TASK_ATTEMPTS = 3 # Failed or abandoned tasks are retried up to this many claims in total
+WORKER_POLL_INTERVAL = 2.0 # Seconds an idle worker waits before asking again (other workers' leases may expire)
+PROGRESS_POLL_INTERVAL = 2.0 # Seconds between queue polls of the Sweep tab
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+class SweepQueue:
+    """
+    Durable task queue of one sweep in <sweep folder>/QUEUE_FILENAME (SQLite, WAL).
+
+    Each task is one prompt x team x model run. Workers claim a task with a
+    lease that they renew while it runs; a task whose lease expired (worker
+    crashed or host went away) can be claimed again. Workers stay on the model
+    they last ran (its Ollama endpoint keeps it loaded) and, when that model's
+    tasks run out, steal from the model with the largest backlog. The sweep
+    configuration is stored alongside, so workers need only the folder.
+    """
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, QUEUE_FILENAME)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None) # Explicit transactions
+        self._lock = threading.Lock() # Shared by a worker's run and lease-renewal threads
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS tasks (task_id INTEGER PRIMARY KEY, run_id TEXT UNIQUE, base_prompt TEXT NOT NULL, "
+                               "prompt_label TEXT, team TEXT NOT NULL, model TEXT NOT NULL, status TEXT NOT NULL, worker TEXT, "
+                               "lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, run_status TEXT, eval_tokens INTEGER, updated REAL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_model ON tasks (status, model)")
+
+    @staticmethod
+    def exists(output_dir: str) -> bool:
+        return os.path.exists(os.path.join(output_dir, QUEUE_FILENAME))
+
+    def set_config(self, config: dict):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('config', ?)", (json.dumps(config),))
+
+    def get_config(self) -> dict:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def enqueue(self, tasks: list) -> int:
+        """Adds (base_prompt, prompt_label, team, model) tasks; runs already queued are kept. Returns the count added."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany("INSERT OR IGNORE INTO tasks (run_id, base_prompt, prompt_label, team, model, status, updated) "
+                                       "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                       [(make_run_id(p, t, m), p, label, t, m, STATUS_PENDING, now) for p, label, t, m in tasks])
+                added = self._conn.total_changes - before
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def claim(self, worker_id: str, preferred_model: str | None = None, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+              now: float | None = None) -> dict | None:
+        """
+        Leases the next task to worker_id: one of preferred_model if any is
+        claimable, else the first task of the model with the most claimable
+        tasks (work stealing). Pending tasks and tasks with expired leases are
+        claimable. Returns the task dict, or None if nothing is claimable now.
+        """
+        now = time.time() if now is None else now
+        claimable = f"(status = '{STATUS_PENDING}' OR (status = '{STATUS_LEASED}' AND lease_expires < ?)) AND attempts < {MAX_TASK_ATTEMPTS}"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE") # One claimer at a time across processes
+            try:
+                # Abandoned tasks that used up their attempts are given up on
+                self._conn.execute(f"UPDATE tasks SET status = '{STATUS_FAILED}', run_status = 'Error: worker lease expired too often', updated = ? "
+                                   f"WHERE status = '{STATUS_LEASED}' AND lease_expires < ? AND attempts >= {MAX_TASK_ATTEMPTS}", (now, now))
+                row = None
+                if preferred_model:
+                    row = self._conn.execute(f"SELECT task_id FROM tasks WHERE {claimable} AND model = ? ORDER BY task_id LIMIT 1",
+                                             (now, preferred_model)).fetchone()
+                if row is None:
+                    row = self._conn.execute(f"SELECT task_id FROM tasks WHERE {claimable} AND model = (SELECT model FROM tasks WHERE {claimable} "
+                                             f"GROUP BY model ORDER BY COUNT(*) DESC, MIN(task_id) LIMIT 1) ORDER BY task_id LIMIT 1",
+                                             (now, now)).fetchone()
+                task = None
+                if row is not None:
+                    self._conn.execute(f"UPDATE tasks SET status = '{STATUS_LEASED}', worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? "
+                                       "WHERE task_id = ?", (worker_id, now + lease_seconds, now, row[0]))
+                    cursor = self._conn.execute("SELECT task_id, run_id, base_prompt, prompt_label, team, model, attempts FROM tasks WHERE task_id = ?", (row[0],))
+                    task = dict(zip([c[0] for c in cursor.description], cursor.fetchone()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return task
+
+    def renew(self, task_id: int, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extends a lease the worker still holds. Returns False if the task was taken over."""
+        with self._lock:
+            cursor = self._conn.execute(f"UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND worker = ? AND status = '{STATUS_LEASED}'",
+                                        (time.time() + lease_seconds, task_id, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, task_id: int, worker_id: str, run_status: str, eval_tokens: int = 0) -> bool:
+        """Records a finished run. Failed runs go back to pending until MAX_TASK_ATTEMPTS."""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE tasks SET status = CASE WHEN ? = 'Success' THEN '{STATUS_DONE}' WHEN attempts >= {MAX_TASK_ATTEMPTS} THEN '{STATUS_FAILED}' "
+                f"ELSE '{STATUS_PENDING}' END, run_status = ?, eval_tokens = ?, lease_expires = NULL, updated = ? "
+                f"WHERE task_id = ? AND worker = ? AND status = '{STATUS_LEASED}'",
+                (run_status, run_status, eval_tokens, time.time(), task_id, worker_id))
+        return cursor.rowcount == 1
+
+    def requeue_failed(self) -> int:
+        """Gives failed tasks a fresh set of attempts (a resumed sweep retries them). Returns the count."""
+        with self._lock:
+            cursor = self._conn.execute(f"UPDATE tasks SET status = '{STATUS_PENDING}', attempts = 0, updated = ? WHERE status = '{STATUS_FAILED}'",
+                                        (time.time(),))
+        return cursor.rowcount
+
+    def counts(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in (STATUS_PENDING, STATUS_LEASED, STATUS_DONE, STATUS_FAILED)}
+
+    def finished_tasks(self) -> list:
+        """(task_id, run_id, team, model, status, run_status, eval_tokens) of done and failed tasks, in task order."""
+        with self._lock:
+            return self._conn.execute(f"SELECT task_id, run_id, team, model, status, run_status, eval_tokens FROM tasks "
+                                      f"WHERE status IN ('{STATUS_DONE}', '{STATUS_FAILED}') ORDER BY task_id").fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_sweep_queue(base_prompts_text: str, selected_teams: list, selected_models: list, output_folder_name: str,
+                       log_intermediate: bool, settings: dict, all_teams_data: dict, resume_from: str = "",
+                       result_sink: str | None = None) -> tuple[str, str]:
+    """
+    Creates (or, with resume_from, extends) a sweep folder with a task queue
+    holding every prompt x team x model run not already completed there.
+
+    Returns:
+        tuple: (status message or "Error: ...", output_dir)
+    """
+    prompts, output_dir, completed_run_ids, error = prepare_sweep(base_prompts_text, selected_teams, selected_models,
+                                                                  output_folder_name, resume_from)
+    if error:
+        return error, output_dir
+    resumed = bool(resume_from and resume_from.strip())
+    sink = (detect_sweep_sink(output_dir) if resumed else None) or resolve_sweep_sink(settings, result_sink)
+    tasks, missing_teams = [], sorted(t for t in selected_teams if not all_teams_data.get(t))
+    for model in dict.fromkeys(selected_models):
+        for p_idx, prompt in enumerate(prompts):
+            for team in selected_teams:
+                if team not in missing_teams and make_run_id(prompt, team, model) not in completed_run_ids:
+                    tasks.append((prompt, f"Prompt {p_idx+1}/{len(prompts)}", team, model))
+    try:
+        queue = SweepQueue(output_dir)
+        config = queue.get_config() if resumed else {}
+        if resumed: queue.requeue_failed()
+        config.update({"log_intermediate": bool(log_intermediate), "result_sink": sink,
+                       "settings": {k: v for k, v in (settings or {}).items() if _json_safe(v)},
+                       "teams": {**config.get("teams", {}), **{t: all_teams_data[t] for t in selected_teams if t not in missing_teams}}})
+        queue.set_config(config)
+        added = queue.enqueue(tasks)
+        queue.close()
+    except Exception as e:
+        return f"Error creating sweep queue in '{output_dir}': {e}", output_dir
+    msg = f"Sweep queue ready in {output_dir}: {added} run(s) queued"
+    if completed_run_ids: msg += f", {len(completed_run_ids)} already completed"
+    if missing_teams: msg += f" (team definition(s) not found: {', '.join(missing_teams)})"
+    print(msg + ".")
+    return msg + ".", output_dir
+
+
+def _json_safe(value) -> bool:
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def run_sweep_worker(output_dir: str, worker_id: str | None = None, ollama_url: str | None = None,
+                     lease_seconds: float = DEFAULT_LEASE_SECONDS, poll_interval: float = WORKER_POLL_INTERVAL,
+                     stop_event: threading.Event | None = None) -> str:
+    """
+    Executes queued runs of a sweep folder until none are left (or stop_event
+    is set). Bound to one Ollama endpoint (ollama_url, else the sweep's
+    settings). Protocols and prompt files land in the sweep folder as with
+    run_sweep. Returns a short summary.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    if not SweepQueue.exists(output_dir):
+        return f"Error: No sweep queue in '{output_dir}'."
+    queue = SweepQueue(output_dir)
+    config = queue.get_config()
+    settings = dict(config.get("settings", {}))
+    if ollama_url: settings["ollama_url"] = ollama_url
+    try:
+        all_roles_data = sweep_manager.load_all_roles(settings, file_agents={})
+        writer = SweepOutputWriter(output_dir, open_sweep_sink(output_dir, config.get("result_sink", "json")))
+    except Exception as e:
+        queue.close()
+        return f"Error: Worker {worker_id} could not start: {e}"
+    print(f"Sweep worker {worker_id} started on {output_dir} (Ollama: {settings.get('ollama_url')}).")
+
+    executed = failed = 0
+    current_model = None
+    try:
+        while not (stop_event and stop_event.is_set()):
+            task = queue.claim(worker_id, current_model, lease_seconds)
+            if task is None:
+                counts = queue.counts()
+                if not counts[STATUS_PENDING] and not counts[STATUS_LEASED]:
+                    break # Everything is done or given up on
+                time.sleep(poll_interval) # Other workers' runs may still fail or expire
+                continue
+            current_model = task["model"]
+            renewing = threading.Event()
+            def renew_lease(task_id=task["task_id"]):
+                while not renewing.wait(lease_seconds / 3):
+                    if not queue.renew(task_id, worker_id, lease_seconds):
+                        print(f"Warning: Worker {worker_id} lost the lease of task {task_id}.")
+                        return
+            renewer = threading.Thread(target=renew_lease, name=f"lease-{task['task_id']}", daemon=True)
+            renewer.start()
+            try:
+                team_definition = config.get("teams", {}).get(task["team"], {})
+                _, run_status, run_stats = _execute_sweep_run(task["base_prompt"], task["prompt_label"], task["team"], team_definition,
+                                                              task["model"], config.get("log_intermediate", False), settings,
+                                                              all_roles_data, writer)
+            except Exception as e: # _execute_sweep_run handles its own errors; this is a safety net
+                run_status, run_stats = f"Error: {e}", {}
+            finally:
+                renewing.set()
+            queue.complete(task["task_id"], worker_id, run_status, run_stats.get("eval_tokens", 0))
+            executed += 1
+            if run_status != "Success": failed += 1
+    finally:
+        writer.close()
+        queue.close()
+    summary = f"Sweep worker {worker_id} finished: {executed} run(s) executed, {failed} not successful."
+    print(summary)
+    return summary
+
+
+def launch_sweep_workers(output_dir: str, settings: dict, workers_per_endpoint: int = 1) -> list:
+    """
+    Starts detached worker processes (python -m core.sweep_queue worker ...),
+    workers_per_endpoint for each Ollama endpoint (settings["ollama_endpoints"],
+    else ollama_url). They keep running if the app exits; output goes to
+    worker_<n>.log in the sweep folder.
+
+    Returns:
+        list[subprocess.Popen]: The started processes.
+    """
+    detach = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt" else {"start_new_session": True}
+    processes = []
+    for e_idx, endpoint in enumerate(resolve_ollama_endpoints(settings)):
+        for w_idx in range(max(1, int(workers_per_endpoint))):
+            worker_id = f"{socket.gethostname()}-w{e_idx}.{w_idx}-{uuid.uuid4().hex[:8]}" # Unique per launch: earlier detached workers may still hold leases
+            command = [sys.executable, "-m", "core.sweep_queue", "worker", output_dir, "--worker-id", worker_id]
+            if endpoint: command += ["--endpoint", endpoint]
+            with open(os.path.join(output_dir, f"worker_{e_idx}.{w_idx}.log"), 'a', encoding='utf-8') as log:
+                processes.append(subprocess.Popen(command, cwd=PROJECT_ROOT, stdout=log, stderr=subprocess.STDOUT, **detach))
+    print(f"Launched {len(processes)} sweep worker process(es) for {output_dir}.")
+    return processes
+
+
+def run_sweep_distributed_iter(base_prompts_text: str, selected_teams: list, selected_models: list, output_folder_name: str,
+                               log_intermediate: bool, settings: dict, all_teams_data: dict, resume_from: str = "",
+                               result_sink: str | None = None, workers_per_endpoint: int = 1,
+                               launch_workers=launch_sweep_workers, poll_interval: float = PROGRESS_POLL_INTERVAL):
+    """
+    Queues a sweep (see create_sweep_queue), starts worker processes and
+    yields the same progress events as run_sweep_iter while they work.
+    A folder that already has a queue is picked up where it stopped. If every
+    worker exits with runs left, the final event says how to continue.
+    """
+    start = time.perf_counter()
+    msg, output_dir = create_sweep_queue(base_prompts_text, selected_teams, selected_models, output_folder_name,
+                                         log_intermediate, settings, all_teams_data, resume_from, result_sink)
+    if msg.startswith("Error"):
+        yield _final_event(msg); return
+    queue = SweepQueue(output_dir)
+    try:
+        initial = queue.counts()
+        total = sum(initial.values())
+        progress = SweepProgress(total)
+        seen = set()
+        for row in queue.finished_tasks(): # Finished before this call (resumed queue)
+            seen.add(row[0]); progress.run_skipped()
+        processes = launch_workers(output_dir, settings, workers_per_endpoint)
+        yield progress.event(msg)
+        while True:
+            for task_id, run_id, team, model, status, run_status, eval_tokens in queue.finished_tasks():
+                if task_id in seen: continue
+                seen.add(task_id)
+                progress.run_finished({"eval_tokens": eval_tokens or 0})
+                yield progress.event(f"Run {progress.completed}: Team '{team}', Model '{model}' -> {(run_status or '')[:100]}")
+            counts = queue.counts()
+            if not counts[STATUS_PENDING] and not counts[STATUS_LEASED]:
+                break
+            if processes and all(p.poll() is not None for p in processes):
+                break # Workers gone (crashed or stopped); the queue keeps the remaining runs
+            time.sleep(poll_interval)
+    finally:
+        queue.close()
+    remaining = counts[STATUS_PENDING] + counts[STATUS_LEASED]
+    summary = (f"--- Distributed Sweep {'Complete' if not remaining else 'Stopped'} ---\n"
+               f"Runs: {counts[STATUS_DONE]} succeeded, {counts[STATUS_FAILED]} failed, {remaining} left of {total}\n"
+               f"Total Duration: {time.perf_counter() - start:.2f} seconds\n"
+               f"Protocols and Prompt Files saved to: {output_dir}\n")
+    if remaining:
+        summary += f"Continue with: python -m core.sweep_queue worker \"{output_dir}\" (or resume the folder from the Sweep tab)\n"
+    print(summary)
+    yield progress.event(done=True, summary=summary)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.sweep_queue", description="Run or inspect queued ArtAgent sweeps.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Execute queued runs of a sweep folder until none are left.")
+    worker.add_argument("folder", help="Sweep folder (sweep_runs/<run> name or path).")
+    worker.add_argument("--endpoint", default=None, help="Ollama generate URL for this worker (default: the sweep's settings).")
+    worker.add_argument("--worker-id", default=None, help="Name shown in the queue (default: host-pid).")
+    worker.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS, help="Lease seconds before a silent worker's run is reassigned.")
+    status = sub.add_parser("status", help="Show task counts of a sweep folder.")
+    status.add_argument("folder")
+    args = parser.parse_args(argv)
+
+    output_dir = resolve_resume_dir(args.folder)
+    if args.command == "worker":
+        print(run_sweep_worker(output_dir, args.worker_id, args.endpoint, args.lease))
+        return 0
+    if not SweepQueue.exists(output_dir):
+        print(f"Error: No sweep queue in '{output_dir}'.")
+        return 1
+    queue = SweepQueue(output_dir)
+    print(", ".join(f"{k}: {v}" for k, v in queue.counts().items()))
+    queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# ArtAgent/core/sweep_store.py
+import hashlib
+import json
+import os
+import sqlite3
+from .file_lock import FileLock
+
+SWEEP_SINKS = ("json", "jsonl", "sqlite")
+DEFAULT_SWEEP_SINK = "json" # One pretty-printed protocol file per run (the classic layout)
+JSONL_RESULTS_FILENAME = "sweep_results.jsonl" # Written inside the sweep run folder
+SQLITE_RESULTS_FILENAME = "sweep_results.sqlite"
+SWEEP_SINK_CHOICES = { # UI label -> sink
+    "JSON file per run": "json",
+    "Single JSONL file": "jsonl",
+    "Single SQLite file": "sqlite",
+}
+INDEXED_COLUMNS = ("run_id", "prompt_hash", "team", "model", "status", "timestamp_utc", "duration_seconds")
+
+def prompt_hash(base_prompt: str) -> str:
+    """Short stable hash of a base prompt (the first part of a run_id)."""
+    return hashlib.md5(base_prompt.encode()).hexdigest()[:8]
+
+
+def resolve_sweep_sink(settings: dict, requested=None) -> str:
+    """Returns the result sink: UI choice (label or name), else settings["sweep_result_sink"], else 'json'."""
+    value = requested if requested not in (None, "") else (settings or {}).get("sweep_result_sink", DEFAULT_SWEEP_SINK)
+    value = SWEEP_SINK_CHOICES.get(value, str(value).strip().lower())
+    return value if value in SWEEP_SINKS else DEFAULT_SWEEP_SINK
+
+
+def detect_sweep_sink(output_dir: str) -> str | None:
+    """Sink already used by a sweep folder (so a resumed sweep keeps writing to it), or None."""
+    if os.path.exists(os.path.join(output_dir, SQLITE_RESULTS_FILENAME)): return "sqlite"
+    if os.path.exists(os.path.join(output_dir, JSONL_RESULTS_FILENAME)): return "jsonl"
+    return None
+
+
+def protocol_record(protocol: dict) -> dict:
+    """Flattens a run protocol into the indexed columns plus the full protocol."""
+    metadata = protocol.get("sweep_metadata", {})
+    configuration = protocol.get("configuration", {})
+    return {
+        "run_id": metadata.get("run_id"),
+        "prompt_hash": prompt_hash(metadata.get("base_user_prompt", "")),
+        "team": configuration.get("agent_team_name"),
+        "model": configuration.get("worker_model"),
+        "status": protocol.get("status"),
+        "timestamp_utc": metadata.get("timestamp_utc"),
+        "duration_seconds": metadata.get("duration_seconds"),
+        "protocol": protocol,
+    }
+
+
+class JsonlSweepSink:
+    """
+    Appends one JSON line per run to JSONL_RESULTS_FILENAME. A re-run (resume)
+    appends a newer line for the same run_id; readers keep the last one.
+    Each line is written whole under the file's FileLock, so queue workers in
+    other processes (see sweep_queue) appending to the same folder never interleave.
+    """
+    sink = "jsonl"
+
+    def __init__(self, output_dir: str):
+        self.path = os.path.join(output_dir, JSONL_RESULTS_FILENAME)
+        self._handle = open(self.path, 'ab')
+
+    def append(self, protocol: dict) -> bool:
+        line = (json.dumps(protocol_record(protocol), ensure_ascii=False) + "\n").encode('utf-8')
+        with FileLock(self.path):
+            self._handle.write(line)
+            self._handle.flush() # Complete before the lock is released (and if the sweep dies later)
+        return True
+
+    def close(self):
+        if not self._handle.closed: self._handle.close()
+
+
+class SQLiteSweepSink:
+    """One row per run in SQLITE_RESULTS_FILENAME, indexed by prompt hash, team, model and status."""
+    sink = "sqlite"
+
+    def __init__(self, output_dir: str):
+        self.path = os.path.join(output_dir, SQLITE_RESULTS_FILENAME)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, prompt_hash TEXT, team TEXT, model TEXT, "
+                               "status TEXT, timestamp_utc TEXT, duration_seconds REAL, protocol TEXT NOT NULL)")
+            for column in ("prompt_hash", "team", "model", "status"):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_runs_{column} ON runs ({column})")
+
+    def append(self, protocol: dict) -> bool:
+        record = protocol_record(protocol)
+        record["protocol"] = json.dumps(protocol, ensure_ascii=False)
+        with self._conn:
+            self._conn.execute(f"INSERT OR REPLACE INTO runs ({', '.join(INDEXED_COLUMNS)}, protocol) VALUES ({', '.join('?' * (len(INDEXED_COLUMNS) + 1))})",
+                               [record[c] for c in INDEXED_COLUMNS] + [record["protocol"]])
+        return True
+
+    def close(self):
+        self._conn.close()
+
+
+def open_sweep_sink(output_dir: str, sink: str):
+    """Returns a sink writer for 'jsonl'/'sqlite', or None for per-run JSON files."""
+    if sink == "jsonl": return JsonlSweepSink(output_dir)
+    if sink == "sqlite": return SQLiteSweepSink(output_dir)
+    return None
+
+
+def query_sweep_results(output_dir: str, include_protocol: bool = False, **filters) -> list:
+    """
+    Returns the run records of a sweep folder, whichever way it was stored
+    (SQLite, JSONL or per-run protocol JSON files), optionally filtered by
+    exact column values, e.g. query_sweep_results(d, model="llama3", status="Success").
+
+    Returns:
+        list[dict]: Records with the INDEXED_COLUMNS (plus 'protocol' if requested).
+    """
+    unknown = set(filters) - set(INDEXED_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown sweep result column(s): {', '.join(sorted(unknown))}")
+    filters = {k: v for k, v in filters.items() if v is not None}
+    columns = list(INDEXED_COLUMNS) + (["protocol"] if include_protocol else [])
+    sqlite_path = os.path.join(output_dir, SQLITE_RESULTS_FILENAME)
+    if os.path.exists(sqlite_path):
+        conn = sqlite3.connect(sqlite_path, timeout=30)
+        try:
+            where = " AND ".join(f"{k} = ?" for k in filters)
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM runs{' WHERE ' + where if where else ''} ORDER BY rowid",
+                                list(filters.values())).fetchall()
+        finally:
+            conn.close()
+        records = [dict(zip(columns, row)) for row in rows]
+        if include_protocol:
+            for record in records: record["protocol"] = json.loads(record["protocol"])
+        return records
+
+    records = {} # run_id -> record; later entries replace earlier ones
+    jsonl_path = os.path.join(output_dir, JSONL_RESULTS_FILENAME)
+    if os.path.exists(jsonl_path):
+        with open(jsonl_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip(): continue
+                try: record = json.loads(line)
+                except json.JSONDecodeError as e: # e.g. a line cut short by a crash
+                    print(f"Warning: Skipping bad line {line_no} in {jsonl_path}: {e}"); continue
+                records[record.get("run_id")] = record
+    else:
+        with os.scandir(output_dir) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if not entry.name.endswith(".json") or not entry.is_file(): continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        record = protocol_record(json.load(f))
+                except Exception as e:
+                    print(f"Warning: Ignoring unreadable protocol {entry.name}: {e}"); continue
+                record["run_id"] = record["run_id"] or entry.name[:-len(".json")]
+                records[record["run_id"]] = record
+    return [{c: record.get(c) for c in columns} for record in records.values()
+            if all(record.get(k) == v for k, v in filters.items())]
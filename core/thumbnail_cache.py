@@ -0,0 +1,166 @@
+# ArtAgent/core/thumbnail_cache.py
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from .utils import get_absolute_path
+
+THUMBNAIL_CACHE_DIR = 'core/thumbnails' # Path relative to project root
+THUMBNAIL_SIZE = (256, 256) # Max (width, height); aspect ratio is preserved
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_SUFFIX = '.webp' # Small, and keeps alpha for PNG sources
+THUMBNAIL_CACHE_MAX_BYTES = 512 * 1024 * 1024 # LRU eviction kicks in above this
+THUMBNAIL_MAX_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+INLINE_RENDER_LIMIT = 4 # Fewer missing thumbnails than this are rendered in-process
+
+def thumbnail_key(image_path: str, size: int, mtime_ns: int, thumb_size=THUMBNAIL_SIZE) -> str:
+    """Cache key: changes whenever the source file is replaced/edited or the thumb size changes."""
+    raw = f"{os.path.abspath(image_path)}|{size}|{mtime_ns}|{thumb_size[0]}x{thumb_size[1]}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _render_thumbnail(src_path: str, dst_path: str, thumb_size, quality: int) -> bool:
+    """Renders one thumbnail (runs in a worker process, or inline in a Gradio worker thread). Returns True on success."""
+    tmp_path = None
+    try:
+        with Image.open(src_path) as img:
+            img.draft('RGB', thumb_size) # JPEG: decode at reduced scale, much faster for large photos
+            img.thumbnail(thumb_size)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+            # A private temp file per call: sessions opening the same folder may render the same thumbnail at once
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dst_path), suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                img.save(f, format='WEBP', quality=quality)
+        os.replace(tmp_path, dst_path)
+        return True
+    except Exception as e:
+        if tmp_path:
+            try: os.remove(tmp_path) # evict() only counts thumbnails, a leftover temp file would stay forever
+            except OSError: pass
+        print(f"Warning: Could not create thumbnail for {os.path.basename(src_path)}: {e}")
+        return False
+
+
+class ThumbnailCache:
+    """
+    On-disk thumbnail cache for the caption gallery.
+
+    Thumbnails are keyed by source path, size and mtime (see thumbnail_key), so
+    edited images get fresh thumbnails and stale ones age out. Missing thumbnails
+    are rendered in a process pool. Every hit refreshes the file's mtime, and
+    evict() removes least-recently-used thumbnails once the cache exceeds max_bytes.
+    """
+    def __init__(self, root_dir: str, thumb_size=THUMBNAIL_SIZE, max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES,
+                 max_workers: int = THUMBNAIL_MAX_WORKERS, quality: int = THUMBNAIL_QUALITY):
+        self.root_dir = root_dir
+        self.thumb_size = tuple(thumb_size)
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.quality = quality
+        self._evict_lock = threading.Lock()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root_dir, key[:2], key + THUMBNAIL_SUFFIX)
+
+    def _render_many(self, jobs) -> list:
+        """Renders (src, dst) jobs, in a process pool when there are enough of them."""
+        args = [(src, dst, self.thumb_size, self.quality) for src, dst in jobs]
+        if len(args) < INLINE_RENDER_LIMIT or self.max_workers <= 1:
+            return [_render_thumbnail(*a) for a in args]
+        try:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(args))) as pool:
+                return list(pool.map(_render_thumbnail, *zip(*args), chunksize=8))
+        except Exception as e:
+            # e.g. BrokenProcessPool or no fork/spawn support: fall back to in-process rendering
+            print(f"Warning: Thumbnail process pool failed ({e}). Rendering in-process.")
+            return [_render_thumbnail(*a) for a in args]
+
+    def get_thumbnails(self, entries) -> dict:
+        """
+        Returns thumbnail paths for images, rendering any that are missing.
+
+        Args:
+            entries: Iterable of (filename, image_path, size, mtime_ns) tuples
+                     (e.g. caption_index.ImageEntry values).
+
+        Returns:
+            dict[str, str]: filename -> thumbnail path (the original image path if rendering failed).
+        """
+        thumbnails = {}
+        jobs, job_names = [], []
+        for entry in entries:
+            filename, image_path, size, mtime_ns = entry[:4]
+            thumb_path = self.path_for(thumbnail_key(image_path, size, mtime_ns, self.thumb_size))
+            try:
+                os.utime(thumb_path) # Hit: mark as recently used
+                thumbnails[filename] = thumb_path
+            except FileNotFoundError:
+                jobs.append((image_path, thumb_path))
+                job_names.append(filename)
+            except OSError:
+                thumbnails[filename] = image_path
+
+        if jobs:
+            for _, thumb_path in jobs:
+                os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            results = self._render_many(jobs)
+            for filename, (image_path, thumb_path), ok in zip(job_names, jobs, results):
+                thumbnails[filename] = thumb_path if ok else image_path
+            print(f"Thumbnail cache: {len(thumbnails) - len(jobs)} hit(s), {sum(results)} rendered, {len(results) - sum(results)} failed.")
+            self.evict()
+        return thumbnails
+
+    def evict(self) -> int:
+        """
+        Removes least-recently-used thumbnails until the cache fits in max_bytes.
+
+        Returns:
+            int: Number of thumbnails removed.
+        """
+        if not os.path.isdir(self.root_dir):
+            return 0
+        with self._evict_lock:
+            files = []
+            total = 0
+            with os.scandir(self.root_dir) as shard_dirs:
+                for shard in shard_dirs:
+                    if not shard.is_dir():
+                        continue
+                    with os.scandir(shard.path) as thumbs:
+                        for thumb in thumbs:
+                            if not thumb.name.endswith(THUMBNAIL_SUFFIX):
+                                continue
+                            try:
+                                st = thumb.stat()
+                            except OSError:
+                                continue
+                            files.append((st.st_mtime, st.st_size, thumb.path))
+                            total += st.st_size
+            if total <= self.max_bytes:
+                return 0
+            removed = 0
+            for _, size, path in sorted(files): # Oldest use first
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Warning: Could not evict thumbnail {os.path.basename(path)}: {e}")
+                    continue
+                total -= size
+                removed += 1
+                if total <= self.max_bytes:
+                    break
+            print(f"Thumbnail cache: evicted {removed} thumbnail(s).")
+            return removed
+
+
+_default_cache = None
+
+def get_default_cache() -> ThumbnailCache:
+    """Returns the shared project thumbnail cache (created lazily)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ThumbnailCache(get_absolute_path(THUMBNAIL_CACHE_DIR))
+    return _default_cache
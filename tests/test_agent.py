@@ -15,7 +15,7 @@ project_root = os.path.dirname(test_dir)
 sys.path.insert(0, project_root)
 
 try:
-    from agents.ollama_agent import get_llm_response
+    from agents.ollama_agent import get_llm_response, EncodedImage, reset_token_usage, get_token_usage
     try:
         # Import the actual Image class for type checking if available
         from PIL import Image as PILImageModule
@@ -216,6 +216,18 @@ def test_get_llm_response_with_invalid_image_object(mock_post, capsys):
     assert "images" not in payload
     captured = capsys.readouterr(); assert "Warning: Item 1 in images list is not a PIL Image object" in captured.out
 
+@patch(REQUESTS_POST_PATH)
+def test_get_llm_response_with_encoded_image(mock_post):
+    """ Test that pre-encoded images are sent as-is, without re-encoding. """
+    stream_chunks = [json.dumps({"response": "A red square.", "done": True})]
+    mock_post.return_value = mock_streaming_response(stream_chunks)
+    args = {**DEFAULT_ARGS, "images": [EncodedImage("cHJlZW5jb2RlZA==", source="a.jpg")]}
+    with patch(BASE64_B64ENCODE_PATH) as mock_b64:
+        result = get_llm_response(**args)
+    assert result == "A red square."
+    mock_b64.assert_not_called()
+    assert mock_post.call_args.kwargs['json']["images"] == ["cHJlZW5jb2RlZA=="]
+
 @patch(ISINSTANCE_PATH) # Patch isinstance used inside the agent function
 @patch(REQUESTS_POST_PATH)
 @patch(PIL_IMAGE_CLASS_PATH) # Patch Image.Image
@@ -265,4 +277,18 @@ def test_get_llm_response_console_logging(mock_post, capsys):
     assert "--- Ollama Request ---" in log_output; assert '"model": "test-model"' in log_output
     assert '"prompt_start": "Short prompt"' in log_output; assert '"images_count": 0' in log_output
     assert '"effective_options": {' in log_output; assert '"temperature": 0.8' in log_output
-    assert "----------------------" in log_output
\ No newline at end of file
+    assert "----------------------" in log_output
+@patch(REQUESTS_POST_PATH)
+def test_get_llm_response_accumulates_token_usage_per_thread(mock_post):
+    """Ollama's final-chunk counters are summed for the calling thread until reset."""
+    import threading
+    final = {"done": True, "prompt_eval_count": 12, "eval_count": 40, "eval_duration": 2_000_000_000}
+    mock_post.side_effect = lambda *a, **kw: mock_streaming_response([json.dumps({"response": "x", "done": False}), json.dumps(final)])
+    reset_token_usage()
+    get_llm_response(**DEFAULT_ARGS); get_llm_response(**DEFAULT_ARGS)
+    assert get_token_usage() == {"requests": 2, "prompt_tokens": 24, "eval_tokens": 80, "eval_seconds": 4.0}
+    other = {}
+    thread = threading.Thread(target=lambda: other.update(get_token_usage())); thread.start(); thread.join()
+    assert other["eval_tokens"] == 0 # Other threads keep their own counts
+    reset_token_usage()
+    assert get_token_usage()["requests"] == 0
@@ -62,6 +62,8 @@ OS_PATH_ISFILE_PATH = 'core.app_logic.os.path.isfile' # Added for folder process
 GET_ABSOLUTE_PATH = 'core.app_logic.get_absolute_path' # Used by save_settings
 BUILTINS_OPEN_PATH = 'core.app_logic.open'
 JSON_DUMP_PATH = 'core.app_logic.json.dump' # Used by save_settings
+ATOMIC_WRITE_PATH = 'core.app_logic.atomic_write_json' # Used by save_settings / save_teams_to_file
+FILE_LOCK_PATH = 'core.app_logic.FileLock' # Used by save_settings / save_teams_to_file
 PIL_IMAGE_FROMARRAY_PATH = 'core.app_logic.Image.fromarray'
 PIL_IMAGE_OPEN_PATH = 'core.app_logic.Image.open'
 
@@ -392,6 +394,24 @@ def test_chat_logic_limiter(
     assert mock_limiters_data[limiter_choice]["limiter_prompt_format"] in call_kwargs['prompt']
 
 
+@patch(ADD_TO_HISTORY_PATH, return_value=None)
+@patch(RELEASE_MODEL_PATH)
+@patch(GET_LLM_RESPONSE_PATH, side_effect=KeyboardInterrupt) # Not caught per file, like a closed Gradio generator
+@patch(LOAD_ALL_ROLES_PATH)
+@patch(GET_ACTUAL_ROLE_NAME_PATH, side_effect=lambda x: x)
+@patch('core.app_logic.ImagePrefetcher')
+def test_chat_logic_folder_processing_closes_prefetcher_when_interrupted(
+    mock_prefetcher_cls, mock_get_actual_name, mock_load_roles, mock_get_llm, mock_release_model, mock_add_history, mock_time, tmp_path):
+    """The background image prefetcher is closed even when folder processing stops early."""
+    mock_load_roles.return_value = mock_roles_data
+    (tmp_path / "img1.png").write_bytes(b"png")
+    with pytest.raises(KeyboardInterrupt):
+        app_logic.chat_logic(str(tmp_path), ui_role_agent1, ui_user_input, ui_model_vision, ui_max_tokens, "Skip", ui_limiter, None,
+                             ui_use_ollama_options, False, mock_settings, mock_models_data, mock_limiters_data,
+                             None, mock_file_agents_dict, mock_history_list, mock_session_history)
+    mock_prefetcher_cls.return_value.close.assert_called_once()
+
+
 @patch(ADD_TO_HISTORY_PATH, return_value=None)
 @patch(RELEASE_MODEL_PATH)
 @patch(GET_LLM_RESPONSE_PATH)
@@ -931,11 +951,11 @@ def test_load_profile_options_callback_invalid_profile():
     assert updates[0].get("value") is None # No update
     assert updates[1].get("value") is None # No update
 
-@patch(JSON_DUMP_PATH) # Mock json.dump
-@patch(BUILTINS_OPEN_PATH, new_callable=mock_open) # Mock file open
+@patch(FILE_LOCK_PATH) # Mock the inter-process lock
+@patch(ATOMIC_WRITE_PATH) # Mock the atomic temp+rename writer
 @patch(GET_ABSOLUTE_PATH, return_value="/fake/path/settings.json") # Mock path resolution
 @patch(LOAD_JSON_PATH, return_value=mock_loaded_settings_from_file) # Mock loading existing settings
-def test_save_settings_callback_success(mock_load, mock_abs_path, mock_file_open, mock_json_dump):
+def test_save_settings_callback_success(mock_load, mock_abs_path, mock_atomic_write, mock_file_lock):
     """Test successfully saving settings with type conversions."""
     # Simulate UI inputs matching the order of mock_api_option_keys
     # ['num_ctx', 'seed', 'temperature', 'top_k', 'use_mmap']
@@ -970,11 +990,12 @@ def test_save_settings_callback_success(mock_load, mock_abs_path, mock_file_open
     mock_load.assert_called_with("/fake/path/settings.json", is_relative=False)
 
     mock_abs_path.assert_called_once_with(app_logic.SETTINGS_FILE)
-    mock_file_open.assert_called_once_with("/fake/path/settings.json", 'w', encoding='utf-8')
-    mock_json_dump.assert_called_once()
+    mock_file_lock.assert_called_once_with("/fake/path/settings.json") # Whole update runs under lock
+    mock_atomic_write.assert_called_once()
+    assert mock_atomic_write.call_args[0][0] == "/fake/path/settings.json"
 
-    # Check the data passed to json.dump
-    saved_data = mock_json_dump.call_args[0][0]
+    # Check the data passed to the writer
+    saved_data = mock_atomic_write.call_args[0][1]
     assert saved_data["ollama_url"] == "http://new-url"
     assert saved_data["max_tokens_slider"] == 8192
     assert saved_data["ollama_api_prompt_to_console"] is False
@@ -992,6 +1013,24 @@ def test_save_settings_callback_success(mock_load, mock_abs_path, mock_file_open
     assert saved_api_opts["top_k"] == 50 # converted to int
     assert saved_api_opts["use_mmap"] is True # converted to bool
 
+@patch(GET_ABSOLUTE_PATH)
+def test_save_teams_to_file_merge_keys_preserves_other_teams(mock_abs_path, tmp_path):
+    """Test that merging one team keeps teams another process saved meanwhile."""
+    teams_file = tmp_path / "agent_teams.json"
+    mock_abs_path.return_value = str(teams_file)
+    teams_file.write_text(json.dumps({"OtherProcessTeam": {"steps": []}, "OldTeam": {"steps": []}}), encoding='utf-8')
+
+    stale_state = {"OldTeam": {"steps": []}, "MyTeam": {"steps": [{"role": "Agent1"}]}}
+    assert app_logic.save_teams_to_file(stale_state, merge_keys=["MyTeam"]) is True
+    saved = json.loads(teams_file.read_text(encoding='utf-8'))
+    assert set(saved) == {"OtherProcessTeam", "OldTeam", "MyTeam"}
+
+    del stale_state["OldTeam"]
+    assert app_logic.save_teams_to_file(stale_state, merge_keys=["OldTeam"]) is True
+    saved = json.loads(teams_file.read_text(encoding='utf-8'))
+    assert set(saved) == {"OtherProcessTeam", "MyTeam"}
+
+
 # --- Tests for Other UI Callbacks ---
 
 @patch(LOAD_JSON_PATH)
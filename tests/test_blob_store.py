@@ -0,0 +1,99 @@
+# ArtAgent/tests/test_blob_store.py
+
+import pytest
+import os
+import sys
+import time
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.blob_store import BlobStore, BLOB_SUFFIX
+except ImportError as e:
+    pytest.skip(f"Skipping blob_store tests, core module not found: {e}", allow_module_level=True)
+
+
+# --- Fixtures ---
+
+@pytest.fixture
+def store(tmp_path):
+    """Provides a BlobStore rooted in a temporary directory."""
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+# --- Tests ---
+
+def test_put_get_roundtrip(store):
+    """Test that stored text is returned unchanged."""
+    text = "Final prompt text with unicode: café ✓\n" * 50
+    digest = store.put(text)
+    assert store.has(digest)
+    assert store.get(digest) == text
+
+def test_put_is_content_addressed(store, tmp_path):
+    """Test that identical texts are stored only once."""
+    d1 = store.put("same body " * 200)
+    d2 = store.put("same body " * 200)
+    assert d1 == d2
+    blob_files = [f for _, _, files in os.walk(tmp_path / "blobs") for f in files]
+    assert len(blob_files) == 1
+    assert blob_files[0].endswith(BLOB_SUFFIX)
+
+def test_blob_is_compressed(store):
+    """Test that repetitive text takes less space on disk than raw."""
+    text = "repetitive caption text " * 500
+    digest = store.put(text)
+    assert os.path.getsize(store._blob_path(digest)) < len(text) // 10
+
+def test_concurrent_puts_of_the_same_body(store, tmp_path):
+    """Test that threads storing the same body at once all succeed and leave no temp files."""
+    import threading
+    errors = []
+    for trial in range(50):
+        text = f"shared step output {trial} " * 200
+        barrier = threading.Barrier(4)
+        def put():
+            try:
+                barrier.wait()
+                assert store.get(store.put(text)) == text
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=put) for _ in range(4)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+    assert errors == []
+    assert not [f for _, _, files in os.walk(tmp_path / "blobs") for f in files if not f.endswith(BLOB_SUFFIX)]
+
+def test_failed_put_removes_temp_file(store, tmp_path, monkeypatch):
+    """Test that a write error leaves neither a blob nor a temp file behind."""
+    monkeypatch.setattr("core.blob_store.zlib.compress", lambda *a: (_ for _ in ()).throw(OSError("disk full")))
+    with pytest.raises(OSError):
+        store.put("body")
+    assert not [f for _, _, files in os.walk(tmp_path / "blobs") for f in files]
+
+def test_get_missing_returns_none(store):
+    """Test that an unknown digest returns None."""
+    assert store.get("0" * 64) is None
+
+def test_prune_removes_only_old_unreferenced(store):
+    """Test pruning keeps live blobs and respects the age grace period."""
+    live = store.put("live body " * 100)
+    dead = store.put("dead body " * 100)
+    fresh_dead = store.put("fresh dead body " * 100)
+    old = time.time() - 7200
+    os.utime(store._blob_path(live), (old, old))
+    os.utime(store._blob_path(dead), (old, old))
+
+    removed = store.prune([live], min_age_seconds=3600)
+
+    assert removed == 1
+    assert store.has(live)
+    assert not store.has(dead)
+    assert store.has(fresh_dead) # Too young to prune
+
+def test_prune_missing_root(tmp_path):
+    """Test pruning a store whose directory does not exist yet."""
+    assert BlobStore(str(tmp_path / "nothing_here")).prune([]) == 0
@@ -0,0 +1,82 @@
+# ArtAgent/tests/test_caption_batch_edit.py
+
+import pytest
+import os
+import sys
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.captioning_logic import batch_edit_captions, dedupe_tags, select_images_by_pattern
+except ImportError as e:
+    pytest.skip(f"Skipping batch caption edit tests, modules not found: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Images with captions; img2 has no caption file yet."""
+    captions = {"img0.png": "cat, cute, Cat, sitting", "img1.png": "dog, running", "photo.jpg": "a photo"}
+    paths = {}
+    for name in ["img0.png", "img1.png", "img2.png", "photo.jpg"]:
+        (tmp_path / name).write_bytes(b"img")
+        paths[name] = str(tmp_path / name)
+        if name in captions:
+            (tmp_path / (os.path.splitext(name)[0] + ".txt")).write_text(captions[name], encoding='utf-8')
+    return tmp_path, paths, captions
+
+
+def read_caption(folder, name):
+    return (folder / (os.path.splitext(name)[0] + ".txt")).read_text(encoding='utf-8')
+
+
+def test_select_images_by_pattern():
+    names = ["img0.png", "IMG1.PNG", "photo.jpg"]
+    assert select_images_by_pattern("*", names) == sorted(names)
+    assert select_images_by_pattern("*.png", names) == ["IMG1.PNG", "img0.png"]
+    assert select_images_by_pattern("photo*, img0*", names) == ["img0.png", "photo.jpg"]
+    assert select_images_by_pattern("", names) == []
+
+
+def test_dedupe_tags():
+    assert dedupe_tags("cat, cute, Cat, sitting,, cute") == "cat, cute, sitting"
+
+
+def test_batch_append_by_pattern_creates_and_updates(dataset):
+    folder, paths, captions = dataset
+    status, updated = batch_edit_captions("img*", ", masterpiece", "Append", paths, dict(captions))
+    assert "Processed: 3" in status and "Errors: 0" in status
+    assert read_caption(folder, "img1.png") == "dog, running, masterpiece"
+    assert read_caption(folder, "img2.png") == ", masterpiece" # Created
+    assert updated["photo.jpg"] == "a photo" and read_caption(folder, "photo.jpg") == "a photo"
+
+
+def test_batch_prepend_with_filename_list(dataset):
+    folder, paths, captions = dataset
+    status, updated = batch_edit_captions(["photo.jpg", "missing.png"], "style: ", "Prepend", paths, dict(captions))
+    assert "Processed: 1" in status and "Skipped: 1" in status
+    assert updated["photo.jpg"] == "style: a photo" == read_caption(folder, "photo.jpg")
+
+
+def test_batch_regex_replace_and_dedupe_skip_unchanged(dataset):
+    folder, paths, captions = dataset
+    untouched_mtime = os.stat(folder / "photo.txt").st_mtime_ns
+    status, updated = batch_edit_captions("*", r"\b(cat|dog)\b", "Replace (Regex)", paths, dict(captions), replace_with=r"\1s")
+    assert "Processed: 2" in status and "Unchanged: 2" in status # img2 (empty) and photo don't match
+    assert read_caption(folder, "img1.png") == "dogs, running"
+    assert os.stat(folder / "photo.txt").st_mtime_ns == untouched_mtime # Not rewritten
+
+    status, updated = batch_edit_captions("img0.png", "", "Dedupe Tags", paths, dict(captions))
+    assert "Processed: 1" in status
+    assert updated["img0.png"] == "cat, cute, sitting" == read_caption(folder, "img0.png")
+
+
+def test_batch_edit_input_errors(dataset):
+    _, paths, captions = dataset
+    assert "No images selected" in batch_edit_captions(None, "x", "Append", paths, captions)[0]
+    assert "No images selected" in batch_edit_captions("nomatch*", "x", "Append", paths, captions)[0]
+    assert "Invalid batch mode: Bogus" in batch_edit_captions("*", "x", "Bogus", paths, captions)[0]
+    status, unchanged = batch_edit_captions("*", "(unclosed", "Replace (Regex)", paths, captions)
+    assert status.startswith("Error: Invalid regex") and unchanged is captions
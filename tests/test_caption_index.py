@@ -0,0 +1,131 @@
+# ArtAgent/tests/test_caption_index.py
+
+import pytest
+import os
+import sys
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core import captioning_logic
+    from core.caption_index import CaptionIndex, build_caption_index, lookup_caption, remember_caption
+    from core.captioning_logic import load_images_and_captions, refresh_images_and_captions, update_caption_display_from_gallery
+    from core.thumbnail_cache import ThumbnailCache
+except ImportError as e:
+    pytest.skip(f"Skipping caption index tests, modules not found: {e}", allow_module_level=True)
+
+
+@pytest.fixture(autouse=True)
+def isolated_thumbnail_cache(tmp_path, monkeypatch):
+    """Keeps thumbnails rendered during tests out of the project cache."""
+    cache = ThumbnailCache(str(tmp_path / "thumbs"))
+    monkeypatch.setattr(captioning_logic, "get_thumbnail_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def caption_folder(tmp_path):
+    """Folder with 5 images, captions for even-numbered ones, and some unrelated files."""
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i in range(5):
+        (folder / f"img{i}.png").write_bytes(b"png")
+        if i % 2 == 0:
+            (folder / f"img{i}.txt").write_text(f"caption {i}", encoding='utf-8')
+    (folder / "notes.md").write_text("ignore me")
+    (folder / "subdir.png").mkdir() # Directory with an image-like name
+    return folder
+
+
+def test_build_scans_images_and_sidecars(caption_folder):
+    index = CaptionIndex(str(caption_folder)).build()
+    assert index.filenames == [f"img{i}.png" for i in range(5)]
+    assert index.entries["img0.png"].caption_path == str(caption_folder / "img0.txt")
+    assert index.entries["img1.png"].caption_path is None
+    assert index.entries["img0.png"].size == 3
+    assert index.loaded_captions() == {} # Nothing read yet
+
+
+def test_get_caption_is_lazy_and_cached(caption_folder):
+    index = CaptionIndex(str(caption_folder)).build()
+    assert index.get_caption("img2.png") == "caption 2"
+    (caption_folder / "img2.txt").write_text("changed on disk", encoding='utf-8')
+    assert index.get_caption("img2.png") == "caption 2" # Served from cache
+    assert index.get_caption("img1.png") == ""
+    assert index.get_caption("missing.png") is None
+
+
+def test_background_load_reads_all_without_clobbering(caption_folder):
+    index = CaptionIndex(str(caption_folder)).build()
+    index.set_caption("img0.png", "written by app")
+    index.start_background_load(batch_size=2).join(timeout=5)
+    captions = index.loaded_captions()
+    assert len(captions) == 5
+    assert captions["img0.png"] == "written by app"
+    assert captions["img4.png"] == "caption 4"
+
+
+def test_lookup_and_remember_use_registered_index(caption_folder):
+    build_caption_index(str(caption_folder))
+    image_path = str(caption_folder / "img1.png")
+    assert lookup_caption("img1.png", image_path, {"img1.png": "from state"}) == "from state"
+    assert lookup_caption("img1.png", image_path, {}) == ""
+    remember_caption(image_path, "img1.png", "new caption")
+    assert lookup_caption("img1.png", image_path, {}) == "new caption"
+
+
+def test_load_images_and_captions_eager(caption_folder):
+    gallery, paths, captions, status, first, first_caption, _ = load_images_and_captions(str(caption_folder))
+    assert status == "Loaded 5 image(s)."
+    assert len(gallery) == 5 and len(paths) == 5
+    assert captions == {"img0.png": "caption 0", "img1.png": "", "img2.png": "caption 2", "img3.png": "", "img4.png": "caption 4"}
+    assert first == "img0.png" and first_caption == "caption 0"
+
+
+def test_load_images_and_captions_lazy_for_large_folders(caption_folder, monkeypatch):
+    monkeypatch.setattr(captioning_logic, "EAGER_CAPTION_LIMIT", 2)
+    _, paths, captions, status, first, first_caption, _ = load_images_and_captions(str(caption_folder))
+    assert "loading in the background" in status
+    assert list(captions) == ["img0.png"] and first_caption == "caption 0"
+
+    # Selecting an image whose caption isn't in state yet still shows it
+    class _Select: index, value = 2, "img2.png"
+    caption, filename, _ = update_caption_display_from_gallery(_Select(), captions, paths)
+    assert filename == "img2.png"
+    assert caption == "caption 2"
+
+
+def test_refresh_diffs_against_previous_scan(caption_folder):
+    index = CaptionIndex(str(caption_folder)).build()
+    assert index.load_captions(["img0.png"]) == {"img0.png": "caption 0"}
+    (caption_folder / "img5.png").write_bytes(b"png")
+    os.remove(caption_folder / "img3.png")
+    (caption_folder / "img0.txt").write_text("edited elsewhere", encoding='utf-8')
+    (caption_folder / "img1.txt").write_text("new caption", encoding='utf-8')
+    (caption_folder / "img4.png").write_bytes(b"bigger png")
+
+    diff = index.refresh()
+    assert diff == {"added": ["img5.png"], "removed": ["img3.png"], "changed": ["img4.png"],
+                    "captions_changed": ["img0.png", "img1.png"]}
+    assert index.get_caption("img0.png") == "edited elsewhere" # Stale cache entry was dropped
+    assert index.refresh() == {"added": [], "removed": [], "changed": [], "captions_changed": []}
+
+
+def test_refresh_images_and_captions_keeps_selection_and_unsaved_text(caption_folder):
+    _, paths, captions, _, _, _, _ = load_images_and_captions(str(caption_folder))
+    (caption_folder / "img5.png").write_bytes(b"png")
+    (caption_folder / "img5.txt").write_text("caption 5", encoding='utf-8')
+    (caption_folder / "img2.txt").write_text("caption 2 v2", encoding='utf-8')
+
+    gallery, paths, captions, status, selected, text, _ = refresh_images_and_captions(
+        str(caption_folder), False, None, paths, captions, "img4.png", "unsaved edit")
+    assert "1 added, 0 removed" in status and "1 caption(s) changed" in status
+    assert len(gallery) == 6 and "img5.png" in paths
+    assert captions["img5.png"] == "caption 5" and captions["img2.png"] == "caption 2 v2"
+    assert selected == "img4.png" and text == "unsaved edit"
+
+    *_, text, _ = refresh_images_and_captions(str(caption_folder), False, None, paths, captions, "img2.png", "old")
+    assert text == "old" # Unchanged since the last refresh
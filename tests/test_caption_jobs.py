@@ -0,0 +1,108 @@
+# ArtAgent/tests/test_caption_jobs.py
+
+import pytest
+import json
+import os
+import sys
+from unittest.mock import patch
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.caption_jobs import CaptionJob, MANIFEST_FILENAME, STATUS_DONE, STATUS_ERROR, STATUS_SKIPPED
+    from core.captioning_logic import generate_captions_for_all
+except ImportError as e:
+    pytest.skip(f"Skipping caption job tests, modules not found: {e}", allow_module_level=True)
+
+GENERATE_SELECTED_PATH = 'core.captioning_logic.generate_captions_for_selected'
+PARAMS = {"agent_or_team": "Captioner", "model": "llava (VISION)", "mode": "Append"}
+COMMON_ARGS = dict(
+    agent_or_team_display_name="Captioner", selected_model_display_name="llava (VISION)",
+    generate_mode="Append", settings={}, models_data=[], limiters_data={}, teams_data={},
+    file_agents={}, history_list=[],
+)
+
+def read_manifest(folder):
+    with open(os.path.join(folder, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_open_resumes_matching_unfinished_job(tmp_path):
+    job = CaptionJob.open(str(tmp_path), ["a.png", "b.png", "c.png"], PARAMS)
+    job.mark_finished("a.png", STATUS_DONE, 1.5)
+    job.mark_finished("b.png", STATUS_ERROR, 0.2, error="boom")
+    job.mark_started("c.png") # Crash while running
+    job.flush(force=True)
+
+    resumed = CaptionJob.open(str(tmp_path), ["a.png", "b.png", "c.png", "d.png"], PARAMS)
+    assert resumed.resumed_count == 1
+    assert resumed.pending_filenames() == ["b.png", "c.png", "d.png"] # Errors and in-flight items are retried
+    assert read_manifest(tmp_path)["items"]["a.png"]["duration"] == 1.5
+
+
+def test_open_starts_fresh_on_param_change_or_complete(tmp_path):
+    job = CaptionJob.open(str(tmp_path), ["a.png", "b.png"], PARAMS)
+    job.mark_finished("a.png", STATUS_DONE, 1.0)
+    job.flush(force=True)
+    assert CaptionJob.open(str(tmp_path), ["a.png", "b.png"], {**PARAMS, "mode": "Overwrite"}).resumed_count == 0
+
+    job = CaptionJob.open(str(tmp_path), ["a.png", "b.png"], PARAMS)
+    job.mark_finished("a.png", STATUS_DONE, 1.0)
+    job.mark_finished("b.png", STATUS_SKIPPED, 0.0)
+    job.finish()
+    assert read_manifest(tmp_path)["state"] == "complete"
+    assert CaptionJob.open(str(tmp_path), ["a.png", "b.png"], PARAMS).pending_filenames() == ["a.png", "b.png"]
+
+
+def test_generate_all_resumes_after_interruption(tmp_path):
+    """Test that a rerun after a crash only captions unfinished images."""
+    image_paths = {f"img{i}.png": str(tmp_path / f"img{i}.png") for i in range(4)}
+    calls = []
+    failed_once = set()
+
+    def fake(selected_filename, current_captions, session_history, **kwargs):
+        calls.append(selected_filename)
+        if selected_filename == "img2.png" and not failed_once:
+            failed_once.add(selected_filename)
+            raise RuntimeError("ollama restarted")
+        return f"Caption for '{selected_filename}'. Status: Success.\n- ok", {selected_filename: "cap"}, "cap", []
+
+    with patch(GENERATE_SELECTED_PATH, side_effect=fake):
+        status, _, _, _ = generate_captions_for_all(image_paths, {}, session_history=[], num_workers=1, **COMMON_ARGS)
+        assert "Processed=3, Errors=1" in status
+        assert read_manifest(tmp_path)["state"] == "incomplete"
+
+        calls.clear()
+        status, _, _, _ = generate_captions_for_all(image_paths, {}, session_history=[], num_workers=1, **COMMON_ARGS)
+        assert calls == ["img2.png"]
+        assert "3 image(s) were already finished" in status
+        assert read_manifest(tmp_path)["state"] == "complete"
+
+        calls.clear()
+        generate_captions_for_all(image_paths, {}, session_history=[], num_workers=1, resume_job=False, **COMMON_ARGS)
+        assert calls == sorted(image_paths)
+
+
+def test_append_job_crash_does_not_caption_finished_images_again(tmp_path):
+    """Test that a crash right after an Append caption was written does not append it again on resume."""
+    image_paths = {f"img{i}.png": str(tmp_path / f"img{i}.png") for i in range(4)}
+    calls = []
+
+    def crash_at_img2(selected_filename, current_captions, session_history, **kwargs):
+        calls.append(selected_filename)
+        if selected_filename == "img2.png": raise KeyboardInterrupt # The process dies; nothing is finished or flushed after this
+        return f"Caption for '{selected_filename}'. Status: Success.\n- ok", {selected_filename: "cap"}, "cap", []
+
+    with patch(GENERATE_SELECTED_PATH, side_effect=crash_at_img2):
+        with pytest.raises(KeyboardInterrupt):
+            generate_captions_for_all(image_paths, {}, session_history=[], num_workers=1, **COMMON_ARGS)
+    assert {name: item["status"] for name, item in read_manifest(tmp_path)["items"].items()}["img1.png"] == STATUS_DONE
+
+    calls.clear()
+    with patch(GENERATE_SELECTED_PATH, side_effect=lambda selected_filename, **kwargs: calls.append(selected_filename) or
+               (f"Caption for '{selected_filename}'. Status: Success.\n- ok", {selected_filename: "cap"}, "cap", [])):
+        generate_captions_for_all(image_paths, {}, session_history=[], num_workers=1, **COMMON_ARGS)
+    assert calls[0] == "img2.png" and "img0.png" not in calls and "img1.png" not in calls
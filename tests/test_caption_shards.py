@@ -0,0 +1,119 @@
+# ArtAgent/tests/test_caption_shards.py
+
+import pytest
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.caption_index import CaptionIndex, build_caption_index, lookup_caption
+    from core.caption_jobs import manifest_filename
+    from core.caption_shards import plan_shards, generate_captions_sharded
+except ImportError as e:
+    pytest.skip(f"Skipping caption shard tests, modules not found: {e}", allow_module_level=True)
+
+GENERATE_SELECTED_PATH = 'core.captioning_logic.generate_captions_for_selected'
+
+def read_manifest(folder):
+    with open(os.path.join(folder, manifest_filename()), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@pytest.fixture
+def dataset_tree(tmp_path):
+    """Root image plus two class folders (one nested) and a hidden folder."""
+    root = tmp_path / "dataset"
+    for rel in ["top.png", "class_a/a1.png", "class_a/a2.png", "class_a/deep/a3.png", "class_b/b1.png", ".cache/hidden.png"]:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"png")
+    (root / "class_a" / "a1.txt").write_text("caption a1", encoding='utf-8')
+    return root
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_recursive_build_uses_relative_filenames(dataset_tree, processes):
+    index = CaptionIndex(str(dataset_tree)).build(recursive=True, processes=processes)
+    assert index.filenames == ["class_a/a1.png", "class_a/a2.png", "class_a/deep/a3.png", "class_b/b1.png", "top.png"]
+    assert index.image_paths["class_a/deep/a3.png"] == str(dataset_tree / "class_a" / "deep" / "a3.png")
+    assert index.get_caption("class_a/a1.png") == "caption a1"
+    assert CaptionIndex(str(dataset_tree)).build().filenames == ["top.png"] # Non-recursive is unchanged
+
+
+def test_lookup_caption_finds_root_index_for_subfolder_images(dataset_tree):
+    index = build_caption_index(str(dataset_tree), recursive=True)
+    index.set_caption("class_b/b1.png", "cached only")
+    assert lookup_caption("class_b/b1.png", index.image_paths["class_b/b1.png"], {}) == "cached only"
+
+
+def test_plan_shards_by_subdirectory_and_hash():
+    names = ["a/1.png", "a/2.png", "a/3.png", "b/1.png", "b/2.png", "c/1.png", "root.png"]
+    shards = plan_shards(names, 2, "Subdirectory")
+    assert sorted(map(len, shards)) == [3, 4] # Folders are packed whole, largest first
+    for folder in ("a/", "b/"):
+        assert sum(any(n.startswith(folder) for n in shard) for shard in shards) == 1
+    hashed = plan_shards(names, 3, "Hash")
+    assert sorted(n for shard in hashed for n in shard) == sorted(names)
+    assert plan_shards(names, 3, "Hash") == hashed # Stable across runs
+    assert plan_shards(["x.png"], 4) == [["x.png"]] # Empty shards are dropped
+
+
+def test_generate_captions_sharded_merges_results(dataset_tree):
+    index = build_caption_index(str(dataset_tree), recursive=True)
+    seen_urls = set()
+
+    def fake_single(selected_filename, current_captions, session_history, settings=None, **kwargs):
+        seen_urls.add(settings.get("ollama_url"))
+        updated = dict(current_captions); updated[selected_filename] = f"caption of {selected_filename}"
+        return (f"Caption generation for '{selected_filename}' finished. Status: Success.\n- ok",
+                updated, updated[selected_filename], session_history + [selected_filename])
+
+    with patch(GENERATE_SELECTED_PATH, side_effect=fake_single):
+        status, captions, _, history = generate_captions_sharded(
+            index.image_paths, {}, "Captioner", "llava (VISION)", "Overwrite",
+            {"ollama_endpoints": ["http://gpu0:11434", "http://gpu1:11434"]}, [], {}, {}, {}, [], ["earlier"],
+            num_processes=2, shard_by="Hash", workers_per_process=2, executor_factory=ThreadPoolExecutor)
+
+    assert "Overall: Processed=5, Errors=0, Skipped=0." in status
+    assert captions == {name: f"caption of {name}" for name in index.filenames}
+    assert history[0] == "earlier" and sorted(history[1:]) == sorted(index.filenames)
+    assert seen_urls == {"http://gpu0:11434", "http://gpu1:11434"}
+    # Hash shards of one folder share its resume manifest; each folder gets its own
+    for folder, names in [(dataset_tree, ["top.png"]), (dataset_tree / "class_a", ["a1.png", "a2.png"])]:
+        manifest = read_manifest(folder)
+        assert manifest["state"] == "complete" and sorted(manifest["items"]) == names
+    assert not list(dataset_tree.glob(manifest_filename("*")))
+
+
+def test_hash_sharded_job_resumes_with_a_different_process_count(tmp_path):
+    image_paths = {f"img{i}.png": str(tmp_path / f"img{i}.png") for i in range(8)}
+    for path in image_paths.values(): open(path, 'wb').close()
+    failing = {"img2.png", "img5.png"}
+    calls = []
+    def fake_single(selected_filename, current_captions, session_history, **kwargs):
+        calls.append(selected_filename)
+        if selected_filename in failing:
+            return f"Caption for '{selected_filename}'. Status: Error.\n- ollama down", current_captions, "", session_history
+        return f"Caption for '{selected_filename}'. Status: Success.\n- ok", {selected_filename: "cap"}, "cap", session_history
+
+    def run(processes):
+        calls.clear()
+        with patch(GENERATE_SELECTED_PATH, side_effect=fake_single):
+            return generate_captions_sharded(image_paths, {}, "Captioner", "llava (VISION)", "Append", {}, [], {}, {}, {}, [], [],
+                                             num_processes=processes, shard_by="Hash", workers_per_process=1,
+                                             executor_factory=ThreadPoolExecutor)[0]
+
+    assert "Processed=6, Errors=2" in run(2)
+    assert read_manifest(tmp_path)["state"] == "incomplete"
+    failing.clear()
+    assert "Processed=2, Errors=0" in run(3)
+    assert sorted(calls) == ["img2.png", "img5.png"] # Only the failed images, although the shards changed
+    manifest = read_manifest(tmp_path)
+    assert manifest["state"] == "complete" and len(manifest["items"]) == 8
+    assert not list(tmp_path.glob(manifest_filename("*")))
@@ -0,0 +1,125 @@
+# ArtAgent/tests/test_caption_store.py
+
+import pytest
+import os
+import sys
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.caption_store import (SidecarCaptionStore, SQLiteCaptionStore, SQLITE_STORE_FILENAME,
+                                    open_caption_store, resolve_caption_store_backend, _stores)
+    from core.caption_index import build_caption_index, lookup_caption
+    from core.captioning_logic import save_caption, batch_edit_captions
+    from core.thumbnail_cache import ThumbnailCache
+    from core import captioning_logic
+except ImportError as e:
+    pytest.skip(f"Skipping caption store tests, modules not found: {e}", allow_module_level=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_store_registry(tmp_path, monkeypatch):
+    """Closes stores opened by a test and keeps thumbnails out of the project cache."""
+    cache = ThumbnailCache(str(tmp_path / "thumbs"))
+    monkeypatch.setattr(captioning_logic, "get_thumbnail_cache", lambda: cache)
+    yield
+    for store in list(_stores.values()):
+        store.close()
+    _stores.clear()
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    folder = tmp_path / "images"
+    (folder / "sub").mkdir(parents=True)
+    for name in ["a.png", "b.png", "sub/c.png"]:
+        (folder / name).write_bytes(b"png")
+    (folder / "a.txt").write_text("caption a", encoding='utf-8')
+    (folder / "sub" / "c.txt").write_text("caption c", encoding='utf-8')
+    return folder
+
+
+def test_sidecar_store_reads_and_writes_txt_files(dataset):
+    store = SidecarCaptionStore(str(dataset))
+    assert store.read("a.png") == "caption a" and store.read("b.png") is None
+    assert store.read_many(["a.png", "b.png", "sub/c.png"]) == {"a.png": "caption a", "sub/c.png": "caption c"}
+    assert store.write_many({"b.png": "new b", "sub/c.png": "new c"}) == {}
+    assert (dataset / "b.txt").read_text(encoding='utf-8') == "new b"
+    assert (dataset / "sub" / "c.txt").read_text(encoding='utf-8') == "new c"
+    assert store.has("b.png") and store.location("sub/c.png") == "c.txt"
+
+
+def test_sqlite_store_bulk_reads_and_batched_writes(dataset):
+    store = SQLiteCaptionStore(str(dataset))
+    keys = [f"img{i}.png" for i in range(2000)] # More than one IN (...) batch
+    store.write_many({key: f"caption {key}" for key in keys})
+    assert store.count() == 2000
+    assert store.read_many(keys[::2] + ["missing.png"]) == {key: f"caption {key}" for key in keys[::2]}
+    store.write("img0.png", "updated")
+    assert store.read("img0.png") == "updated" and store.read("missing.png") is None
+    assert len(store.read_many()) == 2000
+    store.close()
+    assert SQLiteCaptionStore(str(dataset)).read("img0.png") == "updated" # Persisted
+
+
+def test_open_caption_store_prefers_existing_database(dataset):
+    assert open_caption_store(str(dataset)).backend == "sidecar"
+    assert open_caption_store(str(dataset), "sqlite").backend == "sqlite"
+    assert os.path.exists(dataset / SQLITE_STORE_FILENAME)
+    assert open_caption_store(str(dataset), "sidecar").backend == "sqlite" # Never split captions across backends
+    assert resolve_caption_store_backend({"caption_store_backend": "SQLite"}) == "sqlite"
+    assert resolve_caption_store_backend({"caption_store_backend": "bogus"}) == "sidecar"
+
+
+def test_sqlite_backend_imports_sidecars_and_serves_app_writes(dataset):
+    index = build_caption_index(str(dataset), recursive=True, backend="sqlite")
+    assert index.load_captions() == {"a.png": "caption a", "b.png": "", "sub/c.png": "caption c"}
+    paths = index.image_paths
+
+    status, captions = save_caption("b.png", "caption b", paths, index.load_captions())
+    assert "saved successfully" in status and captions["b.png"] == "caption b"
+    assert not os.path.exists(dataset / "b.txt") # Written to the database, not a sidecar
+
+    status, captions = batch_edit_captions("*", ", tag", "Append", paths, captions)
+    assert "Processed: 3" in status and "Errors: 0" in status
+    store = open_caption_store(str(dataset))
+    assert store.read_many() == {"a.png": "caption a, tag", "b.png": "caption b, tag", "sub/c.png": "caption c, tag"}
+    assert lookup_caption("sub/c.png", paths["sub/c.png"], {}) == "caption c, tag"
+
+
+def test_sqlite_refresh_reports_captions_written_by_other_processes(dataset):
+    index = build_caption_index(str(dataset), backend="sqlite")
+    index.load_captions()
+    other = SQLiteCaptionStore(str(dataset)) # Separate connection, like another pipeline stage
+    other.write("b.png", "written elsewhere")
+    other.close()
+    assert index.refresh()["captions_changed"] == ["b.png"]
+    assert index.get_caption("b.png") == "written elsewhere"
+
+
+def _child_store_report(root_dir, queue):
+    from core import caption_store
+    inherited = len(caption_store._stores)
+    store = caption_store.open_caption_store(root_dir)
+    store.write_many({"b.png": "from child"})
+    queue.put((inherited, store.backend))
+    store.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="fork-only behaviour")
+def test_forked_child_opens_its_own_sqlite_store(dataset):
+    import multiprocessing
+    parent_store = open_caption_store(str(dataset), "sqlite")
+    parent_store.write_many({"a.png": "from parent"})
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=_child_store_report, args=(str(dataset), queue))
+    child.start()
+    inherited, backend = queue.get(timeout=30)
+    child.join(timeout=30)
+    assert inherited == 0 and backend == "sqlite" # Fresh registry, own connection to the same database
+    assert open_caption_store(str(dataset)) is parent_store
+    assert parent_store.read_many(["a.png", "b.png"]) == {"a.png": "from parent", "b.png": "from child"}
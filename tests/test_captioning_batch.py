@@ -0,0 +1,99 @@
+# ArtAgent/tests/test_captioning_batch.py
+
+import pytest
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core import captioning_logic
+    from core.captioning_logic import generate_captions_for_all, resolve_caption_workers
+except ImportError as e:
+    pytest.skip(f"Skipping captioning batch tests, modules not found: {e}", allow_module_level=True)
+
+GENERATE_SELECTED_PATH = 'core.captioning_logic.generate_captions_for_selected'
+
+IMAGE_PATHS = {f"img{i:02d}.png": f"/data/img{i:02d}.png" for i in range(8)}
+COMMON_ARGS = dict(
+    agent_or_team_display_name="Captioner", selected_model_display_name="llava (VISION)",
+    generate_mode="Overwrite", settings={}, models_data=[], limiters_data={}, teams_data={},
+    file_agents={}, history_list=[],
+)
+
+
+def fake_single(delay_for=None, fail_on=()):
+    """Builds a stand-in for generate_captions_for_selected that tracks concurrency."""
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def _fake(selected_filename, current_captions, session_history, **kwargs):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        try:
+            time.sleep(delay_for(selected_filename) if delay_for else 0.01)
+            if selected_filename in fail_on:
+                raise RuntimeError("vision backend exploded")
+            caption = f"caption of {selected_filename}"
+            updated = dict(current_captions); updated[selected_filename] = caption
+            status = f"Caption generation for '{selected_filename}' finished. Status: Success.\n- Success {selected_filename}"
+            return status, updated, caption, session_history + [f"entry {selected_filename}"]
+        finally:
+            with lock: state["active"] -= 1
+    return _fake, state
+
+
+def test_generate_all_runs_concurrently_and_keeps_order():
+    """Test that workers overlap while results are reported in filename order."""
+    # Later files finish first, so completion order is reversed
+    fake, state = fake_single(delay_for=lambda name: 0.08 - int(name[3:5]) * 0.01)
+    with patch(GENERATE_SELECTED_PATH, side_effect=fake):
+        status, captions, last_caption, session = generate_captions_for_all(
+            IMAGE_PATHS, {"img00.png": "old"}, session_history=["prior"], num_workers=4, **COMMON_ARGS)
+
+    assert state["peak"] == 4
+    assert "Processed=8, Errors=0, Skipped=0" in status
+    assert session == ["prior"] + [f"entry {name}" for name in sorted(IMAGE_PATHS)]
+    assert captions == {name: f"caption of {name}" for name in IMAGE_PATHS}
+    assert last_caption == "caption of img07.png"
+    assert status.index("--- img00.png ---") < status.index("--- img07.png ---")
+
+def test_generate_all_isolates_per_image_errors():
+    """Test that one failing image does not affect the others."""
+    fake, _ = fake_single(fail_on={"img03.png"})
+    with patch(GENERATE_SELECTED_PATH, side_effect=fake):
+        status, captions, _, _ = generate_captions_for_all(
+            IMAGE_PATHS, {"img03.png": "keep me"}, session_history=[], num_workers=3, **COMMON_ARGS)
+
+    assert "Processed=7, Errors=1" in status
+    assert "vision backend exploded" in status
+    assert captions["img03.png"] == "keep me"
+    assert captions["img04.png"] == "caption of img04.png"
+
+def test_generate_all_passes_only_own_caption():
+    """Test that each worker receives just its own caption (no full-dict copies)."""
+    fake, _ = fake_single()
+    with patch(GENERATE_SELECTED_PATH, side_effect=fake) as mock_single:
+        generate_captions_for_all(IMAGE_PATHS, {"img01.png": "c1"}, session_history=[], num_workers=2, **COMMON_ARGS)
+    passed = {c.kwargs["selected_filename"]: c.kwargs["current_captions"] for c in mock_single.call_args_list}
+    assert passed["img01.png"] == {"img01.png": "c1"}
+    assert passed["img02.png"] == {} # Not loaded yet: read lazily by the single-image path
+
+@pytest.mark.parametrize("settings, requested, expected", [
+    ({}, None, captioning_logic.DEFAULT_CAPTION_WORKERS),
+    ({"caption_parallel_workers": 4}, None, 4),
+    ({"caption_parallel_workers": 4}, 2, 2),
+    ({}, 999, captioning_logic.MAX_CAPTION_WORKERS),
+    ({}, "bad", captioning_logic.DEFAULT_CAPTION_WORKERS),
+    ({}, 0, 1),
+])
+def test_resolve_caption_workers(settings, requested, expected):
+    """Test worker count resolution and clamping."""
+    assert resolve_caption_workers(settings, requested) == expected
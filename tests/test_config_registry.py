@@ -0,0 +1,63 @@
+# ArtAgent/tests/test_config_registry.py
+
+import pytest
+import os
+import sys
+import json
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.config_registry import load_config, clear_config_cache
+    from core.utils import load_json
+except ImportError as e:
+    pytest.skip(f"Skipping config registry tests, modules not found: {e}", allow_module_level=True)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_config_cache()
+    yield
+    clear_config_cache()
+
+
+def counting_loader(calls):
+    def loader(path, is_relative=True):
+        calls.append(path)
+        return load_json(path, is_relative=is_relative)
+    return loader
+
+
+def test_load_config_parses_once_until_file_changes(tmp_path):
+    config_file = tmp_path / "limiters.json"
+    config_file.write_text(json.dumps({"Short": {"limiter_token_slider": 100}}), encoding='utf-8')
+    calls = []
+    loader = counting_loader(calls)
+    first = load_config(str(config_file), is_relative=False, loader=loader)
+    assert load_config(str(config_file), is_relative=False, loader=loader) is first
+    assert len(calls) == 1
+
+    config_file.write_text(json.dumps({"Longer": {"limiter_token_slider": 1000}}), encoding='utf-8')
+    os.utime(config_file, ns=(0, os.stat(config_file).st_mtime_ns + 1_000_000)) # Never the same mtime as the first write
+    assert load_config(str(config_file), is_relative=False, loader=loader) == {"Longer": {"limiter_token_slider": 1000}}
+    assert len(calls) == 2
+
+
+def test_load_config_missing_file_is_not_cached(tmp_path):
+    config_file = tmp_path / "models.json"
+    calls = []
+    loader = counting_loader(calls)
+    assert load_config(str(config_file), is_relative=False, loader=loader) == {}
+    config_file.write_text(json.dumps([{"name": "m1"}]), encoding='utf-8')
+    assert load_config(str(config_file), is_relative=False, loader=loader) == [{"name": "m1"}]
+    assert len(calls) == 2
+
+
+def test_load_config_keeps_snapshots_per_loader(tmp_path):
+    config_file = tmp_path / "roles.json"
+    config_file.write_text(json.dumps({"Role": {"description": "d"}}), encoding='utf-8')
+    assert load_config(str(config_file), is_relative=False) == {"Role": {"description": "d"}}
+    assert load_config(str(config_file), is_relative=False, loader=lambda path, is_relative=True: {"Other": {}}) == {"Other": {}}
@@ -0,0 +1,127 @@
+# ArtAgent/tests/test_dataset_export.py
+
+import pytest
+import json
+import os
+import sys
+import tarfile
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.dataset_export import export_dataset, import_dataset, read_jsonl_record
+except ImportError as e:
+    pytest.skip(f"Skipping dataset export tests, modules not found: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Six 'images' of 3 KB each (content only matters byte-for-byte) with captions."""
+    folder = tmp_path / "src"
+    folder.mkdir()
+    paths, captions = {}, {}
+    for i, name in enumerate(["a.png", "b.jpg", "c.v2.png", "c.png", "d.webp", "e.png"]):
+        (folder / name).write_bytes(bytes([i]) * 3000)
+        paths[name] = str(folder / name)
+        captions[name] = f"caption for {name} ✓"
+    captions["e.png"] = ""
+    return tmp_path, paths, captions
+
+
+def test_tar_export_shards_and_roundtrip(dataset):
+    tmp_path, paths, captions = dataset
+    out = tmp_path / "out"
+    status = export_dataset(paths, captions, str(out), "Tar Shards", shard_size_mb=12000 / (1024 * 1024))
+    assert status.startswith("Exported 6 image(s)")
+
+    manifest = json.loads((out / "dataset.manifest.json").read_text(encoding='utf-8'))
+    assert manifest["samples"] == 6 and len(manifest["files"]) == 3 # ~5.6 KB per sample: 2 per 12 KB shard
+    assert sum(f["samples"] for f in manifest["files"]) == 6
+    with tarfile.open(out / manifest["files"][0]["file"]) as tar:
+        assert tar.getnames() == ["a.png", "a.txt", "a.json", "b.jpg", "b.txt", "b.json"]
+
+    dest = tmp_path / "dest"
+    status = import_dataset(str(out), str(dest))
+    assert status.startswith("Imported 6 image(s) from 3 file(s)")
+    for name, path in paths.items():
+        assert (dest / name).read_bytes() == open(path, 'rb').read()
+        assert (dest / (os.path.splitext(name)[0] + ".txt")).read_text(encoding='utf-8') == captions[name]
+    assert not [p for p in os.listdir(dest) if p.endswith(".part")]
+
+    assert "6 skipped" in import_dataset(str(out), str(dest)) # Existing files kept
+
+
+def test_jsonl_export_with_offsets_and_import(dataset):
+    tmp_path, paths, captions = dataset
+    out = tmp_path / "out"
+    status = export_dataset(paths, captions, str(out), "JSONL", prefix="set", include_uncaptioned=False)
+    assert status.startswith("Exported 5 image(s)")
+
+    index = json.loads((out / "set.idx.json").read_text(encoding='utf-8'))
+    filename, offset, length = index[2]
+    record = read_jsonl_record(str(out / "set.jsonl"), offset, length)
+    assert record["filename"] == filename and record["caption"] == captions[filename]
+
+    dest = tmp_path / "dest"
+    assert import_dataset(str(out / "set.jsonl"), str(dest)).startswith("Imported 5 image(s)")
+    assert (dest / "c.v2.png").read_bytes() == open(paths["c.v2.png"], 'rb').read()
+
+
+def test_export_import_errors(dataset, tmp_path):
+    _, paths, captions = dataset
+    assert export_dataset({}, {}, str(tmp_path)).startswith("Error")
+    assert export_dataset(paths, captions, "").startswith("Error")
+    assert export_dataset(paths, captions, str(tmp_path), "Zip").startswith("Error: Unknown export format")
+    assert import_dataset(str(tmp_path / "missing"), str(tmp_path)).startswith("Error")
+
+
+
+def test_tar_export_of_recursive_dataset_uses_flat_keys(tmp_path):
+    paths = {}
+    for i, name in enumerate(["a/img.png", "b/img.png", "a_img.png"]):
+        path = tmp_path / "src" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(bytes([i]) * 1000)
+        paths[name] = str(path)
+    out = tmp_path / "out"
+    assert export_dataset(paths, {}, str(out), "Tar Shards").startswith("Exported 3 image(s)")
+    with tarfile.open(out / "dataset-000000.tar") as tar:
+        names = tar.getnames()
+        assert all("/" not in name for name in names) and len(set(names)) == 9 # No nested tar directories, no clashes
+        filenames = {json.loads(tar.extractfile(n).read())["filename"] for n in names if n.endswith(".json")}
+    assert filenames == set(paths) # The subpath travels in each sample's .json
+
+
+@pytest.mark.parametrize("export_format", ["Tar Shards", "JSONL"])
+def test_recursive_dataset_roundtrip_keeps_subfolders(tmp_path, export_format):
+    paths, captions = {}, {}
+    for i, name in enumerate(["a/img.png", "b/img.png", "b/deep/img.png", "img.png"]):
+        path = tmp_path / "src" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(bytes([i]) * 1000)
+        paths[name], captions[name] = str(path), f"caption {name}"
+    out = tmp_path / "out"
+    assert export_dataset(paths, captions, str(out), export_format).startswith("Exported 4 image(s)")
+    if export_format == "Tar Shards":
+        with tarfile.open(out / "dataset-000000.tar") as tar:
+            assert all("/" not in name for name in tar.getnames()) # Flat sample keys, subpath in the .json
+
+    dest = tmp_path / "dest"
+    status = import_dataset(str(out), str(dest))
+    assert status.startswith("Imported 4 image(s)") and "skipped" not in status
+    for name, path in paths.items():
+        assert (dest / name).read_bytes() == open(path, 'rb').read()
+        assert (dest / (os.path.splitext(name)[0] + ".txt")).read_text(encoding='utf-8') == captions[name]
+
+
+def test_import_rejects_paths_outside_destination(tmp_path):
+    source = tmp_path / "evil.jsonl"
+    records = [{"filename": name, "caption": "x", "image": "AAAA"} for name in ("../escape.png", "/abs/escape.png", "ok/fine.png")]
+    source.write_text("\n".join(json.dumps(r) for r in records) + "\n", encoding='utf-8')
+    dest = tmp_path / "dest"
+    status = import_dataset(str(source), str(dest))
+    assert status.startswith("Imported 1 image(s)") and "2 rejected" in status
+    assert (dest / "ok" / "fine.png").exists() and not (tmp_path / "escape.png").exists()
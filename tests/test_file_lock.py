@@ -0,0 +1,105 @@
+# ArtAgent/tests/test_file_lock.py
+
+import pytest
+import os
+import sys
+import json
+import threading
+import time
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.file_lock import FileLock, LockTimeoutError, atomic_write_json, atomic_write_text, LOCK_SUFFIX
+except ImportError as e:
+    pytest.skip(f"Skipping file_lock tests, core module not found: {e}", allow_module_level=True)
+
+
+# --- Tests for FileLock ---
+
+def test_lock_creates_sidecar(tmp_path):
+    """Test that the lock file sits next to the guarded file."""
+    target = tmp_path / "settings.json"
+    with FileLock(str(target)):
+        assert os.path.exists(str(target) + LOCK_SUFFIX)
+
+def test_lock_is_reentrant_within_thread(tmp_path):
+    """Test nested acquisition in one thread does not deadlock."""
+    target = str(tmp_path / "history.json")
+    with FileLock(target, timeout=1):
+        with FileLock(target, timeout=1):
+            pass
+    # Fully released afterwards: another thread can acquire promptly
+    acquired = []
+    t = threading.Thread(target=lambda: acquired.append(FileLock(target, timeout=1).acquire().release() is None))
+    t.start(); t.join()
+    assert acquired == [True]
+
+def test_lock_times_out_when_held_elsewhere(tmp_path):
+    """Test that a held lock makes another holder retry and then time out."""
+    target = str(tmp_path / "teams.json")
+    holding = threading.Event(); release = threading.Event()
+
+    def holder():
+        with FileLock(target):
+            holding.set()
+            release.wait(5)
+
+    t = threading.Thread(target=holder); t.start()
+    holding.wait(5)
+    start = time.monotonic()
+    with pytest.raises(LockTimeoutError):
+        FileLock(target, timeout=0.2).acquire()
+    assert time.monotonic() - start >= 0.2
+    release.set(); t.join()
+
+def test_lock_serializes_read_modify_write(tmp_path):
+    """Test concurrent counter increments under the lock lose no updates."""
+    target = tmp_path / "counter.json"
+    atomic_write_json(str(target), {"n": 0})
+
+    def bump():
+        for _ in range(25):
+            with FileLock(str(target)):
+                data = json.loads(target.read_text(encoding='utf-8'))
+                data["n"] += 1
+                atomic_write_json(str(target), data)
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert json.loads(target.read_text(encoding='utf-8'))["n"] == 100
+
+
+# --- Tests for atomic_write_json ---
+
+def test_atomic_write_json_roundtrip(tmp_path):
+    """Test atomic writes produce the data and leave no temp files."""
+    target = tmp_path / "sub" / "data.json"
+    atomic_write_json(str(target), {"a": [1, 2]}, indent=2)
+    assert json.loads(target.read_text(encoding='utf-8')) == {"a": [1, 2]}
+    assert os.listdir(target.parent) == ["data.json"]
+
+def test_atomic_write_json_failure_keeps_original(tmp_path):
+    """Test a failed serialization leaves the previous file intact."""
+    target = tmp_path / "data.json"
+    atomic_write_json(str(target), {"ok": True})
+    with pytest.raises(TypeError):
+        atomic_write_json(str(target), {"bad": object()})
+    assert json.loads(target.read_text(encoding='utf-8')) == {"ok": True}
+    assert os.listdir(tmp_path) == ["data.json"]
+
+def test_atomic_write_text_keeps_permissions(tmp_path):
+    """Test text replacement keeps the target's permissions and leaves no temp files."""
+    target = tmp_path / "caption.txt"
+    atomic_write_text(str(target), "new file")
+    assert target.read_text(encoding='utf-8') == "new file"
+    os.chmod(target, 0o640)
+    atomic_write_text(str(target), "replaced")
+    assert target.read_text(encoding='utf-8') == "replaced"
+    if os.name == "posix":
+        assert os.stat(target).st_mode & 0o777 == 0o640
+    assert [p.name for p in tmp_path.iterdir()] == ["caption.txt"] # No temp files left behind
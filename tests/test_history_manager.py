@@ -4,7 +4,7 @@ import pytest
 import os
 import json
 import sys
-from unittest.mock import patch, mock_open
+from unittest.mock import patch, mock_open, ANY
 
 # --- Adjust import path ---
 test_dir = os.path.dirname(os.path.abspath(__file__))
@@ -28,13 +28,19 @@ except ImportError as e:
 # --- Constants ---
 LOAD_JSON_PATH = 'core.history_manager.load_json'
 SAVE_HISTORY_PATH = 'core.history_manager.save_history' # To mock save called by add
+WRITE_RECORDS_PATH = 'core.history_manager._write_history_records' # Writer used by add_to_history
 GET_ABS_PATH = 'core.history_manager.get_absolute_path'
 BUILTINS_OPEN_PATH = 'builtins.open' # Used by save_history
 JSON_DUMP_PATH = 'core.history_manager.json.dump' # Used by save_history
+ATOMIC_WRITE_PATH = 'core.history_manager.atomic_write_json' # Used by save_history
 
 
 # --- Fixtures ---
-# No autouse fixture needed with the new mocking strategy for load_history
+
+@pytest.fixture(autouse=True)
+def isolated_history_path(tmp_path, monkeypatch):
+    """Keeps history/lock files out of the project tree (tests may still patch this)."""
+    monkeypatch.setattr('core.history_manager.get_absolute_path', lambda rel: str(tmp_path / "isolated_history.json"))
 
 @pytest.fixture
 def temp_history_file(tmp_path):
@@ -89,10 +95,9 @@ def test_load_history_not_a_list(mock_load_json, capsys):
 
 # --- Tests for save_history ---
 
-@patch(JSON_DUMP_PATH) # Mock json.dump
-@patch(BUILTINS_OPEN_PATH, new_callable=mock_open) # Mock file open
+@patch(ATOMIC_WRITE_PATH) # Mock the atomic temp+rename writer
 @patch(GET_ABS_PATH) # Mock get_absolute_path used by save_history
-def test_save_history_basic(mock_get_abs, mock_file_open, mock_json_dump, temp_history_file):
+def test_save_history_basic(mock_get_abs, mock_atomic_write, temp_history_file):
     """Test saving a simple history list."""
     # Configure mock get_absolute_path to return the temp file path
     mock_get_abs.return_value = str(temp_history_file)
@@ -101,51 +106,55 @@ def test_save_history_basic(mock_get_abs, mock_file_open, mock_json_dump, temp_h
     save_history(test_data) # Call the function
 
     mock_get_abs.assert_called_once_with(REAL_HISTORY_FILE) # Check abs path called correctly
-    mock_file_open.assert_called_once_with(str(temp_history_file), 'w', encoding='utf-8') # Check file opened
-    mock_json_dump.assert_called_once_with(test_data, mock_file_open(), indent=4) # Check data dumped
+    mock_atomic_write.assert_called_once_with(str(temp_history_file), test_data, indent=4) # Check data written
 
-@patch(JSON_DUMP_PATH)
-@patch(BUILTINS_OPEN_PATH, new_callable=mock_open)
+@patch(ATOMIC_WRITE_PATH)
 @patch(GET_ABS_PATH)
-def test_save_history_empty(mock_get_abs, mock_file_open, mock_json_dump, temp_history_file):
+def test_save_history_empty(mock_get_abs, mock_atomic_write, temp_history_file):
     """Test saving an empty history list."""
     mock_get_abs.return_value = str(temp_history_file)
     save_history([])
     mock_get_abs.assert_called_once_with(REAL_HISTORY_FILE)
-    mock_file_open.assert_called_once_with(str(temp_history_file), 'w', encoding='utf-8')
-    mock_json_dump.assert_called_once_with([], mock_file_open(), indent=4)
+    mock_atomic_write.assert_called_once_with(str(temp_history_file), [], indent=4)
+
+def test_save_history_writes_file(temp_history_file, monkeypatch):
+    """Test that save_history produces a readable JSON file and no temp leftovers."""
+    monkeypatch.setattr('core.history_manager.get_absolute_path', lambda rel: str(temp_history_file))
+    save_history(["a", "b"])
+    assert json.loads(temp_history_file.read_text(encoding='utf-8')) == ["a", "b"]
+    assert not [p for p in os.listdir(temp_history_file.parent) if p.endswith(".tmp")]
 
 
 # --- Tests for add_to_history ---
 
-@patch(SAVE_HISTORY_PATH) # Mock save_history called by add_to_history
+@patch(WRITE_RECORDS_PATH) # Mock the record writer used by add_to_history
 def test_add_to_history_append(mock_save_history_func):
     """Test adding a new entry to an existing history."""
     initial_history = ["entry_A"]
     updated_history = add_to_history(initial_history, "entry_B") # Pass list directly
     assert updated_history == ["entry_A", "entry_B"]
-    # Verify save_history was called with the updated list
-    mock_save_history_func.assert_called_once_with(["entry_A", "entry_B"])
+    # Verify the updated records were written
+    mock_save_history_func.assert_called_once_with(ANY, ["entry_A", "entry_B"])
 
-@patch(SAVE_HISTORY_PATH)
+@patch(WRITE_RECORDS_PATH)
 def test_add_to_history_from_empty(mock_save_history_func):
     """Test adding an entry when history starts empty."""
     initial_history = []
     updated_history = add_to_history(initial_history, "first_entry")
     assert updated_history == ["first_entry"]
-    mock_save_history_func.assert_called_once_with(["first_entry"])
+    mock_save_history_func.assert_called_once_with(ANY, ["first_entry"])
 
-@patch(SAVE_HISTORY_PATH)
+@patch(WRITE_RECORDS_PATH)
 def test_add_to_history_duplicate_skip(mock_save_history_func):
     """Test that adding an exact duplicate entry is skipped."""
     initial_history = ["duplicate_entry"]
     updated_history = add_to_history(initial_history, "duplicate_entry")
     assert updated_history == ["duplicate_entry"] # Should not change
     # Save should still be called, but with the original list
-    mock_save_history_func.assert_called_once_with(["duplicate_entry"])
+    mock_save_history_func.assert_called_once_with(ANY, ["duplicate_entry"])
 
 
-@patch(SAVE_HISTORY_PATH) # Mock save_history
+@patch(WRITE_RECORDS_PATH) # Mock the record writer
 @patch('core.history_manager.MAX_HISTORY_ENTRIES', 3) # Mock constant within the module
 def test_add_to_history_max_entries(mock_save_history_func):
     """Test that history is truncated when MAX_HISTORY_ENTRIES is exceeded."""
@@ -157,26 +166,138 @@ def test_add_to_history_max_entries(mock_save_history_func):
     # Add entry 3 (reaches limit)
     h1 = add_to_history(h0.copy(), "entry3")
     assert h1 == ["entry1", "entry2", "entry3"]
-    mock_save_history_func.assert_called_with(["entry1", "entry2", "entry3"]) # Check last call
+    mock_save_history_func.assert_called_with(ANY, ["entry1", "entry2", "entry3"]) # Check last call
 
     # Add entry 4 (exceeds limit)
     h2 = add_to_history(h1.copy(), "entry4")
     assert h2 == ["entry2", "entry3", "entry4"] # entry1 should be dropped
-    mock_save_history_func.assert_called_with(["entry2", "entry3", "entry4"])
+    mock_save_history_func.assert_called_with(ANY, ["entry2", "entry3", "entry4"])
 
     # Add entry 5
     h3 = add_to_history(h2.copy(), "entry5")
     assert h3 == ["entry3", "entry4", "entry5"] # entry2 should be dropped
-    mock_save_history_func.assert_called_with(["entry3", "entry4", "entry5"])
+    mock_save_history_func.assert_called_with(ANY, ["entry3", "entry4", "entry5"])
 
 
-@patch(SAVE_HISTORY_PATH) # Mock save_history
+@patch(WRITE_RECORDS_PATH) # Mock the record writer
 def test_add_to_history_invalid_input_type(mock_save_history_func, capsys):
     """Test adding to history when the input 'history' is not a list."""
     initial_history = {"not": "a list"} # Invalid input
     updated_history = add_to_history(initial_history, "new_entry")
     assert updated_history == ["new_entry"] # Should reset and add the entry
     # Check save was called with the corrected list
-    mock_save_history_func.assert_called_once_with(["new_entry"])
+    mock_save_history_func.assert_called_once_with(ANY, ["new_entry"])
     captured = capsys.readouterr()
-    assert "Warning: History is not a list" in captured.out or "Warning: History is not a list" in captured.err
\ No newline at end of file
+    assert "Warning: History is not a list" in captured.out or "Warning: History is not a list" in captured.err
+
+# --- Tests for blob-backed history bodies ---
+
+@pytest.fixture
+def blob_history(tmp_path, monkeypatch):
+    """Points history file and blob store at a temporary directory."""
+    from core import history_manager
+    from core.blob_store import BlobStore
+    history_path = tmp_path / "history.json"
+    store = BlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setattr(history_manager, 'get_absolute_path', lambda rel: str(history_path))
+    monkeypatch.setattr(history_manager, 'get_default_store', lambda: store)
+    monkeypatch.setattr(history_manager, 'load_json', lambda rel, is_relative=True: json.loads(history_path.read_text(encoding='utf-8')))
+    return history_path, store
+
+def test_save_history_externalizes_large_bodies(blob_history):
+    """Test that large bodies are stored as blob references and restored on load."""
+    history_path, store = blob_history
+    body = "Detailed output line.\n" * 100
+    step_entry = f"Timestamp: t\nWorkflow Step 2: 'Detailer'\nGoal: g\nOutput:\n{body}\n---\n"
+    end_entry = f"Timestamp: t\nWorkflow End: 'Team'\nAssembly Strategy: refine_last\nFinal Output:\n{body}\n---\n"
+    small_entry = "Timestamp: t\nRole: A\nResponse:\nshort\n---\n"
+
+    save_history([step_entry, end_entry, small_entry])
+
+    on_disk = json.loads(history_path.read_text(encoding='utf-8'))
+    assert on_disk[2] == small_entry # Small entries stay inline
+    assert on_disk[0]["blob"] == on_disk[1]["blob"] # Identical bodies share one blob
+    assert on_disk[1]["head"].endswith("Final Output:\n")
+    assert on_disk[0]["tail"] == "\n---\n"
+    assert body not in history_path.read_text(encoding='utf-8')
+
+    assert load_history() == [step_entry, end_entry, small_entry]
+
+def test_load_history_missing_blob(blob_history):
+    """Test that a dangling blob reference degrades to a placeholder."""
+    history_path, _ = blob_history
+    history_path.write_text(json.dumps([{"head": "Output:\n", "blob": "ab" * 32, "tail": ""}]), encoding='utf-8')
+    loaded = load_history()
+    assert loaded[0].startswith("Output:\n[History body missing from blob store:")
+
+
+def test_add_to_history_appends_without_reprocessing_stored_entries(blob_history, monkeypatch):
+    """Test that an add externalizes only the new entry and leaves pruning to clears and the periodic schedule."""
+    from core import history_manager
+    history_path, store = blob_history
+    body = "Stored body line.\n" * 100
+    save_history([f"Output:\n{body}", "small"])
+    puts, prunes = [], []
+    monkeypatch.setattr(store, 'put', lambda text, put=store.put: puts.append(text) or put(text))
+    monkeypatch.setattr(store, 'prune', lambda live, **kwargs: prunes.append(list(live)))
+    monkeypatch.setattr(history_manager, 'MAX_HISTORY_ENTRIES', 2)
+
+    new_body = "New body line.\n" * 100
+    updated = add_to_history([], f"Output:\n{new_body}")
+    assert puts == [new_body] # Stored entries are not re-hashed or re-compressed
+    assert updated == ["small", f"Output:\n{new_body}"]
+    assert prunes == [] # Trimmed, but the periodic prune is not due yet
+
+    monkeypatch.setattr(history_manager, '_last_prune', 0.0)
+    add_to_history([], "another")
+    assert prunes == [[store.digest_for(new_body)]]
+
+
+def test_add_to_history_resolves_blobs_outside_the_lock(blob_history, monkeypatch):
+    """Test that the history lock covers only load, append and write, not blob reads."""
+    from core import history_manager, file_lock
+    history_path, _ = blob_history
+    body = "Body line.\n" * 100
+    save_history([f"Output:\n{body}"])
+    lock_path = os.path.abspath(str(history_path)) + file_lock.LOCK_SUFFIX
+    held_during_reads = []
+
+    def internalize(record, store, original=history_manager._internalize_entry):
+        held_during_reads.append(file_lock._held_counts().get(lock_path, 0) > 0)
+        return original(record, store)
+    monkeypatch.setattr(history_manager, '_internalize_entry', internalize)
+
+    assert len(add_to_history([], "entry")) == 2
+    assert held_during_reads == [False, False]
+
+
+# --- Tests for multi-process safe updates ---
+
+def test_add_to_history_merges_on_disk_entries(temp_history_file, monkeypatch):
+    """Test that add_to_history builds on entries written by another process."""
+    monkeypatch.setattr('core.history_manager.get_absolute_path', lambda rel: str(temp_history_file))
+    monkeypatch.setattr('core.history_manager.load_json', lambda rel, is_relative=True: json.loads(temp_history_file.read_text(encoding='utf-8')))
+    temp_history_file.write_text(json.dumps(["from_other_process"]), encoding='utf-8')
+
+    stale_local_history = ["entry_A"] # This process never saw the other process's entry
+    updated = add_to_history(stale_local_history, "entry_B")
+
+    assert updated == ["from_other_process", "entry_B"]
+    assert json.loads(temp_history_file.read_text(encoding='utf-8')) == ["from_other_process", "entry_B"]
+
+def test_add_to_history_concurrent_threads_lose_nothing(temp_history_file, monkeypatch):
+    """Test that concurrent writers serialize through the lock without lost updates."""
+    import threading
+    monkeypatch.setattr('core.history_manager.get_absolute_path', lambda rel: str(temp_history_file))
+    monkeypatch.setattr('core.history_manager.load_json', lambda rel, is_relative=True: json.loads(temp_history_file.read_text(encoding='utf-8')))
+
+    def writer(n):
+        for i in range(10):
+            add_to_history([], f"writer{n}-entry{i}")
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    saved = json.loads(temp_history_file.read_text(encoding='utf-8'))
+    assert len(saved) == 40
@@ -0,0 +1,86 @@
+# ArtAgent/tests/test_image_dedup.py
+
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    import numpy as np
+    from PIL import Image, ImageDraw
+    from core.image_dedup import cluster_hashes, compute_dhash, find_duplicate_groups, hamming_distances
+    from core.captioning_logic import generate_captions_for_all
+except ImportError as e:
+    pytest.skip(f"Skipping image dedup tests, modules not found: {e}", allow_module_level=True)
+
+GENERATE_SELECTED_PATH = 'core.captioning_logic.generate_captions_for_selected'
+
+
+def draw_scene(path, shift=0, size=(320, 240), seed=0):
+    """Random blocky scene; small shifts/resizes keep the perceptual hash close."""
+    rng = np.random.default_rng(seed)
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.integers(0, size[0] - 60), rng.integers(0, size[1] - 60)
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        draw.rectangle([x + shift, y, x + shift + 60, y + 60], fill=color)
+    img.save(path)
+    return str(path)
+
+
+def test_hamming_distances_match_python():
+    hashes = np.array([0, 0xFFFFFFFFFFFFFFFF, 0b1011, 1 << 63], dtype=np.uint64)
+    expected = [bin(int(h) ^ 0b1001).count("1") for h in hashes]
+    assert hamming_distances(0b1001, hashes).tolist() == expected
+
+
+def test_cluster_members_stay_within_distance_of_representative():
+    # a-b and b-c are within 2 bits, but a-c is 4 bits apart: no chaining
+    hashes = {"a.png": 0b0000, "b.png": 0b0011, "c.png": 0b1111, "d.png": (1 << 40) - 1}
+    assert cluster_hashes(hashes, max_distance=2) == {"a.png": ["b.png"], "c.png": [], "d.png": []}
+    assert cluster_hashes(hashes, max_distance=0) == {name: [] for name in hashes}
+
+
+def test_find_duplicate_groups_on_real_images(tmp_path):
+    paths = {
+        "frame1.png": draw_scene(tmp_path / "frame1.png", seed=1),
+        "frame2.png": draw_scene(tmp_path / "frame2.png", shift=2, seed=1),
+        "other.png": draw_scene(tmp_path / "other.png", seed=2),
+    }
+    Image.open(paths["frame1.png"]).resize((160, 120)).save(tmp_path / "frame1_small.jpg", quality=85) # Re-export
+    paths["frame1_small.jpg"] = str(tmp_path / "frame1_small.jpg")
+
+    assert bin(compute_dhash(paths["frame1.png"]) ^ compute_dhash(paths["other.png"])).count("1") > 10
+    groups = find_duplicate_groups(paths, max_distance=6)
+    assert groups == {"frame1.png": ["frame1_small.jpg", "frame2.png"]}
+
+
+def test_generate_all_captions_one_per_group(tmp_path):
+    paths = {
+        "a1.png": draw_scene(tmp_path / "a1.png", seed=5),
+        "a2.png": draw_scene(tmp_path / "a2.png", shift=1, seed=5),
+        "b1.png": draw_scene(tmp_path / "b1.png", seed=6),
+    }
+    (tmp_path / "a2.txt").write_text("existing", encoding='utf-8')
+    calls = []
+
+    def fake(selected_filename, current_captions, session_history, **kwargs):
+        calls.append(selected_filename)
+        caption = f"caption of {selected_filename}"
+        return f"Caption for '{selected_filename}'. Status: Success.\n- ok", {selected_filename: caption}, caption, []
+
+    with patch(GENERATE_SELECTED_PATH, side_effect=fake):
+        status, captions, _, _ = generate_captions_for_all(
+            paths, {}, "Captioner", "llava (VISION)", "Append", {}, [], {}, {}, {}, [], [],
+            num_workers=2, resume_job=False, skip_duplicates=True, duplicate_max_distance=6)
+
+    assert sorted(calls) == ["a1.png", "b1.png"]
+    assert "Processed=3" in status and "1 image(s) reused the caption" in status
+    assert captions["a2.png"] == "existing\n\n---\n\ncaption of a1.png"
+    assert (tmp_path / "a2.txt").read_text(encoding='utf-8') == captions["a2.png"]
@@ -0,0 +1,91 @@
+# ArtAgent/tests/test_image_prefetch.py
+
+import pytest
+import base64
+import io
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from PIL import Image
+    from agents.ollama_agent import EncodedImage
+    from core import image_prefetch
+    from core.image_prefetch import ImagePrefetcher, prepare_image, resolve_image_max_side
+except ImportError as e:
+    pytest.skip(f"Skipping image prefetch tests, modules not found: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def image_files(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"img{i}.jpg"
+        Image.new("RGB", (640, 320), (i * 40, 10, 10)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def decode(encoded):
+    return Image.open(io.BytesIO(base64.b64decode(encoded.data)))
+
+
+def test_prepare_image_resizes_and_encodes(image_files, tmp_path):
+    encoded = prepare_image(image_files[0], max_side=160)
+    assert isinstance(encoded, EncodedImage)
+    assert encoded.size == (160, 80) and decode(encoded).size == (160, 80)
+    assert prepare_image(image_files[0], max_side=0).size == (640, 320)
+
+    palette_path = tmp_path / "palette.gif"
+    Image.new("P", (10, 10)).save(palette_path)
+    assert decode(prepare_image(str(palette_path))).format == "JPEG"
+
+
+@pytest.mark.parametrize("settings, expected", [
+    ({}, image_prefetch.DEFAULT_IMAGE_MAX_SIDE), ({"caption_image_max_side": 0}, 0),
+    ({"caption_image_max_side": "bad"}, image_prefetch.DEFAULT_IMAGE_MAX_SIDE),
+])
+def test_resolve_image_max_side(settings, expected):
+    assert resolve_image_max_side(settings) == expected
+
+
+def test_prefetcher_respects_depth_and_prepares_ahead(image_files):
+    prepared = []
+    lock = threading.Lock()
+    real_prepare = image_prefetch.prepare_image
+
+    def tracking_prepare(path, max_side):
+        with lock: prepared.append(path)
+        return real_prepare(path, max_side)
+
+    with patch.object(image_prefetch, "prepare_image", side_effect=tracking_prepare):
+        with ImagePrefetcher(image_files, depth=2, workers=2, max_side=64) as prefetcher:
+            time.sleep(0.2)
+            assert sorted(prepared) == image_files[:2] # Back-pressure: only `depth` ahead
+            first = prefetcher.get(image_files[0])
+            assert first.source == image_files[0]
+            time.sleep(0.2)
+            assert image_files[2] in prepared # Claiming one frees a slot for the next
+
+            prefetcher.discard(image_files[4]) # Will be skipped, never prepared
+            for path in (image_files[1], image_files[2], image_files[3], image_files[5]):
+                assert prefetcher.get(path).source == path
+    assert image_files[4] not in prepared
+
+
+def test_prefetcher_serves_paths_outside_window_and_errors(image_files, tmp_path):
+    bad = tmp_path / "bad.jpg"
+    bad.write_bytes(b"not an image")
+    with ImagePrefetcher(image_files + [str(bad)], depth=1, workers=1, max_side=64) as prefetcher:
+        assert prefetcher.get(image_files[5]).source == image_files[5] # Ran ahead of the window
+        assert prefetcher.get(image_files[0]).source == image_files[0]
+        assert prefetcher.get(image_files[0]).source == image_files[0] # Re-claim prepares again
+        with pytest.raises(Exception):
+            prefetcher.get(str(bad))
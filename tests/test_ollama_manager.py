@@ -16,6 +16,9 @@ try:
     from core.ollama_manager import (
         release_model,
         release_all_models_logic,
+        list_running_models,
+        preload_model,
+        PRELOAD_TIMEOUT,
         MODELS_FILE # Import the constant
     )
     # Mocks for dependencies
@@ -209,4 +212,26 @@ def test_release_all_models_missing_name_key(mock_load, mock_release):
 
     assert mock_release.call_count == 1 # Only called for the valid model
     mock_release.assert_called_once_with("model2:ok", OLLAMA_URL)
-    assert "Model 'model2:ok' release request sent successfully." in summary
\ No newline at end of file
+    assert "Model 'model2:ok' release request sent successfully." in summary
+# --- Tests for residency queries and preloading ---
+
+@patch('core.ollama_manager.requests.get')
+def test_list_running_models_queries_api_ps(mock_get):
+    """The /api/ps endpoint is derived from the configured generate URL."""
+    mock_resp = create_mock_response(200)
+    mock_resp.json = MagicMock(return_value={"models": [{"name": "llava:13b", "size": 8000}]})
+    mock_get.return_value = mock_resp
+    assert list_running_models(OLLAMA_URL) == [{"name": "llava:13b", "size": 8000}]
+    mock_get.assert_called_once_with("http://fake-manager-test:11434/api/ps", timeout=5)
+
+@patch('core.ollama_manager.requests.get', side_effect=requests.exceptions.ConnectionError("down"))
+def test_list_running_models_unreachable(mock_get):
+    assert list_running_models(OLLAMA_URL) is None
+    assert list_running_models("") is None
+
+@patch(REQUESTS_POST_PATH)
+def test_preload_model_sends_keep_alive(mock_post):
+    mock_post.return_value = create_mock_response(200)
+    result = preload_model(MODEL_NAME, OLLAMA_URL, "15m")
+    mock_post.assert_called_once_with(OLLAMA_URL, json={"model": MODEL_NAME, "keep_alive": "15m"}, timeout=PRELOAD_TIMEOUT)
+    assert "preloaded" in result
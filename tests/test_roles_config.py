@@ -16,6 +16,8 @@ try:
         load_all_roles,
         get_role_display_name,
         get_actual_role_name,
+        compiled_role,
+        compile_role_table,
         DEFAULT_ROLES_FILE,
         CUSTOM_ROLES_FILE
     )
@@ -210,4 +212,26 @@ def test_get_actual_role_name_from_display():
 def test_get_actual_role_name_no_prefix():
     assert get_actual_role_name("NotAFilePrefix Role") == "NotAFilePrefix Role"
     # Test case where it coincidentally starts similarly but without space
-    assert get_actual_role_name("[File]AgentNoSpace") == "[File]AgentNoSpace"
\ No newline at end of file
+    assert get_actual_role_name("[File]AgentNoSpace") == "[File]AgentNoSpace"
+
+# --- Tests for the compiled role table ---
+
+def test_compiled_role_merges_options_and_is_reused():
+    settings = {"ollama_api_options": {"temperature": 0.5, "num_ctx": 2048}}
+    roles = {"Tuned": {"description": "Tuned role.", "ollama_api_options": {"temperature": 0.9}}}
+    compiled = compiled_role("Tuned", settings, roles)
+    assert compiled.options == {"temperature": 0.9, "num_ctx": 2048}
+    assert compiled.description == "Tuned role."
+    assert compiled_role("Tuned", settings, roles) is compiled # Same settings and role definition: a lookup
+    assert compiled_role("Missing", settings, roles).description is None
+
+    # Saving settings or changing a role file yields new dicts, which compile anew
+    saved_settings = {"ollama_api_options": {"temperature": 0.5, "num_ctx": 4096}}
+    assert compiled_role("Tuned", saved_settings, roles).options == {"temperature": 0.9, "num_ctx": 4096}
+    assert compiled_role("Tuned", settings, {"Tuned": {"description": "Edited."}}).options == {"temperature": 0.5, "num_ctx": 2048}
+
+def test_compile_role_table_display_names():
+    table = compile_role_table({}, {**CUSTOM_ROLES_DATA, **FILE_AGENTS_DATA}, FILE_KEYS)
+    assert sorted(role.display_name for role in table.values()) == ["CustomArtist", "SharedRole", "[File] DefaultDesigner", "[File] FileAgent"]
+    assert table["FileAgent"].description == "Loaded from file."
+
@@ -0,0 +1,112 @@
+# ArtAgent/tests/test_sweep_analytics.py
+
+import pytest
+import os
+import sys
+import json
+import random
+import numpy as np
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.sweep_analytics import (tokenize_hashed, TfidfMatrix, mean_pairwise_similarity, near_duplicate_labels,
+                                      analyze_outputs, analyze_sweep, REPORT_TEXT_FILENAME, REPORT_JSON_FILENAME,
+                                      SIMHASH_BANDS, _close_pairs)
+    from core.sweep_store import open_sweep_sink, prompt_hash
+except ImportError as e:
+    pytest.skip(f"Skipping sweep analytics tests, modules not found: {e}", allow_module_level=True)
+
+WORDS = [f"word{i}" for i in range(500)]
+
+def random_text(rng, n=60):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def test_tokenize_hashed_words_case_and_punctuation():
+    docs, hashes = tokenize_hashed(["Chair, chair!", "", "a_very_long_identifier_number_one a_very_long_identifier_number_two é"])
+    assert docs.tolist() == [0, 0, 2, 2, 2]
+    assert hashes[0] == hashes[1] # Case and punctuation do not matter
+    assert len(set(hashes.tolist())) == 4
+
+
+def test_mean_pairwise_similarity_matches_brute_force():
+    rng = random.Random(1)
+    texts = [random_text(rng, rng.randint(5, 30)) for _ in range(12)] + [""]
+    matrix = TfidfMatrix(texts)
+    dense = np.zeros((matrix.n_docs, matrix.n_terms))
+    dense[matrix.docs, matrix.terms] = matrix.weights
+    group = np.array([0] * 7 + [1] * 6)
+    sums, nonempty = matrix.group_sums(group, 2)
+    for g, members in ((0, range(7)), (1, range(7, 13))):
+        rows = dense[list(members)]
+        cosines = rows @ rows.T
+        n = len(rows)
+        expected = (cosines.sum() - np.trace(cosines)) / (n * (n - 1))
+        assert mean_pairwise_similarity(sums[g], nonempty[g], n) == pytest.approx(expected)
+    assert mean_pairwise_similarity(sums[0], 1, 1) is None
+
+
+def test_near_duplicates_cluster_edited_copies_only():
+    rng = random.Random(2)
+    base = [random_text(rng) for _ in range(30)]
+    edited = [text.replace(text.split()[5], "changed", 1) for text in base[:10]]
+    labels = near_duplicate_labels(TfidfMatrix(base + edited + base[:5]))
+    assert all(labels[30 + i] == labels[i] for i in range(10)) # One word changed in 60
+    assert all(labels[40 + i] == labels[i] for i in range(5)) # Exact repeats
+    assert len(set(labels[:30].tolist())) == 30 # Unrelated texts stay apart
+
+
+def test_outputs_without_words_are_not_near_duplicates():
+    labels = near_duplicate_labels(TfidfMatrix(["!!!", "...", "", "a cat on a mat", "a cat on a mat", "???"]))
+    assert labels[3] == labels[4]
+    assert len(set(labels.tolist())) == 5
+
+
+def test_pair_cosines_match_dense_rows():
+    rng = random.Random(5)
+    matrix = TfidfMatrix([random_text(rng, rng.randint(1, 20)) for _ in range(8)] + [""])
+    dense = np.zeros((matrix.n_docs, matrix.n_terms))
+    dense[matrix.docs, matrix.terms] = matrix.weights
+    pairs = np.array([(0, 1), (2, 2), (3, 8), (7, 4)])
+    assert matrix.pair_cosines(pairs) == pytest.approx([dense[i] @ dense[j] for i, j in pairs])
+
+
+def test_close_pairs_finds_every_pair_within_band_guarantee():
+    rng = np.random.default_rng(3)
+    signatures = rng.integers(0, 2**63, 400, dtype=np.int64).astype(np.uint64)
+    flips = [np.uint64(sum(1 << int(b) for b in rng.choice(64, k, replace=False))) for k in range(len(SIMHASH_BANDS))]
+    planted = np.array([signatures[k] ^ flips[k] for k in range(len(flips))], dtype=np.uint64)
+    pairs = {tuple(p) for p in _close_pairs(np.concatenate([signatures, planted]), len(SIMHASH_BANDS) - 1).tolist()}
+    assert {(k, 400 + k) for k in range(len(flips))} <= pairs
+
+
+def test_analyze_outputs_groups_by_team_and_model():
+    rng = random.Random(4)
+    repeated = random_text(rng)
+    outputs = ([{"run_id": f"a{i}", "team": "Repeater", "model": "m1", "text": repeated, "eval_tokens": 50} for i in range(4)] +
+               [{"run_id": f"b{i}", "team": "Diverse", "model": "m1", "text": random_text(rng), "eval_tokens": None} for i in range(4)])
+    report = analyze_outputs(outputs)
+    assert report["by_team"]["Repeater"]["unique_ratio"] == 0.25
+    assert report["by_team"]["Repeater"]["mean_similarity"] == pytest.approx(1.0)
+    assert report["by_team"]["Diverse"]["unique_ratio"] == 1.0 and report["by_team"]["Diverse"]["mean_similarity"] < 0.5
+    assert report["by_model"]["m1"]["outputs"] == 8 and report["by_model"]["m1"]["eval_tokens"]["mean"] == 50
+    assert report["clusters"][0]["size"] == 4 and report["clusters"][0]["sources"] == {"Repeater / m1": 4}
+    assert analyze_outputs([])["outputs"] == 0
+
+
+def test_analyze_sweep_reads_sink_and_writes_report(tmp_path):
+    writer = open_sweep_sink(str(tmp_path), "jsonl")
+    for i, (status, output) in enumerate([("Success", "a red chair"), ("Success", "a blue lamp"), ("Error: boom", "x"),
+                                          ("Success", "Error: No successful outputs generated by workflow steps to concatenate.")]):
+        writer.append({"sweep_metadata": {"base_user_prompt": f"p{i}", "run_id": f"{prompt_hash(f'p{i}')}_T_m"},
+                       "configuration": {"agent_team_name": "T", "worker_model": "m"}, "final_output": output, "status": status})
+    writer.close()
+    text, report = analyze_sweep(str(tmp_path))
+    assert report["outputs"] == 2 and "T / m: 2 output(s)" in text
+    assert (tmp_path / REPORT_TEXT_FILENAME).read_text(encoding='utf-8').startswith("--- Sweep Output Analytics (2 output(s)) ---")
+    assert json.loads((tmp_path / REPORT_JSON_FILENAME).read_text(encoding='utf-8'))["by_model"]["m"]["outputs"] == 2
+    assert analyze_sweep(str(tmp_path / "missing"))[0].startswith("Error: Sweep folder not found")
@@ -0,0 +1,117 @@
+# ArtAgent/tests/test_sweep_estimator.py
+
+import pytest
+import os
+import sys
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.sweep_estimator import (estimate_sweep, format_sweep_estimate, load_run_telemetry, DurationModel,
+                                      DEFAULT_SECONDS_PER_STEP)
+    from core.sweep_manager import make_run_id
+    from core.sweep_store import open_sweep_sink
+except ImportError as e:
+    pytest.skip(f"Skipping sweep estimator tests, modules not found: {e}", allow_module_level=True)
+
+ROLES = {"Styler": {"description": "Styles."}, "Detailer": {"description": "Details."}}
+TEAMS = {
+    "Two Steps": {"description": "Prompts", "steps": [{"role": "Styler", "goal": "style"}, {"role": "Detailer", "goal": "a"}]},
+    "Shared": {"description": "Prompts", "steps": [{"role": "Styler", "goal": "style"}, {"role": "Detailer", "goal": "b"}]},
+    "Summary": {"description": "Other", "steps": [{"role": "Styler", "goal": "style"}], "assembly_strategy": "summarize_all"},
+}
+
+
+def make_protocol(prompt, team, model, status="Success", duration=10.0, eval_tokens=100, **run_stats):
+    return {
+        "sweep_metadata": {"base_user_prompt": prompt, "timestamp_utc": "2024-01-01T00:00:00Z", "run_id": make_run_id(prompt, team, model),
+                           "duration_seconds": duration, "eval_tokens": eval_tokens, **run_stats},
+        "configuration": {"agent_team_name": team, "worker_model": model, "log_intermediate_steps": False},
+        "execution_log": None, "final_output": "out", "status": status,
+    }
+
+
+def test_duration_model_falls_back_from_pair_to_model_to_default():
+    records = [{"model": "m1", "team": "Two Steps", "duration_seconds": 10.0, "eval_tokens": 50}, # Before calls were counted: 5s per call
+               {"model": "m1", "team": "Two Steps", "duration_seconds": 10.0, "eval_tokens": 150, "llm_calls": 1, "concurrency": 2},
+               {"model": "m1", "team": "Two Steps", "duration_seconds": 30.0, "llm_calls": 0}, # All steps reused: ignored
+               {"model": "m2", "team": "Summary", "duration_seconds": 6.0}]
+    model = DurationModel(records, TEAMS)
+    assert model.predict("m1", "Two Steps", 2) == (15.0, "2 past run(s)") # 5s and 10s per call
+    assert model.predict("m1", "Summary", 2) == (15.0, "model average")
+    assert model.predict("m3", "Two Steps", 2) == (12.0, "all-model average")
+    assert model.predict_tokens("m1", "Two Steps") == pytest.approx((25 + 150) / 2)
+    assert model.predict_tokens("m2", "Summary") is None
+    assert DurationModel([], TEAMS).predict("m1", "Two Steps", 2) == (2 * DEFAULT_SECONDS_PER_STEP, "default")
+
+
+def test_estimate_counts_runs_calls_shared_steps_and_concurrency():
+    # A past run of 2 calls: 4s and 20 tokens per call
+    telemetry = [{"model": "m1", "team": "Two Steps", "duration_seconds": 8.0, "eval_tokens": 40, "llm_calls": 2, "concurrency": 2}]
+    estimate = estimate_sweep("p1\np2", ["Two Steps", "Shared", "Missing"], ["m1", "m2"], {}, TEAMS, ROLES,
+                              concurrency=2, telemetry=telemetry)
+    assert estimate["runs"] == 8 and estimate["concurrency"] == 2
+    # 'Shared' repeats the first step of 'Two Steps': 3 of the 4 calls per prompt are unique
+    assert estimate["models"]["m1"]["llm_calls"] == 6
+    assert estimate["models"]["m1"]["teams"]["Two Steps"]["source"] == "1 past run(s)"
+    # Sharing is applied once (the past run's duration is per call it made): 4 runs x 1.5 calls x 4s over 2 concurrent runs
+    assert estimate["models"]["m1"]["seconds"] == pytest.approx(4 * 1.5 * 4.0 / 2)
+    assert estimate["tokens"] == pytest.approx(2 * 1.5 * 20)
+    assert estimate_sweep("p1\np2", ["Two Steps", "Shared"], ["m1"], {"sweep_share_prefixes": False}, TEAMS, ROLES,
+                          telemetry=telemetry)["llm_calls"] == 8
+    text = format_sweep_estimate(estimate)
+    assert "Runs: 8" in text and "Model 'm2'" in text and "all-model average" in text
+
+
+@pytest.mark.parametrize("telemetry", [[{"model": "m1", "team": "Summary", "duration_seconds": 10.0, "llm_calls": 2}], []],
+                         ids=["history", "default"])
+def test_estimate_applies_planned_concurrency_with_and_without_history(telemetry):
+    prompts = "\n".join(f"p{i}" for i in range(16))
+    serial = estimate_sweep(prompts, ["Summary"], ["m1"], {}, TEAMS, ROLES, concurrency=1, telemetry=telemetry)["seconds"]
+    assert serial == pytest.approx(16 * (10.0 if telemetry else 2 * DEFAULT_SECONDS_PER_STEP))
+    assert estimate_sweep(prompts, ["Summary"], ["m1"], {}, TEAMS, ROLES, concurrency=8, telemetry=telemetry)["seconds"] == pytest.approx(serial / 8)
+    # Never more runs in flight than the model has
+    assert estimate_sweep(prompts, ["Summary"], ["m1"], {}, TEAMS, ROLES, concurrency=32, telemetry=telemetry)["seconds"] == pytest.approx(serial / 16)
+
+
+def test_estimate_leaves_out_completed_runs_of_resumed_folder(tmp_path):
+    writer = open_sweep_sink(str(tmp_path), "jsonl")
+    writer.append(make_protocol("p1", "Summary", "m1"))
+    writer.append(make_protocol("p2", "Summary", "m1", status="Error: boom"))
+    writer.close()
+    estimate = estimate_sweep("p1\np2", ["Summary"], ["m1"], {}, TEAMS, ROLES, resume_from=str(tmp_path), telemetry=[])
+    assert estimate["runs"] == 1 and estimate["llm_calls"] == 2
+    assert estimate_sweep("", ["Summary"], ["m1"], {}, TEAMS, telemetry=[])["error"].startswith("Error")
+    assert "not found" in estimate_sweep("p", ["Summary"], ["m1"], {}, TEAMS, resume_from=str(tmp_path / "nope"), telemetry=[])["error"]
+
+
+def test_estimate_shares_steps_per_model_by_its_remaining_runs(tmp_path):
+    writer = open_sweep_sink(str(tmp_path), "jsonl")
+    for prompt in ("p1", "p2"): writer.append(make_protocol(prompt, "Shared", "m1"))
+    writer.close()
+    estimate = estimate_sweep("p1\np2", ["Two Steps", "Shared"], ["m1", "m2"], {}, TEAMS, ROLES, concurrency=1,
+                              resume_from=str(tmp_path), telemetry=[])
+    # m1 only has 'Two Steps' left, so nothing is shared; m2 runs both teams and shares their first step
+    assert estimate["models"]["m1"]["llm_calls"] == 4 and estimate["models"]["m2"]["llm_calls"] == 6
+    assert estimate["models"]["m1"]["seconds"] == pytest.approx(4 * DEFAULT_SECONDS_PER_STEP)
+    assert estimate["models"]["m2"]["seconds"] == pytest.approx(6 * DEFAULT_SECONDS_PER_STEP)
+
+
+def test_load_run_telemetry_reads_successful_timed_runs(tmp_path):
+    (tmp_path / "20240101-000000_a").mkdir(); (tmp_path / "20240102-000000_b").mkdir()
+    writer = open_sweep_sink(str(tmp_path / "20240101-000000_a"), "sqlite")
+    writer.append(make_protocol("p1", "Summary", "m1", duration=4.0, eval_tokens=30, llm_calls=2, concurrency=3))
+    writer.append(make_protocol("p2", "Summary", "m1", status="Error: boom"))
+    writer.close()
+    writer = open_sweep_sink(str(tmp_path / "20240102-000000_b"), "jsonl")
+    writer.append(make_protocol("p1", "Two Steps", "m2", duration=None))
+    writer.close()
+
+    records = load_run_telemetry(str(tmp_path))
+    assert [(r["model"], r["team"], r["duration_seconds"], r["eval_tokens"], r["llm_calls"], r["concurrency"]) for r in records] == \
+        [("m1", "Summary", 4.0, 30, 2, 3)]
+    assert load_run_telemetry(str(tmp_path), max_folders=1) == []
+    assert load_run_telemetry(str(tmp_path / "missing")) == []
@@ -288,4 +288,215 @@ def test_run_sweep_protocol_save_error(
     assert "Sweep Complete" in summary
     assert "Run 1:" in summary
     assert "Protocol Save Error:" in summary
-    assert "save_json utility returned False" in summary
\ No newline at end of file
+    assert "save_json utility returned False" in summary
+
+@patch(LOAD_ALL_ROLES_PATH, return_value=MOCK_ROLES_DATA)
+@patch(RUN_TEAM_WORKFLOW_PATH)
+def test_run_sweep_concurrent_within_model_group(mock_run_workflow, mock_load_roles, mock_time, tmp_path):
+    """Runs for one model overlap, but the next model only starts once the group is done."""
+    import threading
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0, "order": []}
+
+    def fake_workflow(**kwargs):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            state["order"].append(kwargs["worker_model_name"])
+        time.sleep(0.05)
+        with lock: state["active"] -= 1
+        return f"Out {kwargs['user_input']} {kwargs['team_name']}", [], None
+    mock_run_workflow.side_effect = fake_workflow
+
+    with patch(GET_ABS_PATH, return_value=str(tmp_path)):
+        summary = sweep_manager.run_sweep(MOCK_PROMPTS_TEXT, SELECTED_TEAMS, SELECTED_MODELS, OUTPUT_FOLDER_NAME,
+                                          False, {"sweep_concurrency": 4}, MOCK_TEAMS_DATA)
+
+    assert "Total Runs Attempted: 8/8" in summary
+    assert state["peak"] == 4
+    assert state["order"] == ["model-sweep-1"] * 4 + ["model-sweep-2"] * 4
+    # Statuses stay in prompt/team order; every run landed in its model's prompt file
+    assert summary.index("Run 1: Prompt 1/2, Team 'TeamSweepA'") < summary.index("Run 4: Prompt 2/2, Team 'TeamSweepB'")
+    lines = (tmp_path / "prompts_model-sweep-1.txt").read_text(encoding='utf-8').splitlines()
+    assert sorted(lines) == sorted(f"Out {p} {t}" for p in MOCK_PROMPTS_LIST for t in SELECTED_TEAMS)
+    assert len(list(tmp_path.glob("*.json"))) == 8
+
+
+def test_resolve_sweep_concurrency():
+    assert sweep_manager.resolve_sweep_concurrency({}) == 1
+    assert sweep_manager.resolve_sweep_concurrency({"sweep_concurrency": 6}) == 6
+    assert sweep_manager.resolve_sweep_concurrency({"sweep_concurrency": 6}, 2) == 2
+    assert sweep_manager.resolve_sweep_concurrency({}, "bad") == 1
+    assert sweep_manager.resolve_sweep_concurrency({}, 99) == sweep_manager.MAX_SWEEP_CONCURRENCY
+
+
+@patch(LOAD_ALL_ROLES_PATH, return_value=MOCK_ROLES_DATA)
+@patch(RUN_TEAM_WORKFLOW_PATH)
+def test_run_sweep_resume_runs_only_missing_or_failed(mock_run_workflow, mock_load_roles, mock_time, tmp_path):
+    """A resumed sweep skips runs whose protocol recorded success."""
+    def first_pass(**kwargs):
+        if kwargs["team_name"] == "TeamSweepB" and kwargs["worker_model_name"] == "model-sweep-2":
+            raise RuntimeError("ollama restarted")
+        return "Out", [], None
+    mock_run_workflow.side_effect = first_pass
+    with patch(GET_ABS_PATH, return_value=str(tmp_path)):
+        sweep_manager.run_sweep(MOCK_PROMPTS_TEXT, SELECTED_TEAMS, SELECTED_MODELS, OUTPUT_FOLDER_NAME, False, MOCK_SETTINGS, MOCK_TEAMS_DATA)
+    os.remove(tmp_path / f"{sweep_manager.make_run_id('Prompt One', 'TeamSweepA', 'model-sweep-1')}.json") # Lost before saving
+    assert len(sweep_manager.load_completed_run_ids(str(tmp_path))) == 5
+
+    mock_run_workflow.reset_mock(side_effect=True)
+    mock_run_workflow.return_value = ("Out again", [], None)
+    with patch('core.sweep_manager.time.time', MagicMock(side_effect=[2000.0, 2010.0])):
+        summary = sweep_manager.run_sweep(MOCK_PROMPTS_TEXT, SELECTED_TEAMS, SELECTED_MODELS, OUTPUT_FOLDER_NAME, False,
+                                          MOCK_SETTINGS, MOCK_TEAMS_DATA, resume_from=str(tmp_path))
+
+    rerun = sorted((c.kwargs["user_input"], c.kwargs["team_name"], c.kwargs["worker_model_name"]) for c in mock_run_workflow.call_args_list)
+    assert rerun == [("Prompt One", "TeamSweepA", "model-sweep-1"),
+                     ("Prompt One", "TeamSweepB", "model-sweep-2"), ("Prompt Two", "TeamSweepB", "model-sweep-2")]
+    assert "Already Completed (skipped on resume): 5" in summary
+    assert len(sweep_manager.load_completed_run_ids(str(tmp_path))) == 8
+
+
+def test_run_sweep_resume_missing_folder(tmp_path):
+    summary = sweep_manager.run_sweep(MOCK_PROMPTS_TEXT, SELECTED_TEAMS, SELECTED_MODELS, "f", False, {}, MOCK_TEAMS_DATA,
+                                      resume_from=str(tmp_path / "nope"))
+    assert "Error: Sweep folder to resume not found" in summary
+
+
+@patch(LOAD_ALL_ROLES_PATH, return_value=MOCK_ROLES_DATA)
+@patch(RUN_TEAM_WORKFLOW_PATH, return_value=("Out", [], None))
+def test_run_sweep_orders_resident_models_first_and_preloads_next(mock_run_workflow, mock_load_roles, mock_time, tmp_path):
+    """The resident model runs first; the next model is preloaded (in the background) once."""
+    events = []
+    mock_run_workflow.side_effect = lambda **kwargs: events.append(("run", kwargs["worker_model_name"])) or ("Out", [], None)
+    settings = {"ollama_url": "http://fake-sweep:11434/api/generate", "sweep_keep_alive": "7m"}
+    with patch(GET_ABS_PATH, return_value=str(tmp_path)), \
+         patch('core.sweep_planner.ollama_manager.list_running_models', return_value=[{"name": "model-sweep-2:latest"}]), \
+         patch('core.sweep_planner.ollama_manager.list_local_model_sizes', return_value={}), \
+         patch('core.sweep_planner.ollama_manager.preload_model',
+               side_effect=lambda name, url, keep_alive: events.append(("preload", name, keep_alive)) or "ok") as mock_preload:
+        summary = sweep_manager.run_sweep(MOCK_PROMPTS_TEXT, SELECTED_TEAMS, SELECTED_MODELS, OUTPUT_FOLDER_NAME, False, settings, MOCK_TEAMS_DATA)
+
+    assert "Model Order: model-sweep-2 (resident) -> model-sweep-1" in summary
+    mock_preload.assert_called_once_with("model-sweep-1", settings["ollama_url"], "7m")
+    assert [e[1] for e in events if e[0] == "run"] == ["model-sweep-2"] * 4 + ["model-sweep-1"] * 4
+
+
+@patch(LOAD_ALL_ROLES_PATH, return_value=MOCK_ROLES_DATA)
+@patch(RUN_TEAM_WORKFLOW_PATH)
+def test_run_sweep_sqlite_sink_and_resume(mock_run_workflow, mock_load_roles, mock_time, tmp_path):
+    """With a result sink no per-run JSON files are written; resuming reads the sink."""
+    from core.sweep_store import query_sweep_results
+    def team_b_fails(**kwargs):
+        if kwargs["team_name"] == "TeamSweepB":
+            raise RuntimeError("ollama down")
+        return "Out", [], None
+    mock_run_workflow.side_effect = team_b_fails
+    with patch(GET_ABS_PATH, return_value=str(tmp_path)):
+        sweep_manager.run_sweep(MOCK_PROMPTS_TEXT, SELECTED_TEAMS, SELECTED_MODELS, OUTPUT_FOLDER_NAME, False,
+                                MOCK_SETTINGS, MOCK_TEAMS_DATA, result_sink="Single SQLite file")
+    assert not list(tmp_path.glob("*.json"))
+    assert len(query_sweep_results(str(tmp_path), status="Success")) == 4
+    assert all(r["duration_seconds"] is not None for r in query_sweep_results(str(tmp_path)))
+    metadata = query_sweep_results(str(tmp_path), include_protocol=True)[0]["protocol"]["sweep_metadata"]
+    assert metadata["llm_calls"] == 0 and metadata["concurrency"] >= 1 # Recorded for the estimator (the workflow is mocked)
+
+    mock_run_workflow.reset_mock(side_effect=True)
+    mock_run_workflow.return_value = ("Out again", [], None)
+    with patch('core.sweep_manager.time.time', MagicMock(side_effect=[2000.0, 2010.0])):
+        summary = sweep_manager.run_sweep(MOCK_PROMPTS_TEXT, SELECTED_TEAMS, SELECTED_MODELS, OUTPUT_FOLDER_NAME, False,
+                                          MOCK_SETTINGS, MOCK_TEAMS_DATA, resume_from=str(tmp_path))
+    assert mock_run_workflow.call_count == 4
+    assert "Already Completed (skipped on resume): 4" in summary
+    assert len(query_sweep_results(str(tmp_path), team="TeamSweepB", status="Success")) == 4
+
+
+@patch(LOAD_ALL_ROLES_PATH, return_value=MOCK_ROLES_DATA)
+@patch(RUN_TEAM_WORKFLOW_PATH, return_value=("Out", [], None))
+def test_run_sweep_iter_reports_progress_and_eta(mock_run_workflow, mock_load_roles, mock_time, tmp_path):
+    """One event per dispatched group and finished run, ending with the summary."""
+    with patch(GET_ABS_PATH, return_value=str(tmp_path)):
+        events = list(sweep_manager.run_sweep_iter(MOCK_PROMPTS_TEXT, SELECTED_TEAMS, SELECTED_MODELS, OUTPUT_FOLDER_NAME,
+                                                   False, MOCK_SETTINGS, MOCK_TEAMS_DATA))
+    run_events = [e for e in events if not e["done"] and e["last_status"].startswith("Run ")]
+    assert [e["completed"] for e in run_events] == list(range(1, 9))
+    assert all(e["total"] == 8 for e in events)
+    assert run_events[3]["runs_per_minute"] > 0 and run_events[3]["eta_seconds"] > 0
+    assert events[-1]["done"] and events[-1]["eta_seconds"] == 0
+    assert "Total Runs Attempted: 8/8" in events[-1]["summary"]
+    assert sweep_manager.format_sweep_progress(run_events[3]).startswith("Progress: 4/8 runs (50%)")
+
+
+def test_sweep_progress_rates_and_formatting():
+    progress = sweep_manager.SweepProgress(10)
+    assert progress.event()["eta_seconds"] is None and "ETA unknown" in sweep_manager.format_sweep_progress(progress.event())
+    progress.run_skipped() # Resumed: completed, but not part of the rate
+    with patch('core.sweep_manager.time.perf_counter', side_effect=[10.0, 40.0, 60.0]):
+        progress._marks[0] = (0.0, 0)
+        progress.run_finished({"eval_tokens": 300})
+        progress.run_finished({"eval_tokens": 300})
+        event = progress.event()
+    assert event["completed"] == 3
+    assert event["runs_per_minute"] == pytest.approx(3.0) # 2 runs in 40s
+    assert event["tokens_per_second"] == pytest.approx(15.0)
+    assert event["eta_seconds"] == pytest.approx(140.0) # 7 remaining at 20s each
+    assert "ETA 2m 20s" in sweep_manager.format_sweep_progress(event)
+
+
+def test_run_sweep_with_progress_yields_log_then_summary(tmp_path):
+    events = [{"completed": 1, "total": 2, "elapsed_seconds": 5.0, "runs_per_minute": 12.0, "tokens_per_second": None,
+               "eta_seconds": 5.0, "last_status": "Run 1: a -> Success", "done": False, "summary": ""},
+              {"done": True, "summary": "--- Sweep Complete ---"}]
+    with patch('core.sweep_manager.run_sweep_iter', return_value=iter(events)):
+        texts = list(sweep_manager.run_sweep_with_progress(MOCK_PROMPTS_TEXT, SELECTED_TEAMS, SELECTED_MODELS, "f", False, {}, MOCK_TEAMS_DATA))
+    assert texts[0].startswith("Progress: 1/2 runs (50%)") and texts[0].endswith("Run 1: a -> Success")
+    assert texts[-1] == "--- Sweep Complete ---"
+
+
+@patch(LOAD_ALL_ROLES_PATH, return_value=MOCK_ROLES_DATA)
+@patch(RUN_TEAM_WORKFLOW_PATH, return_value=("Out", [], None))
+def test_run_sweep_shares_step_cache_within_model_group(mock_run_workflow, mock_load_roles, mock_time, tmp_path):
+    teams = {"A": {"description": "Same", "steps": [{"role": "AgentSweep1"}, {"role": "AgentSweep2"}]},
+             "B": {"description": "Same", "steps": [{"role": "AgentSweep1"}]}}
+    with patch(GET_ABS_PATH, return_value=str(tmp_path)):
+        summary = sweep_manager.run_sweep("P", ["A", "B"], SELECTED_MODELS, OUTPUT_FOLDER_NAME, False, MOCK_SETTINGS, teams)
+    caches = [c.kwargs["step_cache"] for c in mock_run_workflow.call_args_list]
+    assert caches[0] is caches[1] and caches[2] is caches[3] and caches[0] is not caches[2]
+    assert "Shared Step Prefixes: 0 step call(s) reused (1 of 3 per prompt and model)" in summary # Workflow is mocked
+
+    mock_run_workflow.reset_mock()
+    with patch(GET_ABS_PATH, return_value=str(tmp_path)), patch('core.sweep_manager.time.time', MagicMock(side_effect=[0.0, 1.0])):
+        sweep_manager.run_sweep("P", ["A", "B"], SELECTED_MODELS, OUTPUT_FOLDER_NAME, False, {"sweep_share_prefixes": False}, teams)
+    assert all(c.kwargs["step_cache"] is None for c in mock_run_workflow.call_args_list)
+
+
+@patch(LOAD_ALL_ROLES_PATH, return_value=MOCK_ROLES_DATA)
+@patch(RUN_TEAM_WORKFLOW_PATH, return_value=("Out", [], None))
+def test_run_sweep_option_grid_batches_by_num_ctx(mock_run_workflow, mock_load_roles, mock_time, tmp_path):
+    """Option sets multiply the runs; per model, runs sharing num_ctx finish before the next num_ctx starts."""
+    grid = '{"temperature": [0.2, 0.8], "num_ctx": [2048, 4096]}'
+    with patch(GET_ABS_PATH, return_value=str(tmp_path)):
+        summary = sweep_manager.run_sweep("P", ["TeamSweepA"], SELECTED_MODELS, OUTPUT_FOLDER_NAME, False, MOCK_SETTINGS,
+                                          MOCK_TEAMS_DATA, concurrency=1, option_space=grid)
+    runs = [(c.kwargs["worker_model_name"], c.kwargs["option_overrides"]["num_ctx"]) for c in mock_run_workflow.call_args_list]
+    assert runs == [("model-sweep-1", 2048)] * 2 + [("model-sweep-1", 4096)] * 2 + [("model-sweep-2", 2048)] * 2 + [("model-sweep-2", 4096)] * 2
+    assert "Total Runs Attempted: 8/8" in summary and "Option Sets: 4 in 2 runner configuration(s) per model" in summary
+
+    options = {"temperature": 0.8, "num_ctx": 4096}
+    run_id = sweep_manager.make_run_id("P", "TeamSweepA", "model-sweep-1", options)
+    assert run_id != sweep_manager.make_run_id("P", "TeamSweepA", "model-sweep-1")
+    with open(tmp_path / f"{run_id}.json", 'r', encoding='utf-8') as f:
+        assert json.load(f)["configuration"]["ollama_api_options"] == options
+    assert len(list(tmp_path.glob("prompts_model-sweep-1_o*.txt"))) == 4
+
+
+def test_run_sweep_option_grid_errors(tmp_path):
+    assert sweep_manager.run_sweep("P", SELECTED_TEAMS, SELECTED_MODELS, "f", False, {}, MOCK_TEAMS_DATA,
+                                   option_space="{temperature").startswith("Error: Option grid is not valid JSON")
+    texts = list(sweep_manager.run_sweep_with_progress("P", SELECTED_TEAMS, SELECTED_MODELS, "f", False, {}, MOCK_TEAMS_DATA,
+                                                       use_workers=True, option_space='{"top_p": [0.9, 1.0]}'))
+    assert texts == ["Error: Option sweeps run in this process only; turn off worker processes to sweep Ollama options."]
+    # An invalid option space is reported as such, not as an option sweep the workers cannot run
+    texts = list(sweep_manager.run_sweep_with_progress("P", SELECTED_TEAMS, SELECTED_MODELS, "f", False, {}, MOCK_TEAMS_DATA,
+                                                       use_workers=True, option_space="{bad json"))
+    assert len(texts) == 1 and texts[0].startswith("Error: Option grid is not valid JSON")
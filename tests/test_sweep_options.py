@@ -0,0 +1,85 @@
+# ArtAgent/tests/test_sweep_options.py
+
+import pytest
+import os
+import sys
+import time
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.sweep_options import (parse_option_space, expand_option_sets, group_option_sets, resolve_option_sets,
+                                    option_set_id, describe_option_set, MAX_OPTION_SETS)
+except ImportError as e:
+    pytest.skip(f"Skipping sweep options tests, modules not found: {e}", allow_module_level=True)
+
+
+def test_parse_option_space_validates():
+    assert parse_option_space("") == ({}, "")
+    assert parse_option_space('{"temperature": [0.1]}') == ({"temperature": [0.1]}, "")
+    for bad in ('{"t": [', '[1, 2]', '{"t": []}', '{"t": {"min": 1, "max": 0}}', '{"t": {"min": 0, "max": 1, "steps": 0}}', '{"t": 0.5}'):
+        space, error = parse_option_space(bad)
+        assert space == {} and error.startswith("Error:"), bad
+
+
+def test_grid_expands_lists_and_stepped_ranges():
+    sets = expand_option_sets({"temperature": {"min": 0.0, "max": 1.0, "steps": 3}, "num_ctx": [2048, 4096]})
+    assert len(sets) == 6
+    assert sets[0] == {"temperature": 0.0, "num_ctx": 2048} and sets[-1] == {"temperature": 1.0, "num_ctx": 4096}
+    assert expand_option_sets({}) == [{}]
+    with pytest.raises(ValueError):
+        expand_option_sets({"temperature": {"min": 0.0, "max": 1.0}})
+
+
+def test_latin_hypercube_uses_every_stratum_once():
+    samples = 5
+    sets = expand_option_sets({"temperature": {"min": 0.0, "max": 1.0}, "num_ctx": {"min": 1000, "max": 6000}}, "lhs", samples, seed=3)
+    assert len(sets) == samples
+    assert sorted(int(s["temperature"] * samples) for s in sets) == list(range(samples))
+    assert sorted((s["num_ctx"] - 1000) // 1000 for s in sets) == list(range(samples))
+    assert all(isinstance(s["num_ctx"], int) for s in sets)
+    assert sets == expand_option_sets({"temperature": {"min": 0.0, "max": 1.0}, "num_ctx": {"min": 1000, "max": 6000}}, "lhs", samples, seed=3)
+
+
+def test_random_samples_stay_in_range_and_lists():
+    sets = expand_option_sets({"top_p": {"min": 0.5, "max": 0.9}, "seed": [1, 2, 3]}, "random", 20, seed=1)
+    assert len(sets) == 20 and all(0.5 <= s["top_p"] <= 0.9 and s["seed"] in (1, 2, 3) for s in sets)
+    with pytest.raises(ValueError):
+        expand_option_sets({"top_p": [0.5]}, "sobol", 4)
+
+
+def test_group_option_sets_by_runner_options():
+    sets = [{"num_ctx": 2048, "temperature": 0.1}, {"num_ctx": 4096, "temperature": 0.1}, {"num_ctx": 2048, "temperature": 0.9}, {"temperature": 0.5}]
+    assert group_option_sets(sets) == [[sets[0], sets[2]], [sets[1]], [sets[3]]]
+
+
+def test_resolve_option_sets_from_ui_or_settings():
+    assert resolve_option_sets({}) == ([{}], "")
+    sets, error = resolve_option_sets({"sweep_option_space": {"top_k": [10, 40]}})
+    assert error == "" and sets == [{"top_k": 10}, {"top_k": 40}]
+    sets, error = resolve_option_sets({}, '{"seed": [1, 2]}', "Random samples", 10) # Repeated draws collapse
+    assert error == "" and 1 <= len(sets) <= 2
+    _, error = resolve_option_sets({}, {"a": list(range(MAX_OPTION_SETS)), "b": [1, 2]})
+    assert "limit" in error
+
+
+def test_oversized_grid_is_rejected_before_expanding():
+    start = time.perf_counter()
+    _, error = resolve_option_sets({}, {f"o{i}": list(range(12)) for i in range(7)}, "grid")
+    assert f"{12 ** 7} option sets" in error
+    _, error = resolve_option_sets({}, {"num_ctx": {"min": 0, "max": 10 ** 9, "steps": 10 ** 9}}, "grid")
+    assert "limit" in error
+    _, error = resolve_option_sets({}, {"temperature": [0.1, 0.2]}, "Random samples", 10 ** 7)
+    assert "limit" in error
+    assert time.perf_counter() - start < 1.0
+    sets, error = resolve_option_sets({}, {"num_ctx": {"min": 1, "max": 3, "steps": 10 ** 9}}, "grid") # Integer steps collapse to 3 values
+    assert error == "" and len(sets) == 3
+
+
+def test_option_set_id_and_description():
+    assert option_set_id(None) == "" and option_set_id({}) == ""
+    assert option_set_id({"a": 1, "b": 2}) == option_set_id({"b": 2, "a": 1}) != option_set_id({"a": 1, "b": 3})
+    assert describe_option_set({"temperature": 0.2, "num_ctx": 2048}) == "temperature=0.2, num_ctx=2048"
@@ -0,0 +1,66 @@
+# ArtAgent/tests/test_sweep_planner.py
+
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core import sweep_planner
+    from core.sweep_planner import plan_model_order, plan_sweep_models, ModelPreloader, estimate_load_seconds
+except ImportError as e:
+    pytest.skip(f"Skipping sweep planner tests, modules not found: {e}", allow_module_level=True)
+
+LIST_RUNNING_PATH = 'core.sweep_planner.ollama_manager.list_running_models'
+LIST_SIZES_PATH = 'core.sweep_planner.ollama_manager.list_local_model_sizes'
+PRELOAD_PATH = 'core.sweep_planner.ollama_manager.preload_model'
+SETTINGS = {"ollama_url": "http://fake-planner:11434/api/generate"}
+
+@pytest.fixture(autouse=True)
+def clear_observed_loads(monkeypatch):
+    monkeypatch.setattr(sweep_planner, "_observed_load_seconds", {})
+
+
+def test_plan_model_order_resident_first_then_cheapest():
+    order = plan_model_order(["big", "small", "warm", "small"], {"warm:latest"}, {"big": 40.0, "small": 4.0})
+    assert order == ["warm", "small", "big"]
+    assert plan_model_order(["a", "b"], set(), {}) == ["a", "b"] # Unknown costs keep the selection order
+
+
+def test_estimate_load_seconds_prefers_measured_loads():
+    sizes = {"llava:13b": 8e9}
+    assert estimate_load_seconds("llava:13b", sizes) == pytest.approx(8e9 / sweep_planner.LOAD_BYTES_PER_SECOND)
+    assert estimate_load_seconds("unknown", sizes) == sweep_planner.DEFAULT_LOAD_SECONDS
+    sweep_planner.record_load_seconds("llava:13b", 3.5)
+    assert estimate_load_seconds("llava:13b", sizes) == 3.5
+
+
+@patch(LIST_SIZES_PATH, return_value={"big:latest": 20e9, "small:latest": 2e9, "warm:latest": 9e9})
+@patch(LIST_RUNNING_PATH, return_value=[{"name": "warm:latest", "size": 9e9}])
+def test_plan_sweep_models_uses_ollama_residency(mock_running, mock_sizes):
+    plan = plan_sweep_models(["big", "small", "warm"], SETTINGS)
+    assert plan.order == ["warm", "small", "big"]
+    assert "warm (resident)" in plan.describe() and "big (~20s load)" in plan.describe()
+
+
+@patch(LIST_RUNNING_PATH, return_value=None)
+def test_plan_sweep_models_without_ollama_keeps_order(mock_running):
+    assert plan_sweep_models(["b", "a"], SETTINGS).order == ["b", "a"]
+    assert plan_sweep_models(["b", "a"], {}).order == ["b", "a"] # No URL: Ollama is not queried
+    assert mock_running.call_count == 1
+
+
+@patch(PRELOAD_PATH, return_value="Model 'next' preloaded (keep_alive=5m).")
+def test_model_preloader_loads_each_model_once(mock_preload):
+    preloader = ModelPreloader(SETTINGS["ollama_url"], "5m", resident={"warm:latest"})
+    assert preloader.preload("next") is True
+    assert preloader.preload("next") is False
+    assert preloader.preload("warm") is False # Already in memory
+    preloader.wait(5)
+    mock_preload.assert_called_once_with("next", SETTINGS["ollama_url"], "5m")
+    assert "next:latest" in sweep_planner._observed_load_seconds
@@ -0,0 +1,70 @@
+# ArtAgent/tests/test_sweep_prefix.py
+
+import pytest
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.sweep_prefix import build_prefix_trie, StepOutputCache
+    from core.agent_manager import run_team_workflow
+except ImportError as e:
+    pytest.skip(f"Skipping sweep prefix tests, modules not found: {e}", allow_module_level=True)
+
+GET_LLM_RESPONSE_PATH = 'core.agent_manager.get_llm_response'
+ADD_TO_HISTORY_PATH = 'core.agent_manager.history.add_to_history'
+
+ROLES = {"Styler": {"description": "Styles."}, "Designer": {"description": "Designs."}, "Detailer": {"description": "Details."}}
+TEAMS = {
+    "Objects A": {"description": "Object prompts", "steps": [{"role": "Styler", "goal": "style"}, {"role": "Designer", "goal": "form"}, {"role": "Detailer", "goal": "a"}]},
+    "Objects B": {"description": "Object prompts", "steps": [{"role": "Styler", "goal": "style"}, {"role": "Designer", "goal": "form"}, {"role": "Detailer", "goal": "b"}]},
+    "Objects C": {"description": "Object prompts", "steps": [{"role": "Styler", "goal": "style"}, {"role": "Detailer", "goal": "c"}]},
+    "Other": {"description": "Something else", "steps": [{"role": "Styler", "goal": "style"}]},
+}
+
+
+def test_prefix_trie_counts_shared_steps():
+    trie = build_prefix_trie(list(TEAMS), TEAMS, ROLES)
+    assert trie.naive_calls == 9
+    assert trie.unique_calls == 6 # Styler shared by A/B/C, Designer by A/B; 'Other' has its own description
+    assert trie.shared_calls == 3
+    assert build_prefix_trie(["Objects A", "Other"], TEAMS, ROLES).shared_calls == 0
+
+
+def test_step_output_cache_computes_concurrent_requests_once():
+    cache = StepOutputCache()
+    calls = []
+    def slow():
+        calls.append(1); time.sleep(0.05); return "out"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow))) for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(calls) == 1 and sorted(results) == [("out", False)] + [("out", True)] * 3
+    assert cache.get_or_compute("err", lambda: "⚠️ Error: busy") == ("⚠️ Error: busy", False)
+    assert cache.get_or_compute("err", lambda: "fine") == ("fine", False) # Errors are not kept
+
+
+@patch(ADD_TO_HISTORY_PATH, side_effect=lambda history, entry: history)
+@patch(GET_LLM_RESPONSE_PATH)
+def test_run_team_workflow_reuses_shared_prefix_outputs(mock_llm, mock_history):
+    mock_llm.side_effect = lambda **kwargs: f"{kwargs['role']} #{mock_llm.call_count}"
+    cache = StepOutputCache()
+    out_a, _, _ = run_team_workflow("Objects A", TEAMS["Objects A"], "a chair", {}, ROLES, [], "m", step_cache=cache)
+    out_b, _, _ = run_team_workflow("Objects B", TEAMS["Objects B"], "a chair", {}, ROLES, [], "m", step_cache=cache)
+    assert mock_llm.call_count == 4 # 3 for A, only the last step for B
+    assert out_a.split("\n\n")[:2] == out_b.split("\n\n")[:2] == ["Styler #1", "Designer #2"]
+    run_team_workflow("Objects A", TEAMS["Objects A"], "a table", {}, ROLES, [], "m", step_cache=cache)
+    run_team_workflow("Objects A", TEAMS["Objects A"], "a chair", {}, ROLES, [], "other-model", step_cache=cache)
+    assert mock_llm.call_count == 10 # Different prompt or model: nothing shared
+    assert cache.hits == 2
+    run_team_workflow("Objects A", TEAMS["Objects A"], "a chair", {}, ROLES, [], "m", step_cache=cache, option_overrides={"temperature": 0.2})
+    assert mock_llm.call_count == 13 # Different option set: nothing shared either
+    assert mock_llm.call_args.kwargs["ollama_api_options"] == {"temperature": 0.2}
@@ -0,0 +1,111 @@
+# ArtAgent/tests/test_sweep_queue.py
+
+import pytest
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from core.sweep_queue import (SweepQueue, create_sweep_queue, run_sweep_worker, run_sweep_distributed_iter, main,
+                                  launch_sweep_workers, MAX_TASK_ATTEMPTS)
+    from core.sweep_manager import load_completed_run_ids, make_run_id
+except ImportError as e:
+    pytest.skip(f"Skipping sweep queue tests, modules not found: {e}", allow_module_level=True)
+
+RUN_TEAM_WORKFLOW_PATH = 'core.sweep_manager.agent_manager.run_team_workflow'
+LOAD_ALL_ROLES_PATH = 'core.sweep_manager.load_all_roles'
+TEAMS = {"TeamA": {"description": "A", "steps": [{"role": "R"}]}, "TeamB": {"description": "B", "steps": [{"role": "R"}]}}
+SETTINGS = {"ollama_url": "http://gpu0:11434/api/generate", "sweep_step_max_tokens": 100}
+
+
+@pytest.fixture
+def queued_sweep(tmp_path):
+    with patch('core.sweep_manager.get_absolute_path', return_value=str(tmp_path / "sweep")):
+        msg, output_dir = create_sweep_queue("P1\nP2", ["TeamA", "TeamB"], ["m1", "m2"], "q", False, SETTINGS, TEAMS)
+    assert "8 run(s) queued" in msg
+    return output_dir
+
+
+def test_claim_prefers_current_model_then_steals_largest_backlog(tmp_path):
+    queue = SweepQueue(str(tmp_path))
+    queue.enqueue([("p", "Prompt 1/1", "T", "small"), ("p", "Prompt 1/1", "T", "big"), ("p2", "Prompt 1/1", "T", "big")])
+    assert queue.claim("w1")["model"] == "big" # Nothing preferred: largest backlog
+    assert queue.claim("w2", preferred_model="small")["model"] == "small"
+    assert queue.claim("w2", preferred_model="small")["model"] == "big" # Own model drained: steal
+    assert queue.claim("w3") is None
+    queue.close()
+
+
+def test_expired_leases_are_reclaimed_and_given_up_after_max_attempts(tmp_path):
+    queue = SweepQueue(str(tmp_path))
+    queue.enqueue([("p", "Prompt 1/1", "T", "m")])
+    task = queue.claim("dead-worker", lease_seconds=10, now=1000.0)
+    assert queue.claim("w2", now=1005.0) is None # Lease still valid
+    stolen = queue.claim("w2", lease_seconds=10, now=1011.0)
+    assert stolen["task_id"] == task["task_id"] and stolen["attempts"] == 2
+    assert not queue.complete(task["task_id"], "dead-worker", "Success") # Lost the lease
+    assert queue.complete(stolen["task_id"], "w2", "Error: boom") # Failed: back to pending
+    assert queue.counts()["pending"] == 1
+    queue.claim("w3", lease_seconds=10, now=2000.0) # Third attempt, then abandoned
+    assert queue.claim("w4", now=3000.0) is None
+    assert queue.counts()["failed"] == 1 and MAX_TASK_ATTEMPTS == 3
+    queue.close()
+
+
+@patch(LOAD_ALL_ROLES_PATH, return_value={"R": {}})
+@patch(RUN_TEAM_WORKFLOW_PATH)
+def test_workers_execute_queue_into_sweep_folder(mock_run_workflow, mock_load_roles, queued_sweep):
+    urls = set()
+    def fake_workflow(**kwargs):
+        urls.add(kwargs["initial_settings"]["ollama_url"])
+        return f"Out {kwargs['team_name']}", [], None
+    mock_run_workflow.side_effect = fake_workflow
+
+    workers = [threading.Thread(target=run_sweep_worker, args=(queued_sweep, f"w{i}", f"http://gpu{i}:11434/api/generate"),
+                                kwargs={"poll_interval": 0.01}) for i in range(2)]
+    for w in workers: w.start()
+    for w in workers: w.join(10)
+
+    assert mock_run_workflow.call_count == 8
+    assert urls <= {"http://gpu0:11434/api/generate", "http://gpu1:11434/api/generate"}
+    assert len(load_completed_run_ids(queued_sweep)) == 8 # Protocols landed in the sweep folder
+    queue = SweepQueue(queued_sweep)
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 8, "failed": 0}
+    queue.close()
+
+
+@patch(LOAD_ALL_ROLES_PATH, return_value={"R": {}})
+@patch(RUN_TEAM_WORKFLOW_PATH, return_value=("Out", [], None))
+def test_distributed_iter_reports_progress_from_queue(mock_run_workflow, mock_load_roles, tmp_path):
+    def in_process_workers(output_dir, settings, workers_per_endpoint):
+        run_sweep_worker(output_dir, "local", poll_interval=0.01)
+        return []
+    with patch('core.sweep_manager.get_absolute_path', return_value=str(tmp_path / "sweep")):
+        events = list(run_sweep_distributed_iter("P1", ["TeamA", "TeamB"], ["m1"], "q", False, SETTINGS, TEAMS,
+                                                 launch_workers=in_process_workers, poll_interval=0.01))
+    assert [e["completed"] for e in events if not e["done"]][-1] == 2
+    assert "Runs: 2 succeeded, 0 failed, 0 left of 2" in events[-1]["summary"]
+
+
+def test_cli_status(queued_sweep, capsys):
+    assert main(["status", queued_sweep]) == 0
+    assert "pending: 8" in capsys.readouterr().out
+    assert main(["status", os.path.join(queued_sweep, "missing")]) == 1
+
+
+@patch('core.sweep_queue.subprocess.Popen')
+def test_launched_worker_ids_are_unique_per_launch(mock_popen, tmp_path):
+    settings = {"ollama_endpoints": ["http://gpu0:11434/api/generate", "http://gpu1:11434/api/generate"]}
+    launch_sweep_workers(str(tmp_path), settings, workers_per_endpoint=2)
+    launch_sweep_workers(str(tmp_path), settings, workers_per_endpoint=2) # e.g. a relaunch while old workers still run
+    commands = [call.args[0] for call in mock_popen.call_args_list]
+    worker_ids = [command[command.index("--worker-id") + 1] for command in commands]
+    assert len(worker_ids) == 8 and len(set(worker_ids)) == 8
+    assert [command[command.index("--endpoint") + 1] for command in commands[:4]] == [settings["ollama_endpoints"][0]] * 2 + [settings["ollama_endpoints"][1]] * 2
+
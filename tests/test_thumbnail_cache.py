@@ -0,0 +1,113 @@
+# ArtAgent/tests/test_thumbnail_cache.py
+
+import pytest
+import os
+import sys
+import time
+
+# --- Adjust import path ---
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, project_root)
+
+try:
+    from PIL import Image
+    from core.thumbnail_cache import ThumbnailCache, thumbnail_key, _render_thumbnail
+    from core.caption_index import CaptionIndex
+except ImportError as e:
+    pytest.skip(f"Skipping thumbnail cache tests, modules not found: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def image_folder(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i in range(6):
+        Image.new("RGB", (800, 600), (i * 40, 0, 0)).save(folder / f"img{i}.jpg")
+    Image.new("RGBA", (300, 900), (0, 0, 255, 128)).save(folder / "alpha.png")
+    return folder
+
+@pytest.fixture
+def cache(tmp_path):
+    return ThumbnailCache(str(tmp_path / "thumbs"), thumb_size=(128, 128), max_workers=2)
+
+
+def entries_for(folder):
+    index = CaptionIndex(str(folder)).build()
+    return [index.entries[name] for name in index.filenames]
+
+
+def test_thumbnail_key_changes_with_source_stat():
+    base = thumbnail_key("/a/b.png", 100, 1)
+    assert thumbnail_key("/a/b.png", 100, 1) == base
+    assert thumbnail_key("/a/b.png", 100, 2) != base
+    assert thumbnail_key("/a/b.png", 101, 1) != base
+    assert thumbnail_key("/a/b.png", 100, 1, (64, 64)) != base
+
+
+def test_get_thumbnails_renders_in_pool_and_reuses(image_folder, cache):
+    entries = entries_for(image_folder)
+    thumbs = cache.get_thumbnails(entries)
+    assert set(thumbs) == {e.filename for e in entries}
+    for path in thumbs.values():
+        assert path.startswith(cache.root_dir)
+        with Image.open(path) as img:
+            assert max(img.size) <= 128
+    with Image.open(thumbs["alpha.png"]) as img:
+        assert img.mode == "RGBA"
+
+    mtimes = {p: os.stat(p).st_mtime_ns for p in thumbs.values()}
+    assert cache.get_thumbnails(entries) == thumbs # Cache hits, same files
+    assert all(os.stat(p).st_mtime_ns >= mtimes[p] for p in thumbs.values())
+
+
+def test_unreadable_image_falls_back_to_original(tmp_path, cache):
+    folder = tmp_path / "broken"
+    folder.mkdir()
+    (folder / "bad.png").write_bytes(b"not an image")
+    entries = entries_for(folder)
+    assert cache.get_thumbnails(entries) == {"bad.png": str(folder / "bad.png")}
+
+
+def test_concurrent_inline_renders_of_the_same_thumbnail(image_folder, tmp_path):
+    """Gradio sessions opening the same folder render the same thumbnail at once; each gets its own temp file."""
+    import threading
+    dst_dir = tmp_path / "thumbs"
+    dst_dir.mkdir()
+    results = []
+    for trial in range(20):
+        barrier = threading.Barrier(4)
+        dst = str(dst_dir / f"t{trial}.webp")
+        def render():
+            barrier.wait()
+            results.append(_render_thumbnail(str(image_folder / "img0.jpg"), dst, (128, 128), 80))
+        threads = [threading.Thread(target=render) for _ in range(4)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+    assert results == [True] * 80
+    assert sorted(os.listdir(dst_dir)) == sorted(f"t{i}.webp" for i in range(20))
+
+
+def test_failed_render_leaves_no_temp_file(image_folder, tmp_path, monkeypatch):
+    def failing_save(self, fp, *args, **kwargs):
+        fp.write(b"partial")
+        raise OSError("disk full")
+    monkeypatch.setattr(Image.Image, "save", failing_save)
+    dst_dir = tmp_path / "thumbs"
+    dst_dir.mkdir()
+    assert not _render_thumbnail(str(image_folder / "img0.jpg"), str(dst_dir / "t.webp"), (128, 128), 80)
+    assert os.listdir(dst_dir) == []
+
+
+def test_evict_removes_least_recently_used(image_folder, cache):
+    entries = entries_for(image_folder)
+    thumbs = cache.get_thumbnails(entries)
+    now = time.time()
+    for age, name in enumerate(sorted(thumbs)):
+        os.utime(thumbs[name], (now - 1000 + age, now - 1000 + age)) # sorted(...)[0] is oldest
+    sizes = {name: os.path.getsize(p) for name, p in thumbs.items()}
+    oldest = sorted(thumbs)[0]
+    cache.max_bytes = sum(sizes.values()) - 1
+    assert cache.evict() == 1
+    assert not os.path.exists(thumbs[oldest])
+    assert all(os.path.exists(thumbs[n]) for n in thumbs if n != oldest)
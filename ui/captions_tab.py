@@ -3,7 +3,7 @@ import gradio as gr
 from core.help_content import get_tooltip
 
 # Signature remains the same (accepts models list)
-def create_captions_tab(initial_agent_team_choices, initial_vision_models):
+def create_captions_tab(initial_agent_team_choices, initial_vision_models, initial_caption_workers=1):
     """Creates the Gradio components for the Captions Editor Tab."""
 
     with gr.Tab("Image Captions Editor"):
@@ -19,7 +19,12 @@ def create_captions_tab(initial_agent_team_choices, initial_vision_models):
                 info=get_tooltip("captions_folder_path"),
                 scale=3
             )
+            captions_include_subfolders = gr.Checkbox(
+                label="Include Subfolders", value=False, scale=1,
+                info=get_tooltip("captions_include_subfolders")
+            )
             captions_load_button = gr.Button("Load Folder", variant="secondary", scale=1)
+            captions_refresh_button = gr.Button("Refresh", variant="secondary", scale=1)
 
         with gr.Row():
             with gr.Column(scale=1):
@@ -36,8 +41,11 @@ def create_captions_tab(initial_agent_team_choices, initial_vision_models):
                     elem_id="caption_gallery" # Add elem_id if needed
                 )
                 # --- End Gallery ---
-                # Remove the separate Image Preview, Gallery handles preview
-                # caption_image_preview = gr.Image(...)
+                # Gallery shows cached thumbnails; the original loads here on selection
+                caption_image_preview = gr.Image(
+                    label="Selected Image (Full Resolution)",
+                    type="filepath", interactive=False, height=400
+                )
 
             with gr.Column(scale=2):
                 gr.Markdown("### Selected Image Caption") # Renamed section
@@ -82,6 +90,36 @@ def create_captions_tab(initial_agent_team_choices, initial_vision_models):
                          variant="secondary",
                          info=get_tooltip("caption_generate_selected_button")
                     )
+                    caption_parallel_workers = gr.Slider(
+                        minimum=1, maximum=16, step=1, value=initial_caption_workers,
+                        label="Parallel Workers (Generate ALL)",
+                        info=get_tooltip("caption_parallel_workers")
+                    )
+                    caption_resume_job = gr.Checkbox(
+                        label="Resume Interrupted Job", value=True,
+                        info=get_tooltip("caption_resume_job")
+                    )
+                    with gr.Row():
+                        caption_skip_duplicates = gr.Checkbox(
+                            label="Caption One Image per Near-Duplicate Group", value=False,
+                            info=get_tooltip("caption_skip_duplicates")
+                        )
+                        caption_duplicate_distance = gr.Slider(
+                            minimum=0, maximum=16, step=1, value=6,
+                            label="Near-Duplicate Threshold (bits)",
+                            info=get_tooltip("caption_duplicate_distance")
+                        )
+                    with gr.Row():
+                        caption_worker_processes = gr.Slider(
+                            minimum=1, maximum=8, step=1, value=1,
+                            label="Worker Processes (Generate ALL)",
+                            info=get_tooltip("caption_worker_processes")
+                        )
+                        caption_shard_by = gr.Radio(
+                            ["Subdirectory", "Hash"], value="Subdirectory",
+                            label="Shard By",
+                            info=get_tooltip("caption_shard_by")
+                        )
                     # Keep batch generate, but maybe disable initially until multi-select is refined?
                     caption_generate_all_button = gr.Button(
                          "Generate Captions for ALL Loaded Images",
@@ -93,33 +131,79 @@ def create_captions_tab(initial_agent_team_choices, initial_vision_models):
 
                 captions_status_display = gr.Textbox(label="Status", interactive=False, lines=3)
 
-                with gr.Accordion("Manual Batch Append/Prepend (Requires Multi-Select - TBD)", open=False):
-                    gr.Markdown("Manually add text to captions for **multiple selected images** (Multi-select UI to be determined).")
+                with gr.Accordion("Batch Edit Captions", open=False):
+                    gr.Markdown("Edit the captions of **many images at once**: select them by filename pattern, then apply one operation.")
+                    captions_batch_selection = gr.Textbox(
+                        label="Select Images (Glob Patterns)", value="*",
+                        placeholder="e.g. * or *.png, char_*",
+                        info=get_tooltip("captions_batch_selection")
+                    )
+                    captions_batch_mode = gr.Radio(
+                        ["Append", "Prepend", "Replace (Regex)", "Dedupe Tags"],
+                        label="Operation", value="Append",
+                        info=get_tooltip("captions_batch_mode")
+                    )
                     captions_batch_text = gr.Textbox(
-                        label="Text to Add",
+                        label="Text to Add / Regex Pattern",
                         info=get_tooltip("captions_batch_text")
                     )
+                    captions_batch_replace = gr.Textbox(
+                        label="Replacement (Replace mode)",
+                        info=get_tooltip("captions_batch_replace")
+                    )
+                    captions_batch_apply_button = gr.Button("Apply to Selected Images", info=get_tooltip("captions_batch_apply_button"))
+
+                with gr.Accordion("Export / Import Dataset", open=False):
+                    gr.Markdown("Pack the loaded images and captions into a few large files for fast copying, or unpack such files into a folder.")
                     with gr.Row():
-                        captions_prepend_button = gr.Button("Prepend Text", info=get_tooltip("captions_prepend_button"))
-                        captions_append_button = gr.Button("Append Text", info=get_tooltip("captions_append_button"))
-                        # Disable batch buttons until multi-select is clear
-                        captions_prepend_button.interactive = False
-                        captions_append_button.interactive = False
+                        dataset_export_format = gr.Radio(
+                            ["Tar Shards", "JSONL"], label="Export Format", value="Tar Shards",
+                            info=get_tooltip("dataset_export_format")
+                        )
+                        dataset_shard_size = gr.Number(
+                            label="Shard Size (MB)", value=512, precision=0,
+                            info=get_tooltip("dataset_shard_size")
+                        )
+                    dataset_export_folder = gr.Textbox(
+                        label="Export Folder", placeholder="Folder to write shards/JSONL into",
+                        info=get_tooltip("dataset_export_folder")
+                    )
+                    dataset_export_button = gr.Button("Export Loaded Images & Captions")
+                    dataset_import_source = gr.Textbox(
+                        label="Import Source", placeholder="A .tar shard, a .jsonl file, or a folder of them",
+                        info=get_tooltip("dataset_import_source")
+                    )
+                    dataset_import_dest = gr.Textbox(
+                        label="Import Into Folder", placeholder="Destination folder for images and .txt captions",
+                        info=get_tooltip("dataset_import_dest")
+                    )
+                    dataset_import_button = gr.Button("Import Dataset")
 
 
     return {
         # Existing Components (some removed/renamed)
         "captions_folder_path": captions_folder_path,
+        "captions_include_subfolders": captions_include_subfolders,
         "captions_load_button": captions_load_button,
+        "captions_refresh_button": captions_refresh_button,
         # "captions_image_selector": captions_image_selector, # Replaced by gallery
         "captions_image_gallery": captions_image_gallery, # NEW Gallery component
-        # "caption_image_preview": caption_image_preview, # Removed, gallery has preview
+        "caption_image_preview": caption_image_preview, # Full-resolution image for the selection
         "caption_selected_filename_display": caption_selected_filename_display,
         "captions_caption_display": captions_caption_display,
         "captions_save_button": captions_save_button,
+        "captions_batch_selection": captions_batch_selection,
+        "captions_batch_mode": captions_batch_mode,
         "captions_batch_text": captions_batch_text,
-        "captions_prepend_button": captions_prepend_button,
-        "captions_append_button": captions_append_button,
+        "captions_batch_replace": captions_batch_replace,
+        "captions_batch_apply_button": captions_batch_apply_button,
+        "dataset_export_format": dataset_export_format,
+        "dataset_shard_size": dataset_shard_size,
+        "dataset_export_folder": dataset_export_folder,
+        "dataset_export_button": dataset_export_button,
+        "dataset_import_source": dataset_import_source,
+        "dataset_import_dest": dataset_import_dest,
+        "dataset_import_button": dataset_import_button,
         "captions_status_display": captions_status_display,
 
         # Agent Captioning Components
@@ -128,6 +212,12 @@ def create_captions_tab(initial_agent_team_choices, initial_vision_models):
         "caption_generate_mode": caption_generate_mode,
         "caption_generate_selected_button": caption_generate_selected_button, # Renamed
         "caption_generate_all_button": caption_generate_all_button,
+        "caption_parallel_workers": caption_parallel_workers,
+        "caption_resume_job": caption_resume_job,
+        "caption_skip_duplicates": caption_skip_duplicates,
+        "caption_duplicate_distance": caption_duplicate_distance,
+        "caption_worker_processes": caption_worker_processes,
+        "caption_shard_by": caption_shard_by,
 
         # State keys remain the same conceptually
         "caption_image_paths_state_key": "caption_image_paths_state",
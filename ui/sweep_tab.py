@@ -1,8 +1,10 @@
 # ArtAgent/ui/sweep_tab.py
 import gradio as gr
 from core.help_content import get_tooltip # Assuming help content is added later
+from core.sweep_store import SWEEP_SINK_CHOICES
+from core.sweep_options import SWEEP_OPTION_MODE_CHOICES, DEFAULT_OPTION_SAMPLES
 
-def create_sweep_tab(initial_team_names, initial_model_names):
+def create_sweep_tab(initial_team_names, initial_model_names, initial_sweep_concurrency=1, initial_result_sink="json"):
     """Creates the Gradio components for the Experiment Sweep Tab."""
 
     with gr.Tab("Experiment Sweep"):
@@ -25,6 +27,25 @@ def create_sweep_tab(initial_team_names, initial_model_names):
                     label="Log Intermediate Agent Steps?", value=False,
                     info="Include the output of each agent step within the team workflow in the protocol file."
                 )
+                sweep_resume_folder_input = gr.Textbox(
+                    label="Resume Sweep Folder (optional)", value="",
+                    placeholder="e.g. 20240101_112233_sweep_results",
+                    info=get_tooltip("sweep_resume_folder")
+                )
+                sweep_concurrency_slider = gr.Slider(
+                    minimum=1, maximum=16, step=1, value=initial_sweep_concurrency,
+                    label="Concurrent Runs per Model",
+                    info=get_tooltip("sweep_concurrency")
+                )
+                sweep_result_sink_dropdown = gr.Dropdown(
+                    label="Protocol Storage", choices=list(SWEEP_SINK_CHOICES),
+                    value=next((label for label, sink in SWEEP_SINK_CHOICES.items() if sink == initial_result_sink), "JSON file per run"),
+                    info=get_tooltip("sweep_result_sink")
+                )
+                sweep_use_workers_checkbox = gr.Checkbox(
+                    label="Run on Worker Processes (queued)", value=False,
+                    info=get_tooltip("sweep_use_workers")
+                )
 
         with gr.Row():
             sweep_teams_select = gr.CheckboxGroup(
@@ -40,9 +61,34 @@ def create_sweep_tab(initial_team_names, initial_model_names):
                 info="Check one or more models to use for the agent steps."
             )
 
+        with gr.Accordion("Ollama Option Sweep (optional)", open=False):
+            with gr.Row():
+                sweep_option_space_input = gr.Textbox(
+                    label="Option Grid (JSON)", lines=3, value="",
+                    placeholder='{"temperature": [0.2, 0.7, 1.0], "num_ctx": [2048, 8192]}',
+                    info=get_tooltip("sweep_option_space")
+                )
+                with gr.Column():
+                    sweep_option_mode_dropdown = gr.Dropdown(
+                        label="Option Sets", choices=list(SWEEP_OPTION_MODE_CHOICES), value="Full grid",
+                        info=get_tooltip("sweep_option_mode")
+                    )
+                    sweep_option_samples_number = gr.Number(
+                        label="Samples (random / Latin hypercube)", value=DEFAULT_OPTION_SAMPLES, precision=0
+                    )
+
         with gr.Row():
+            sweep_estimate_button = gr.Button("🧮 Estimate Sweep (Dry Run)")
             sweep_start_button = gr.Button("🚀 Start Sweep Run", variant="primary")
 
+        with gr.Row():
+            sweep_analyze_folder_input = gr.Textbox(
+                label="Sweep Folder to Analyze", value="", scale=3,
+                placeholder="e.g. 20240101_112233_sweep_results",
+                info=get_tooltip("sweep_analyze_folder")
+            )
+            sweep_analyze_button = gr.Button("📊 Analyze Sweep Outputs", scale=1)
+
         with gr.Row():
             gr.Markdown("### Sweep Progress & Status")
             sweep_status_display = gr.Textbox(
@@ -57,6 +103,16 @@ def create_sweep_tab(initial_team_names, initial_model_names):
         "sweep_models_select": sweep_models_select,
         "sweep_output_folder_input": sweep_output_folder_input,
         "sweep_log_intermediate_checkbox": sweep_log_intermediate_checkbox,
+        "sweep_concurrency_slider": sweep_concurrency_slider,
+        "sweep_resume_folder_input": sweep_resume_folder_input,
+        "sweep_result_sink_dropdown": sweep_result_sink_dropdown,
+        "sweep_use_workers_checkbox": sweep_use_workers_checkbox,
+        "sweep_option_space_input": sweep_option_space_input,
+        "sweep_option_mode_dropdown": sweep_option_mode_dropdown,
+        "sweep_option_samples_number": sweep_option_samples_number,
+        "sweep_estimate_button": sweep_estimate_button,
         "sweep_start_button": sweep_start_button,
+        "sweep_analyze_folder_input": sweep_analyze_folder_input,
+        "sweep_analyze_button": sweep_analyze_button,
         "sweep_status_display": sweep_status_display,
     }
\ No newline at end of file